@@ -1,6 +1,33 @@
-import { NextResponse } from 'next/server';
-import { MongoClient } from 'mongodb';
 import { v4 as uuidv4 } from 'uuid';
+import { createHash } from 'crypto';
+import {
+  getDb, jsonResponse, errorResponse, getSession, getConfig, getPreferences, jellyfinAuthHeader, CORS_HEADERS,
+  invalidateSession, invalidateConfig, invalidatePreferences,
+} from '@/lib/server/bff';
+import { responseCache } from '@/lib/server/response-cache';
+import { resolveMediaStatuses, jellyseerrDetails } from '@/lib/server/media-status';
+import { ImageDiskCache, negotiateImageFormat } from '@/lib/server/image-cache';
+import {
+  jellyfinImageUrl, tmdbImageUrl, snapWidth, tmdbSize, PLACEHOLDER_WIDTH,
+} from '@/lib/images';
+import { upstreamFetch, upstreamJson, CircuitOpenError } from '@/lib/server/upstream';
+import { UpstreamOverloadedError } from '@/lib/server/admission';
+import {
+  beginRequestTiming, finishRequestTiming, timePhase, registerMetricsCollector, metricFamily, runDetached,
+} from '@/lib/server/metrics';
+import { syncCatalog, catalogGenres, resetCatalog } from '@/lib/server/catalog-index';
+import { searchIndex, mapSeerrResult, rememberSeerrResults, tmdbKey } from '@/lib/server/search-index';
+import { getDiscoverPage, refreshDiscoverSnapshots, resetDiscoverSnapshots } from '@/lib/server/discover-store';
+import {
+  CACHE_POLICIES, policyScope, visibilityScope, cachedJellyfinJson, getUserItemData, hasFullCatalogAccess,
+  ensureDiscoverRefresher, catalogForSession, getPlayedIds, loadLibraryPage, loadResumeItems, progressQueue,
+} from '@/lib/server/library';
+import {
+  RECO_SOURCE_BUDGETS, loadDagzHistory, recordPlayInDagzProfile, computeRecommendations,
+} from '@/lib/server/dagzrank';
+import { markHomeFeedDirty, refreshHomeFeed, resetHomeFeeds } from '@/lib/server/home-feed';
+import { prefetchInBackground } from '@/lib/server/warmup';
+import { streamUrlFor } from '@/lib/server/hls-proxy';
 
 /* =================================================================
    DagzFlix Backend - BFF (Backend-For-Frontend)
@@ -14,110 +41,13 @@ import { v4 as uuidv4 } from 'uuid';
    - Bug 4: DagzRank compatible with TMDB genreIds + fused recommendations
    ================================================================= */
 
-const MONGO_URL = process.env.MONGO_URL;
-const DB_NAME = process.env.DB_NAME || 'dagzflix';
-
-// --- MongoDB Connection Singleton ---
-let cachedClient = null;
-let cachedDb = null;
-
-async function getDb() {
-  if (cachedDb) return cachedDb;
-  try {
-    if (!cachedClient) {
-      cachedClient = new MongoClient(MONGO_URL);
-      await cachedClient.connect();
-    }
-    cachedDb = cachedClient.db(DB_NAME);
-    return cachedDb;
-  } catch (err) {
-    console.error('[DagzFlix] MongoDB connection error:', err.message);
-    throw new Error('Database connection failed');
-  }
-}
-
-// --- Helper: JSON response with CORS ---
-function jsonResponse(data, status = 200) {
-  return NextResponse.json(data, {
-    status,
-    headers: {
-      'Access-Control-Allow-Origin': '*',
-      'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-      'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-    },
-  });
-}
-
-// --- Helper: Get session from cookie ---
-async function getSession(req) {
-  const sessionId = req.cookies.get('dagzflix_session')?.value;
-  if (!sessionId) return null;
-  const db = await getDb();
-  const session = await db.collection('sessions').findOne({ _id: sessionId });
-  if (!session) return null;
-  if (new Date(session.expiresAt) < new Date()) {
-    await db.collection('sessions').deleteOne({ _id: sessionId });
-    return null;
-  }
-  return session;
-}
-
-// --- Helper: Get server configuration ---
-async function getConfig() {
-  const db = await getDb();
-  return db.collection('config').findOne({ _id: 'main' });
-}
-
-// --- Helper: Build Jellyfin auth header ---
-function jellyfinAuthHeader(token) {
-  const base = 'MediaBrowser Client="DagzFlix", Device="Web", DeviceId="dagzflix-web", Version="1.0"';
-  return token ? `${base}, Token="${token}"` : base;
-}
-
-/* =================================================================
-   BUG 4 FIX: TMDB Genre ID → Name mapping
-   Allows DagzRank to score TMDB objects (genreIds) alongside
-   Jellyfin objects (Genres as string names).
-   ================================================================= */
-
-const TMDB_GENRE_ID_TO_NAME = {
-  // Movies
-  28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy',
-  80: 'Crime', 99: 'Documentary', 18: 'Drama', 10751: 'Family',
-  14: 'Fantasy', 36: 'History', 27: 'Horror', 10402: 'Music',
-  9648: 'Mystery', 10749: 'Romance', 878: 'Science Fiction',
-  10770: 'TV Movie', 53: 'Thriller', 10752: 'War', 37: 'Western',
-  // TV-specific
-  10759: 'Action & Adventure', 10762: 'Kids', 10763: 'News',
-  10764: 'Reality', 10765: 'Sci-Fi & Fantasy', 10766: 'Soap',
-  10767: 'Talk', 10768: 'War & Politics',
-};
-
-/** Resolve genres from any source: Jellyfin (string[]), TMDB (genreIds number[]), or both */
-function resolveGenres(item) {
-  // Priority 1: Jellyfin string genres
-  const stringGenres = item.genres || item.Genres || [];
-  if (stringGenres.length > 0 && typeof stringGenres[0] === 'string') {
-    return stringGenres;
-  }
-  // Priority 2: TMDB genreIds → resolve to names
-  const genreIds = item.genreIds || item.genre_ids || [];
-  if (genreIds.length > 0) {
-    return genreIds.map(id => TMDB_GENRE_ID_TO_NAME[id] || `Genre_${id}`).filter(Boolean);
-  }
-  // Priority 3: if stringGenres contains objects like { id, name }
-  if (stringGenres.length > 0 && typeof stringGenres[0] === 'object') {
-    return stringGenres.map(g => g.name || g.Name).filter(Boolean);
-  }
-  return [];
-}
-
 /* =================================================================
    SETUP ROUTES
    ================================================================= */
 
 /** Check if initial setup has been completed */
 async function handleSetupCheck() {
+  beginRequestTiming('setup/check');
   try {
     const config = await getConfig();
     return jsonResponse({
@@ -132,6 +62,7 @@ async function handleSetupCheck() {
 
 /** Test connection to Jellyfin or Jellyseerr */
 async function handleSetupTest(req) {
+  beginRequestTiming('setup/test', req);
   try {
     const body = await req.json();
     const { type, url, apiKey } = body;
@@ -169,12 +100,13 @@ async function handleSetupTest(req) {
 
     return jsonResponse({ success: false, error: 'Type invalide' }, 400);
   } catch (err) {
-    return jsonResponse({ success: false, error: err.message }, 500);
+    return errorResponse(err, { success: false });
   }
 }
 
 /** Save setup configuration */
 async function handleSetupSave(req) {
+  beginRequestTiming('setup/save', req);
   try {
     const body = await req.json();
     const { jellyfinUrl, jellyfinApiKey, jellyseerrUrl, jellyseerrApiKey } = body;
@@ -199,9 +131,27 @@ async function handleSetupSave(req) {
       { upsert: true }
     );
 
+    // New upstream servers: nothing cached or indexed so far is valid anymore
+    invalidateConfig();
+    responseCache.clear();
+    await imageCache.clear('jellyfin|');
+    await resetCatalog(db);
+    await resetDiscoverSnapshots(db);
+    await resetHomeFeeds(db);
+    searchIndex.clear();
+    if (jellyfinApiKey) {
+      syncCatalog(db, await getConfig(), { full: true })
+        .catch(err => console.error('[DagzFlix] Catalog sync error:', err.message));
+    }
+    if (jellyseerrUrl) {
+      const config = await getConfig();
+      runDetached(() => refreshDiscoverSnapshots(db, config))
+        .catch(err => console.error('[DagzFlix] Discover snapshot refresh failed:', err.message));
+    }
+
     return jsonResponse({ success: true, message: 'Configuration sauvegardee' });
   } catch (err) {
-    return jsonResponse({ success: false, error: err.message }, 500);
+    return errorResponse(err, { success: false });
   }
 }
 
@@ -211,6 +161,7 @@ async function handleSetupSave(req) {
 
 /** Login via Jellyfin proxy - authenticate user and create local session */
 async function handleAuthLogin(req) {
+  beginRequestTiming('auth/login', req);
   try {
     const body = await req.json();
     const { username, password } = body;
@@ -225,15 +176,14 @@ async function handleAuthLogin(req) {
     }
 
     // Proxy authentication to Jellyfin
-    const jellyfinRes = await fetch(`${config.jellyfinUrl}/Users/AuthenticateByName`, {
+    const jellyfinRes = await upstreamFetch(`${config.jellyfinUrl}/Users/AuthenticateByName`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
         'X-Emby-Authorization': jellyfinAuthHeader(),
       },
       body: JSON.stringify({ Username: username, Pw: password }),
-      signal: AbortSignal.timeout(30000), // BUG 3 FIX: 15s → 30s
-    });
+    }, { service: 'Jellyfin' });
 
     if (!jellyfinRes.ok) {
       const status = jellyfinRes.status;
@@ -246,27 +196,43 @@ async function handleAuthLogin(req) {
     const accessToken = authData.AccessToken;
     const displayName = authData.User?.Name || username;
 
+    // Resolve the user's visibility scope for the shared response cache
+    let policy = authData.User?.Policy;
+    if (!policy) {
+      try {
+        const userRes = await upstreamFetch(`${config.jellyfinUrl}/Users/${userId}`, {
+          headers: { 'X-Emby-Token': accessToken },
+        }, { service: 'Jellyfin' });
+        if (userRes.ok) policy = (await userRes.json()).Policy;
+      } catch (e) { /* fall back to a per-user scope */ }
+    }
+
     // Create local session
     const sessionId = uuidv4();
     const db = await getDb();
-    await db.collection('sessions').insertOne({
+    const session = {
       _id: sessionId,
       userId,
       jellyfinToken: accessToken,
       jellyfinUserId: userId,
       username: displayName,
+      visibilityScope: policyScope(policy),
+      fullCatalogAccess: hasFullCatalogAccess(policy),
       createdAt: new Date(),
       expiresAt: new Date(Date.now() + 7 * 24 * 60 * 60 * 1000), // 7 days
-    });
+    };
+    await db.collection('sessions').insertOne(session);
 
     // Check if onboarding is complete
-    const prefs = await db.collection('preferences').findOne({ userId });
+    const prefs = await getPreferences(userId);
 
     const response = jsonResponse({
       success: true,
       user: { id: userId, name: displayName },
       onboardingComplete: !!prefs?.onboardingComplete,
     });
+    // After the response timing closed: the prefetch is not this request's work
+    prefetchDashboard(config, session);
 
     // Set httpOnly session cookie
     response.cookies.set('dagzflix_session', sessionId, {
@@ -287,31 +253,62 @@ async function handleAuthLogin(req) {
   }
 }
 
+/**
+ * Load what the dashboard asks for first in the background, so it is cached
+ * by the time the login redirect lands: resume row, DagzRank inputs (history,
+ * played ids, catalog snapshot), genres and the discover rows.
+ */
+function prefetchDashboard(config, session) {
+  prefetchInBackground(session.userId, {
+    resume: async () => {
+      await progressQueue.settle(`${session.userId}|`);
+      const items = await loadResumeItems(config, session);
+      prefetchPlayback(config, session, { itemIds: items.slice(0, PLAYBACK_PREFETCH_RESUME).map(i => i.id) });
+    },
+    history: async () => loadDagzHistory(
+      await getDb(), config, session, await getPreferences(session.userId), RECO_SOURCE_BUDGETS.history
+    ),
+    catalog: async () => {
+      const snap = await catalogForSession(await getDb(), config, session);
+      if (snap) return getPlayedIds(config, session);
+      return cachedJellyfinJson(
+        `${config.jellyfinUrl}/Genres?UserId=${session.jellyfinUserId}&SortBy=SortName&SortOrder=Ascending`,
+        session,
+        'genres'
+      );
+    },
+    discover: async () => config.jellyseerrUrl && Promise.all(['movies', 'tv'].map(async endpoint => getDiscoverPage(await getDb(), config, endpoint, 1))),
+    home: async () => refreshHomeFeed({ db: await getDb(), config, session }),
+  });
+}
+
 /** Logout - destroy session */
 async function handleAuthLogout(req) {
+  beginRequestTiming('auth/logout', req);
   try {
     const sessionId = req.cookies.get('dagzflix_session')?.value;
     if (sessionId) {
       const db = await getDb();
       await db.collection('sessions').deleteOne({ _id: sessionId });
+      invalidateSession(sessionId);
     }
     const response = jsonResponse({ success: true });
     response.cookies.set('dagzflix_session', '', { maxAge: 0, path: '/' });
     return response;
   } catch (err) {
-    return jsonResponse({ success: false, error: err.message }, 500);
+    return errorResponse(err, { success: false });
   }
 }
 
 /** Get current session info */
 async function handleAuthSession(req) {
+  beginRequestTiming('auth/session', req);
   try {
     const session = await getSession(req);
     if (!session) {
       return jsonResponse({ authenticated: false });
     }
-    const db = await getDb();
-    const prefs = await db.collection('preferences').findOne({ userId: session.userId });
+    const prefs = await getPreferences(session.userId);
     return jsonResponse({
       authenticated: true,
       user: {
@@ -332,6 +329,7 @@ async function handleAuthSession(req) {
 
 /** Save user genre preferences (onboarding) */
 async function handlePreferencesSave(req) {
+  beginRequestTiming('preferences', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -353,24 +351,26 @@ async function handlePreferencesSave(req) {
       },
       { upsert: true }
     );
+    invalidatePreferences(session.userId);
+    await markHomeFeedDirty({ db, config: await getConfig(), session }, ['picks'], { delay: 0 });
 
     return jsonResponse({ success: true });
   } catch (err) {
-    return jsonResponse({ error: err.message }, 500);
+    return errorResponse(err);
   }
 }
 
 /** Get user preferences */
 async function handlePreferencesGet(req) {
+  beginRequestTiming('preferences', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
 
-    const db = await getDb();
-    const prefs = await db.collection('preferences').findOne({ userId: session.userId });
-    return jsonResponse({ preferences: prefs || {} });
+    const { dagzProfile, ...prefs } = (await getPreferences(session.userId)) || {};
+    return jsonResponse({ preferences: prefs });
   } catch (err) {
-    return jsonResponse({ error: err.message }, 500);
+    return errorResponse(err);
   }
 }
 
@@ -378,105 +378,358 @@ async function handlePreferencesGet(req) {
    MEDIA ROUTES - Jellyfin Proxy
    ================================================================= */
 
-/** Get media library from Jellyfin */
+// NDJSON variant: the first rows are fetched (and streamed) on their own
+const LIBRARY_STREAM_FIRST = 24;
+
+/** Opaque library cursor: next start index, bound to the query it was issued for */
+function encodeLibraryCursor(query, startIndex) {
+  return Buffer.from(JSON.stringify({ s: startIndex, q: libraryQueryHash(query) })).toString('base64url');
+}
+
+/** Start index of a cursor, or null when malformed or issued for another query */
+function decodeLibraryCursor(cursor, query) {
+  try {
+    const { s, q } = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    return Number.isInteger(s) && s >= 0 && q === libraryQueryHash(query) ? s : null;
+  } catch {
+    return null;
+  }
+}
+
+function libraryQueryHash(query) {
+  return createHash('sha1').update(JSON.stringify(query)).digest('hex').slice(0, 12);
+}
+
+/**
+ * NDJSON library page: a { totalCount } line, one { item } line per item, then
+ * { done, totalCount, nextCursor } (or { error }). The first LIBRARY_STREAM_FIRST
+ * rows are a separate upstream call so they are written before the rest arrives.
+ */
+function streamLibraryPage(loadPage, query, startIndex, limit) {
+  const slices = [[startIndex, Math.min(limit, LIBRARY_STREAM_FIRST)]];
+  if (limit > LIBRARY_STREAM_FIRST) slices.push([startIndex + LIBRARY_STREAM_FIRST, limit - LIBRARY_STREAM_FIRST]);
+  const pages = slices.map(([start, count]) => loadPage(start, count));
+  pages.forEach(p => p.catch(() => { /* reported in the stream */ }));
+
+  const encoder = new TextEncoder();
+  const body = new ReadableStream({
+    async start(controller) {
+      const line = record => controller.enqueue(encoder.encode(`${JSON.stringify(record)}\n`));
+      let next = startIndex;
+      let total = 0;
+      try {
+        for (let idx = 0; idx < pages.length; idx++) {
+          const page = await pages[idx];
+          if (idx === 0) {
+            total = page.total;
+            line({ totalCount: total });
+          }
+          page.items.forEach(item => line({ item }));
+          next += page.items.length;
+          if (page.items.length < slices[idx][1]) break; // end of the library
+        }
+        line({ done: true, totalCount: total, nextCursor: next > startIndex && next < total ? encodeLibraryCursor(query, next) : null });
+      } catch (err) {
+        console.error('[DagzFlix] Media library stream error:', err.message);
+        line({ error: err.message });
+      }
+      controller.close();
+    },
+  });
+  return finishRequestTiming(new Response(body, {
+    status: 200,
+    headers: { ...CORS_HEADERS, 'Content-Type': 'application/x-ndjson; charset=utf-8', 'Cache-Control': 'no-store' },
+  }));
+}
+
+/**
+ * Get media library from Jellyfin.
+ * fields=card|detail picks the projection; cursor (from nextCursor) replaces
+ * startIndex; format=ndjson (or Accept: application/x-ndjson) streams the page.
+ */
 async function handleMediaLibrary(req) {
+  beginRequestTiming('media/library', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
 
     const config = await getConfig();
     const url = new URL(req.url);
-    const type = url.searchParams.get('type') || 'Movie';
-    const limit = url.searchParams.get('limit') || '20';
-    const startIndex = url.searchParams.get('startIndex') || '0';
-    const sortBy = url.searchParams.get('sortBy') || 'DateCreated';
-    const sortOrder = url.searchParams.get('sortOrder') || 'Descending';
-    const genreIds = url.searchParams.get('genreIds') || '';
-    const searchTerm = url.searchParams.get('searchTerm') || '';
-
-    let endpoint = `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items`;
-    const params = new URLSearchParams({
-      IncludeItemTypes: type,
-      Limit: limit,
-      StartIndex: startIndex,
-      SortBy: sortBy,
-      SortOrder: sortOrder,
-      Recursive: 'true',
-      Fields: 'Overview,Genres,CommunityRating,OfficialRating,PremiereDate,RunTimeTicks,People,ProviderIds,MediaSources',
-      ImageTypeLimit: '1',
-      EnableImageTypes: 'Primary,Backdrop,Thumb',
-    });
-
-    if (genreIds) params.set('GenreIds', genreIds);
-    if (searchTerm) params.set('SearchTerm', searchTerm);
-
-    const res = await fetch(`${endpoint}?${params.toString()}`, {
-      headers: { 'X-Emby-Token': session.jellyfinToken },
-      signal: AbortSignal.timeout(45000), // BUG 3 FIX: 15s → 45s (heavy query)
-    });
-
-    if (!res.ok) throw new Error(`Jellyfin responded with ${res.status}`);
-    const data = await res.json();
+    const query = {
+      type: url.searchParams.get('type') || 'Movie',
+      sortBy: url.searchParams.get('sortBy') || 'DateCreated',
+      sortOrder: url.searchParams.get('sortOrder') || 'Descending',
+      genreIds: url.searchParams.get('genreIds') || '',
+      searchTerm: url.searchParams.get('searchTerm') || '',
+      fields: url.searchParams.get('fields') === 'card' ? 'card' : 'detail',
+    };
+    const limit = Math.max(1, parseInt(url.searchParams.get('limit') || '20') || 20);
+    let startIndex = Math.max(0, parseInt(url.searchParams.get('startIndex') || '0') || 0);
+    const cursor = url.searchParams.get('cursor');
+    if (cursor) {
+      startIndex = decodeLibraryCursor(cursor, query);
+      if (startIndex === null) return jsonResponse({ error: 'Curseur invalide' }, 400);
+    }
 
-    // Transform items to include proxy image URLs
-    const items = (data.Items || []).map(item => ({
-      id: item.Id,
-      name: item.Name,
-      type: item.Type,
-      overview: item.Overview || '',
-      genres: item.Genres || [],
-      communityRating: item.CommunityRating || 0,
-      officialRating: item.OfficialRating || '',
-      premiereDate: item.PremiereDate || '',
-      year: item.ProductionYear || '',
-      runtime: item.RunTimeTicks ? Math.round(item.RunTimeTicks / 600000000) : 0,
-      posterUrl: `/api/proxy/image?itemId=${item.Id}&type=Primary&maxWidth=400`,
-      backdropUrl: `/api/proxy/image?itemId=${item.Id}&type=Backdrop&maxWidth=1920`,
-      thumbUrl: `/api/proxy/image?itemId=${item.Id}&type=Thumb&maxWidth=600`,
-      people: (item.People || []).slice(0, 5).map(p => ({ name: p.Name, role: p.Role, type: p.Type })),
-      providerIds: item.ProviderIds || {},
-      hasSubtitles: item.HasSubtitles || false,
-      isPlayed: item.UserData?.Played || false,
-      playbackPositionTicks: item.UserData?.PlaybackPositionTicks || 0,
-      mediaSources: (item.MediaSources || []).length > 0,
-    }));
+    const loadPage = (start, count) => loadLibraryPage(config, session, query, start, count);
+    const wantsStream = url.searchParams.get('format') === 'ndjson'
+      || (req.headers.get('accept') || '').includes('application/x-ndjson');
+    if (wantsStream) return streamLibraryPage(loadPage, query, startIndex, limit);
 
+    const page = await loadPage(startIndex, limit);
+    const next = startIndex + page.items.length;
     return jsonResponse({
-      items,
-      totalCount: data.TotalRecordCount || 0,
+      items: page.items,
+      totalCount: page.total,
+      nextCursor: next > startIndex && next < page.total ? encodeLibraryCursor(query, next) : null,
     });
   } catch (err) {
     console.error('[DagzFlix] Media library error:', err.message);
-    return jsonResponse({ items: [], totalCount: 0, error: err.message }, 500);
+    return errorResponse(err, { items: [], totalCount: 0 });
   }
 }
 
 /** Get Jellyfin genres */
 async function handleMediaGenres(req) {
+  beginRequestTiming('media/genres', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
 
     const config = await getConfig();
-    const res = await fetch(
+    const snap = await catalogForSession(await getDb(), config, session);
+    if (snap) return jsonResponse({ genres: catalogGenres(snap) });
+
+    const data = await cachedJellyfinJson(
       `${config.jellyfinUrl}/Genres?UserId=${session.jellyfinUserId}&SortBy=SortName&SortOrder=Ascending`,
-      {
-        headers: { 'X-Emby-Token': session.jellyfinToken },
-        signal: AbortSignal.timeout(30000), // BUG 3 FIX: 10s → 30s
-      }
+      session,
+      'genres'
     );
-
-    if (!res.ok) throw new Error(`Jellyfin responded with ${res.status}`);
-    const data = await res.json();
     const genres = (data.Items || []).map(g => ({ id: g.Id, name: g.Name }));
     return jsonResponse({ genres });
   } catch (err) {
-    return jsonResponse({ genres: [], error: err.message }, 500);
+    return errorResponse(err, { genres: [] });
+  }
+}
+
+/* =================================================================
+   MEDIA DETAIL - everything the detail page shows, in one request
+   GET /api/media/detail?id=<jellyfinId>[&tmdbId=&mediaType=movie|tv]
+       [&sections=item,similar,status,seasons,episodes,collection,trailers]
+       [&format=ndjson]
+   Sections load concurrently. Those needing the TMDB id or the item type
+   wait for the item only when the caller did not pass tmdbId / mediaType;
+   episodes (of the first season) wait for the seasons. JSON answers once
+   every section settled (failed ones are null, messages under `errors`);
+   NDJSON writes a { section, data } or { section, error } line as each
+   completes, then { done }. Without `sections`: item + similar.
+   ================================================================= */
+
+const DETAIL_SECTIONS = ['item', 'similar', 'status', 'seasons', 'episodes', 'collection', 'trailers'];
+const DETAIL_DEFAULT_SECTIONS = ['item', 'similar'];
+
+/** Detail page shape of a Jellyfin item */
+function mapDetailItem(item, userData) {
+  return {
+    id: item.Id,
+    name: item.Name,
+    originalTitle: item.OriginalTitle || '',
+    type: item.Type,
+    overview: item.Overview || '',
+    genres: item.Genres || [],
+    communityRating: item.CommunityRating || 0,
+    officialRating: item.OfficialRating || '',
+    premiereDate: item.PremiereDate || '',
+    year: item.ProductionYear || '',
+    runtime: item.RunTimeTicks ? Math.round(item.RunTimeTicks / 600000000) : 0,
+    posterUrl: jellyfinImageUrl(item.Id, 'Primary'),
+    backdropUrl: jellyfinImageUrl(item.Id, 'Backdrop'),
+    people: (item.People || []).map(p => ({ name: p.Name, role: p.Role, type: p.Type })),
+    providerIds: item.ProviderIds || {},
+    studios: (item.Studios || []).map(s => s.Name),
+    taglines: item.Taglines || [],
+    isPlayed: userData?.Played || false,
+    playbackPositionTicks: userData?.PlaybackPositionTicks || 0,
+    mediaSources: (item.MediaSources || []).map(ms => ({
+      id: ms.Id, name: ms.Name, size: ms.Size,
+      container: ms.Container, videoCodec: ms.VideoStream?.Codec,
+      audioCodec: ms.AudioStream?.Codec,
+      resolution: ms.VideoStream ? `${ms.VideoStream.Width}x${ms.VideoStream.Height}` : '',
+    })),
+    hasSubtitles: item.HasSubtitles || false,
+    externalUrls: item.ExternalUrls || [],
+  };
+}
+
+/** Similar items (shared per visibility scope) */
+async function loadSimilar(config, session, itemId) {
+  const simData = await cachedJellyfinJson(
+    `${config.jellyfinUrl}/Items/${itemId}/Similar?UserId=${session.jellyfinUserId}&Limit=12&Fields=Overview,Genres,CommunityRating`,
+    session,
+    'similar'
+  );
+  return (simData.Items || []).map(s => ({
+    id: s.Id, name: s.Name, type: s.Type,
+    posterUrl: jellyfinImageUrl(s.Id, 'Primary'),
+    communityRating: s.CommunityRating || 0,
+    year: s.ProductionYear || '',
+  }));
+}
+
+/** Seasons of a series (shared per visibility scope) */
+async function loadSeasons(config, session, seriesId) {
+  const data = await cachedJellyfinJson(
+    `${config.jellyfinUrl}/Shows/${seriesId}/Seasons?UserId=${session.jellyfinUserId}&Fields=ItemCounts`,
+    session,
+    'seasons'
+  );
+  return (data.Items || []).map(s => ({
+    id: s.Id,
+    name: s.Name,
+    seasonNumber: s.IndexNumber ?? 0,
+    episodeCount: s.ChildCount || 0,
+    posterUrl: jellyfinImageUrl(s.Id, 'Primary'),
+  }));
+}
+
+/** Episodes of one season: metadata shared per visibility scope, played / resume state per user */
+async function loadEpisodes(config, session, seriesId, seasonId) {
+  const data = await cachedJellyfinJson(
+    `${config.jellyfinUrl}/Shows/${seriesId}/Episodes?SeasonId=${seasonId}&UserId=${session.jellyfinUserId}&Fields=Overview`,
+    session,
+    'seasons'
+  );
+  const episodes = data.Items || [];
+  const userData = await getUserItemData(config, session, episodes.map(e => e.Id));
+  return episodes.map(e => {
+    const ud = userData[e.Id] || e.UserData;
+    return {
+      id: e.Id,
+      name: e.Name,
+      episodeNumber: e.IndexNumber ?? 0,
+      seasonNumber: e.ParentIndexNumber ?? 0,
+      overview: e.Overview || '',
+      runtime: e.RunTimeTicks ? Math.round(e.RunTimeTicks / 600000000) : 0,
+      thumbUrl: jellyfinImageUrl(e.Id, 'Primary'),
+      isPlayed: ud?.Played || false,
+      playbackPositionTicks: ud?.PlaybackPositionTicks || 0,
+    };
+  });
+}
+
+/** TMDB collection (saga) of a movie through Jellyseerr, or null */
+async function loadCollection(config, tmdbId) {
+  if (!config.jellyseerrUrl) return null;
+  const details = await jellyseerrDetails(config, 'movie', tmdbId);
+  const collectionId = details.collection?.id;
+  if (!collectionId) return null;
+  const { ttl, swr, timeout } = CACHE_POLICIES.collection;
+  const data = await responseCache.wrap(`seerr|collection/${collectionId}`, { ttl, swr, tags: ['seerr'] }, () => upstreamJson(
+    `${config.jellyseerrUrl}/api/v1/collection/${collectionId}`,
+    { headers: { 'X-Api-Key': config.jellyseerrApiKey }, service: 'Jellyseerr' },
+    { budget: timeout }
+  ));
+  const parts = [...(data.parts || [])].sort((a, b) => (a.releaseDate || '').localeCompare(b.releaseDate || ''));
+  return {
+    id: data.id,
+    name: data.name || details.collection.name || '',
+    overview: data.overview || '',
+    items: parts.map(part => ({
+      id: part.mediaInfo?.jellyfinMediaId || part.id,
+      tmdbId: part.id,
+      name: part.title || part.name || '',
+      type: 'Movie',
+      mediaType: 'movie',
+      year: (part.releaseDate || '').substring(0, 4),
+      posterUrl: tmdbImageUrl(part.posterPath, 'poster'),
+      mediaStatus: part.mediaInfo?.status || 0,
+      isCurrent: String(part.id) === String(tmdbId),
+    })),
+  };
+}
+
+/** YouTube trailers from Jellyseerr, else the item's remote trailers from Jellyfin */
+async function loadTrailers(config, tmdbId, mediaType, item) {
+  if (config.jellyseerrUrl && tmdbId) {
+    try {
+      const details = await jellyseerrDetails(config, mediaType, tmdbId);
+      const videos = (details.relatedVideos || []).filter(v => v.type === 'Trailer' && v.site === 'YouTube');
+      if (videos.length > 0) return videos.map(v => ({ name: v.name || '', key: v.key, url: v.url, site: v.site }));
+    } catch (e) { /* fall back to Jellyfin */ }
   }
+  return (item?.RemoteTrailers || []).map(t => ({ name: t.Name || '', key: null, url: t.Url }));
 }
 
-/** Get single media detail from Jellyfin */
+/** One promise per requested section, all started now; shared inputs are loaded once */
+function detailSectionTasks(config, session, itemId, hint, sections) {
+  const once = fn => {
+    let promise = null;
+    return () => (promise ||= fn());
+  };
+  const rawItem = once(() => cachedJellyfinJson(
+    `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items/${itemId}`,
+    session,
+    'detail'
+  ));
+  const knownItem = once(() => (itemId ? rawItem().catch(() => null) : Promise.resolve(null)));
+  const mediaType = once(async () => {
+    if (hint.mediaType) return hint.mediaType === 'tv' ? 'tv' : 'movie';
+    return (await knownItem())?.Type === 'Series' ? 'tv' : 'movie';
+  });
+  const tmdbId = once(async () => hint.tmdbId || (await knownItem())?.ProviderIds?.Tmdb || null);
+  const seasons = once(async () => (itemId && (await mediaType()) === 'tv' ? loadSeasons(config, session, itemId) : []));
+
+  const loaders = {
+    item: async () => {
+      if (!itemId) return null;
+      const item = await rawItem();
+      const userData = (await getUserItemData(config, session, [item.Id]))[item.Id] || item.UserData;
+      return mapDetailItem(item, userData);
+    },
+    similar: () => (itemId ? loadSimilar(config, session, itemId).catch(() => []) : []), // similar is optional
+    status: async () => {
+      const [{ status, jellyfinAvailable, jellyseerrStatus }] = await resolveMediaStatuses(config, session, [
+        { id: itemId, tmdbId: await tmdbId(), mediaType: await mediaType() },
+      ]);
+      return { status, jellyfinAvailable, jellyseerrStatus };
+    },
+    seasons,
+    episodes: async () => {
+      const [first] = await seasons();
+      return first ? { seasonId: first.id, episodes: await loadEpisodes(config, session, itemId, first.id) } : null;
+    },
+    collection: async () => {
+      const id = await tmdbId();
+      return id && (await mediaType()) === 'movie' ? loadCollection(config, id) : null;
+    },
+    trailers: async () => loadTrailers(config, await tmdbId(), await mediaType(), await knownItem()),
+  };
+  return Object.fromEntries(sections.map(name => [name, Promise.resolve().then(loaders[name])]));
+}
+
+/** NDJSON detail: one line per section as it completes, then { done } */
+function streamDetailSections(tasks) {
+  const encoder = new TextEncoder();
+  const body = new ReadableStream({
+    async start(controller) {
+      const line = record => controller.enqueue(encoder.encode(`${JSON.stringify(record)}\n`));
+      await Promise.all(Object.entries(tasks).map(([section, task]) => task.then(
+        data => line({ section, data }),
+        err => line({ section, error: err.message })
+      )));
+      line({ done: true });
+      controller.close();
+    },
+  });
+  return finishRequestTiming(new Response(body, {
+    status: 200,
+    headers: { ...CORS_HEADERS, 'Content-Type': 'application/x-ndjson; charset=utf-8', 'Cache-Control': 'no-store' },
+  }));
+}
+
+/** Media detail page: item and the sections asked for (see above) */
 async function handleMediaDetail(req) {
+  beginRequestTiming('media/detail', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -484,72 +737,35 @@ async function handleMediaDetail(req) {
     const config = await getConfig();
     const url = new URL(req.url);
     const itemId = url.searchParams.get('id');
-
-    if (!itemId) return jsonResponse({ error: 'ID requis' }, 400);
-
-    const res = await fetch(
-      `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items/${itemId}`,
-      {
-        headers: { 'X-Emby-Token': session.jellyfinToken },
-        signal: AbortSignal.timeout(30000), // BUG 3 FIX: 10s → 30s
-      }
-    );
-
-    if (!res.ok) throw new Error(`Jellyfin responded with ${res.status}`);
-    const item = await res.json();
-
-    // Get similar items
-    let similar = [];
-    try {
-      const simRes = await fetch(
-        `${config.jellyfinUrl}/Items/${itemId}/Similar?UserId=${session.jellyfinUserId}&Limit=12&Fields=Overview,Genres,CommunityRating`,
-        { headers: { 'X-Emby-Token': session.jellyfinToken }, signal: AbortSignal.timeout(30000) } // BUG 3 FIX
-      );
-      if (simRes.ok) {
-        const simData = await simRes.json();
-        similar = (simData.Items || []).map(s => ({
-          id: s.Id, name: s.Name, type: s.Type,
-          posterUrl: `/api/proxy/image?itemId=${s.Id}&type=Primary&maxWidth=300`,
-          communityRating: s.CommunityRating || 0,
-          year: s.ProductionYear || '',
-        }));
-      }
-    } catch (e) { /* ignore similar items errors */ }
-
-    return jsonResponse({
-      item: {
-        id: item.Id,
-        name: item.Name,
-        originalTitle: item.OriginalTitle || '',
-        type: item.Type,
-        overview: item.Overview || '',
-        genres: item.Genres || [],
-        communityRating: item.CommunityRating || 0,
-        officialRating: item.OfficialRating || '',
-        premiereDate: item.PremiereDate || '',
-        year: item.ProductionYear || '',
-        runtime: item.RunTimeTicks ? Math.round(item.RunTimeTicks / 600000000) : 0,
-        posterUrl: `/api/proxy/image?itemId=${item.Id}&type=Primary&maxWidth=500`,
-        backdropUrl: `/api/proxy/image?itemId=${item.Id}&type=Backdrop&maxWidth=1920`,
-        people: (item.People || []).map(p => ({ name: p.Name, role: p.Role, type: p.Type })),
-        providerIds: item.ProviderIds || {},
-        studios: (item.Studios || []).map(s => s.Name),
-        taglines: item.Taglines || [],
-        isPlayed: item.UserData?.Played || false,
-        playbackPositionTicks: item.UserData?.PlaybackPositionTicks || 0,
-        mediaSources: (item.MediaSources || []).map(ms => ({
-          id: ms.Id, name: ms.Name, size: ms.Size,
-          container: ms.Container, videoCodec: ms.VideoStream?.Codec,
-          audioCodec: ms.AudioStream?.Codec,
-          resolution: ms.VideoStream ? `${ms.VideoStream.Width}x${ms.VideoStream.Height}` : '',
-        })),
-        hasSubtitles: item.HasSubtitles || false,
-        externalUrls: item.ExternalUrls || [],
-      },
-      similar,
+    const hint = { tmdbId: url.searchParams.get('tmdbId'), mediaType: url.searchParams.get('mediaType') };
+
+    if (!itemId && !hint.tmdbId) return jsonResponse({ error: 'ID requis' }, 400);
+
+    const requested = url.searchParams.get('sections');
+    const sections = requested
+      ? [...new Set(requested.split(',').map(s => s.trim()))].filter(s => DETAIL_SECTIONS.includes(s))
+      : DETAIL_DEFAULT_SECTIONS;
+    if (sections.length === 0) return jsonResponse({ error: 'Section inconnue' }, 400);
+
+    const tasks = detailSectionTasks(config, session, itemId, hint, sections);
+    const wantsStream = url.searchParams.get('format') === 'ndjson'
+      || (req.headers.get('accept') || '').includes('application/x-ndjson');
+    if (wantsStream) return streamDetailSections(tasks);
+
+    const settled = await Promise.allSettled(Object.values(tasks));
+    const result = {};
+    const errors = {};
+    sections.forEach((name, idx) => {
+      const outcome = settled[idx];
+      result[name] = outcome.status === 'fulfilled' ? outcome.value : null;
+      if (outcome.status === 'rejected') errors[name] = outcome.reason?.message || String(outcome.reason);
     });
+    // The page cannot render without its item
+    if (errors.item) return errorResponse(settled[sections.indexOf('item')].reason);
+    if (Object.keys(errors).length > 0) result.errors = errors;
+    return jsonResponse(result);
   } catch (err) {
-    return jsonResponse({ error: err.message }, 500);
+    return errorResponse(err);
   }
 }
 
@@ -558,43 +774,19 @@ async function handleMediaDetail(req) {
    ================================================================= */
 
 async function handleMediaResume(req) {
+  beginRequestTiming('media/resume', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
 
     const config = await getConfig();
-    const res = await fetch(
-      `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items/Resume?Limit=20&Recursive=true&Fields=Overview,Genres,CommunityRating,PremiereDate,RunTimeTicks,MediaSources&MediaTypes=Video&ImageTypeLimit=1&EnableImageTypes=Primary,Backdrop,Thumb`,
-      {
-        headers: { 'X-Emby-Token': session.jellyfinToken },
-        signal: AbortSignal.timeout(45000), // BUG 3 FIX: 10s → 45s (heavy query)
-      }
-    );
-
-    if (!res.ok) throw new Error(`Jellyfin responded with ${res.status}`);
-    const data = await res.json();
-
-    const items = (data.Items || []).map(item => ({
-      id: item.Id,
-      name: item.Name,
-      type: item.Type,
-      seriesName: item.SeriesName || '',
-      overview: item.Overview || '',
-      genres: item.Genres || [],
-      communityRating: item.CommunityRating || 0,
-      year: item.ProductionYear || '',
-      runtime: item.RunTimeTicks ? Math.round(item.RunTimeTicks / 600000000) : 0,
-      posterUrl: `/api/proxy/image?itemId=${item.Id}&type=Primary&maxWidth=400`,
-      backdropUrl: `/api/proxy/image?itemId=${item.Id}&type=Backdrop&maxWidth=1920`,
-      thumbUrl: `/api/proxy/image?itemId=${item.Id}&type=Thumb&maxWidth=600`,
-      playbackPositionTicks: item.UserData?.PlaybackPositionTicks || 0,
-      playbackPercentage: item.UserData?.PlayedPercentage || 0,
-    }));
-
+    await progressQueue.settle(`${session.userId}|`); // queued positions first
+    const items = await loadResumeItems(config, session);
+    prefetchPlayback(config, session, { itemIds: items.slice(0, PLAYBACK_PREFETCH_RESUME).map(i => i.id) });
     return jsonResponse({ items });
   } catch (err) {
     console.error('[DagzFlix] Resume error:', err.message);
-    return jsonResponse({ items: [], error: err.message }, 500);
+    return errorResponse(err, { items: [] });
   }
 }
 
@@ -603,9 +795,12 @@ async function handleMediaResume(req) {
    New endpoint: POST /api/media/progress
    Reports current playback position to Jellyfin in Ticks.
    Called by VideoPlayer.jsx every 10 seconds.
+   Progress reports are coalesced per (user, item) and flushed on an
+   interval (progressQueue, lib/server/library); start/stop go out at once.
    ================================================================= */
 
 async function handleMediaProgress(req) {
+  beginRequestTiming('media/progress', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -618,7 +813,6 @@ async function handleMediaProgress(req) {
 
     // Determine which Jellyfin endpoint to use
     let jellyfinEndpoint;
-    let jellyfinMethod = 'POST';
 
     if (isStopped) {
       // Final report: mark playback as stopped
@@ -641,26 +835,39 @@ async function handleMediaProgress(req) {
       PlayMethod: 'Transcode', // HLS = Transcode from Jellyfin's perspective
     };
 
-    const res = await fetch(jellyfinEndpoint, {
-      method: jellyfinMethod,
-      headers: {
-        'Content-Type': 'application/json',
-        'X-Emby-Token': session.jellyfinToken,
-      },
-      body: JSON.stringify(reportBody),
-      signal: AbortSignal.timeout(30000), // BUG 3 FIX
-    });
+    const queueKey = `${session.userId}|${itemId}`;
+    const report = { url: jellyfinEndpoint, token: session.jellyfinToken, body: reportBody };
+
+    // Resume position changed: reads of this user's state settle the queue first
+    responseCache.delete(`userdata|${session.userId}|${itemId}`);
+    responseCache.delete(`resume|${session.userId}`);
 
-    // Jellyfin returns 204 No Content on success
-    if (!res.ok && res.status !== 204) {
-      console.error(`[DagzFlix] Progress report failed: ${res.status}`);
-      return jsonResponse({ success: false, error: `Jellyfin responded with ${res.status}` }, 500);
+    if (jellyfinEndpoint.endsWith('/Progress')) {
+      progressQueue.enqueue(queueKey, report);
+      return jsonResponse({ success: true, queued: true });
+    }
+
+    try {
+      await progressQueue.sendNow(queueKey, report);
+    } catch (e) {
+      return errorResponse(e, { success: false });
+    }
+    // Start / stop change the resume row (a stop may also feed the DagzRank history)
+    markHomeFeedDirty({ db: await getDb(), config, session }, isStopped ? ['resume', 'picks'] : ['resume'])
+      .catch(e => console.error('[DagzFlix] Home feed mark failed:', e.message));
+
+    // A stop may also flip the played state of other views
+    if (isStopped) {
+      responseCache.invalidateTag(`user:${session.userId}`);
+      // Fire-and-forget: fold the item into the DagzRank history if Jellyfin now marks it played
+      recordPlayInDagzProfile(config, session, itemId)
+        .catch(e => console.error('[DagzRank] Profile update error:', e.message));
     }
 
     return jsonResponse({ success: true });
   } catch (err) {
     console.error('[DagzFlix] Progress error:', err.message);
-    return jsonResponse({ success: false, error: err.message }, 500);
+    return errorResponse(err, { success: false });
   }
 }
 
@@ -670,6 +877,7 @@ async function handleMediaProgress(req) {
    ================================================================= */
 
 async function handleMediaStatus(req) {
+  beginRequestTiming('media/status', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -680,60 +888,19 @@ async function handleMediaStatus(req) {
     const tmdbId = url.searchParams.get('tmdbId');
     const mediaType = url.searchParams.get('mediaType') || 'movie';
 
-    let status = 'unknown';
-    let jellyfinAvailable = false;
-    let jellyseerrStatus = null;
-
-    // Check Jellyfin availability
-    if (itemId) {
-      try {
-        const res = await fetch(
-          `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items/${itemId}`,
-          { headers: { 'X-Emby-Token': session.jellyfinToken }, signal: AbortSignal.timeout(30000) } // BUG 3 FIX: 8s → 30s
-        );
-        if (res.ok) {
-          const item = await res.json();
-          jellyfinAvailable = (item.MediaSources || []).length > 0;
-        }
-      } catch (e) { /* Jellyfin unreachable */ }
-    }
-
-    // Check Jellyseerr status if TMDB ID is available
-    if (tmdbId && config.jellyseerrUrl) {
-      try {
-        const endpoint = mediaType === 'tv' ? 'tv' : 'movie';
-        const res = await fetch(
-          `${config.jellyseerrUrl}/api/v1/${endpoint}/${tmdbId}`,
-          { headers: { 'X-Api-Key': config.jellyseerrApiKey }, signal: AbortSignal.timeout(30000) } // BUG 3 FIX: 8s → 30s
-        );
-        if (res.ok) {
-          const data = await res.json();
-          jellyseerrStatus = data.mediaInfo?.status || null;
-        }
-      } catch (e) { /* Jellyseerr unreachable */ }
-    }
-
-    // Determine Smart Button status
-    if (jellyfinAvailable) {
-      status = 'available'; // -> Play button
-    } else if (jellyseerrStatus === 2 || jellyseerrStatus === 3) {
-      status = 'pending'; // -> "En cours d'acquisition"
-    } else if (jellyseerrStatus === 4) {
-      status = 'partial'; // -> Partially available
-    } else if (jellyseerrStatus === 5) {
-      status = 'available'; // Available via Jellyseerr
-    } else {
-      status = 'not_available'; // -> Request button
-    }
+    const [{ status, jellyfinAvailable, jellyseerrStatus }] = await resolveMediaStatuses(config, session, [
+      { id: itemId, tmdbId, mediaType },
+    ]);
 
     return jsonResponse({ status, jellyfinAvailable, jellyseerrStatus });
   } catch (err) {
-    return jsonResponse({ status: 'unknown', error: err.message }, 500);
+    return errorResponse(err, { status: 'unknown' });
   }
 }
 
 /** Request media via Jellyseerr */
 async function handleMediaRequest(req) {
+  beginRequestTiming('media/request', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -756,15 +923,14 @@ async function handleMediaRequest(req) {
       requestBody.seasons = seasons;
     }
 
-    const res = await fetch(`${config.jellyseerrUrl}/api/v1/request`, {
+    const res = await upstreamFetch(`${config.jellyseerrUrl}/api/v1/request`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
         'X-Api-Key': config.jellyseerrApiKey,
       },
       body: JSON.stringify(requestBody),
-      signal: AbortSignal.timeout(30000), // BUG 3 FIX: 15s → 30s
-    });
+    }, { service: 'Jellyseerr' });
 
     if (!res.ok) {
       const errData = await res.json().catch(() => ({}));
@@ -772,17 +938,36 @@ async function handleMediaRequest(req) {
     }
 
     const data = await res.json();
+
+    // Request status changed upstream: cached Jellyseerr lookups are now outdated
+    responseCache.invalidateTag('seerr');
+    searchIndex.remove(`tmdb:${requestBody.mediaType}:${requestBody.mediaId}`);
+    // The discover snapshots carry each title's mediaInfo.status too
+    const db = await getDb();
+    runDetached(() => refreshDiscoverSnapshots(db, config))
+      .catch(err => console.error('[DagzFlix] Discover snapshot refresh failed:', err.message));
+
     return jsonResponse({ success: true, request: data });
   } catch (err) {
-    return jsonResponse({ success: false, error: err.message }, 500);
+    return errorResponse(err, { success: false });
   }
 }
 
 /* =================================================================
-   SEARCH ROUTES - Jellyseerr/TMDB Proxy
+   SEARCH ROUTES - local search index, then Jellyseerr/TMDB
+   The index (lib/server/search-index) answers from the catalog snapshot
+   and the TMDB results already seen; Jellyseerr is only asked when the
+   owned content cannot fill the first page, or for later pages.
+   GET /api/search?q=&page=&type=Movie|Series (or mediaType=movie|tv)
+                  &genre=&year=&scope=local (index only, no Jellyseerr)
    ================================================================= */
 
+// Local matches that make a first page good enough to skip Jellyseerr
+const SEARCH_INDEX_MIN_HITS = parseInt(process.env.SEARCH_INDEX_MIN_HITS || '20');
+const SEARCH_PAGE_SIZE = 20;
+
 async function handleSearch(req) {
+  beginRequestTiming('search', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -790,67 +975,100 @@ async function handleSearch(req) {
     const config = await getConfig();
     const url = new URL(req.url);
     const query = url.searchParams.get('q') || '';
-    const page = url.searchParams.get('page') || '1';
+    const page = Math.max(parseInt(url.searchParams.get('page') || '1') || 1, 1);
+    const mediaType = url.searchParams.get('mediaType');
+    const filters = {
+      type: url.searchParams.get('type') || (mediaType === 'tv' ? 'Series' : mediaType === 'movie' ? 'Movie' : null),
+      genre: url.searchParams.get('genre') || null,
+      year: url.searchParams.get('year') || null,
+    };
+    const localOnly = url.searchParams.get('scope') === 'local';
 
     if (!query.trim()) return jsonResponse({ results: [] });
 
-    // Try Jellyseerr first for TMDB search
+    // Owned content is only searchable for users who see the whole catalog
+    const snap = await catalogForSession(await getDb(), config, session);
+    if (snap) timePhase('index', () => searchIndex.syncCatalog(snap));
+    const searchLocal = () => timePhase('index', () => searchIndex.search(query, {
+      ...filters,
+      sources: snap ? ['local', 'tmdb'] : ['tmdb'],
+      limit: SEARCH_PAGE_SIZE,
+    }));
+    let indexed = searchLocal();
+
+    if (page === 1 && (localOnly || indexed.localTotal >= SEARCH_INDEX_MIN_HITS)) {
+      return jsonResponse({ results: indexed.items, totalResults: indexed.total, facets: indexed.facets, source: 'index' });
+    }
+
     if (config.jellyseerrUrl) {
       try {
-        const res = await fetch(
+        const data = await upstreamJson(
           `${config.jellyseerrUrl}/api/v1/search?query=${encodeURIComponent(query)}&page=${page}`,
-          { headers: { 'X-Api-Key': config.jellyseerrApiKey }, signal: AbortSignal.timeout(30000) } // BUG 3 FIX
+          { headers: { 'X-Api-Key': config.jellyseerrApiKey }, service: 'Jellyseerr' }
         );
-        if (res.ok) {
-          const data = await res.json();
-          const results = (data.results || []).map(item => ({
-            id: item.id,
-            tmdbId: item.id,
-            name: item.title || item.name || '',
-            type: item.mediaType === 'tv' ? 'Series' : 'Movie',
-            mediaType: item.mediaType,
-            overview: item.overview || '',
-            posterUrl: item.posterPath ? `/api/proxy/tmdb?path=${item.posterPath}&width=w400` : '',
-            backdropUrl: item.backdropPath ? `/api/proxy/tmdb?path=${item.backdropPath}&width=w1280` : '',
-            year: (item.releaseDate || item.firstAirDate || '').substring(0, 4),
-            voteAverage: item.voteAverage || 0,
-            mediaStatus: item.mediaInfo?.status || 0,
-          }));
-          return jsonResponse({ results, totalPages: data.totalPages || 1, totalResults: data.totalResults || 0 });
+        const pairs = (data.results || []).map(item => [item, mapSeerrResult(item)]);
+        const docs = rememberSeerrResults(pairs);
+        const wanted = doc => (!filters.type || doc.type === filters.type)
+          && (!filters.genre || doc.genres.includes(filters.genre))
+          && (!filters.year || doc.year === filters.year);
+        const docsById = new Map(docs.map(doc => [doc.id, doc]));
+        const filtered = filters.type || filters.genre || filters.year;
+        const seerrResults = pairs.map(([, result]) => result).filter(result => {
+          const doc = docsById.get(`tmdb:${result.mediaType}:${result.tmdbId}`);
+          return doc ? wanted(doc) : !filtered; // people only without filters
+        });
+
+        if (page > 1) {
+          return jsonResponse({ results: seerrResults, totalPages: data.totalPages || 1, totalResults: data.totalResults || 0 });
         }
-      } catch (e) { /* Jellyseerr search failed, fallback to Jellyfin */ }
+        // One ranking over owned content and every TMDB result known for the query;
+        // Jellyseerr matches the index cannot explain (alternative titles) follow
+        indexed = searchLocal();
+        const shown = new Set(indexed.items.filter(r => r.tmdbId).map(tmdbKey));
+        const extra = seerrResults.filter(r => !shown.has(tmdbKey(r)));
+        return jsonResponse({
+          results: [...indexed.items, ...extra],
+          totalPages: data.totalPages || 1,
+          totalResults: Math.max(data.totalResults || 0, indexed.total),
+          facets: indexed.facets,
+          source: 'mixed',
+        });
+      } catch (e) { /* Jellyseerr search failed, fallback to the index / Jellyfin */ }
     }
 
-    // Fallback: search Jellyfin directly
-    const res = await fetch(
+    if (snap || indexed.total > 0) {
+      return jsonResponse({ results: indexed.items, totalResults: indexed.total, facets: indexed.facets, source: 'index' });
+    }
+
+    const data = await upstreamJson(
       `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?SearchTerm=${encodeURIComponent(query)}&Recursive=true&Limit=20&Fields=Overview,Genres,CommunityRating,ProviderIds`,
-      { headers: { 'X-Emby-Token': session.jellyfinToken }, signal: AbortSignal.timeout(30000) } // BUG 3 FIX
+      { headers: { 'X-Emby-Token': session.jellyfinToken }, service: 'Jellyfin' }
     );
-
-    if (!res.ok) throw new Error('Search failed');
-    const data = await res.json();
     const results = (data.Items || []).map(item => ({
       id: item.Id,
       name: item.Name,
       type: item.Type,
       overview: item.Overview || '',
-      posterUrl: `/api/proxy/image?itemId=${item.Id}&type=Primary&maxWidth=300`,
+      posterUrl: jellyfinImageUrl(item.Id, 'Primary'),
       year: item.ProductionYear || '',
       communityRating: item.CommunityRating || 0,
       mediaStatus: 5, // Available in Jellyfin
     }));
 
-    return jsonResponse({ results, totalResults: data.TotalRecordCount || 0 });
+    return jsonResponse({ results, totalResults: data.TotalRecordCount || 0, source: 'jellyfin' });
   } catch (err) {
-    return jsonResponse({ results: [], error: err.message }, 500);
+    return errorResponse(err, { results: [] });
   }
 }
 
 /* =================================================================
    JELLYSEERR DISCOVER - Trending content
+   Served from the discover snapshot store (lib/server/discover-store):
+   `snapshot` gives the age of the data, null for pages read live.
    ================================================================= */
 
 async function handleDiscover(req) {
+  beginRequestTiming('discover', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -858,334 +1076,258 @@ async function handleDiscover(req) {
     const config = await getConfig();
     const url = new URL(req.url);
     const type = url.searchParams.get('type') || 'movies';
-    const page = url.searchParams.get('page') || '1';
+    const page = Math.max(1, parseInt(url.searchParams.get('page') || '1') || 1);
 
     if (!config.jellyseerrUrl) {
       return jsonResponse({ results: [], error: 'Jellyseerr non configure' });
     }
 
+    ensureDiscoverRefresher();
     const endpoint = type === 'tv' ? 'tv' : 'movies';
-    const res = await fetch(
-      `${config.jellyseerrUrl}/api/v1/discover/${endpoint}?page=${page}`,
-      { headers: { 'X-Api-Key': config.jellyseerrApiKey }, signal: AbortSignal.timeout(30000) } // BUG 3 FIX
-    );
-
-    if (!res.ok) throw new Error(`Discover failed: ${res.status}`);
-    const data = await res.json();
+    // Snapshot pages from memory; later pages through the shared cache (concurrent misses share one upstream call)
+    const data = await getDiscoverPage(await getDb(), config, endpoint, page);
 
-    const results = (data.results || []).map(item => ({
-      id: item.id,
-      tmdbId: item.id,
-      name: item.title || item.name || '',
-      type: type === 'tv' ? 'Series' : 'Movie',
-      mediaType: type === 'tv' ? 'tv' : 'movie',
-      overview: item.overview || '',
-      posterUrl: item.posterPath ? `/api/proxy/tmdb?path=${item.posterPath}&width=w400` : '',
-      backdropUrl: item.backdropPath ? `/api/proxy/tmdb?path=${item.backdropPath}&width=w1280` : '',
-      year: (item.releaseDate || item.firstAirDate || '').substring(0, 4),
-      voteAverage: item.voteAverage || 0,
-      genreIds: item.genreIds || [],
-      mediaStatus: item.mediaInfo?.status || 0,
-    }));
+    const pairs = timePhase('transform', () => data.results.map(item => [item, mapSeerrResult(item, type === 'tv' ? 'tv' : 'movie')]));
+    rememberSeerrResults(pairs);
+    const results = pairs.map(([, result]) => result);
 
-    return jsonResponse({ results, totalPages: data.totalPages || 1 });
+    return jsonResponse({ results, totalPages: data.totalPages, snapshot: data.snapshot });
   } catch (err) {
-    return jsonResponse({ results: [], error: err.message }, 500);
+    return errorResponse(err, { results: [] });
   }
 }
 
 /* =================================================================
-   DAGZRANK - Recommendation Algorithm
-   
-   BUG 4 FIX: Now compatible with both Jellyfin (Genres: string[])
-   and TMDB (genreIds: number[]) objects via resolveGenres().
-   
-   Scoring system (0-100 per media):
-   - Genre Match (0-40pts): Based on user's favorite/disliked genres
-   - Watch History Affinity (0-25pts): Genres/patterns from viewing history
-   - Community Score (0-20pts): TMDB rating normalized
-   - Freshness Bonus (0-10pts): Recent content gets bonus
-   - Already Watched Penalty: -100 (excluded)
+   RECOMMENDATIONS - DagzRank scoring (lib/server/dagzrank)
    ================================================================= */
 
-/** Calculate DagzRank score for a single media item */
-function calculateDagzRank(item, preferences, watchHistory) {
-  let score = 0;
-  // BUG 4 FIX: Use resolveGenres to handle both Jellyfin and TMDB formats
-  const itemGenres = resolveGenres(item);
-  const favGenres = preferences?.favoriteGenres || [];
-  const dislikedGenres = preferences?.dislikedGenres || [];
-
-  // 1. Genre Match Score (0-40)
-  if (itemGenres.length > 0 && favGenres.length > 0) {
-    // Case-insensitive matching for cross-source compatibility
-    const normalizedFav = favGenres.map(g => g.toLowerCase());
-    const normalizedDislike = dislikedGenres.map(g => g.toLowerCase());
-    const matchCount = itemGenres.filter(g => normalizedFav.includes(g.toLowerCase())).length;
-    const dislikeCount = itemGenres.filter(g => normalizedDislike.includes(g.toLowerCase())).length;
-    const genreScore = (matchCount / Math.max(itemGenres.length, 1)) * 40;
-    const dislikePenalty = (dislikeCount / Math.max(itemGenres.length, 1)) * 20;
-    score += Math.max(0, genreScore - dislikePenalty);
-  } else {
-    score += 15; // Default score for items with no genre data
-  }
-
-  // 2. Watch History Affinity (0-25)
-  if (watchHistory && watchHistory.length > 0) {
-    const historyGenres = {};
-    watchHistory.forEach(h => {
-      (h.genres || []).forEach(g => {
-        const key = g.toLowerCase();
-        historyGenres[key] = (historyGenres[key] || 0) + 1;
-      });
-    });
-    const maxCount = Math.max(...Object.values(historyGenres), 1);
-    let affinityScore = 0;
-    itemGenres.forEach(g => {
-      const key = g.toLowerCase();
-      if (historyGenres[key]) {
-        affinityScore += (historyGenres[key] / maxCount) * 25;
-      }
-    });
-    score += Math.min(25, affinityScore / Math.max(itemGenres.length, 1) * itemGenres.length);
-  } else {
-    score += 10; // Default for new users
-  }
-
-  // 3. Community Score (0-20)
-  const rating = item.communityRating || item.CommunityRating || item.voteAverage || 0;
-  score += (rating / 10) * 20;
-
-  // 4. Freshness Bonus (0-10)
-  const year = item.year || item.ProductionYear || 0;
-  const currentYear = new Date().getFullYear();
-  if (year) {
-    const age = currentYear - parseInt(year);
-    if (age <= 1) score += 10;
-    else if (age <= 3) score += 7;
-    else if (age <= 5) score += 4;
-    else if (age <= 10) score += 2;
-  }
-
-  // 5. Already Watched Penalty
-  if (item.isPlayed) {
-    score = Math.max(0, score - 50);
-  }
-
-  return Math.min(100, Math.round(score));
-}
-
 /** 
  * BUG 4 FIX: Get DagzRank recommendations
  * Now FUSES local Jellyfin library + Jellyseerr trending before scoring.
+ * All sources are fetched concurrently, each within its own deadline budget;
+ * sources that fail or run out of budget are reported in `skippedSources`.
+ * Local candidates come from the whole catalog index when available
+ * (only the user's played ids are fetched live), else from a random sample.
  */
 async function handleRecommendations(req) {
+  beginRequestTiming('recommendations', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
 
-    const config = await getConfig();
-    const db = await getDb();
-    const prefs = await db.collection('preferences').findOne({ userId: session.userId });
-
-    // Get user's watch history from Jellyfin
-    let watchHistory = [];
-    try {
-      const histRes = await fetch(
-        `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?IsPlayed=true&Recursive=true&Limit=100&Fields=Genres&SortBy=DatePlayed&SortOrder=Descending`,
-        { headers: { 'X-Emby-Token': session.jellyfinToken }, signal: AbortSignal.timeout(45000) } // BUG 3 FIX
-      );
-      if (histRes.ok) {
-        const histData = await histRes.json();
-        watchHistory = (histData.Items || []).map(i => ({
-          id: i.Id, name: i.Name, genres: i.Genres || [],
-        }));
-      }
-    } catch (e) { /* history fetch failed */ }
-
-    // --- SOURCE 1: Get available media from Jellyfin ---
-    let jellyfinItems = [];
-    try {
-      const mediaRes = await fetch(
-        `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?Recursive=true&Limit=100&IncludeItemTypes=Movie,Series&Fields=Overview,Genres,CommunityRating,PremiereDate&SortBy=Random`,
-        { headers: { 'X-Emby-Token': session.jellyfinToken }, signal: AbortSignal.timeout(45000) } // BUG 3 FIX
-      );
-      if (mediaRes.ok) {
-        const mediaData = await mediaRes.json();
-        jellyfinItems = (mediaData.Items || []).map(item => ({
-          id: item.Id,
-          name: item.Name,
-          type: item.Type,
-          overview: item.Overview || '',
-          genres: item.Genres || [],
-          communityRating: item.CommunityRating || 0,
-          year: item.ProductionYear || '',
-          posterUrl: `/api/proxy/image?itemId=${item.Id}&type=Primary&maxWidth=400`,
-          backdropUrl: `/api/proxy/image?itemId=${item.Id}&type=Backdrop&maxWidth=1920`,
-          isPlayed: item.UserData?.Played || false,
-          source: 'jellyfin',
-        }));
-      }
-    } catch (e) { console.error('[DagzRank] Jellyfin fetch error:', e.message); }
-
-    // --- SOURCE 2: BUG 4 FIX - Get trending from Jellyseerr (TMDB) ---
-    let jellyseerrItems = [];
-    if (config.jellyseerrUrl) {
-      try {
-        // Fetch trending movies + TV from Jellyseerr
-        for (const discoverType of ['movies', 'tv']) {
-          try {
-            const discRes = await fetch(
-              `${config.jellyseerrUrl}/api/v1/discover/${discoverType}?page=1`,
-              { headers: { 'X-Api-Key': config.jellyseerrApiKey }, signal: AbortSignal.timeout(30000) }
-            );
-            if (discRes.ok) {
-              const discData = await discRes.json();
-              const mapped = (discData.results || []).map(item => ({
-                id: `tmdb-${item.id}`,
-                tmdbId: item.id,
-                name: item.title || item.name || '',
-                type: discoverType === 'tv' ? 'Series' : 'Movie',
-                mediaType: discoverType === 'tv' ? 'tv' : 'movie',
-                overview: item.overview || '',
-                genreIds: item.genreIds || [],
-                genres: [], // Will be resolved by resolveGenres via genreIds
-                voteAverage: item.voteAverage || 0,
-                communityRating: item.voteAverage || 0,
-                year: (item.releaseDate || item.firstAirDate || '').substring(0, 4),
-                posterUrl: item.posterPath ? `/api/proxy/tmdb?path=${item.posterPath}&width=w400` : '',
-                backdropUrl: item.backdropPath ? `/api/proxy/tmdb?path=${item.backdropPath}&width=w1280` : '',
-                isPlayed: false,
-                mediaStatus: item.mediaInfo?.status || 0,
-                source: 'jellyseerr',
-              }));
-              jellyseerrItems.push(...mapped);
-            }
-          } catch (e) { /* single discover type failed */ }
-        }
-      } catch (e) { console.error('[DagzRank] Jellyseerr fetch error:', e.message); }
-    }
-
-    // --- FUSION: Deduplicate by name and score everything ---
-    const seenNames = new Set();
-    const allItems = [];
-
-    // Jellyfin items first (they're locally available)
-    for (const item of jellyfinItems) {
-      const key = item.name.toLowerCase();
-      if (!seenNames.has(key)) {
-        seenNames.add(key);
-        allItems.push(item);
-      }
-    }
-
-    // Then Jellyseerr items (world catalog)
-    for (const item of jellyseerrItems) {
-      const key = item.name.toLowerCase();
-      if (!seenNames.has(key)) {
-        seenNames.add(key);
-        allItems.push(item);
-      }
-    }
-
-    // Score each item with DagzRank
-    const scored = allItems.map(item => {
-      const score = calculateDagzRank(item, prefs, watchHistory);
-      return {
-        ...item,
-        dagzRank: score,
-      };
-    });
-
-    // Sort by DagzRank descending
-    scored.sort((a, b) => b.dagzRank - a.dagzRank);
-
-    return jsonResponse({
-      recommendations: scored.filter(s => s.dagzRank > 20).slice(0, 30),
-      totalScored: scored.length,
-      sources: {
-        jellyfin: jellyfinItems.length,
-        jellyseerr: jellyseerrItems.length,
-      },
-    });
+    return jsonResponse(await computeRecommendations(await getDb(), await getConfig(), session));
   } catch (err) {
     console.error('[DagzFlix] Recommendations error:', err.message);
-    return jsonResponse({ recommendations: [], error: err.message }, 500);
+    return errorResponse(err, { recommendations: [] });
   }
 }
 
 /* =================================================================
    PROXY ROUTES - Secure image/video proxying
    No external URLs are ever exposed to the client
+   Images are streamed through and kept in an on-disk LRU cache
+   keyed by (item or TMDB path, type, width, format). Widths snap to
+   lib/images buckets; Jellyfin encodes to the format negotiated from
+   Accept (TMDB only serves JPEG) and draws the blurred placeholders.
    ================================================================= */
 
+// Jellyfin blur radius and quality of the placeholders (lib/images placeholderUrl)
+const PLACEHOLDER_BLUR = 10;
+const PLACEHOLDER_QUALITY = 50;
+
+const imageCache = new ImageDiskCache({
+  dir: process.env.IMAGE_CACHE_DIR || '.cache/images',
+  maxBytes: parseInt(process.env.IMAGE_CACHE_MAX_MB || '512') * 1024 * 1024,
+});
+
+registerMetricsCollector('image-cache', () => {
+  const st = imageCache.stats();
+  return [
+    ...metricFamily('dagzflix_image_cache_hits_total', 'counter', 'Images served from the disk cache', [[{}, st.hits]]),
+    ...metricFamily('dagzflix_image_cache_misses_total', 'counter', 'Images fetched upstream', [[{}, st.misses]]),
+    ...metricFamily('dagzflix_image_cache_not_modified_total', 'counter', 'Conditional image requests answered 304', [[{}, st.notModified]]),
+    ...metricFamily('dagzflix_image_cache_bytes', 'gauge', 'Disk cache size', [[{}, st.bytes]]),
+  ];
+});
+
+/** Image proxy error: 503 + Retry-After when the image class was shed (lib/server/admission) or the circuit is open */
+function imageErrorResponse(err) {
+  if (err instanceof UpstreamOverloadedError || err instanceof CircuitOpenError) {
+    return new Response('Busy', { status: 503, headers: { 'Retry-After': String(err.retryAfter) } });
+  }
+  return new Response('Proxy error', { status: 500 });
+}
+
 /** Proxy Jellyfin images */
 async function handleProxyImage(req) {
+  beginRequestTiming('proxy/image', req);
   try {
     const config = await getConfig();
-    if (!config?.jellyfinUrl) return new Response('Not configured', { status: 503 });
+    if (!config?.jellyfinUrl) return finishRequestTiming(new Response('Not configured', { status: 503 }));
 
     const url = new URL(req.url);
     const itemId = url.searchParams.get('itemId');
     const type = url.searchParams.get('type') || 'Primary';
-    const maxWidth = url.searchParams.get('maxWidth') || '400';
+    const placeholder = url.searchParams.get('placeholder') === '1';
+    const maxWidth = placeholder ? PLACEHOLDER_WIDTH : snapWidth(url.searchParams.get('maxWidth')) || 480;
+    const format = negotiateImageFormat(req.headers.get('accept'));
 
-    if (!itemId) return new Response('Missing itemId', { status: 400 });
+    if (!itemId) return finishRequestTiming(new Response('Missing itemId', { status: 400 }));
 
-    const imageUrl = `${config.jellyfinUrl}/Items/${itemId}/Images/${type}?maxWidth=${maxWidth}`;
-    const res = await fetch(imageUrl, {
-      headers: config.jellyfinApiKey ? { 'X-Emby-Token': config.jellyfinApiKey } : {},
-      signal: AbortSignal.timeout(30000), // BUG 3 FIX: 15s → 30s
-    });
-
-    if (!res.ok) {
-      return new Response('Image not found', { status: 404 });
+    const params = new URLSearchParams({ maxWidth: String(maxWidth) });
+    if (format) params.set('format', format);
+    if (placeholder) {
+      params.set('blur', String(PLACEHOLDER_BLUR));
+      params.set('quality', String(PLACEHOLDER_QUALITY));
     }
-
-    const buffer = await res.arrayBuffer();
-    const contentType = res.headers.get('content-type') || 'image/jpeg';
-
-    return new Response(buffer, {
-      status: 200,
-      headers: {
-        'Content-Type': contentType,
-        'Cache-Control': 'public, max-age=86400',
-        'Access-Control-Allow-Origin': '*',
-      },
-    });
+    const imageUrl = `${config.jellyfinUrl}/Items/${itemId}/Images/${type}?${params}`;
+    const key = `jellyfin|${itemId}|${type}|${placeholder ? 'placeholder' : maxWidth}|${format || 'source'}`;
+    const response = await imageCache.serve(req, key, () => upstreamFetch(
+      imageUrl,
+      { headers: config.jellyfinApiKey ? { 'X-Emby-Token': config.jellyfinApiKey } : {} },
+      { budget: 'image', service: 'Jellyfin' }
+    ), { headers: { Vary: 'Accept' } });
+
+    return finishRequestTiming(response || new Response('Image not found', { status: 404 }));
   } catch (err) {
-    return new Response('Proxy error', { status: 500 });
+    return finishRequestTiming(imageErrorResponse(err));
   }
 }
 
 /** Proxy TMDB images (from Jellyseerr search results) */
 async function handleProxyTmdb(req) {
+  beginRequestTiming('proxy/tmdb', req);
   try {
     const url = new URL(req.url);
     const path = url.searchParams.get('path');
-    const width = url.searchParams.get('width') || 'w400';
+    const width = tmdbSize(url.searchParams.get('width') || 'w500', url.searchParams.get('kind') || 'poster');
 
-    if (!path) return new Response('Missing path', { status: 400 });
+    if (!path) return finishRequestTiming(new Response('Missing path', { status: 400 }));
 
     const imageUrl = `https://image.tmdb.org/t/p/${width}${path}`;
-    const res = await fetch(imageUrl, { signal: AbortSignal.timeout(30000) }); // BUG 3 FIX
+    const response = await imageCache.serve(req, `tmdb|${path}|${width}`, () => upstreamFetch(imageUrl, {}, { budget: 'image', service: 'TMDB' }));
 
-    if (!res.ok) return new Response('Image not found', { status: 404 });
+    return finishRequestTiming(response || new Response('Image not found', { status: 404 }));
+  } catch (err) {
+    return finishRequestTiming(imageErrorResponse(err));
+  }
+}
 
-    const buffer = await res.arrayBuffer();
-    const contentType = res.headers.get('content-type') || 'image/jpeg';
+/* =================================================================
+   PLAYBACK INFO CACHE
+   The PlaybackInfo answer for our static device profile (media source,
+   streams, codec decision) is cached per visibility scope (users seeing
+   the same items share it), item, media source and profile hash: later
+   plays skip the call and only get a fresh PlaySessionId, generated here
+   (it just names Jellyfin's transcoding job) instead of taken from
+   PlaybackInfo. The caller's token is stripped from the cached
+   DeliveryUrls and added back per request. Resume rows and the next
+   episode are analysed in advance.
+   ================================================================= */
 
-    return new Response(buffer, {
-      status: 200,
-      headers: {
-        'Content-Type': contentType,
-        'Cache-Control': 'public, max-age=86400',
-        'Access-Control-Allow-Origin': '*',
+const STREAM_DEVICE_PROFILE = {
+  MaxStreamingBitrate: 120000000,
+  DirectPlayProfiles: [{ Container: 'mp4,m4v,mkv,webm,avi,mov', Type: 'Video' }],
+  TranscodingProfiles: [
+    {
+      Container: 'ts',
+      Type: 'Video',
+      VideoCodec: 'h264,hevc',
+      AudioCodec: 'aac,mp3',
+      Context: 'Streaming',
+      Protocol: 'hls',
+      MaxAudioChannels: '2',
+      BreakOnNonKeyFrames: true,
+    },
+  ],
+  SubtitleProfiles: [
+    { Format: 'vtt', Method: 'External' },
+    { Format: 'srt', Method: 'External' },
+    { Format: 'ass', Method: 'External' },
+  ],
+};
+const STREAM_PROFILE_HASH = createHash('sha1').update(JSON.stringify(STREAM_DEVICE_PROFILE)).digest('hex').slice(0, 12);
+const PLAYBACK_INFO_TTL_MS = parseInt(process.env.PLAYBACK_INFO_TTL_MS || '21600000');
+// Resume rows whose playback info is prefetched
+const PLAYBACK_PREFETCH_RESUME = parseInt(process.env.PLAYBACK_PREFETCH_RESUME || '3');
+// Audio codecs browsers cannot decode: transcoded to AAC/MP3
+const AUDIO_TRANSCODE_CODECS = ['dts', 'truehd', 'eac3', 'dca', 'flac', 'pcm', 'mlp'];
+
+/** Jellyfin path without its api_key / ApiKey parameters, safe to share between users */
+function stripApiKey(path) {
+  const [base, query] = path.split('?');
+  if (!query) return path;
+  const params = new URLSearchParams(query);
+  for (const name of [...params.keys()]) if (/^api_?key$/i.test(name)) params.delete(name);
+  const rest = params.toString();
+  return rest ? `${base}?${rest}` : base;
+}
+
+/** Jellyfin path authenticated with the given token */
+function withApiKey(path, token) {
+  return `${path}${path.includes('?') ? '&' : '?'}api_key=${token}`;
+}
+
+/** Media source with the token-bearing URLs Jellyfin built for the caller stripped */
+function shareableMediaSource(source) {
+  if (!source) return null;
+  return {
+    ...source,
+    ...(source.TranscodingUrl ? { TranscodingUrl: stripApiKey(source.TranscodingUrl) } : {}),
+    MediaStreams: (source.MediaStreams || []).map(s => (s.DeliveryUrl ? { ...s, DeliveryUrl: stripApiKey(s.DeliveryUrl) } : s)),
+  };
+}
+
+/** { mediaSource, audioCodec, needsAudioTranscode } of an item for STREAM_DEVICE_PROFILE, cached per visibility scope */
+function loadPlaybackAnalysis(config, session, itemId, mediaSourceId = '') {
+  const key = `playback|${visibilityScope(session)}|${itemId}|${mediaSourceId}|${STREAM_PROFILE_HASH}`;
+  return responseCache.wrap(key, { ttl: PLAYBACK_INFO_TTL_MS, tags: ['playback'] }, async () => {
+    const res = await upstreamFetch(
+      `${config.jellyfinUrl}/Items/${itemId}/PlaybackInfo?UserId=${session.jellyfinUserId}${mediaSourceId ? `&MediaSourceId=${mediaSourceId}` : ''}`,
+      {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-Emby-Token': session.jellyfinToken },
+        body: JSON.stringify({ DeviceProfile: STREAM_DEVICE_PROFILE }),
       },
-    });
-  } catch (err) {
-    return new Response('Proxy error', { status: 500 });
+      { service: 'Jellyfin' }
+    );
+    if (!res.ok) {
+      res.body?.cancel().catch(() => {});
+      throw new Error('Playback info failed');
+    }
+    const pb = await res.json();
+    const mediaSource = shareableMediaSource((pb.MediaSources || []).find(m => m.Id === mediaSourceId) || (pb.MediaSources || [])[0]);
+    const streams = mediaSource?.MediaStreams || [];
+    // Detect if audio needs transcoding
+    const audioStream = streams.find(s => s.Type === 'Audio' && s.IsDefault) || streams.find(s => s.Type === 'Audio');
+    const audioCodec = (audioStream?.Codec || '').toLowerCase();
+    return { mediaSource, audioCodec, needsAudioTranscode: AUDIO_TRANSCODE_CODECS.includes(audioCodec) };
+  });
+}
+
+/** Id of the episode after itemId in its series, or null (movie, last episode) */
+async function nextEpisodeId(config, session, itemId) {
+  const item = await cachedJellyfinJson(`${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items/${itemId}`, session, 'detail');
+  if (item?.Type !== 'Episode' || !item.SeriesId) return null;
+  const data = await cachedJellyfinJson(
+    `${config.jellyfinUrl}/Shows/${item.SeriesId}/Episodes?UserId=${session.jellyfinUserId}&StartItemId=${itemId}&Limit=2&Fields=`,
+    session,
+    'seasons'
+  );
+  const next = (data.Items || [])[1];
+  return next && next.Id !== itemId ? next.Id : null;
+}
+
+/** Analyse in the background the items likely to be played next */
+function prefetchPlayback(config, session, { itemIds = [], after = null }) {
+  const tasks = Object.fromEntries(itemIds.map(id => [id, () => loadPlaybackAnalysis(config, session, id)]));
+  if (after) {
+    tasks.nextEpisode = async () => {
+      const nextId = await nextEpisodeId(config, session, after);
+      if (nextId) await loadPlaybackAnalysis(config, session, nextId);
+    };
   }
+  if (Object.keys(tasks).length) prefetchInBackground(`${session.userId}|playback|${after || itemIds.join(',')}`, tasks);
 }
 
 /** 
@@ -1195,6 +1337,7 @@ async function handleProxyTmdb(req) {
  * Falls back to Static=true Direct Play URL as secondary option.
  */
 async function handleStream(req) {
+  beginRequestTiming('media/stream', req);
   try {
     const session = await getSession(req);
     if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
@@ -1203,66 +1346,33 @@ async function handleStream(req) {
     const itemId = url.searchParams.get('id');
     if (!itemId) return jsonResponse({ error: 'ID requis' }, 400);
 
-    const res = await fetch(
-      `${config.jellyfinUrl}/Items/${itemId}/PlaybackInfo?UserId=${session.jellyfinUserId}`,
-      {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json', 'X-Emby-Token': session.jellyfinToken },
-        body: JSON.stringify({
-          DeviceProfile: {
-            MaxStreamingBitrate: 120000000,
-            DirectPlayProfiles: [{ Container: 'mp4,m4v,mkv,webm,avi,mov', Type: 'Video' }],
-            TranscodingProfiles: [
-              {
-                Container: 'ts',
-                Type: 'Video',
-                VideoCodec: 'h264,hevc',
-                AudioCodec: 'aac,mp3',
-                Context: 'Streaming',
-                Protocol: 'hls',
-                MaxAudioChannels: '2',
-                BreakOnNonKeyFrames: true,
-              },
-            ],
-            SubtitleProfiles: [
-              { Format: 'vtt', Method: 'External' },
-              { Format: 'srt', Method: 'External' },
-              { Format: 'ass', Method: 'External' },
-            ],
-          },
-        }),
-        signal: AbortSignal.timeout(30000), // BUG 3 FIX: 15s → 30s
-      }
-    );
-    if (!res.ok) throw new Error('Playback info failed');
-    const pb = await res.json();
-    const ms0 = (pb.MediaSources || [])[0];
-    const psId = pb.PlaySessionId;
+    const analysis = await loadPlaybackAnalysis(config, session, itemId, url.searchParams.get('mediaSourceId') || '');
+    const ms0 = analysis.mediaSource;
+    const psId = uuidv4().replace(/-/g, '');
     const streams = ms0?.MediaStreams || [];
+    prefetchPlayback(config, session, { after: itemId });
 
     // BUG 1 FIX: Use HLS master.m3u8 URL instead of Static=true
     // VideoCodec=copy = no CPU usage for video (remux only)
     // AudioCodec=aac,mp3 = lightweight transcode for web-incompatible audio (DTS, TrueHD, etc.)
     // TranscodingMaxAudioChannels=2 = stereo downmix for browser compatibility
-    const hlsUrl = `${config.jellyfinUrl}/Videos/${itemId}/master.m3u8?api_key=${session.jellyfinToken}&MediaSourceId=${ms0?.Id || ''}&PlaySessionId=${psId || ''}&VideoCodec=copy&AudioCodec=aac,mp3&TranscodingMaxAudioChannels=2&SegmentContainer=ts&MinSegmentLength=1&BreakOnNonKeyFrames=true`;
+    // STREAM_PROXY: both URLs go through /api/hls instead, token left out (lib/server/hls-proxy)
+    const hlsUrl = streamUrlFor(config, `${config.jellyfinUrl}/Videos/${itemId}/master.m3u8?api_key=${session.jellyfinToken}&MediaSourceId=${ms0?.Id || ''}&PlaySessionId=${psId || ''}&VideoCodec=copy&AudioCodec=aac,mp3&TranscodingMaxAudioChannels=2&SegmentContainer=ts&MinSegmentLength=1&BreakOnNonKeyFrames=true`);
 
     // Keep Direct Play URL as fallback (for media with browser-native audio like AAC)
-    const directUrl = `${config.jellyfinUrl}/Videos/${itemId}/stream?Static=true&MediaSourceId=${ms0?.Id || ''}&PlaySessionId=${psId || ''}&api_key=${session.jellyfinToken}`;
+    const directUrl = streamUrlFor(config, `${config.jellyfinUrl}/Videos/${itemId}/stream?Static=true&MediaSourceId=${ms0?.Id || ''}&PlaySessionId=${psId || ''}&api_key=${session.jellyfinToken}`);
 
-    // Detect if audio needs transcoding
-    const audioStream = streams.find(s => s.Type === 'Audio' && s.IsDefault) || streams.find(s => s.Type === 'Audio');
-    const audioCodec = (audioStream?.Codec || '').toLowerCase();
-    const needsAudioTranscode = ['dts', 'truehd', 'eac3', 'dca', 'flac', 'pcm', 'mlp'].includes(audioCodec);
+    const { audioCodec, needsAudioTranscode } = analysis;
 
     // Use HLS if audio needs transcoding, otherwise offer both
     const streamUrl = needsAudioTranscode ? hlsUrl : hlsUrl; // Always use HLS for consistency
 
-    // Direct subtitle URLs
+    // Subtitle URLs: through /api/hls without the token when STREAM_PROXY is on, direct otherwise
     const subtitles = streams.filter(s => s.Type === 'Subtitle').map((s, idx) => ({
       index: s.Index,
       language: s.Language || 'und',
       displayTitle: s.DisplayTitle || s.Title || s.Language || `Sous-titre ${idx + 1}`,
       codec: s.Codec,
       url: s.DeliveryUrl
-        ? `${config.jellyfinUrl}${s.DeliveryUrl}`
+        ? streamUrlFor(config, `${config.jellyfinUrl}${withApiKey(stripApiKey(s.DeliveryUrl), session.jellyfinToken)}`)
         : `${config.jellyfinUrl
@@ -0,0 +1,51 @@
+import { getDb, jsonResponse, errorResponse, getSession, getConfig } from '@/lib/server/bff';
+import { beginRequestTiming } from '@/lib/server/metrics';
+import { syncCatalog, getCatalogStatus, startCatalogRefresher } from '@/lib/server/catalog-index';
+
+/* =================================================================
+   CATALOG SYNC
+   GET  /api/catalog/sync  -> index status (item count, last sync, errors)
+   POST /api/catalog/sync  -> start a sync now ({ full: true } re-reads everything)
+   ================================================================= */
+
+export const dynamic = 'force-dynamic';
+
+/** Catalog index status */
+export async function GET(req) {
+  beginRequestTiming('catalog/sync', req);
+  try {
+    const session = await getSession(req);
+    if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
+
+    startCatalogRefresher(async () => ({ db: await getDb(), config: await getConfig() }));
+    return jsonResponse(await getCatalogStatus(await getDb()));
+  } catch (err) {
+    return errorResponse(err);
+  }
+}
+
+/** Trigger a catalog sync in the background */
+export async function POST(req) {
+  beginRequestTiming('catalog/sync', req);
+  try {
+    const session = await getSession(req);
+    if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
+
+    const config = await getConfig();
+    if (!config?.jellyfinUrl) return jsonResponse({ error: 'Serveur non configure' }, 400);
+    if (!config.jellyfinApiKey && !session.fullCatalogAccess) {
+      return jsonResponse({ error: 'Cle API Jellyfin requise pour indexer le catalogue' }, 403);
+    }
+
+    const body = await req.json().catch(() => ({}));
+    const db = await getDb();
+    syncCatalog(db, config, {
+      full: !!body.full,
+      auth: { token: session.jellyfinToken, userId: session.jellyfinUserId },
+    }).catch(err => console.error('[DagzFlix] Catalog sync error:', err.message));
+
+    return jsonResponse({ started: true, ...(await getCatalogStatus(db)) }, 202);
+  } catch (err) {
+    return errorResponse(err);
+  }
+}
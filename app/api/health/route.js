@@ -0,0 +1,25 @@
+import { jsonResponse } from '@/lib/server/bff';
+import { warmUp, warmupStatus } from '@/lib/server/warmup';
+import packageJson from '@/package.json';
+
+/* =================================================================
+   HEALTH
+   GET /api/health         -> 200 { status: 'ok', timestamp, version, ready, warmup }
+   GET /api/health?ready=1 -> same, or 503 { status: 'warming' } until the
+                              startup warm-up finished (lib/server/warmup):
+                              the load balancer's readiness probe.
+   The first probe starts the warm-up when instrumentation.js did not.
+   ================================================================= */
+
+export const dynamic = 'force-dynamic';
+
+/** Liveness / readiness probe */
+export async function GET(req) {
+  warmUp();
+  const warmup = warmupStatus();
+  const body = { timestamp: new Date().toISOString(), version: packageJson.version, ready: warmup.ready, warmup };
+  if (new URL(req.url).searchParams.has('ready') && !warmup.ready) {
+    return jsonResponse({ status: 'warming', ...body }, 503);
+  }
+  return jsonResponse({ status: 'ok', ...body });
+}
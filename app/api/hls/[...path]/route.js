@@ -0,0 +1,16 @@
+import { serveHls } from '@/lib/server/hls-proxy';
+
+/* =================================================================
+   HLS STREAMING PROXY
+   GET /api/hls/<itemId>/master.m3u8?...      rewritten playlists
+   GET /api/hls/<itemId>/hls1/main/<n>.ts?... cached segments (Range ok)
+   GET /api/hls/<itemId>/stream?Static=true&... piped through
+   Mirrors <jellyfin>/Videos/...; the session cookie authenticates,
+   the Jellyfin token stays server-side (lib/server/hls-proxy).
+   ================================================================= */
+
+export const dynamic = 'force-dynamic';
+
+export async function GET(req, { params }) {
+  return serveHls(req, params.path);
+}
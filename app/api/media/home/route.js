@@ -0,0 +1,28 @@
+import { getDb, jsonResponse, errorResponse, getSession, getConfig } from '@/lib/server/bff';
+import { beginRequestTiming } from '@/lib/server/metrics';
+import { getHomeFeed } from '@/lib/server/home-feed';
+
+/* =================================================================
+   HOME FEED
+   GET /api/media/home
+   -> { rows: { resume, picks, newMovies, newSeries, trendingMovies,
+        trendingSeries } }, each row { items, builtAt, ageMs, stale }
+   One response for the whole dashboard, read from the user's
+   materialized feed (lib/server/home-feed, which defines the rows).
+   ================================================================= */
+
+export const dynamic = 'force-dynamic';
+
+export async function GET(req) {
+  beginRequestTiming('media/home', req);
+  try {
+    const session = await getSession(req);
+    if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
+
+    const feed = await getHomeFeed({ db: await getDb(), config: await getConfig(), session });
+    return jsonResponse(feed);
+  } catch (err) {
+    console.error('[DagzFlix] Home feed error:', err.message);
+    return errorResponse(err, { rows: {} });
+  }
+}
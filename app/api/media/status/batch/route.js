@@ -0,0 +1,36 @@
+import { jsonResponse, errorResponse, getSession, getConfig } from '@/lib/server/bff';
+import { beginRequestTiming } from '@/lib/server/metrics';
+import { resolveMediaStatuses, STATUS_BATCH_MAX } from '@/lib/server/media-status';
+
+/* =================================================================
+   SMART BUTTON STATUS - BATCH
+   POST /api/media/status/batch  { items: [{ id, tmdbId, mediaType }] }
+   -> { statuses: [...] } in input order (same fields as /api/media/status)
+   ================================================================= */
+
+export const dynamic = 'force-dynamic';
+
+export async function POST(req) {
+  beginRequestTiming('media/status/batch', req);
+  try {
+    const session = await getSession(req);
+    if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
+
+    const body = await req.json().catch(() => ({}));
+    const items = Array.isArray(body.items) ? body.items : null;
+    if (!items) return jsonResponse({ error: 'Liste items requise' }, 400);
+    if (items.length > STATUS_BATCH_MAX) {
+      return jsonResponse({ error: `Maximum ${STATUS_BATCH_MAX} items par lot` }, 400);
+    }
+
+    const config = await getConfig();
+    const statuses = await resolveMediaStatuses(config, session, items.map(i => ({
+      id: i?.id,
+      tmdbId: i?.tmdbId,
+      mediaType: i?.mediaType || 'movie',
+    })));
+    return jsonResponse({ statuses });
+  } catch (err) {
+    return errorResponse(err, { statuses: [] });
+  }
+}
@@ -0,0 +1,31 @@
+import { jsonResponse } from '@/lib/server/bff';
+import { renderMetrics } from '@/lib/server/metrics';
+
+/* =================================================================
+   METRICS
+   GET /api/metrics -> Prometheus text exposition: route latency and
+   per-phase histograms (mongo, jellyfin, jellyseerr, tmdb, transform,
+   serialize), upstream client, caches and progress queue counters.
+   Scrapers send "Authorization: Bearer <METRICS_TOKEN>". Without a
+   configured token the endpoint is closed: its labels name the internal
+   Jellyfin / Jellyseerr origins and their breaker state.
+   ================================================================= */
+
+export const dynamic = 'force-dynamic';
+
+const METRICS_TOKEN = process.env.METRICS_TOKEN || '';
+
+/** Prometheus scrape */
+export async function GET(req) {
+  if (!METRICS_TOKEN) return jsonResponse({ error: 'Metriques desactivees (METRICS_TOKEN non defini)' }, 403);
+  if (req.headers.get('authorization') !== `Bearer ${METRICS_TOKEN}`) {
+    return jsonResponse({ error: 'Non autorise' }, 401);
+  }
+  return new Response(renderMetrics(), {
+    status: 200,
+    headers: {
+      'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+      'Cache-Control': 'no-store',
+    },
+  });
+}
@@ -7,10 +7,17 @@ Since no real Jellyfin server is available, tests focus on endpoints that work w
 
 import requests
 import json
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
 
 # Base URL from environment
-BASE_URL = "https://media-hub-dev-1.preview.emergentagent.com/api"
+BASE_URL = os.environ.get("DAGZFLIX_BASE_URL", "https://media-hub-dev-1.preview.emergentagent.com/api")
+
+# Host the BFF uses to reach the local upstream stand-in (--stub mode)
+STUB_HOST = os.environ.get("DAGZFLIX_STUB_HOST", "127.0.0.1")
 
 def log_test(test_name, success, details=""):
     """Log test results with consistent formatting"""
@@ -418,6 +425,647 @@ def test_media_collection_without_auth():
         log_test("Media collection endpoint without auth", False, f"Exception: {str(e)}")
         return False
 
+# AUTHENTICATED FLOWS - Driven against the local Jellyfin/Jellyseerr stand-in (--stub)
+
+def configure_stub_upstream(stub):
+    """Point the BFF at the stand-in and log in; returns a requests.Session holding the session cookie"""
+    payload = {
+        "jellyfinUrl": stub.url,
+        "jellyfinApiKey": stub.api_key,
+        "jellyseerrUrl": stub.url,
+        "jellyseerrApiKey": stub.api_key,
+    }
+    response = requests.post(f"{BASE_URL}/setup/save", json=payload, timeout=10)
+    if response.status_code != 200:
+        raise RuntimeError(f"setup/save failed: {response.status_code} {response.text[:200]}")
+
+    http = requests.Session()
+    username, password = next(iter(stub.users.items()))
+    response = http.post(f"{BASE_URL}/auth/login", json={"username": username, "password": password}, timeout=30)
+    if response.status_code != 200 or 'dagzflix_session' not in http.cookies:
+        raise RuntimeError(f"auth/login failed: {response.status_code} {response.text[:200]}")
+    return http
+
+def check_media_library_with_stub(http, stub):
+    """GET /api/media/library against the stand-in - items are mapped with proxy image URLs"""
+    try:
+        response = http.get(f"{BASE_URL}/media/library", params={'type': 'Movie', 'limit': 20}, timeout=60)
+        print(f"Status Code: {response.status_code}")
+        data = response.json()
+        items = data.get('items', [])
+        expected_total = sum(1 for i in stub.library if i['Type'] == 'Movie')
+        if response.status_code == 200 and len(items) == 20 and data.get('totalCount') == expected_total \
+                and items[0].get('posterUrl', '').startswith('/api/proxy/image'):
+            log_test("Media library (stub upstream)", True, f"{len(items)} items, totalCount {data['totalCount']}")
+            return True
+        log_test("Media library (stub upstream)", False, f"Got: {response.text[:200]}")
+        return False
+    except Exception as e:
+        log_test("Media library (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_library_projection_with_stub(http, stub):
+    """fields=card trims the payload, cursors chain pages without overlap, format=ndjson streams the same rows"""
+    try:
+        params = {'type': 'Movie', 'limit': 100, 'sortBy': 'SortName', 'sortOrder': 'Ascending'}
+        detail = http.get(f"{BASE_URL}/media/library", params=params, timeout=60)
+        card = http.get(f"{BASE_URL}/media/library", params={**params, 'fields': 'card'}, timeout=60)
+        first = card.json()
+        second = http.get(f"{BASE_URL}/media/library", params={**params, 'fields': 'card', 'cursor': first.get('nextCursor')}, timeout=60).json()
+        stream = http.get(f"{BASE_URL}/media/library", params={**params, 'fields': 'card', 'format': 'ndjson'}, timeout=60)
+        lines = [json.loads(line) for line in stream.text.splitlines() if line.strip()]
+        streamed = [line['item']['id'] for line in lines if 'item' in line]
+        page_one = [i['id'] for i in first.get('items', [])]
+        page_two = [i['id'] for i in second.get('items', [])]
+        print(f"Detail {len(detail.content)} bytes, card {len(card.content)} bytes, stream {len(lines)} lines")
+        if len(card.content) * 2 < len(detail.content) and 'overview' not in first['items'][0] \
+                and page_two and not set(page_one) & set(page_two) and streamed == page_one \
+                and stream.headers.get('content-type', '').startswith('application/x-ndjson') \
+                and lines[-1].get('nextCursor') == first.get('nextCursor'):
+            log_test("Library projection / cursor / NDJSON (stub upstream)", True,
+                     f"card {len(card.content) * 100 // len(detail.content)}% of detail size")
+            return True
+        log_test("Library projection / cursor / NDJSON (stub upstream)", False, f"page two {page_two[:3]}, last line {lines[-1:]}")
+        return False
+    except Exception as e:
+        log_test("Library projection / cursor / NDJSON (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_media_detail_sections_with_stub(http, stub):
+    """media/detail?sections= loads every section of a series page concurrently; NDJSON streams one line per section"""
+    try:
+        series = [i for i in stub.library if i['Type'] == 'Series'][-1]
+        sections = 'item,similar,status,seasons,episodes,collection,trailers'
+        params = {'id': series['Id'], 'tmdbId': series['ProviderIds']['Tmdb'], 'mediaType': 'tv', 'sections': sections}
+        slow = ('item', 'similar', 'seasons', 'episodes', 'seerr_media')
+        for endpoint in slow:
+            stub.set_latency(endpoint, 0.3)
+        try:
+            start = time.time()
+            detail = http.get(f"{BASE_URL}/media/detail", params=params, timeout=60).json()
+            elapsed = time.time() - start
+        finally:
+            for endpoint in slow:
+                stub.set_latency(endpoint, stub.default_latency)
+        stream = http.get(f"{BASE_URL}/media/detail", params={**params, 'format': 'ndjson'}, timeout=60)
+        lines = [json.loads(line) for line in stream.text.splitlines() if line.strip()]
+        streamed = {line['section'] for line in lines if 'data' in line}
+        print(f"Series detail in {elapsed:.2f}s: {len(detail.get('seasons') or [])} seasons, "
+              f"{len((detail.get('episodes') or {}).get('episodes', []))} episodes, status {detail.get('status')}, "
+              f"{len(detail.get('trailers') or [])} trailers; stream {len(lines)} lines")
+        # Serially: item, similar, seasons, episodes and the Jellyseerr details would take 1.5s
+        if detail.get('item', {}).get('id') == series['Id'] and len(detail.get('seasons') or []) == series['ChildCount'] \
+                and (detail.get('episodes') or {}).get('episodes') and detail.get('status', {}).get('status') \
+                and detail.get('trailers') and not detail.get('errors') and elapsed < 1.2 \
+                and streamed == set(sections.split(',')) and lines[-1] == {'done': True}:
+            log_test("Media detail sections (stub upstream)", True, f"7 sections in {elapsed:.2f}s with 300ms upstream calls")
+            return True
+        log_test("Media detail sections (stub upstream)", False, f"{elapsed:.2f}s, errors {detail.get('errors')}, streamed {streamed}")
+        return False
+    except Exception as e:
+        log_test("Media detail sections (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def wait_for_catalog_sync(http, previous_sync_at=None, timeout=120):
+    """Poll GET /api/catalog/sync until a sync newer than previous_sync_at has landed"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = http.get(f"{BASE_URL}/catalog/sync", timeout=30).json()
+        if not status.get('running') and status.get('lastSyncAt') and status['lastSyncAt'] != previous_sync_at:
+            return status
+        time.sleep(0.5)
+    raise RuntimeError("catalog sync did not finish in time")
+
+def check_catalog_sync_with_stub(http, stub):
+    """POST /api/catalog/sync against the stand-in - full index, then an incremental pass picks up changes"""
+    try:
+        response = http.post(f"{BASE_URL}/catalog/sync", json={'full': True}, timeout=30)
+        print(f"Status Code: {response.status_code}")
+        status = wait_for_catalog_sync(http)
+        if response.status_code != 202 or not status.get('ready') or status.get('itemCount') != len(stub.library):
+            log_test("Catalog sync (stub upstream)", False, f"Got: {status}")
+            return False
+
+        stub.touch_items([i['Id'] for i in stub.library[:5]])
+        http.post(f"{BASE_URL}/catalog/sync", json={}, timeout=30)
+        incremental = wait_for_catalog_sync(http, status['lastSyncAt'])
+        reco = http.get(f"{BASE_URL}/recommendations", timeout=120).json()
+        if incremental.get('lastSyncMode') == 'incremental' and incremental.get('lastSyncChanged') == 5 \
+                and reco.get('sources', {}).get('catalog') == 'index':
+            log_test("Catalog sync (stub upstream)", True,
+                     f"{status['itemCount']} items indexed, incremental pass saw {incremental['lastSyncChanged']}")
+            return True
+        log_test("Catalog sync (stub upstream)", False, f"Got: {incremental} / sources {reco.get('sources')}")
+        return False
+    except Exception as e:
+        log_test("Catalog sync (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_search_index_with_stub(http, stub):
+    """Search answers owned titles from the local index: typos tolerated, facets counted server-side, Jellyseerr skipped"""
+    try:
+        target = stub.library[17]
+        first, rest = target['Name'].split(' ', 1)
+        typo = f"{first[0]}{first[2]}{first[1]}{first[3:]} {rest}"  # two letters swapped
+        before = stub.calls['seerr_search']
+        fuzzy = http.get(f"{BASE_URL}/search", params={'q': typo, 'scope': 'local'}, timeout=30).json()
+        broad = http.get(f"{BASE_URL}/search", params={'q': first}, timeout=30).json()
+        seerr_calls = stub.calls['seerr_search'] - before
+        genre = (broad.get('facets', {}).get('genres') or [{}])[0]
+        narrowed = http.get(f"{BASE_URL}/search", params={'q': first, 'genre': genre.get('name', '')}, timeout=30).json()
+        print(f"Typo '{typo}' -> {[r['name'] for r in fuzzy.get('results', [])[:3]]}, '{first}' {broad.get('totalResults')} hits "
+              f"({broad.get('source')}), {genre} -> {narrowed.get('totalResults')}")
+        if fuzzy.get('results') and fuzzy['results'][0]['id'] == target['Id'] \
+                and broad.get('source') == 'index' and seerr_calls == 0 \
+                and genre.get('count') and narrowed.get('totalResults') == genre['count']:
+            log_test("Search index (stub upstream)", True, f"typo resolved, {broad['totalResults']} local hits without Jellyseerr")
+            return True
+        log_test("Search index (stub upstream)", False, f"fuzzy {fuzzy.get('results', [])[:1]}, {seerr_calls} Jellyseerr calls")
+        return False
+    except Exception as e:
+        log_test("Search index (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_recommendations_with_stub(http, stub):
+    """GET /api/recommendations against the stand-in - fuses Jellyfin + Jellyseerr sources"""
+    try:
+        response = http.get(f"{BASE_URL}/recommendations", timeout=120)
+        print(f"Status Code: {response.status_code}")
+        data = response.json()
+        sources = data.get('sources', {})
+        if response.status_code == 200 and data.get('recommendations') and sources.get('jellyfin', 0) > 0 \
+                and sources.get('jellyseerr', 0) > 0:
+            log_test("Recommendations (stub upstream)", True, f"{len(data['recommendations'])} picks, sources {sources}")
+            return True
+        log_test("Recommendations (stub upstream)", False, f"Got: {response.text[:200]}")
+        return False
+    except Exception as e:
+        log_test("Recommendations (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_discover_snapshot_with_stub(http, stub):
+    """Jellyseerr slower than every budget: discover pages and recommendation candidates still come from the snapshot"""
+    try:
+        stub.set_latency('seerr_discover', 15)
+        before = stub.calls['seerr_discover']
+        discover = http.get(f"{BASE_URL}/discover?type=movies&page=2", timeout=60)
+        reco = http.get(f"{BASE_URL}/recommendations", timeout=60)
+        upstream_calls = stub.calls['seerr_discover'] - before
+        elapsed = discover.elapsed.total_seconds() + reco.elapsed.total_seconds()
+        print(f"Status Codes: {discover.status_code} {reco.status_code}, upstream calls: {upstream_calls}, {elapsed:.1f}s")
+        snapshot = discover.json().get('snapshot') or {}
+        data = reco.json()
+        if discover.status_code == 200 and discover.json().get('results') and snapshot.get('ageMs') is not None \
+                and reco.status_code == 200 and data.get('sources', {}).get('jellyseerr', 0) > 0 \
+                and not any(s.startswith('jellyseerr') for s in data.get('skippedSources', [])) \
+                and (data.get('snapshots', {}).get('movies') or {}).get('ageMs') is not None \
+                and upstream_calls == 0 and elapsed < 5:
+            log_test("Discover snapshot (slow Jellyseerr)", True, f"snapshot age {snapshot['ageMs']}ms, {elapsed:.1f}s")
+            return True
+        log_test("Discover snapshot (slow Jellyseerr)", False, f"discover {discover.text[:200]}, reco {reco.text[:200]}")
+        return False
+    except Exception as e:
+        log_test("Discover snapshot (slow Jellyseerr)", False, f"Exception: {str(e)}")
+        return False
+    finally:
+        stub.latency.pop('seerr_discover', None)
+
+def check_image_cache_with_stub(http, stub):
+    """GET /api/proxy/image twice, then revalidate - second read served from disk, third answers 304"""
+    try:
+        item = stub.library[1]
+        params = {'itemId': item['Id'], 'type': 'Primary', 'maxWidth': 321}
+        before = stub.calls['image']
+        first = http.get(f"{BASE_URL}/proxy/image", params=params, timeout=30)
+        time.sleep(0.5)  # the disk copy lands once the streamed body is complete
+        second = http.get(f"{BASE_URL}/proxy/image", params=params, timeout=30)
+        etag = second.headers.get('ETag')
+        third = http.get(f"{BASE_URL}/proxy/image", params=params, headers={'If-None-Match': etag or ''}, timeout=30)
+        print(f"Status Codes: {first.status_code} {second.status_code} {third.status_code}")
+        upstream_calls = stub.calls['image'] - before
+        if first.status_code == 200 and second.status_code == 200 and first.content == second.content \
+                and etag and third.status_code == 304 and upstream_calls == 1:
+            log_test("Image proxy disk cache (stub upstream)", True, f"1 upstream fetch for 3 reads, ETag {etag[:12]}…")
+            return True
+        log_test("Image proxy disk cache (stub upstream)", False,
+                 f"statuses {first.status_code}/{second.status_code}/{third.status_code}, ETag {etag}, upstream calls {upstream_calls}")
+        return False
+    except Exception as e:
+        log_test("Image proxy disk cache (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_image_variants_with_stub(http, stub):
+    """Nearby widths share one bucketed upstream fetch in the negotiated format; placeholders are tiny blurred variants"""
+    try:
+        item = stub.library[3]
+        webp = {'Accept': 'image/avif,image/webp,image/*;q=0.8'}
+        before = stub.calls['image']
+        first = requests.get(f"{BASE_URL}/proxy/image", params={'itemId': item['Id'], 'maxWidth': 200}, headers=webp, timeout=30)
+        time.sleep(0.5)  # the disk copy lands once the streamed body is complete
+        second = requests.get(f"{BASE_URL}/proxy/image", params={'itemId': item['Id'], 'maxWidth': 230}, headers=webp, timeout=30)
+        fetched = stub.image_queries[-1]
+        placeholder = requests.get(f"{BASE_URL}/proxy/image", params={'itemId': item['Id'], 'placeholder': 1}, headers=webp, timeout=30)
+        blurred = stub.image_queries[-1]
+        upstream_calls = stub.calls['image'] - before
+        print(f"Statuses {first.status_code} {second.status_code} {placeholder.status_code}, upstream calls {upstream_calls}, "
+              f"queries {fetched} / {blurred}, Vary {second.headers.get('Vary')}")
+        if first.status_code == second.status_code == placeholder.status_code == 200 and upstream_calls == 2 \
+                and fetched.get('maxWidth') == '240' and fetched.get('format') == 'webp' and 'Accept' in second.headers.get('Vary', '') \
+                and blurred.get('maxWidth') == '32' and blurred.get('blur') and len(placeholder.content) < len(first.content):
+            log_test("Image width buckets and formats (stub upstream)", True, "200px and 230px served by one 240px WebP fetch, placeholder ok")
+            return True
+        log_test("Image width buckets and formats (stub upstream)", False, f"upstream calls {upstream_calls}, queries {fetched} / {blurred}")
+        return False
+    except Exception as e:
+        log_test("Image width buckets and formats (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_status_batch_with_stub(http, stub):
+    """POST /api/media/status/batch with a 20-card grid - one Jellyfin query, one cached Jellyseerr lookup per unknown title"""
+    try:
+        local = [{'id': i['Id'], 'tmdbId': i['ProviderIds']['Tmdb'], 'mediaType': 'tv' if i['Type'] == 'Series' else 'movie'}
+                 for i in stub.library[:10]]
+        remote = [{'id': 900000 + n, 'tmdbId': 900000 + n, 'mediaType': 'movie'} for n in range(10)]
+        before = dict(stub.calls)
+        response = http.post(f"{BASE_URL}/media/status/batch", json={'items': local + remote}, timeout=60)
+        first = {k: v - before.get(k, 0) for k, v in stub.calls.items() if v != before.get(k, 0)}
+        before = dict(stub.calls)
+        again = http.post(f"{BASE_URL}/media/status/batch", json={'items': local + remote}, timeout=60)
+        second = {k: v - before.get(k, 0) for k, v in stub.calls.items() if v != before.get(k, 0)}
+        print(f"Status Code: {response.status_code}, upstream calls: {first}, then {second}")
+        statuses = [s['status'] for s in response.json().get('statuses', [])]
+        if response.status_code == 200 and again.status_code == 200 and len(statuses) == 20 \
+                and first.get('items') == 1 and first.get('seerr_media', 0) <= len(remote) \
+                and sum(first.values()) == first.get('items', 0) + first.get('seerr_media', 0) \
+                and second.get('seerr_media', 0) == 0 \
+                and all(s == 'available' for s in statuses[:10]) and all(s == 'not_available' for s in statuses[10:]):
+            log_test("Smart Button batch status (stub upstream)", True, f"20 statuses for {sum(first.values())} upstream calls, then {sum(second.values())}")
+            return True
+        log_test("Smart Button batch status (stub upstream)", False, f"statuses {statuses}, upstream calls {first}, then {second}")
+        return False
+    except Exception as e:
+        log_test("Smart Button batch status (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_progress_coalescing_with_stub(http, stub):
+    """POST /api/media/progress x5 then read resume - one upstream progress report with the latest position, stop sent at once"""
+    try:
+        movie = stub.library[2]
+        url = f"{BASE_URL}/media/progress"
+        before = len(stub.playback_reports)
+        for n in range(1, 6):
+            http.post(url, json={'itemId': movie['Id'], 'positionTicks': n * 100000000, 'isPaused': False}, timeout=30)
+        queued = len(stub.playback_reports) - before
+        http.get(f"{BASE_URL}/media/resume", timeout=60)  # settles the user's queued reports
+        flushed = stub.playback_reports[before:]
+        stop = http.post(url, json={'itemId': movie['Id'], 'positionTicks': 600000000, 'isStopped': True}, timeout=30)
+        last = stub.playback_reports[-1]
+        print(f"Queued before resume: {queued}, flushed: {[(p, b.get('PositionTicks')) for p, b in flushed]}, last: {last[0]}")
+        if queued == 0 and len(flushed) == 1 and flushed[0][1]['PositionTicks'] == 500000000 \
+                and stop.status_code == 200 and last[0].endswith('Playing/Stopped'):
+            log_test("Progress coalescing (stub upstream)", True, "5 reports → 1 upstream progress call, stop forwarded")
+            return True
+        log_test("Progress coalescing (stub upstream)", False, f"queued {queued}, flushed {flushed}, last {last}")
+        return False
+    except Exception as e:
+        log_test("Progress coalescing (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_stream_with_stub(http, stub):
+    """GET /api/media/stream against the stand-in - PlaybackInfo resolves to an HLS URL"""
+    try:
+        movie = next(i for i in stub.library if i['Type'] == 'Movie')
+        response = http.get(f"{BASE_URL}/media/stream", params={'id': movie['Id']}, timeout=60)
+        print(f"Status Code: {response.status_code}")
+        data = response.json()
+        subtitle_urls = [s['url'] for s in data.get('subtitles', [])]
+        # Proxied streams (STREAM_PROXY=true) must not hand out a token-bearing subtitle URL either
+        proxied = data.get('streamUrl', '').startswith('/api/hls/')
+        leaked = [u for u in subtitle_urls if proxied and (not u.startswith('/api/hls/') or 'api_key' in u)]
+        if response.status_code == 200 and 'master.m3u8' in data.get('streamUrl', '') and not leaked:
+            log_test("Stream (stub upstream)", True, f"streamUrl ok, {len(subtitle_urls)} subtitles")
+            return True
+        log_test("Stream (stub upstream)", False, f"Got: {response.text[:200]}, leaked subtitle URLs: {leaked}")
+        return False
+    except Exception as e:
+        log_test("Stream (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_playback_info_cache_with_stub(http, stub):
+    """Second play of a movie (also after a new login) and plays of resume rows skip PlaybackInfo;
+    every play gets its own PlaySessionId"""
+    try:
+        movie = [i for i in stub.library if i['Type'] == 'Movie'][5]
+        before = stub.calls['playback_info']
+        urls = [http.get(f"{BASE_URL}/media/stream", params={'id': movie['Id']}, timeout=60).json().get('streamUrl', '')
+                for _ in range(2)]
+        relogin = requests.Session()
+        username, password = next(iter(stub.users.items()))
+        relogin.post(f"{BASE_URL}/auth/login", json={"username": username, "password": password}, timeout=30)
+        urls.append(relogin.get(f"{BASE_URL}/media/stream", params={'id': movie['Id']}, timeout=60).json().get('streamUrl', ''))
+        repeat_calls = stub.calls['playback_info'] - before
+        sessions = {parse_qs(urlsplit(u).query).get('PlaySessionId', [''])[0] for u in urls}
+
+        resume = http.get(f"{BASE_URL}/media/resume", timeout=60).json().get('items', [])[:3]
+        time.sleep(1)  # playback info of the top resume rows is prefetched in the background
+        before = stub.calls['playback_info']
+        for item in resume:
+            http.get(f"{BASE_URL}/media/stream", params={'id': item['id']}, timeout=60)
+        resume_calls = stub.calls['playback_info'] - before
+        print(f"PlaybackInfo calls for 3 plays (2 sessions): {repeat_calls}, PlaySessionIds {len(sessions)}, "
+              f"for {len(resume)} resume plays: {resume_calls}")
+        if repeat_calls == 1 and len(sessions) == 3 and '' not in sessions and resume and resume_calls == 0:
+            log_test("PlaybackInfo cache and resume prefetch (stub upstream)", True, "repeat and resume plays served from the cache")
+            return True
+        log_test("PlaybackInfo cache and resume prefetch (stub upstream)", False,
+                 f"repeat calls {repeat_calls}, sessions {sessions}, resume calls {resume_calls}")
+        return False
+    except Exception as e:
+        log_test("PlaybackInfo cache and resume prefetch (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_hls_proxy_with_stub(http, stub):
+    """GET /api/hls playlists come back rewritten without tokens; two viewers of one title share each
+    segment transfer (read-ahead included) and byte ranges are answered 206"""
+    try:
+        movie = stub.library[4]
+        base = BASE_URL.rsplit('/api', 1)[0]
+        before = stub.calls['hls_segment']
+        master = http.get(f"{BASE_URL}/hls/{movie['Id']}/master.m3u8?MediaSourceId={movie['Id']}&PlaySessionId=viewer-a", timeout=30).text
+        variant = next(line for line in master.splitlines() if line.startswith('/api/hls/'))
+        playlist = http.get(f"{base}{variant}", timeout=30).text
+        segments = [line for line in playlist.splitlines() if line.startswith('/api/hls/')]
+        first = http.get(f"{base}{segments[0]}", headers={'Range': 'bytes=0-99'}, timeout=30)
+        time.sleep(1)  # read-ahead of the next segments
+
+        other = requests.Session()
+        username, password = next(iter(stub.users.items()))
+        other.post(f"{BASE_URL}/auth/login", json={"username": username, "password": password}, timeout=30)
+        playlist_b = other.get(f"{BASE_URL}/hls/{movie['Id']}/main.m3u8?MediaSourceId={movie['Id']}&PlaySessionId=viewer-b", timeout=30).text
+        segments_b = [line for line in playlist_b.splitlines() if line.startswith('/api/hls/')]
+        sizes = [len(other.get(f"{base}{s}", timeout=30).content) for s in segments_b[:4]]
+        time.sleep(1)
+        upstream_calls = stub.calls['hls_segment'] - before
+        print(f"Range: {first.status_code} {first.headers.get('Content-Range')}, viewer B sizes {sizes}, "
+              f"upstream segment calls {upstream_calls}")
+        # Segments 0-3 requested, read-ahead reaches segment 6: 7 distinct segments, each fetched once
+        if 'api_key' not in master + playlist and 'http' not in playlist and first.status_code == 206 \
+                and len(first.content) == 100 and all(sizes) and upstream_calls == 7:
+            log_test("HLS proxy segment sharing (stub upstream)", True, f"2 viewers, {upstream_calls} segment transfers")
+            return True
+        log_test("HLS proxy segment sharing (stub upstream)", False, f"playlist {playlist[:200]}, upstream calls {upstream_calls}")
+        return False
+    except Exception as e:
+        log_test("HLS proxy segment sharing (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_cached_lookups_invalidation_with_stub(stub):
+    """Preferences and logout take effect immediately despite the session/preferences lookup cache"""
+    try:
+        http = requests.Session()
+        username, password = next(iter(stub.users.items()))
+        http.post(f"{BASE_URL}/auth/login", json={"username": username, "password": password}, timeout=30)
+        session_id = http.cookies.get('dagzflix_session')
+        http.get(f"{BASE_URL}/preferences", timeout=30)  # warm the cache
+        http.post(f"{BASE_URL}/preferences", json={'favoriteGenres': ['Drama'], 'dislikedGenres': []}, timeout=30)
+        prefs = http.get(f"{BASE_URL}/preferences", timeout=30).json().get('preferences', {})
+        http.post(f"{BASE_URL}/auth/logout", timeout=30)
+        after = requests.get(f"{BASE_URL}/auth/session", cookies={'dagzflix_session': session_id or ''}, timeout=30).json()
+        print(f"Preferences: {prefs.get('favoriteGenres')}, session after logout: {after}")
+        if prefs.get('favoriteGenres') == ['Drama'] and 'dagzProfile' not in prefs and after.get('authenticated') is False:
+            log_test("Cached lookups invalidation (stub upstream)", True, "preferences fresh, logged-out cookie rejected")
+            return True
+        log_test("Cached lookups invalidation (stub upstream)", False, f"prefs {prefs}, session {after}")
+        return False
+    except Exception as e:
+        log_test("Cached lookups invalidation (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_warmup_prefetch_with_stub(http, stub):
+    """GET /api/health?ready=1 reports a finished warm-up; a login prefetches the resume row in the background"""
+    try:
+        health = requests.get(f"{BASE_URL}/health?ready=1", timeout=30)
+        warmup = health.json().get('warmup', {})
+        # A progress report drops the cached resume row of earlier logins
+        http.post(f"{BASE_URL}/media/progress", json={'itemId': stub.library[3]['Id'], 'positionTicks': 100000000}, timeout=30)
+        before = stub.calls['resume']
+        fresh = requests.Session()
+        username, password = next(iter(stub.users.items()))
+        fresh.post(f"{BASE_URL}/auth/login", json={"username": username, "password": password}, timeout=30)
+        deadline = time.time() + 10
+        while stub.calls['resume'] == before and time.time() < deadline:
+            time.sleep(0.1)
+        prefetched = stub.calls['resume'] - before
+        items = fresh.get(f"{BASE_URL}/media/resume", timeout=30).json().get('items')
+        served_upstream = stub.calls['resume'] - before - prefetched
+        print(f"Health: {health.status_code} steps {warmup.get('steps')}, resume prefetched {prefetched}, "
+              f"upstream calls on GET {served_upstream}")
+        if health.status_code == 200 and warmup.get('ready') and warmup.get('steps', {}).get('mongo', {}).get('status') == 'done' \
+                and prefetched == 1 and served_upstream == 0 and items is not None:
+            log_test("Warm-up and login prefetch (stub upstream)", True, f"{len(items)} resume items served from the prefetch")
+            return True
+        log_test("Warm-up and login prefetch (stub upstream)", False, f"health {health.text[:200]}, prefetched {prefetched}")
+        return False
+    except Exception as e:
+        log_test("Warm-up and login prefetch (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_home_feed_with_stub(http, stub):
+    """GET /api/media/home serves every dashboard row; a repeat read stays off Jellyfin, a playback start rebuilds the resume row"""
+    rows_expected = {'resume', 'picks', 'newMovies', 'newSeries', 'trendingMovies', 'trendingSeries'}
+    try:
+        http.get(f"{BASE_URL}/media/home", timeout=60)
+        time.sleep(0.5)  # rows found outdated by the first read finish building
+        first = http.get(f"{BASE_URL}/media/home", timeout=60).json().get('rows', {})
+        before = stub.calls['resume'] + stub.calls['items']
+        second = http.get(f"{BASE_URL}/media/home", timeout=60).json().get('rows', {})
+        repeat_calls = stub.calls['resume'] + stub.calls['items'] - before
+        http.post(f"{BASE_URL}/media/progress", json={'itemId': stub.library[5]['Id'], 'positionTicks': 0}, timeout=30)
+        resume_before = stub.calls['resume']
+        third = http.get(f"{BASE_URL}/media/home", timeout=60).json().get('rows', {})
+        resume_calls = stub.calls['resume'] - resume_before
+        print(f"Rows: {sorted(first)}, repeat upstream calls {repeat_calls}, resume rebuilt with {resume_calls} call(s)")
+        unchanged = all(second[name]['builtAt'] == first[name]['builtAt'] and not second[name]['stale'] for name in rows_expected)
+        if set(first) == rows_expected and first['newMovies']['items'] and first['trendingMovies']['items'] \
+                and unchanged and repeat_calls == 0 and resume_calls == 1 \
+                and third['resume']['builtAt'] != second['resume']['builtAt'] and not third['resume']['stale']:
+            log_test("Home feed (stub upstream)", True, f"{sum(len(r['items']) for r in first.values())} items in one response")
+            return True
+        log_test("Home feed (stub upstream)", False, f"rows {sorted(first)}, repeat calls {repeat_calls}, resume calls {resume_calls}")
+        return False
+    except Exception as e:
+        log_test("Home feed (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_discover_herd_with_stub(http, stub):
+    """20 concurrent GET /api/discover for the same page - one upstream Jellyseerr call"""
+    try:
+        stub.set_latency('seerr_discover', 0.3)
+        before = stub.calls['seerr_discover']
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            responses = list(pool.map(lambda _: http.get(f"{BASE_URL}/discover?type=movies&page=7", timeout=60), range(20)))
+        upstream_calls = stub.calls['seerr_discover'] - before
+        stub.set_latency('seerr_discover', 0.0)
+        print(f"Status codes: {sorted({r.status_code for r in responses})}, upstream calls: {upstream_calls}")
+        if all(r.status_code == 200 and r.json().get('results') for r in responses) and upstream_calls == 1:
+            log_test("Discover herd coalescing (stub upstream)", True, "20 requests → 1 upstream call")
+            return True
+        log_test("Discover herd coalescing (stub upstream)", False, f"upstream calls {upstream_calls}")
+        return False
+    except Exception as e:
+        log_test("Discover herd coalescing (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_admission_with_stub(http, stub):
+    """A burst of slow poster loads does not delay starting playback: images are capped and shed, the stream goes first"""
+    try:
+        movie = [i for i in stub.library if i['Type'] == 'Movie'][7]
+        posters = [{'itemId': i['Id'], 'type': 'Primary', 'maxWidth': 123} for i in stub.library[20:80]]
+        stub.set_latency('image', 1.0)
+        try:
+            with ThreadPoolExecutor(max_workers=len(posters)) as pool:
+                images = [pool.submit(requests.get, f"{BASE_URL}/proxy/image", params=p, timeout=60) for p in posters]
+                time.sleep(0.3)  # the burst holds every image slot
+                start = time.time()
+                stream = http.get(f"{BASE_URL}/media/stream", params={'id': movie['Id']}, timeout=60)
+                elapsed = time.time() - start
+                responses = [f.result() for f in images]
+        finally:
+            stub.set_latency('image', stub.default_latency)
+        statuses = [r.status_code for r in responses]
+        shed = [r for r in responses if r.status_code == 503]
+        print(f"Stream in {elapsed * 1000:.0f}ms during {len(posters)} slow image loads: "
+              f"{statuses.count(200)} served, {len(shed)} shed")
+        if stream.status_code == 200 and elapsed < 1.0 and set(statuses) <= {200, 503} \
+                and all(r.headers.get('Retry-After') for r in shed):
+            log_test("Upstream admission control (stub upstream)", True,
+                     f"stream {elapsed * 1000:.0f}ms, {len(shed)} images shed with Retry-After")
+            return True
+        log_test("Upstream admission control (stub upstream)", False, f"stream {stream.status_code} in {elapsed:.2f}s, images {statuses}")
+        return False
+    except Exception as e:
+        log_test("Upstream admission control (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_metrics_with_stub(http, stub):
+    """GET /api/recommendations carries Server-Timing phases; /api/metrics exposes the route and phase histograms
+    to METRICS_TOKEN holders only (closed when the BFF has no token)"""
+    from tests.metrics import parse_server_timing, phase_breakdown, scrape, sample_value
+    try:
+        response = http.get(f"{BASE_URL}/recommendations", timeout=120)
+        timing = parse_server_timing(response.headers.get("Server-Timing"))
+        anonymous = requests.get(f"{BASE_URL}/metrics", timeout=30)
+        token = os.environ.get("METRICS_TOKEN")
+        if not token:
+            print(f"Server-Timing: {timing}, anonymous scrape: {anonymous.status_code}")
+            if "total" in timing and anonymous.status_code == 403:
+                log_test("Metrics and Server-Timing (stub upstream)", True, "scrape closed without METRICS_TOKEN")
+                return True
+            log_test("Metrics and Server-Timing (stub upstream)", False, f"timing {timing}, anonymous scrape {anonymous.status_code}")
+            return False
+        samples = scrape(BASE_URL, token)
+        reco = phase_breakdown(samples).get("recommendations", {})
+        requests_seen = sample_value(samples, "dagzflix_request_duration_seconds_count", route="recommendations")
+        print(f"Server-Timing: {timing}")
+        print(f"Scraped recommendations: {reco}")
+        upstream_phases = {"jellyfin", "jellyseerr"} & set(reco.get("phases", {}))
+        if "total" in timing and "serialize" in timing and requests_seen >= 1 and upstream_phases \
+                and anonymous.status_code == 401:
+            log_test("Metrics and Server-Timing (stub upstream)", True, f"phases {sorted(reco['phases'])}")
+            return True
+        log_test("Metrics and Server-Timing (stub upstream)", False, f"timing {timing}, scrape {reco}")
+        return False
+    except Exception as e:
+        log_test("Metrics and Server-Timing (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_circuit_breaker_with_stub(http, stub):
+    """Upstream answering 503: retried, then the breaker opens and calls fail fast (503 + Retry-After)
+    without reaching it. Runs last: the stub's origin stays open for UPSTREAM_BREAKER_COOLDOWN_MS afterwards."""
+    try:
+        stub.set_failure_rate('seerr_discover', 1.0)
+        # Pages nobody loaded yet: warmed / cached ones would not reach the stub
+        for page in range(11, 14):
+            http.get(f"{BASE_URL}/discover?type=tv&page={page}", timeout=60)
+        before = stub.calls['seerr_discover']
+        start = time.time()
+        response = http.get(f"{BASE_URL}/discover?type=tv&page=19", timeout=60)
+        elapsed = time.time() - start
+        reached = stub.calls['seerr_discover'] - before
+        stub.set_failure_rate('seerr_discover', 0.0)
+        print(f"Status Code: {response.status_code}, upstream calls once open: {reached}, {elapsed * 1000:.0f}ms")
+        retry_after = response.headers.get('Retry-After')
+        if response.status_code == 503 and retry_after and 'circuit open' in response.json().get('error', '') and reached == 0:
+            log_test("Upstream circuit breaker (stub upstream)", True, f"failed fast in {elapsed * 1000:.0f}ms, Retry-After {retry_after}s")
+            return True
+        log_test("Upstream circuit breaker (stub upstream)", False, f"body {response.text[:200]}, upstream calls {reached}")
+        return False
+    except Exception as e:
+        log_test("Upstream circuit breaker (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def check_breaker_trial_abort_with_stub(http, stub):
+    """After the cooldown, a half-open trial call cancelled by its client (a player closed mid-request)
+    must not keep the circuit open: the next call becomes the trial and closes it.
+    Follows check_circuit_breaker_with_stub, which leaves the stub's origin open."""
+    try:
+        cooldown = int(os.environ.get('UPSTREAM_BREAKER_COOLDOWN_MS', '15000')) / 1000
+        time.sleep(cooldown + 0.5)
+        movie = stub.library[4]
+        # Not a playlist nor a segment extension: passed through with the client's abort signal
+        stub.set_latency('hls_segment', 5.0)
+        before = stub.calls['hls_segment']
+        try:
+            http.get(f"{BASE_URL}/hls/{movie['Id']}/hls1/main/0.vtt", timeout=1)
+        except requests.exceptions.Timeout:
+            pass
+        trial_sent = stub.calls['hls_segment'] > before
+        stub.set_latency('hls_segment', 0)
+        time.sleep(0.5)
+        response = http.get(f"{BASE_URL}/discover?type=tv&page=23", timeout=60)
+        print(f"Trial reached upstream: {trial_sent}, next call: {response.status_code}")
+        if trial_sent and response.status_code == 200:
+            log_test("Breaker trial cancelled by its client (stub upstream)", True, "next call closed the circuit")
+            return True
+        log_test("Breaker trial cancelled by its client (stub upstream)", False, f"status {response.status_code}, body {response.text[:200]}")
+        return False
+    except Exception as e:
+        log_test("Breaker trial cancelled by its client (stub upstream)", False, f"Exception: {str(e)}")
+        return False
+
+def run_stub_backend_tests(library_size=1000, latency=0.0):
+    """Run the authenticated hot paths against an in-process upstream stand-in"""
+    from tests.upstream_stub import UpstreamStub
+
+    results = {}
+    with UpstreamStub(host=STUB_HOST, library_size=library_size, default_latency=latency) as stub:
+        print(f"🧪 Upstream stand-in on {stub.url} ({library_size} items, {latency * 1000:.0f}ms latency)")
+        print()
+        http = configure_stub_upstream(stub)
+        results['stub_media_library'] = check_media_library_with_stub(http, stub)
+        results['stub_library_projection'] = check_library_projection_with_stub(http, stub)
+        results['stub_media_detail_sections'] = check_media_detail_sections_with_stub(http, stub)
+        results['stub_catalog_sync'] = check_catalog_sync_with_stub(http, stub)
+        results['stub_search_index'] = check_search_index_with_stub(http, stub)
+        results['stub_recommendations'] = check_recommendations_with_stub(http, stub)
+        results['stub_discover_snapshot'] = check_discover_snapshot_with_stub(http, stub)
+        results['stub_image_cache'] = check_image_cache_with_stub(http, stub)
+        results['stub_image_variants'] = check_image_variants_with_stub(http, stub)
+        results['stub_status_batch'] = check_status_batch_with_stub(http, stub)
+        results['stub_progress_coalescing'] = check_progress_coalescing_with_stub(http, stub)
+        results['stub_stream'] = check_stream_with_stub(http, stub)
+        results['stub_playback_info_cache'] = check_playback_info_cache_with_stub(http, stub)
+        results['stub_hls_proxy'] = check_hls_proxy_with_stub(http, stub)
+        results['stub_cached_lookups'] = check_cached_lookups_invalidation_with_stub(stub)
+        results['stub_warmup_prefetch'] = check_warmup_prefetch_with_stub(http, stub)
+        results['stub_home_feed'] = check_home_feed_with_stub(http, stub)
+        results['stub_discover_herd'] = check_discover_herd_with_stub(http, stub)
+        results['stub_admission'] = check_admission_with_stub(http, stub)
+        results['stub_metrics'] = check_metrics_with_stub(http, stub)
+        results['stub_circuit_breaker'] = check_circuit_breaker_with_stub(http, stub)
+        results['stub_breaker_trial_abort'] = check_breaker_trial_abort_with_stub(http, stub)
+    return results
+
 def run_comprehensive_backend_tests():
     """Run all backend API tests in sequence"""
     print("=" * 80)
@@ -500,8 +1148,30 @@ def run_comprehensive_backend_tests():
     return results
 
 if __name__ == "__main__":
+    if "--load" in sys.argv:
+        # Load mode: everything after --load is handed to tests.load (see python -m tests.load --help)
+        from tests.load import main as load_main
+        load_main(sys.argv[sys.argv.index("--load") + 1:])
+        sys.exit(0)
+    if "--bench" in sys.argv:
+        # Benchmark mode: everything after --bench is handed to tests.bench (see python -m tests.bench --help)
+        from tests.bench import main as bench_main
+        sys.exit(bench_main(sys.argv[sys.argv.index("--bench") + 1:]))
+    if "--budgets" in sys.argv:
+        # Budget mode: upstream calls per user flow step (see python -m tests.budgets --help)
+        from tests.budgets import main as budgets_main
+        sys.exit(budgets_main(sys.argv[sys.argv.index("--budgets") + 1:]))
+    if "--metrics" in sys.argv:
+        # Metrics mode: per-route phase breakdown scraped from /api/metrics (see python -m tests.metrics --help)
+        from tests.metrics import main as metrics_main
+        sys.exit(metrics_main(sys.argv[sys.argv.index("--metrics") + 1:]))
     try:
         results = run_comprehensive_backend_tests()
+        if "--stub" in sys.argv:
+            results.update(run_stub_backend_tests(
+                library_size=int(os.environ.get("DAGZFLIX_STUB_LIBRARY_SIZE", "1000")),
+                latency=float(os.environ.get("DAGZFLIX_STUB_LATENCY", "0")),
+            ))
         # Exit with error code if any tests failed
         if not all(results.values()):
             sys.exit(1)
@@ -18,7 +18,28 @@ export function DashboardView({ user, onItemClick, onPlay }) {
 
   useEffect(() => { load(); }, []);
 
+  const showHero = (item) => { if (item && !heroRef.current) { heroRef.current = item; setHeroItem(item); } };
+
+  // Whole dashboard in one response (materialized server-side); per-row calls if it fails
   const load = async () => {
+    try {
+      const { rows, error } = await cachedApi('media/home');
+      if (!rows || error) throw new Error(error || 'media/home');
+      const items = (name) => rows[name]?.items || [];
+      setContinueW(items('resume'));
+      setReco(items('picks'));
+      setMovies(items('newMovies'));
+      setSeries(items('newSeries'));
+      setTrendM(items('trendingMovies'));
+      setTrendS(items('trendingSeries'));
+      showHero(items('picks')[0] || items('newMovies')[0]);
+      setLoads({ reco: false, movies: false, series: false, trendM: false, trendS: false, continueW: false });
+    } catch {
+      loadRows();
+    }
+  };
+
+  const loadRows = async () => {
     const sl = (k, v) => setLoads(p => ({ ...p, [k]: v }));
 
     // Continue Watching
@@ -33,7 +54,7 @@ export function DashboardView({ user, onItemClick, onPlay }) {
     cachedApi('recommendations').then(r => {
       const recs = r.recommendations || [];
       setReco(recs);
-      if (recs.length > 0 && !heroRef.current) { heroRef.current = recs[0]; setHeroItem(recs[0]); }
+      showHero(recs[0]);
       sl('reco', false);
     }).catch(() => sl('reco', false));
 
@@ -42,7 +63,7 @@ export function DashboardView({ user, onItemClick, onPlay }) {
     cachedApi('media/library?type=Movie&limit=20&sortBy=DateCreated&sortOrder=Descending').then(r => {
       const i = r.items || [];
       setMovies(i);
-      if (!heroRef.current && i.length > 0) { heroRef.current = i[0]; setHeroItem(i[0]); }
+      showHero(i[0]);
       sl('movies', false);
     }).catch(() => sl('movies', false));
 
@@ -3,6 +3,7 @@ import { useState } from 'react';
 import { motion } from 'framer-motion';
 import { Button } from '@/components/ui/button';
 import { Play, Info, Sparkles } from 'lucide-react';
+import { responsiveImage } from '@/lib/images';
 
 export function HeroSection({ item, onPlay, onDetail }) {
   const [imgErr, setImgErr] = useState(false);
@@ -10,7 +11,7 @@ export function HeroSection({ item, onPlay, onDetail }) {
   return (
     <div data-testid="hero-section" className="relative h-[75vh] min-h-[550px]">
       {!imgErr && item?.backdropUrl ? (
-        <img src={item.backdropUrl} alt={item.name} className="absolute inset-0 w-full h-full object-cover" onError={() => setImgErr(true)} />
+        <img {...responsiveImage(item.backdropUrl, 'backdrop')} alt={item.name} className="absolute inset-0 w-full h-full object-cover" onError={() => setImgErr(true)} />
       ) : (
         <div className="absolute inset-0 bg-gradient-to-br from-gray-900 via-gray-800 to-[#050505]" />
       )}
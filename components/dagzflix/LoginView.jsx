@@ -5,7 +5,7 @@ import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Eye, EyeOff, Loader2, AlertCircle } from 'lucide-react';
-import { api, invalidateCache } from '@/lib/api';
+import { api, clearCache } from '@/lib/api';
 import { pageVariants } from '@/lib/constants';
 
 export function LoginView({ onLogin }) {
@@ -19,7 +19,7 @@ export function LoginView({ onLogin }) {
     e.preventDefault(); setLoading(true); setError('');
     try {
       const r = await api('auth/login', { method: 'POST', body: JSON.stringify({ username: u, password: p }) });
-      if (r.success) { invalidateCache('auth'); onLogin(r.user, r.onboardingComplete); }
+      if (r.success) { await clearCache(); onLogin(r.user, r.onboardingComplete); }
       else setError(r.error || 'Échec');
     } catch (e) { setError(e.message); }
     setLoading(false);
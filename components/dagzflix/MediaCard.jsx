@@ -2,6 +2,7 @@
 import { useState, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { Star, Clapperboard, ChevronLeft, ChevronRight, Loader2, Sparkles } from 'lucide-react';
+import { responsiveImage } from '@/lib/images';
 
 export function MediaCard({ item, onClick, size = 'normal' }) {
   const [imgErr, setImgErr] = useState(false);
@@ -17,7 +18,7 @@ export function MediaCard({ item, onClick, size = 'normal' }) {
     >
       <div className="aspect-[2/3] rounded-2xl overflow-hidden bg-white/3 relative card-reflection group shadow-lg shadow-black/30">
         {!imgErr && item.posterUrl ? (
-          <img src={item.posterUrl} alt={item.name} className="w-full h-full object-cover" onError={() => setImgErr(true)} loading="lazy" />
+          <img {...responsiveImage(item.posterUrl, size === 'large' ? 'cardLarge' : 'card')} alt={item.name} className="w-full h-full object-cover" onError={() => setImgErr(true)} loading="lazy" />
         ) : (
           <div className="w-full h-full flex items-center justify-center bg-gradient-to-br from-gray-900 to-gray-950"><Clapperboard className="w-10 h-10 text-gray-700" /></div>
         )}
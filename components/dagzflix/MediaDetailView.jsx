@@ -7,8 +7,9 @@ import {
   ChevronLeft, Clock, Star, Film, Tv, Layers, Sparkles, Clapperboard,
   Subtitles, AudioLines, Play, PlayCircle, Check,
 } from 'lucide-react';
-import { cachedApi } from '@/lib/api';
+import { cachedApi, streamDetail } from '@/lib/api';
 import { pageVariants, GENRE_ICONS } from '@/lib/constants';
+import { responsiveImage } from '@/lib/images';
 import { SmartButton, TrailerButton } from './SmartButton';
 import { VideoPlayer } from './VideoPlayer';
 import { MediaCard, MediaRow } from './MediaCard';
@@ -20,7 +21,7 @@ function EpisodeCard({ ep, onPlay }) {
       <div className="flex gap-4 p-4">
         <div className="relative w-40 aspect-video rounded-xl overflow-hidden bg-white/5 flex-shrink-0">
           {!imgErr && (ep.thumbUrl || ep.backdropUrl) ? (
-            <img src={ep.thumbUrl || ep.backdropUrl} alt={ep.name} className="w-full h-full object-cover" onError={() => setImgErr(true)} />
+            <img {...responsiveImage(ep.thumbUrl || ep.backdropUrl, 'thumb')} alt={ep.name} className="w-full h-full object-cover" onError={() => setImgErr(true)} />
           ) : (
             <div className="w-full h-full flex items-center justify-center"><PlayCircle className="w-8 h-8 text-gray-600" /></div>
           )}
@@ -57,47 +58,48 @@ export function MediaDetailView({ item, onBack, onPlay, onItemClick }) {
   const [playEpId, setPlayEpId] = useState(null);
   const [subs, setSubs] = useState([]);
   const [audio, setAudio] = useState([]);
+  const [knownStatus, setKnownStatus] = useState(null); // null while the detail stream may still bring it
+  const [trailers, setTrailers] = useState(null);
   const itemKey = item?.id || item?.tmdbId || '';
 
   useEffect(() => {
     // Reset ALL state on item change - fixes saga/collection persistence bug
     setDetail(null); setSimilar([]); setSeasons([]); setSelectedSeason(null); setEpisodes([]);
     setCollection(null); setCollectionItems([]); setSubs([]); setAudio([]); setImgError(false); setLoading(true);
+    setKnownStatus(null); setTrailers(null);
     fetchAll();
   }, [itemKey]);
 
   const fetchAll = async () => {
-    let fi = item;
-    if (item.id && !item.tmdbId) {
-      try { const r = await cachedApi(`media/detail?id=${item.id}`); if (r.item) { setDetail(r.item); fi = r.item; setSimilar(r.similar || []); } } catch { /* ignore */ }
-    } else { setDetail(item); fi = item; }
-
-    const isSeries = fi?.type === 'Series';
-    const fId = fi?.id;
-    const tmdbId = fi?.tmdbId || fi?.providerIds?.Tmdb;
-
-    if (isSeries && fId) {
-      try { const r = await cachedApi(`media/seasons?seriesId=${fId}`); const s = r.seasons || []; setSeasons(s); if (s.length > 0) { setSelectedSeason(s[0]); fetchEps(fId, s[0].id); } } catch { /* ignore */ }
-    }
-
-    // Only fetch collection for non-series
-    if (!isSeries) {
-      try {
-        const p = new URLSearchParams();
-        if (fId) p.set('id', fId);
-        if (tmdbId) p.set('tmdbId', tmdbId);
-        const r = await cachedApi(`media/collection?${p.toString()}`);
-        // Only set if we actually have collection data
-        if (r.collection) {
-          setCollection(r.collection);
-          setCollectionItems(r.items || []);
-        }
-      } catch { /* ignore */ }
-    }
-
-    if (fId) {
-      try { const r = await cachedApi(`media/stream?id=${fId}`); setSubs(r.subtitles || []); setAudio(r.audioTracks || []); } catch { /* ignore */ }
-    }
+    const tmdbId = item.tmdbId || item.providerIds?.Tmdb;
+    // Jellyfin ids only: TMDB-only results (discover, Jellyseerr search) carry their TMDB id as id
+    const jellyfinId = item.id && String(item.id) !== String(item.tmdbId ?? '') ? item.id : null;
+    if (!jellyfinId) setDetail(item);
+
+    const p = new URLSearchParams();
+    if (jellyfinId) p.set('id', jellyfinId);
+    if (tmdbId) p.set('tmdbId', tmdbId);
+    if (item.type) p.set('mediaType', item.type === 'Series' ? 'tv' : 'movie');
+    p.set('sections', [...(jellyfinId ? ['item', 'similar'] : []), 'status', 'seasons', 'episodes', 'collection', 'trailers'].join(','));
+
+    const tracks = jellyfinId
+      ? cachedApi(`media/stream?id=${jellyfinId}`).then(r => { setSubs(r.subtitles || []); setAudio(r.audioTracks || []); }).catch(() => { /* ignore */ })
+      : null;
+
+    // One request for the whole page: each section renders as soon as the server has it
+    try {
+      await streamDetail(p.toString(), (name, data) => {
+        if (name === 'item' && data) setDetail(data);
+        else if (name === 'similar') setSimilar(data || []);
+        else if (name === 'status' && data) setKnownStatus(data.status);
+        else if (name === 'seasons') { const s = data || []; setSeasons(s); if (s.length > 0) setSelectedSeason(s[0]); }
+        else if (name === 'episodes' && data) setEpisodes(data.episodes || []);
+        else if (name === 'collection' && data?.items?.length > 0) { setCollection(data); setCollectionItems(data.items); }
+        else if (name === 'trailers') setTrailers(data || []);
+      });
+    } catch { /* ignore */ }
+    setKnownStatus(st => st ?? undefined); // not delivered: the Smart Button checks by itself
+    await tracks;
     setLoading(false);
   };
 
@@ -117,7 +119,7 @@ export function MediaDetailView({ item, onBack, onPlay, onItemClick }) {
       {/* Backdrop */}
       <div className="relative h-[55vh] min-h-[400px]">
         {!imgError && d?.backdropUrl ? (
-          <img src={d.backdropUrl} alt={d.name} className="absolute inset-0 w-full h-full object-cover" onError={() => setImgError(true)} />
+          <img {...responsiveImage(d.backdropUrl, 'backdrop')} alt={d.name} className="absolute inset-0 w-full h-full object-cover" onError={() => setImgError(true)} />
         ) : (
           <div className="absolute inset-0 bg-gradient-to-br from-red-950/20 via-gray-900 to-[#050505]" />
         )}
@@ -132,7 +134,7 @@ export function MediaDetailView({ item, onBack, onPlay, onItemClick }) {
         <div className="flex flex-col md:flex-row gap-10">
           <div className="flex-shrink-0 w-48 md:w-56">
             <div className="aspect-[2/3] rounded-3xl overflow-hidden shadow-2xl bg-white/5 ring-1 ring-white/10">
-              {d?.posterUrl ? <img src={d.posterUrl} alt={d.name} className="w-full h-full object-cover" /> : <div className="w-full h-full flex items-center justify-center"><Clapperboard className="w-16 h-16 text-gray-700" /></div>}
+              {d?.posterUrl ? <img {...responsiveImage(d.posterUrl, 'poster')} alt={d.name} className="w-full h-full object-cover" /> : <div className="w-full h-full flex items-center justify-center"><Clapperboard className="w-16 h-16 text-gray-700" /></div>}
             </div>
           </div>
           <div className="flex-1 pt-4">
@@ -150,7 +152,7 @@ export function MediaDetailView({ item, onBack, onPlay, onItemClick }) {
             {d?.dagzRank > 0 && (
               <div className="mb-5 inline-flex items-center gap-3 glass rounded-2xl px-5 py-3"><Sparkles className="w-5 h-5 text-red-400" /><span className="text-red-300 font-bold">DagzRank</span><div className="w-24 h-2 bg-white/10 rounded-full overflow-hidden"><div className="h-full bg-gradient-to-r from-red-600 to-red-400 rounded-full" style={{ width: `${d.dagzRank}%` }} /></div><span className="text-red-400 font-bold">{d.dagzRank}%</span></div>
             )}
-            <div className="flex flex-wrap items-center gap-3 mb-6"><SmartButton item={d} onPlay={() => setShowPlayer(true)} /><TrailerButton item={d} /></div>
+            <div className="flex flex-wrap items-center gap-3 mb-6"><SmartButton item={d} status={knownStatus} onPlay={() => setShowPlayer(true)} /><TrailerButton item={d} trailers={trailers} /></div>
             <p className="text-gray-400 leading-relaxed mb-6 max-w-2xl font-light">{d?.overview}</p>
             {(subs.length > 0 || audio.length > 0) && (
               <div className="flex flex-wrap gap-4 mb-6">
@@ -198,7 +200,7 @@ export function MediaDetailView({ item, onBack, onPlay, onItemClick }) {
               {collectionItems.map((ci, idx) => (
                 <motion.div key={ci.id || idx} whileHover={{ scale: 1.05, y: -4 }} className={`cursor-pointer ${ci.isCurrent ? 'ring-2 ring-red-500 rounded-2xl' : ''}`} onClick={() => { if (!ci.isCurrent) onItemClick(ci); }}>
                   <div className="aspect-[2/3] rounded-2xl overflow-hidden bg-white/3 relative shadow-lg">
-                    {ci.posterUrl ? <img src={ci.posterUrl} alt={ci.name} className="w-full h-full object-cover" loading="lazy" /> : <div className="w-full h-full flex items-center justify-center"><Clapperboard className="w-8 h-8 text-gray-700" /></div>}
+                    {ci.posterUrl ? <img {...responsiveImage(ci.posterUrl, 'grid')} alt={ci.name} className="w-full h-full object-cover" loading="lazy" /> : <div className="w-full h-full flex items-center justify-center"><Clapperboard className="w-8 h-8 text-gray-700" /></div>}
                     {ci.isCurrent && <div className="absolute inset-0 bg-red-600/10 flex items-center justify-center"><Badge className="bg-red-600 text-white">Actuel</Badge></div>}
                   </div>
                   <p className="text-sm text-gray-400 mt-2 truncate font-medium">{ci.name}</p>
@@ -2,8 +2,8 @@
 import { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Input } from '@/components/ui/input';
-import { Film, Tv, Search, Sparkles, Library, Wand2 } from 'lucide-react';
-import { cachedApi } from '@/lib/api';
+import { Film, Tv, Search, Sparkles, Library, Wand2, Loader2 } from 'lucide-react';
+import { cachedApi, streamLibrary } from '@/lib/api';
 import { MediaCard } from './MediaCard';
 import { WizardView } from './WizardView';
 
@@ -36,14 +36,30 @@ export function MediaTypePage({ mediaType, onItemClick, onPlay }) {
     setRecoLoading(false);
   };
 
-  // Library
+  // Library: card projection streamed as NDJSON, first rows shown as soon as they arrive
   const [library, setLibrary] = useState([]);
   const [libLoading, setLibLoading] = useState(false);
+  const [libCursor, setLibCursor] = useState(null);
+  const [libMoreLoading, setLibMoreLoading] = useState(false);
+  const libQuery = `type=${jellyfinType}&limit=60&sortBy=SortName&sortOrder=Ascending&fields=card`;
   const loadLib = async () => {
     setLibLoading(true);
-    try { const r = await cachedApi(`media/library?type=${jellyfinType}&limit=60&sortBy=SortName&sortOrder=Ascending`); setLibrary(r.items || []); } catch { /* ignore */ }
+    try {
+      const page = await streamLibrary(libQuery, items => { setLibrary(items); if (items.length > 0) setLibLoading(false); });
+      setLibCursor(page.nextCursor);
+    } catch { /* ignore */ }
     setLibLoading(false);
   };
+  const loadMoreLib = async () => {
+    if (!libCursor || libMoreLoading) return;
+    setLibMoreLoading(true);
+    const before = library;
+    try {
+      const page = await streamLibrary(`${libQuery}&cursor=${libCursor}`, items => setLibrary([...before, ...items]));
+      setLibCursor(page.nextCursor);
+    } catch { /* ignore */ }
+    setLibMoreLoading(false);
+  };
 
   useEffect(() => {
     if (tab === 'dagzrank') loadRecos();
@@ -115,7 +131,17 @@ export function MediaTypePage({ mediaType, onItemClick, onPlay }) {
             <div className="flex items-center gap-2 mb-6"><Library className="w-5 h-5 text-blue-400" /><h2 className="text-lg font-bold">Disponible sur votre serveur</h2></div>
             {libLoading ? <SkeletonGrid /> :
               library.length > 0 ? (
-                <div className="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-4 lg:grid-cols-6 gap-5">{library.map((item, i) => <MediaCard key={item.id || i} item={item} onClick={onItemClick} />)}</div>
+                <>
+                  <div className="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-4 lg:grid-cols-6 gap-5">{library.map((item, i) => <MediaCard key={item.id || i} item={item} onClick={onItemClick} />)}</div>
+                  {libCursor && (
+                    <div className="flex justify-center py-10">
+                      <button data-testid="library-load-more" onClick={loadMoreLib} disabled={libMoreLoading}
+                        className="flex items-center gap-2 px-6 py-3 rounded-2xl text-sm font-medium bg-white/5 text-gray-300 hover:bg-white/10 transition-all">
+                        {libMoreLoading && <Loader2 className="w-4 h-4 animate-spin" />}Afficher plus
+                      </button>
+                    </div>
+                  )}
+                </>
               ) : (
                 <div className="text-center py-16"><Library className="w-12 h-12 text-gray-800 mx-auto mb-3" /><p className="text-gray-500">Aucun {isTV ? 'série' : 'film'} dans la bibliothèque</p></div>
               )}
@@ -17,7 +17,7 @@ export function Navbar({ user, onSearch, onNavigate, currentView }) {
   }, []);
 
   const submit = (e) => { e.preventDefault(); if (sq.trim()) { onSearch(sq.trim()); setSearchOpen(false); } };
-  const logout = async () => { await api('auth/logout', { method: 'POST' }); clearCache(); window.location.reload(); };
+  const logout = async () => { await api('auth/logout', { method: 'POST' }); await clearCache(); window.location.reload(); };
 
   const navItems = [
     { id: 'dashboard', label: 'Accueil', icon: Home },
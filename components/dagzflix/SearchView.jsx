@@ -1,32 +1,83 @@
 'use client';
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Input } from '@/components/ui/input';
-import { Search } from 'lucide-react';
+import { Search, X } from 'lucide-react';
 import { cachedApi } from '@/lib/api';
 import { MediaCard } from './MediaCard';
 
+const TYPE_LABELS = { Movie: 'Films', Series: 'Séries' };
+const FACET_KEYS = [['type', 'types'], ['genre', 'genres'], ['year', 'years']];
+
 export function SearchView({ query, onItemClick }) {
   const [results, setResults] = useState([]);
+  const [facets, setFacets] = useState(null);
+  const [filters, setFilters] = useState({});
   const [loading, setLoading] = useState(true);
   const [si, setSi] = useState(query);
+  const [current, setCurrent] = useState(query);
+  const searchId = useRef(0);
 
-  useEffect(() => { if (query) doSearch(query); }, [query]);
+  useEffect(() => { if (query) { setCurrent(query); doSearch(query, {}); } }, [query]);
 
-  const doSearch = async (q) => {
+  const doSearch = async (q, f) => {
+    const id = ++searchId.current;
+    setFilters(f);
     setLoading(true);
-    try { const r = await cachedApi(`search?q=${encodeURIComponent(q)}`); setResults(r.results || []); } catch { /* ignore */ }
-    setLoading(false);
+    const params = new URLSearchParams({ q });
+    for (const [key, value] of Object.entries(f)) if (value) params.set(key, value);
+    // Owned content first: the local index answers in milliseconds, Jellyseerr results follow
+    try {
+      const quick = await cachedApi(`search?${params}&scope=local`);
+      if (id !== searchId.current) return;
+      if (quick.results?.length) {
+        setResults(quick.results);
+        setFacets(quick.facets || null);
+        setLoading(false);
+      }
+    } catch { /* ignore */ }
+    try {
+      const r = await cachedApi(`search?${params}`);
+      if (id !== searchId.current) return;
+      setResults(r.results || []);
+      if (r.facets) setFacets(r.facets);
+    } catch { /* ignore */ }
+    if (id === searchId.current) setLoading(false);
+  };
+
+  const toggleFilter = (key, value) => {
+    doSearch(current, { ...filters, [key]: filters[key] === value ? null : value });
   };
 
+  const activeFilters = Object.entries(filters).filter(([, v]) => v);
+
   return (
     <div data-testid="search-view" className="pt-24 px-6 md:px-16 min-h-screen">
-      <form onSubmit={(e) => { e.preventDefault(); if (si.trim()) doSearch(si.trim()); }} className="mb-10 max-w-2xl">
+      <form onSubmit={(e) => { e.preventDefault(); if (si.trim()) { setCurrent(si.trim()); doSearch(si.trim(), {}); } }} className="mb-6 max-w-2xl">
         <div className="relative">
           <Input data-testid="global-search-input" value={si} onChange={e => setSi(e.target.value)} placeholder="Rechercher..."
             className="bg-white/5 border-white/10 text-white h-14 pl-14 text-lg rounded-2xl" autoFocus />
           <Search className="absolute left-5 top-1/2 -translate-y-1/2 w-5 h-5 text-gray-500" />
         </div>
       </form>
+      {facets && (
+        <div data-testid="search-facets" className="mb-8 space-y-2">
+          {FACET_KEYS.map(([key, facetName]) => (facets[facetName] || []).length > 0 && (
+            <div key={key} className="flex flex-wrap gap-2">
+              {facets[facetName].slice(0, key === 'type' ? 2 : 12).map(({ name, count }) => (
+                <button key={name} data-testid={`search-facet-${key}`} onClick={() => toggleFilter(key, name)}
+                  className={`px-3 py-1.5 rounded-xl text-sm border transition-colors ${filters[key] === name ? 'bg-red-600 text-white border-red-500' : 'bg-white/5 text-gray-300 border-white/5 hover:bg-white/10'}`}>
+                  {key === 'type' ? TYPE_LABELS[name] || name : name} <span className="text-xs opacity-60">{count}</span>
+                </button>
+              ))}
+            </div>
+          ))}
+          {activeFilters.length > 0 && (
+            <button data-testid="search-facets-clear" onClick={() => doSearch(current, {})} className="flex items-center gap-1 text-sm text-gray-400 hover:text-white">
+              <X className="w-3.5 h-3.5" />Effacer les filtres
+            </button>
+          )}
+        </div>
+      )}
       {loading ? (
         <div className="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-4 lg:grid-cols-6 gap-5">
           {Array.from({ length: 12 }).map((_, i) => <div key={i}><div className="aspect-[2/3] skeleton" /></div>)}
@@ -3,23 +3,28 @@ import { useState, useEffect } from 'react';
 import { AnimatePresence, motion } from 'framer-motion';
 import { Button } from '@/components/ui/button';
 import { Play, Download, Clock, Check, Loader2, Youtube, X } from 'lucide-react';
-import { api, cachedApi } from '@/lib/api';
+import { api, cachedApi, mediaStatus, invalidateCache } from '@/lib/api';
 
-export function SmartButton({ item, onPlay }) {
+/** status: already known Smart Button status (no lookup), null while the parent is still loading it */
+export function SmartButton({ item, onPlay, status: knownStatus }) {
   const [status, setStatus] = useState('loading');
   const [requesting, setRequesting] = useState(false);
   const [requested, setRequested] = useState(false);
 
-  useEffect(() => { if (item) check(); }, [item?.id]);
+  useEffect(() => {
+    if (!item || knownStatus === null) return;
+    if (knownStatus) setStatus(knownStatus);
+    else check();
+  }, [item?.id, knownStatus]);
 
   const check = async () => {
     setStatus('loading');
     try {
-      const p = new URLSearchParams();
-      if (item.id) p.set('id', item.id);
-      if (item.tmdbId || item.providerIds?.Tmdb) p.set('tmdbId', item.tmdbId || item.providerIds?.Tmdb);
-      p.set('mediaType', item.type === 'Series' ? 'tv' : 'movie');
-      const r = await cachedApi(`media/status?${p.toString()}`);
+      const r = await mediaStatus({
+        id: item.id,
+        tmdbId: item.tmdbId || item.providerIds?.Tmdb,
+        mediaType: item.type === 'Series' ? 'tv' : 'movie',
+      });
       setStatus(r.status || 'unknown');
     } catch { setStatus('unknown'); }
   };
@@ -31,7 +36,7 @@ export function SmartButton({ item, onPlay }) {
         method: 'POST',
         body: JSON.stringify({ tmdbId: item.tmdbId || item.providerIds?.Tmdb, mediaType: item.type === 'Series' ? 'tv' : 'movie' }),
       });
-      if (r.success) { setRequested(true); setStatus('pending'); }
+      if (r.success) { setRequested(true); setStatus('pending'); invalidateCache('media/detail'); }
     } catch (e) { /* ignore */ }
     setRequesting(false);
   };
@@ -48,12 +53,18 @@ export function SmartButton({ item, onPlay }) {
   );
 }
 
-export function TrailerButton({ item }) {
+/** trailers: already loaded list (e.g. from the detail sections), fetched on click otherwise */
+export function TrailerButton({ item, trailers: knownTrailers }) {
   const [trailers, setTrailers] = useState([]);
   const [show, setShow] = useState(false);
   const [loading, setLoading] = useState(false);
 
   const fetchTrailers = async () => {
+    if (knownTrailers) {
+      setTrailers(knownTrailers);
+      if (knownTrailers.length > 0) setShow(true);
+      return;
+    }
     setLoading(true);
     try {
       const p = new URLSearchParams();
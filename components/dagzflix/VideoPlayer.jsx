@@ -6,7 +6,7 @@ import {
   Play, Pause, ChevronLeft, Loader2, AlertCircle, SkipBack, SkipForward,
   Volume2, VolumeX, Subtitles, AudioLines, Maximize,
 } from 'lucide-react';
-import { api } from '@/lib/api';
+import { api, invalidateCache } from '@/lib/api';
 import { formatTime } from '@/lib/constants';
 
 export function VideoPlayer({ item, episodeId, onClose }) {
@@ -31,7 +31,12 @@ export function VideoPlayer({ item, episodeId, onClose }) {
 
   useEffect(() => {
     fetchStream();
-    return () => { if (ctrlTimer.current) clearTimeout(ctrlTimer.current); };
+    return () => {
+      if (ctrlTimer.current) clearTimeout(ctrlTimer.current);
+      // Playback moved the resume position: the cached rows must not be served stale
+      invalidateCache('media/resume');
+      invalidateCache('media/home');
+    };
   }, []);
 
   const fetchStream = async () => {
@@ -6,6 +6,7 @@ import { Wand2, ChevronLeft, Star, Info, AlertCircle, Sparkles, CalendarDays, Ti
 import { Badge } from '@/components/ui/badge';
 import { api } from '@/lib/api';
 import { MOODS, ERAS, DURATIONS } from '@/lib/constants';
+import { responsiveImage } from '@/lib/images';
 import { MediaCard } from './MediaCard';
 
 export function WizardView({ mediaType, onItemClick }) {
@@ -113,10 +114,10 @@ export function WizardView({ mediaType, onItemClick }) {
                 <div data-testid="wizard-result" className="relative max-w-4xl mx-auto mb-12 rounded-3xl overflow-hidden glass-strong">
                   <div className="flex flex-col md:flex-row">
                     {result.backdropUrl && (
-                      <div className="absolute inset-0"><img src={result.backdropUrl} alt="" className="w-full h-full object-cover opacity-20" /><div className="absolute inset-0 bg-gradient-to-r from-[#050505] via-[#050505]/80 to-transparent" /></div>
+                      <div className="absolute inset-0"><img {...responsiveImage(result.backdropUrl, 'backdrop')} alt="" className="w-full h-full object-cover opacity-20" /><div className="absolute inset-0 bg-gradient-to-r from-[#050505] via-[#050505]/80 to-transparent" /></div>
                     )}
                     <div className="relative flex flex-col md:flex-row gap-8 p-8">
-                      <div className="w-40 md:w-52 flex-shrink-0">{result.posterUrl && <img src={result.posterUrl} alt={result.name} className="w-full rounded-2xl shadow-2xl" />}</div>
+                      <div className="w-40 md:w-52 flex-shrink-0">{result.posterUrl && <img {...responsiveImage(result.posterUrl, 'poster')} alt={result.name} className="w-full rounded-2xl shadow-2xl" />}</div>
                       <div className="flex-1">
                         <Badge className="bg-purple-600 text-white mb-3"><Wand2 className="w-3 h-3 mr-1" />Match parfait</Badge>
                         <h3 className="text-3xl font-black mb-3">{result.name}</h3>
@@ -0,0 +1,11 @@
+/* =================================================================
+   Next.js startup hook: warm the Node.js server (MongoDB pool, config,
+   catalog, discover pages) before the first request arrives.
+   Set WARMUP_ON_START=false to leave it to the first /api/health probe.
+   ================================================================= */
+
+export async function register() {
+  if (process.env.NEXT_RUNTIME !== 'nodejs' || process.env.WARMUP_ON_START === 'false') return;
+  const { warmUp } = await import('@/lib/server/warmup');
+  warmUp();
+}
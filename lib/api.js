@@ -1,8 +1,29 @@
 /* =================================================================
    DagzFlix - API Layer with Client-Side Cache
+   GET answers are kept by lib/client-cache: fresh for CACHE_TTLS, then
+   served stale while a background call refreshes them (CACHE_SWR), except
+   for the NO_STALE routes. PERSISTED routes are also written to IndexedDB
+   (NEXT_PUBLIC_CLIENT_CACHE_PERSIST=false to disable): a reload or another
+   tab starts from them instead of re-paying the dashboard. The player
+   invalidates media/resume and media/home when it closes.
    ================================================================= */
 
-const apiCache = new Map();
+import { ClientCache } from '@/lib/client-cache';
+
+const apiCache = new ClientCache({
+  maxEntries: parseInt(process.env.NEXT_PUBLIC_CLIENT_CACHE_MAX_ENTRIES || '300'),
+  maxBytes: parseInt(process.env.NEXT_PUBLIC_CLIENT_CACHE_MAX_MB || '8') * 1024 * 1024,
+  persist: process.env.NEXT_PUBLIC_CLIENT_CACHE_PERSIST !== 'false',
+});
+
+// Stale window after the TTL; session, setup and playback answers are never served stale
+const CACHE_SWR = 24 * 60 * 60 * 1000;
+const NO_STALE = ['setup/', 'auth/', 'media/status', 'media/stream'];
+// Kept across reloads (never sessions or stream URLs, which carry tokens)
+const PERSISTED = [
+  'media/library', 'media/detail', 'media/seasons', 'media/episodes', 'media/trailer',
+  'media/collection', 'media/resume', 'media/home', 'discover', 'recommendations',
+];
 
 const CACHE_TTLS = {
   'setup/check': 120000,
@@ -15,6 +36,7 @@ const CACHE_TTLS = {
   'media/collection': 3600000,
   'media/status': 60000,
   'media/resume': 300000,
+  'media/home': 60000,
   'search': 120000,
   'discover': 300000,
   'recommendations': 300000,
@@ -28,6 +50,15 @@ function getCacheTTL(path) {
   return 60000;
 }
 
+/** Cache options of a GET path: { ttl, swr, persist } */
+function cachePolicy(path) {
+  return {
+    ttl: getCacheTTL(path),
+    swr: NO_STALE.some(prefix => path.startsWith(prefix)) ? 0 : CACHE_SWR,
+    persist: PERSISTED.some(prefix => path.startsWith(prefix)),
+  };
+}
+
 export async function api(path, options = {}) {
   const res = await fetch(`/api/${path}`, {
     headers: { 'Content-Type': 'application/json', ...options.headers },
@@ -36,23 +67,144 @@ export async function api(path, options = {}) {
   return res.json();
 }
 
+/**
+ * GET through the cache (other methods go straight to api). Concurrent calls
+ * for one path share a single request; a stale answer is returned at once
+ * and refreshed in the background.
+ */
 export async function cachedApi(path, options = {}) {
   const isGet = !options.method || options.method === 'GET';
-  if (isGet) {
-    const cached = apiCache.get(path);
-    if (cached && Date.now() - cached.ts < getCacheTTL(path)) return cached.data;
-  }
-  const data = await api(path, options);
-  if (isGet) apiCache.set(path, { data, ts: Date.now() });
-  return data;
+  if (!isGet) return api(path, options);
+  return apiCache.wrap(path, cachePolicy(path), () => api(path, options));
 }
 
 export function invalidateCache(prefix) {
-  for (const key of apiCache.keys()) {
-    if (key.startsWith(prefix)) apiCache.delete(key);
-  }
+  apiCache.invalidatePrefix(prefix);
 }
 
 export function clearCache() {
-  apiCache.clear();
+  return apiCache.clear();
+}
+
+/* --- Smart Button statuses: calls made within STATUS_BATCH_DELAY are sent as one batch --- */
+
+const STATUS_BATCH_DELAY = 10;
+const STATUS_BATCH_SIZE = 100;
+const statusQueue = new Map();
+let statusTimer = null;
+
+function mediaStatusPath({ id, tmdbId, mediaType }) {
+  const p = new URLSearchParams();
+  if (id) p.set('id', id);
+  if (tmdbId) p.set('tmdbId', tmdbId);
+  p.set('mediaType', mediaType || 'movie');
+  return `media/status?${p.toString()}`;
+}
+
+async function flushMediaStatuses() {
+  statusTimer = null;
+  const pending = [...statusQueue.entries()];
+  statusQueue.clear();
+  for (let i = 0; i < pending.length; i += STATUS_BATCH_SIZE) {
+    const chunk = pending.slice(i, i + STATUS_BATCH_SIZE);
+    try {
+      const r = await api('media/status/batch', {
+        method: 'POST',
+        body: JSON.stringify({ items: chunk.map(([, entry]) => entry.tuple) }),
+      });
+      chunk.forEach(([path, entry], idx) => {
+        const data = r.statuses?.[idx] || { status: 'unknown', error: r.error };
+        if (data.status !== 'unknown') apiCache.set(path, data, cachePolicy(path));
+        entry.waiters.forEach(w => w.resolve(data));
+      });
+    } catch (err) {
+      chunk.forEach(([, entry]) => entry.waiters.forEach(w => w.reject(err)));
+    }
+  }
+}
+
+/** Smart Button status of one { id, tmdbId, mediaType } - cached, batched with the other cards on screen */
+export function mediaStatus(tuple) {
+  const path = mediaStatusPath(tuple);
+  const cached = apiCache.get(path);
+  if (cached) return Promise.resolve(cached);
+  return new Promise((resolve, reject) => {
+    const entry = statusQueue.get(path) || { tuple, waiters: [] };
+    entry.waiters.push({ resolve, reject });
+    statusQueue.set(path, entry);
+    if (!statusTimer) statusTimer = setTimeout(flushMediaStatuses, STATUS_BATCH_DELAY);
+  });
+}
+
+/* --- NDJSON streams: records are handed over as each network chunk arrives --- */
+
+/** GET an NDJSON route; onRecords(records) is called with the complete lines of every chunk read */
+export async function streamApi(path, onRecords) {
+  const res = await fetch(`/api/${path}`, { headers: { Accept: 'application/x-ndjson' } });
+  if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    const records = lines.filter(l => l.trim()).map(l => JSON.parse(l));
+    if (records.length > 0) onRecords(records);
+  }
+  if (buffer.trim()) onRecords([JSON.parse(buffer)]);
+}
+
+/**
+ * Library page streamed from media/library (format=ndjson). onItems(items, meta)
+ * is called with the rows received so far; resolves to { items, totalCount, nextCursor }.
+ * Complete pages are cached like cachedApi.
+ */
+export async function streamLibrary(query, onItems = () => {}) {
+  const path = `media/library?${query}&format=ndjson`;
+  const cached = await apiCache.lookup(path);
+  if (cached?.fresh) {
+    onItems(cached.value.items, cached.value);
+    return cached.value;
+  }
+  const page = { items: [], totalCount: 0, nextCursor: null };
+  await streamApi(path, records => {
+    for (const record of records) {
+      if (record.error) throw new Error(record.error);
+      if (record.item) page.items.push(record.item);
+      if ('totalCount' in record) page.totalCount = record.totalCount;
+      if ('nextCursor' in record) page.nextCursor = record.nextCursor;
+    }
+    onItems([...page.items], page);
+  });
+  apiCache.set(path, page, cachePolicy(path));
+  return page;
+}
+
+/**
+ * Detail page sections streamed from media/detail (format=ndjson).
+ * onSection(name, data) is called as each section arrives (failed sections are
+ * skipped); resolves to { [section]: data }. Complete answers are cached like cachedApi.
+ */
+export async function streamDetail(query, onSection = () => {}) {
+  const path = `media/detail?${query}&format=ndjson`;
+  const cached = await apiCache.lookup(path);
+  if (cached?.fresh) {
+    Object.entries(cached.value).forEach(([name, data]) => onSection(name, data));
+    return cached.value;
+  }
+  const sections = {};
+  let complete = true;
+  await streamApi(path, records => {
+    for (const record of records) {
+      if (record.error) complete = false;
+      else if (record.section) {
+        sections[record.section] = record.data;
+        onSection(record.section, record.data);
+      }
+    }
+  });
+  if (complete) apiCache.set(path, sections, cachePolicy(path));
+  return sections;
 }
@@ -0,0 +1,221 @@
+/* =================================================================
+   DagzFlix - Client-side Response Cache
+   Browser counterpart of lib/server/response-cache, used by lib/api:
+   - Per-entry TTL + stale-while-revalidate window
+   - Bounded by entry count AND approximate byte size (LRU)
+   - Identical in-flight loads share one promise
+   - Optional IndexedDB copy of selected entries: survives reloads and
+     is read by every tab of the origin (pruned to maxEntries on open)
+   - Writes and invalidations are broadcast to the other tabs
+   Responses carrying an `error` field are handed back, never cached.
+   ================================================================= */
+
+const STORE = 'entries';
+
+function estimateBytes(value) {
+  try {
+    return (JSON.stringify(value) || '').length * 2; // UTF-16 in memory
+  } catch {
+    return 1024;
+  }
+}
+
+/** Promise of an IndexedDB request's result */
+function idbResult(request) {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+export class ClientCache {
+  constructor({ maxEntries = 300, maxBytes = 8 * 1024 * 1024, persist = false, name = 'dagzflix-cache' } = {}) {
+    this.maxEntries = maxEntries;
+    this.maxBytes = maxBytes;
+    this.entries = new Map(); // key -> { value, size, expiresAt, staleUntil }, insertion order = LRU order
+    this.inflight = new Map();
+    this.bytes = 0;
+    this.generation = 0; // bumped by invalidations: loads started before one are not stored
+    this.hits = 0;
+    this.staleHits = 0;
+    this.misses = 0;
+    // Browser only: the module is evaluated during server rendering too
+    const browser = typeof window !== 'undefined';
+    this.db = browser && persist && typeof indexedDB !== 'undefined' ? this.openDb(name) : null;
+    this.channel = browser && typeof BroadcastChannel !== 'undefined' ? new BroadcastChannel(name) : null;
+    if (this.channel) this.channel.onmessage = ({ data }) => this.applyRemote(data);
+  }
+
+  /** Open the IndexedDB store and prune it; resolves to null when unavailable (private mode, quota) */
+  async openDb(name) {
+    try {
+      const request = indexedDB.open(name, 1);
+      request.onupgradeneeded = () => {
+        request.result.createObjectStore(STORE, { keyPath: 'key' }).createIndex('staleUntil', 'staleUntil');
+      };
+      const db = await idbResult(request);
+      const store = db.transaction(STORE, 'readwrite').objectStore(STORE);
+      const count = await idbResult(store.count());
+      // Oldest first: past their stale window, then beyond maxEntries
+      let excess = count - this.maxEntries;
+      const cursors = store.index('staleUntil').openCursor();
+      cursors.onsuccess = () => {
+        const cursor = cursors.result;
+        if (!cursor || (excess <= 0 && cursor.value.staleUntil > Date.now())) return;
+        cursor.delete();
+        excess--;
+        cursor.continue();
+      };
+      return db;
+    } catch {
+      return null;
+    }
+  }
+
+  /** Run fn(store) in an IndexedDB transaction; failures only cost the persisted copy */
+  async withStore(mode, fn) {
+    const db = await this.db;
+    if (!db) return undefined;
+    try {
+      return await fn(db.transaction(STORE, mode).objectStore(STORE));
+    } catch {
+      return undefined;
+    }
+  }
+
+  /** Memory lookup: { value, fresh } or null when absent or past its stale window */
+  peek(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return null;
+    const now = Date.now();
+    if (now > entry.staleUntil) {
+      this.delete(key);
+      return null;
+    }
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return { value: entry.value, fresh: now <= entry.expiresAt };
+  }
+
+  /** Fresh value from memory, or undefined */
+  get(key) {
+    const hit = this.peek(key);
+    return hit?.fresh ? hit.value : undefined;
+  }
+
+  /** Memory, then the persisted copy (kept in memory once read): { value, fresh } or null */
+  async lookup(key) {
+    const hit = this.peek(key);
+    if (hit || !this.db) return hit;
+    const generation = this.generation;
+    const entry = await this.withStore('readonly', store => idbResult(store.get(key)));
+    if (!entry || Date.now() > entry.staleUntil || this.entries.has(key) || generation !== this.generation) return this.peek(key);
+    this.remember(key, entry);
+    return this.peek(key);
+  }
+
+  remember(key, { value, size, expiresAt, staleUntil }) {
+    this.delete(key);
+    if (size > this.maxBytes) return;
+    this.entries.set(key, { value, size, expiresAt, staleUntil });
+    this.bytes += size;
+    for (const oldKey of this.entries.keys()) {
+      if (this.entries.size <= this.maxEntries && this.bytes <= this.maxBytes) break;
+      this.delete(oldKey);
+    }
+  }
+
+  set(key, value, { ttl = 60000, swr = 0, persist = false } = {}) {
+    if (value?.error) return value;
+    const now = Date.now();
+    const entry = { value, size: estimateBytes(value) + key.length * 2, expiresAt: now + ttl, staleUntil: now + ttl + swr };
+    this.remember(key, entry);
+    if (persist) this.withStore('readwrite', store => idbResult(store.put({ key, ...entry })));
+    this.broadcast({ type: 'set', key, entry });
+    return value;
+  }
+
+  delete(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+    this.entries.delete(key);
+    this.bytes -= entry.size;
+    return true;
+  }
+
+  /**
+   * Return the cached value for key, or load it.
+   * Fresh hit -> cached value. Stale hit (within swr) -> cached value + background refresh.
+   * Miss -> await loader(); concurrent misses for the same key share one load.
+   */
+  async wrap(key, options, loader) {
+    const hit = await this.lookup(key);
+    if (hit?.fresh) {
+      this.hits++;
+      return hit.value;
+    }
+    if (hit) {
+      this.staleHits++;
+      this.load(key, options, loader).catch(() => { /* keep serving stale */ });
+      return hit.value;
+    }
+    this.misses++;
+    return this.load(key, options, loader);
+  }
+
+  load(key, options, loader) {
+    if (this.inflight.has(key)) return this.inflight.get(key);
+    const generation = this.generation;
+    const promise = Promise.resolve()
+      .then(loader)
+      .then(value => (generation === this.generation ? this.set(key, value, options) : value))
+      .finally(() => this.inflight.delete(key));
+    this.inflight.set(key, promise);
+    return promise;
+  }
+
+  /** Drop every entry whose key starts with prefix, here, in IndexedDB and in the other tabs */
+  invalidatePrefix(prefix, { remote = false } = {}) {
+    this.generation++;
+    for (const key of [...this.entries.keys()]) {
+      if (key.startsWith(prefix)) this.delete(key);
+    }
+    if (remote) return;
+    this.withStore('readwrite', store => idbResult(store.delete(IDBKeyRange.bound(prefix, `${prefix}\uffff`))));
+    this.broadcast({ type: 'invalidate', prefix });
+  }
+
+  /** Drop everything; resolves once the persisted copy is gone too (await it before a reload) */
+  clear({ remote = false } = {}) {
+    this.generation++;
+    this.entries.clear();
+    this.bytes = 0;
+    if (remote) return Promise.resolve();
+    this.broadcast({ type: 'clear' });
+    return this.withStore('readwrite', store => idbResult(store.clear()));
+  }
+
+  broadcast(message) {
+    try {
+      this.channel?.postMessage(message);
+    } catch { /* value not cloneable: the other tabs load it themselves */ }
+  }
+
+  /** Message from another tab: mirror it in memory (it already updated IndexedDB) */
+  applyRemote(message) {
+    if (message.type === 'set') this.remember(message.key, message.entry);
+    else if (message.type === 'invalidate') this.invalidatePrefix(message.prefix, { remote: true });
+    else if (message.type === 'clear') this.clear({ remote: true });
+  }
+
+  stats() {
+    return {
+      entries: this.entries.size,
+      bytes: this.bytes,
+      hits: this.hits,
+      staleHits: this.staleHits,
+      misses: this.misses,
+      inflight: this.inflight.size,
+    };
+  }
+}
@@ -0,0 +1,112 @@
+/* =================================================================
+   DagzFlix - Image URLs and responsive variants
+   Shared by the BFF (URLs put in API answers, width snapping in the
+   image proxies) and the components (srcSet / sizes, placeholders).
+   - Widths snap up to IMAGE_WIDTH_BUCKETS (TMDB: to its published
+     sizes): every card asking for ~200px lands on the same cached file
+   - Components build a srcSet from the URL an API answer carries, and
+     the browser picks the width its layout and pixel density need
+   - Placeholders: a tiny blurred variant painted behind the image
+   ================================================================= */
+
+export const IMAGE_WIDTH_BUCKETS = [120, 240, 360, 480, 720, 960, 1280, 1920];
+export const PLACEHOLDER_WIDTH = 32;
+
+// TMDB only serves these widths (image.tmdb.org configuration)
+const TMDB_WIDTHS = {
+  poster: [92, 154, 185, 342, 500, 780],
+  backdrop: [300, 780, 1280],
+};
+
+// Width of the default `src` per Jellyfin image type
+const DEFAULT_WIDTHS = { Primary: 480, Thumb: 720, Backdrop: 1280 };
+
+// Layouts: candidate widths and the CSS width they are displayed at
+export const IMAGE_LAYOUTS = {
+  card: { widths: [240, 360, 480], sizes: '(min-width: 768px) 185px, 160px' },
+  cardLarge: { widths: [240, 360, 480, 720], sizes: '(min-width: 768px) 260px, 220px' },
+  grid: { widths: [240, 360, 480], sizes: '(min-width: 1024px) 16vw, (min-width: 640px) 33vw, 50vw' },
+  poster: { widths: [240, 360, 480, 720], sizes: '(min-width: 768px) 224px, 192px' },
+  thumb: { widths: [240, 360, 480], sizes: '160px' },
+  backdrop: { widths: [720, 960, 1280, 1920], sizes: '100vw' },
+};
+
+/** Smallest bucket at least `width` wide (the largest one beyond), or null for no width */
+export function snapWidth(width, buckets = IMAGE_WIDTH_BUCKETS) {
+  const n = parseInt(width);
+  if (!n || n <= 0) return null;
+  return buckets.find(b => b >= n) || buckets[buckets.length - 1];
+}
+
+/** TMDB size name (w342...) for a width ('w400', 400) and image kind; 'original' is not served */
+export function tmdbSize(width, kind = 'poster') {
+  const widths = TMDB_WIDTHS[kind] || TMDB_WIDTHS.poster;
+  return `w${snapWidth(String(width ?? '').replace(/^w/, ''), widths) || widths[widths.length - 1]}`;
+}
+
+/** Proxied Jellyfin image */
+export function jellyfinImageUrl(itemId, type = 'Primary', width = DEFAULT_WIDTHS[type] || 480) {
+  return `/api/proxy/image?itemId=${itemId}&type=${type}&maxWidth=${snapWidth(width)}`;
+}
+
+/** Proxied TMDB image ('' without a path) */
+export function tmdbImageUrl(path, kind = 'poster', width = kind === 'backdrop' ? 1280 : 500) {
+  return path ? `/api/proxy/tmdb?path=${path}&kind=${kind}&width=${tmdbSize(width, kind)}` : '';
+}
+
+/** [url, width] of a proxied image at another width; null for other URLs */
+function variant(url, width) {
+  const [base, query = ''] = url.split('?');
+  const params = new URLSearchParams(query);
+  if (base.endsWith('/api/proxy/image')) {
+    const snapped = snapWidth(width);
+    params.set('maxWidth', snapped);
+    return [`${base}?${params}`, snapped];
+  }
+  if (base.endsWith('/api/proxy/tmdb')) {
+    const size = tmdbSize(width, params.get('kind') || 'poster');
+    params.set('width', size);
+    return [`${base}?${params}`, parseInt(size.slice(1))];
+  }
+  return null;
+}
+
+/** srcSet of a proxied image over the given widths (undefined for other URLs) */
+export function imageSrcSet(url, widths) {
+  if (!url) return undefined;
+  const variants = new Map();
+  for (const width of widths) {
+    const found = variant(url, width);
+    if (!found) return undefined;
+    variants.set(found[0], found[1]);
+  }
+  return [...variants].map(([href, w]) => `${href} ${w}w`).join(', ');
+}
+
+/** Tiny blurred variant of a proxied image, or null */
+export function placeholderUrl(url) {
+  if (!url) return null;
+  const [base, query = ''] = url.split('?');
+  const params = new URLSearchParams(query);
+  if (base.endsWith('/api/proxy/image')) {
+    params.set('placeholder', '1');
+    params.delete('maxWidth');
+    return `${base}?${params}`;
+  }
+  return variant(url, PLACEHOLDER_WIDTH)?.[0] || null;
+}
+
+/**
+ * Props of an <img> for a proxied image shown in one of IMAGE_LAYOUTS:
+ * src, srcSet, sizes and the placeholder painted behind it.
+ */
+export function responsiveImage(url, layout = 'card') {
+  const { widths, sizes } = IMAGE_LAYOUTS[layout];
+  const srcSet = imageSrcSet(url, widths);
+  const placeholder = placeholderUrl(url);
+  return {
+    src: url,
+    ...(srcSet ? { srcSet, sizes } : {}),
+    ...(placeholder ? { style: { backgroundImage: `url("${placeholder}")`, backgroundSize: 'cover', backgroundPosition: 'center' } } : {}),
+  };
+}
@@ -0,0 +1,165 @@
+/* =================================================================
+   DagzFlix - Upstream admission control
+   Every upstream call (lib/server/upstream) takes a connection slot of
+   its origin through an AdmissionQueue. Calls belong to a priority
+   class, by rank:
+   - playback     stream / PlaybackInfo, progress reports, HLS proxy
+   - interactive  every other user-facing route
+   - image        poster and backdrop proxies
+   - background   work outside any request: prefetches, catalog and
+                  discover refreshes, home feed rebuilds
+   A class only starts a call while the origin's active calls are below
+   its share of the cap, so the last slots stay free for the classes
+   above it; freed slots go to the highest-ranked waiter. Image and
+   background queues are bounded: beyond their length (or, for images,
+   after UPSTREAM_IMAGE_MAX_WAIT_MS in the queue) calls fail at once with
+   UpstreamOverloadedError, answered 503 + Retry-After by the proxies.
+   The class comes from withPriority(), else the current request's route
+   (lib/server/metrics), else background.
+   ================================================================= */
+
+import { AsyncLocalStorage } from 'async_hooks';
+import { currentRoute } from '@/lib/server/metrics';
+
+const RETRY_AFTER_S = parseInt(process.env.UPSTREAM_SHED_RETRY_AFTER_S || '2');
+
+export const PRIORITY_CLASSES = {
+  playback: { rank: 0, share: 1, queue: Infinity, maxWait: 0 },
+  interactive: { rank: 1, share: 0.75, queue: Infinity, maxWait: 0 },
+  image: {
+    rank: 2,
+    share: 0.5,
+    queue: parseInt(process.env.UPSTREAM_IMAGE_QUEUE || '64'),
+    maxWait: parseInt(process.env.UPSTREAM_IMAGE_MAX_WAIT_MS || '5000'),
+  },
+  background: { rank: 3, share: 0.25, queue: parseInt(process.env.UPSTREAM_BACKGROUND_QUEUE || '32'), maxWait: 0 },
+};
+const CLASS_ORDER = Object.keys(PRIORITY_CLASSES).sort((a, b) => PRIORITY_CLASSES[a].rank - PRIORITY_CLASSES[b].rank);
+
+// Route (as named by beginRequestTiming) -> class; unlisted routes are interactive
+const ROUTE_PRIORITIES = [
+  [/^(media\/stream|media\/progress|hls\/)/, 'playback'],
+  [/^proxy\//, 'image'],
+  [/^catalog\/sync$/, 'background'],
+];
+
+const priorityStorage = globalThis.__dagzflixPriority || (globalThis.__dagzflixPriority = new AsyncLocalStorage());
+
+/** Raised without queueing when a low-priority class is over its queue limit or wait */
+export class UpstreamOverloadedError extends Error {
+  constructor(origin, priority) {
+    super(`${origin} busy (${priority} calls shed)`);
+    this.name = 'UpstreamOverloadedError';
+    this.code = 'UPSTREAM_OVERLOADED';
+    this.retryAfter = RETRY_AFTER_S;
+  }
+}
+
+/** Run fn with its upstream calls (and the work it starts) in the given class */
+export function withPriority(priority, fn) {
+  return priorityStorage.run(priority, fn);
+}
+
+/** Class of the upstream calls made now */
+export function currentPriority() {
+  const explicit = priorityStorage.getStore();
+  if (explicit) return explicit;
+  const route = currentRoute();
+  if (!route) return 'background';
+  return ROUTE_PRIORITIES.find(([pattern]) => pattern.test(route))?.[1] || 'interactive';
+}
+
+export class AdmissionQueue {
+  constructor(origin, capacity) {
+    this.origin = origin;
+    this.capacity = capacity;
+    this.active = 0;
+    this.activeBy = Object.fromEntries(CLASS_ORDER.map(name => [name, 0]));
+    this.waiting = Object.fromEntries(CLASS_ORDER.map(name => [name, []]));
+    this.shed = Object.fromEntries(CLASS_ORDER.map(name => [name, 0]));
+  }
+
+  /** Calls a class may have running in total (its own and the higher classes') before it waits */
+  limit(priority) {
+    return Math.max(1, Math.floor(this.capacity * PRIORITY_CLASSES[priority].share));
+  }
+
+  /** Higher classes waiting: a slot freed now is theirs */
+  outranked(priority) {
+    return CLASS_ORDER.some(name => PRIORITY_CLASSES[name].rank < PRIORITY_CLASSES[priority].rank && this.waiting[name].length);
+  }
+
+  start(priority) {
+    this.active++;
+    this.activeBy[priority]++;
+  }
+
+  /** Resolve once a slot is granted; rejects on abort, overflow or the class's max wait */
+  acquire(priority, signal) {
+    const cls = PRIORITY_CLASSES[priority];
+    if (this.active < this.limit(priority) && !this.outranked(priority) && !this.waiting[priority].length) {
+      this.start(priority);
+      return Promise.resolve();
+    }
+    const queue = this.waiting[priority];
+    if (queue.length >= cls.queue) {
+      this.shed[priority]++;
+      return Promise.reject(new UpstreamOverloadedError(this.origin, priority));
+    }
+    return new Promise((resolve, reject) => {
+      const cleanup = () => {
+        signal.removeEventListener('abort', onAbort);
+        clearTimeout(timer);
+      };
+      const leave = err => {
+        const idx = queue.indexOf(waiter);
+        if (idx >= 0) queue.splice(idx, 1);
+        cleanup();
+        reject(err);
+      };
+      const onAbort = () => leave(signal.reason);
+      const waiter = () => {
+        cleanup();
+        this.start(priority);
+        resolve();
+      };
+      const timer = cls.maxWait ? setTimeout(() => {
+        this.shed[priority]++;
+        leave(new UpstreamOverloadedError(this.origin, priority));
+      }, cls.maxWait) : null;
+      signal.addEventListener('abort', onAbort, { once: true });
+      queue.push(waiter);
+    });
+  }
+
+  /** Give a slot back and start the waiters it lets through, highest class first */
+  release(priority) {
+    this.active--;
+    this.activeBy[priority]--;
+    for (const name of CLASS_ORDER) {
+      const queue = this.waiting[name];
+      while (queue.length && this.active < this.limit(name)) queue.shift()();
+      if (queue.length) return; // lower classes wait behind this one
+    }
+  }
+
+  /** Run fn holding a slot of the given class */
+  async run(priority, signal, fn) {
+    await this.acquire(priority, signal);
+    try {
+      return await fn();
+    } finally {
+      this.release(priority);
+    }
+  }
+
+  stats() {
+    return {
+      capacity: this.capacity,
+      active: this.active,
+      activeBy: { ...this.activeBy },
+      queuedBy: Object.fromEntries(CLASS_ORDER.map(name => [name, this.waiting[name].length])),
+      shedBy: { ...this.shed },
+    };
+  }
+}
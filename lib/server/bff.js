@@ -0,0 +1,146 @@
+/* =================================================================
+   DagzFlix - BFF shared plumbing
+   MongoDB singleton, JSON/CORS response, session + config lookup and
+   the Jellyfin auth header. Shared by the catch-all API route and the
+   dedicated App Router endpoints under app/api/.
+
+   Session, config and preferences documents are read on nearly every
+   call: they are kept in a short-TTL in-process cache, invalidated by
+   the handlers that write them. The cache is shared by every route
+   bundle of the process; other BFF processes see a change after at
+   most one TTL.
+
+   Lookups that reach MongoDB count as the request's `mongo` phase and
+   jsonResponse closes the request timing (lib/server/metrics).
+   ================================================================= */
+
+import { NextResponse } from 'next/server';
+import { MongoClient } from 'mongodb';
+import { ResponseCache } from '@/lib/server/response-cache';
+import { timePhase, finishRequestTiming } from '@/lib/server/metrics';
+
+const MONGO_URL = process.env.MONGO_URL;
+const DB_NAME = process.env.DB_NAME || 'dagzflix';
+// Connections the driver keeps open even when idle (opened at warm-up, lib/server/warmup)
+const MONGO_MIN_POOL_SIZE = parseInt(process.env.MONGO_MIN_POOL_SIZE || '2');
+
+// Lookup TTLs (ms)
+const SESSION_TTL = parseInt(process.env.SESSION_CACHE_TTL_MS || '30000');
+const CONFIG_TTL = parseInt(process.env.CONFIG_CACHE_TTL_MS || '60000');
+const PREFERENCES_TTL = parseInt(process.env.PREFERENCES_CACHE_TTL_MS || '30000');
+
+// One lookup cache per process: App Router routes are bundled separately, and a
+// logout or setup save handled by the catch-all must reach every route's lookups
+const lookupCache = globalThis.__dagzflixLookups
+  || (globalThis.__dagzflixLookups = new ResponseCache({ maxEntries: 10000, maxBytes: 16 * 1024 * 1024 }));
+
+// --- MongoDB Connection Singleton ---
+// One client per process (on globalThis): the pool opened at warm-up serves every route bundle
+const mongo = globalThis.__dagzflixMongo || (globalThis.__dagzflixMongo = { client: null, connecting: null, db: null });
+
+export async function getDb() {
+  if (mongo.db) return mongo.db;
+  try {
+    if (!mongo.client) {
+      mongo.client = new MongoClient(MONGO_URL, { minPoolSize: MONGO_MIN_POOL_SIZE });
+      mongo.connecting = mongo.client.connect();
+    }
+    await mongo.connecting;
+    if (!mongo.db) {
+      mongo.db = mongo.client.db(DB_NAME);
+      ensureIndexes(mongo.db);
+    }
+    return mongo.db;
+  } catch (err) {
+    mongo.client = null;
+    mongo.connecting = null;
+    console.error('[DagzFlix] MongoDB connection error:', err.message);
+    throw new Error('Database connection failed');
+  }
+}
+
+/** Startup indexes: expired sessions are removed by MongoDB itself (TTL index), preferences are looked up by userId */
+function ensureIndexes(db) {
+  Promise.all([
+    db.collection('sessions').createIndex({ expiresAt: 1 }, { expireAfterSeconds: 0 }),
+    db.collection('preferences').createIndex({ userId: 1 }),
+  ]).catch(err => console.error('[DagzFlix] Index creation error:', err.message));
+}
+
+export const CORS_HEADERS = {
+  'Access-Control-Allow-Origin': '*',
+  'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+  'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+};
+
+// --- Helper: JSON response with CORS (+ Server-Timing) ---
+export function jsonResponse(data, status = 200, headers = {}) {
+  const response = timePhase('serialize', () => NextResponse.json(data, { status, headers: { ...CORS_HEADERS, ...headers } }));
+  return finishRequestTiming(response);
+}
+
+// Upstream calls refused without being sent: open circuit (lib/server/upstream), shed class (lib/server/admission)
+const REFUSED_CODES = new Set(['CIRCUIT_OPEN', 'UPSTREAM_OVERLOADED']);
+
+/**
+ * Error answer of a handler: data + `error`, with `status` (500 by default),
+ * or 503 + Retry-After when upstream was not even called (fail fast).
+ */
+export function errorResponse(err, data = {}, status = 500) {
+  const body = { ...data, error: err.message };
+  if (!REFUSED_CODES.has(err?.code)) return jsonResponse(body, status);
+  return jsonResponse(body, 503, { 'Retry-After': String(err.retryAfter || 1) });
+}
+
+// --- Helper: Get session from cookie ---
+// Expired documents are left to the TTL index instead of being deleted here;
+// expiresAt is checked on cached copies too, which may outlive the session
+export async function getSession(req) {
+  const sessionId = req.cookies.get('dagzflix_session')?.value;
+  if (!sessionId) return null;
+  const session = await lookupCache.wrap(`session|${sessionId}`, { ttl: SESSION_TTL }, () => timePhase('mongo', async () => {
+    const db = await getDb();
+    return db.collection('sessions').findOne({ _id: sessionId });
+  }));
+  if (!session) return null;
+  if (new Date(session.expiresAt) < new Date()) {
+    lookupCache.delete(`session|${sessionId}`);
+    return null;
+  }
+  return session;
+}
+
+// --- Helper: Get server configuration ---
+export async function getConfig() {
+  return lookupCache.wrap('config|main', { ttl: CONFIG_TTL }, () => timePhase('mongo', async () => {
+    const db = await getDb();
+    return db.collection('config').findOne({ _id: 'main' });
+  }));
+}
+
+// --- Helper: Get a user's preferences document (null when none) ---
+export async function getPreferences(userId) {
+  return lookupCache.wrap(`prefs|${userId}`, { ttl: PREFERENCES_TTL }, () => timePhase('mongo', async () => {
+    const db = await getDb();
+    return db.collection('preferences').findOne({ userId });
+  }));
+}
+
+// --- Cache invalidation, called after writes ---
+export function invalidateSession(sessionId) {
+  lookupCache.delete(`session|${sessionId}`);
+}
+
+export function invalidateConfig() {
+  lookupCache.delete('config|main');
+}
+
+export function invalidatePreferences(userId) {
+  lookupCache.delete(`prefs|${userId}`);
+}
+
+// --- Helper: Build Jellyfin auth header ---
+export function jellyfinAuthHeader(token) {
+  const base = 'MediaBrowser Client="DagzFlix", Device="Web", DeviceId="dagzflix-web", Version="1.0"';
+  return token ? `${base}, Token="${token}"` : base;
+}
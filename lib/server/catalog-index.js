@@ -0,0 +1,250 @@
+/* =================================================================
+   DagzFlix - Catalog Index
+   Full copy of the Jellyfin Movie/Series catalog kept in MongoDB
+   (collection `catalog`, sync bookkeeping in `catalog_state`).
+   - Incremental sync: only items saved since the last run (MinDateLastSaved)
+   - Periodic full sync: re-reads everything and drops deleted items
+   - Background refresher: one timer per BFF process
+   - In-memory snapshot of the index, reloaded when a sync lands
+   Recommendations, genres and the search index (lib/server/search-index)
+   read from here instead of sampling Jellyfin on every request.
+   ================================================================= */
+
+import { upstreamJson } from '@/lib/server/upstream';
+
+export const CATALOG_SYNC_INTERVAL_MS = parseInt(process.env.CATALOG_SYNC_INTERVAL_MS || '900000');
+export const CATALOG_FULL_SYNC_INTERVAL_MS = parseInt(process.env.CATALOG_FULL_SYNC_INTERVAL_MS || '86400000');
+
+const PAGE_SIZE = 1000;
+const PAGE_TIMEOUT = 60000;
+// MinDateLastSaved overlap, absorbs clock skew between Jellyfin and the BFF
+const SYNC_OVERLAP_MS = 5 * 60 * 1000;
+// How often a request re-reads catalog_state to notice syncs made by another process
+const STATE_CHECK_MS = 30000;
+const SYNC_FIELDS = 'Overview,Genres,ProviderIds,DateCreated,PremiereDate,CommunityRating';
+
+const EMPTY_SNAPSHOT = { version: null, checkedAt: 0, items: null, genres: null };
+
+// One copy per process: App Router routes are bundled separately, and the
+// snapshot loaded at warm-up (lib/server/warmup) must be the one they read
+const store = globalThis.__dagzflixCatalog || (globalThis.__dagzflixCatalog = {
+  indexesReady: null,
+  runningSync: null,
+  refresherTimer: null,
+  snapshot: { ...EMPTY_SNAPSHOT },
+});
+
+/** Create the catalog indexes once per process */
+export function ensureCatalogIndexes(db) {
+  if (!store.indexesReady) {
+    store.indexesReady = Promise.all([
+      db.collection('catalog').createIndex({ type: 1 }),
+      db.collection('catalog').createIndex({ syncId: 1 }),
+      db.collection('catalog').createIndex({ tmdbId: 1 }),
+    ]).catch(err => {
+      store.indexesReady = null;
+      throw err;
+    });
+  }
+  return store.indexesReady;
+}
+
+/** Map a Jellyfin item to its catalog document */
+function toCatalogDoc(item, syncId) {
+  return {
+    name: item.Name || '',
+    nameLower: (item.Name || '').toLowerCase(),
+    type: item.Type,
+    overview: item.Overview || '',
+    genres: item.Genres || [],
+    genreItems: (item.GenreItems || []).map(g => ({ id: g.Id, name: g.Name })),
+    communityRating: item.CommunityRating || 0,
+    year: item.ProductionYear || '',
+    premiereDate: item.PremiereDate || null,
+    dateCreated: item.DateCreated || null,
+    tmdbId: item.ProviderIds?.Tmdb || null,
+    syncId,
+  };
+}
+
+/**
+ * Sync the catalog from Jellyfin.
+ * Uses the server API key; `auth` ({ token, userId }) lets a request-triggered
+ * sync read through a user's session when no API key is configured.
+ * Concurrent calls in the same process share the running sync.
+ */
+export function syncCatalog(db, config, { full = false, auth = null } = {}) {
+  if (!store.runningSync) {
+    store.runningSync = runSync(db, config, { full, auth }).finally(() => { store.runningSync = null; });
+  }
+  return store.runningSync;
+}
+
+async function runSync(db, config, { full, auth }) {
+  const token = config.jellyfinApiKey || auth?.token;
+  if (!config?.jellyfinUrl || !token) throw new Error('Aucune cle API Jellyfin pour indexer le catalogue');
+  await ensureCatalogIndexes(db);
+
+  const stateCol = db.collection('catalog_state');
+  const state = await stateCol.findOne({ _id: 'catalog' });
+  const startedAt = new Date();
+  const lastFull = state?.lastFullSyncAt ? new Date(state.lastFullSyncAt).getTime() : 0;
+  const mode = full || !state?.lastSyncStartedAt || startedAt - lastFull > CATALOG_FULL_SYNC_INTERVAL_MS ? 'full' : 'incremental';
+  const syncId = startedAt.getTime();
+  await stateCol.updateOne({ _id: 'catalog' }, { $set: { status: 'running', runningSince: startedAt } }, { upsert: true });
+
+  const base = config.jellyfinApiKey
+    ? `${config.jellyfinUrl}/Items`
+    : `${config.jellyfinUrl}/Users/${auth.userId}/Items`;
+  const params = new URLSearchParams({
+    Recursive: 'true',
+    IncludeItemTypes: 'Movie,Series',
+    Fields: SYNC_FIELDS,
+    SortBy: 'SortName',
+    EnableImages: 'false',
+    EnableUserData: 'false',
+    Limit: String(PAGE_SIZE),
+  });
+  if (mode === 'incremental') {
+    params.set('MinDateLastSaved', new Date(new Date(state.lastSyncStartedAt).getTime() - SYNC_OVERLAP_MS).toISOString());
+  }
+
+  try {
+    let changed = 0;
+    for (let start = 0; ; start += PAGE_SIZE) {
+      params.set('StartIndex', String(start));
+      const data = await upstreamJson(
+        `${base}?${params}`,
+        { headers: { 'X-Emby-Token': token }, service: 'Jellyfin' },
+        { budget: PAGE_TIMEOUT }
+      );
+      const page = data.Items || [];
+      if (page.length > 0) {
+        await db.collection('catalog').bulkWrite(page.map(item => ({
+          updateOne: { filter: { _id: item.Id }, update: { $set: toCatalogDoc(item, syncId) }, upsert: true },
+        })), { ordered: false });
+        changed += page.length;
+      }
+      if (page.length < PAGE_SIZE) break;
+    }
+
+    let removed = 0;
+    if (mode === 'full') {
+      removed = (await db.collection('catalog').deleteMany({ syncId: { $ne: syncId } })).deletedCount;
+    }
+
+    const finishedAt = new Date();
+    const result = {
+      status: 'idle',
+      lastSyncMode: mode,
+      lastSyncStartedAt: startedAt,
+      lastSyncAt: finishedAt,
+      lastSyncDurationMs: finishedAt - startedAt,
+      lastSyncChanged: changed,
+      lastSyncRemoved: removed,
+      itemCount: await db.collection('catalog').countDocuments(),
+      lastError: null,
+    };
+    if (mode === 'full') result.lastFullSyncAt = finishedAt;
+    await stateCol.updateOne({ _id: 'catalog' }, { $set: result, $unset: { runningSince: '' } });
+    store.snapshot.checkedAt = 0; // reload on next read
+    return result;
+  } catch (err) {
+    await stateCol.updateOne(
+      { _id: 'catalog' },
+      { $set: { status: 'error', lastError: err.message, lastErrorAt: new Date() }, $unset: { runningSince: '' } }
+    );
+    throw err;
+  }
+}
+
+/** Sync bookkeeping for the status endpoint */
+export async function getCatalogStatus(db) {
+  const state = await db.collection('catalog_state').findOne({ _id: 'catalog' });
+  return {
+    ready: !!state?.lastFullSyncAt,
+    running: !!store.runningSync || state?.status === 'running',
+    status: state?.status || 'never',
+    itemCount: state?.itemCount || 0,
+    lastSyncMode: state?.lastSyncMode || null,
+    lastSyncAt: state?.lastSyncAt || null,
+    lastFullSyncAt: state?.lastFullSyncAt || null,
+    lastSyncDurationMs: state?.lastSyncDurationMs ?? null,
+    lastSyncChanged: state?.lastSyncChanged ?? null,
+    lastSyncRemoved: state?.lastSyncRemoved ?? null,
+    lastError: state?.lastError || null,
+    refresher: !!store.refresherTimer,
+    intervalMs: CATALOG_SYNC_INTERVAL_MS,
+  };
+}
+
+/** True when the last successful sync is older than the refresh interval */
+export function isCatalogStale(status) {
+  return !status.lastSyncAt || Date.now() - new Date(status.lastSyncAt).getTime() > CATALOG_SYNC_INTERVAL_MS;
+}
+
+/**
+ * In-memory snapshot of the whole index (null until a full sync completed).
+ * catalog_state is re-checked at most every STATE_CHECK_MS; the documents are
+ * only reloaded when a sync changed them.
+ */
+export async function getCatalogSnapshot(db) {
+  const now = Date.now();
+  if (store.snapshot.items && now - store.snapshot.checkedAt < STATE_CHECK_MS) return store.snapshot;
+
+  const state = await db.collection('catalog_state').findOne(
+    { _id: 'catalog' },
+    { projection: { lastSyncAt: 1, lastFullSyncAt: 1, itemCount: 1 } }
+  );
+  if (!state?.lastFullSyncAt) return null;
+  const version = `${new Date(state.lastSyncAt).getTime()}:${state.itemCount}`;
+  if (store.snapshot.version !== version) {
+    const items = await db.collection('catalog')
+      .find({}, { projection: { syncId: 0, nameLower: 0 } })
+      .toArray();
+    store.snapshot = { version, checkedAt: now, items, genres: null };
+  } else {
+    store.snapshot.checkedAt = now;
+  }
+  return store.snapshot;
+}
+
+/** Distinct genres of the indexed catalog ({ id, name }, sorted by name) */
+export function catalogGenres(snap) {
+  if (!snap.genres) {
+    const byName = new Map();
+    for (const item of snap.items) {
+      for (const g of item.genreItems || []) if (!byName.has(g.name)) byName.set(g.name, g);
+    }
+    snap.genres = [...byName.values()].sort((a, b) => a.name.localeCompare(b.name));
+  }
+  return snap.genres;
+}
+
+/**
+ * Start the background refresher (idempotent). `loadContext` resolves the
+ * current { db, config } on every tick so setup changes are picked up.
+ * Ticks without an API key are skipped: request-triggered syncs cover them.
+ */
+export function startCatalogRefresher(loadContext, intervalMs = CATALOG_SYNC_INTERVAL_MS) {
+  if (store.refresherTimer || intervalMs <= 0) return;
+  const tick = async () => {
+    try {
+      const { db, config } = await loadContext();
+      if (!config?.jellyfinUrl || !config.jellyfinApiKey) return;
+      await syncCatalog(db, config);
+    } catch (err) {
+      console.error('[DagzFlix] Catalog sync error:', err.message);
+    }
+  };
+  store.refresherTimer = setInterval(tick, intervalMs);
+  store.refresherTimer.unref?.();
+  tick();
+}
+
+/** Forget the in-memory snapshot (setup changed: the index belongs to another server) */
+export async function resetCatalog(db) {
+  store.snapshot = { ...EMPTY_SNAPSHOT };
+  await db.collection('catalog').deleteMany({});
+  await db.collection('catalog_state').deleteOne({ _id: 'catalog' });
+}
@@ -0,0 +1,320 @@
+/* =================================================================
+   DagzFlix - DAGZRANK Recommendation Algorithm
+   Served by /api/recommendations and the `picks` row of the home feed.
+   
+   BUG 4 FIX: Now compatible with both Jellyfin (Genres: string[])
+   and TMDB (genreIds: number[]) objects via resolveGenres().
+   
+   Scoring system (0-100 per media):
+   - Genre Match (0-40pts): Based on user's favorite/disliked genres
+   - Watch History Affinity (0-25pts): Genres/patterns from viewing history
+   - Community Score (0-20pts): TMDB rating normalized
+   - Freshness Bonus (0-10pts): Recent content gets bonus
+   - Already Watched Penalty: -100 (excluded)
+   ================================================================= */
+
+import { getDb, getPreferences, invalidatePreferences } from '@/lib/server/bff';
+import { timePhase } from '@/lib/server/metrics';
+import { getDiscoverPage } from '@/lib/server/discover-store';
+import {
+  catalogForSession, getPlayedIds, ensureDiscoverRefresher, resolveGenres, fetchJsonWithin,
+} from '@/lib/server/library';
+import { jellyfinImageUrl, tmdbImageUrl } from '@/lib/images';
+
+// Per-source deadline budgets (ms): a slow source is skipped instead of blocking the whole response
+export const RECO_SOURCE_BUDGETS = {
+  history: parseInt(process.env.RECO_BUDGET_HISTORY_MS || '8000'),
+  jellyfin: parseInt(process.env.RECO_BUDGET_JELLYFIN_MS || '10000'),
+  jellyseerr: parseInt(process.env.RECO_BUDGET_JELLYSEERR_MS || '6000'),
+};
+
+// Best-scored local items kept from the catalog index before fusion with Jellyseerr
+const RECO_CATALOG_POOL = 200;
+
+// Number of most recently played items feeding the watch-history affinity
+const DAGZ_HISTORY_WINDOW = 100;
+// Persisted profiles are rebuilt from Jellyfin after this age (catches plays made outside DagzFlix)
+const DAGZ_PROFILE_MAX_AGE = 24 * 60 * 60 * 1000;
+
+/**
+ * Compile a user's DagzRank profile once per request: lowercase genre sets,
+ * normalized history affinity weights (0-25 per genre) and the current year.
+ * Scoring an item then costs one lookup per genre instead of a history scan.
+ */
+function compileDagzProfile(preferences, history) {
+  const counts = new Map();
+  (history || []).forEach(h => {
+    (h.genres || []).forEach(g => {
+      const key = g.toLowerCase();
+      counts.set(key, (counts.get(key) || 0) + 1);
+    });
+  });
+  const maxCount = Math.max(...counts.values(), 1);
+  const affinity = new Map();
+  for (const [genre, count] of counts) affinity.set(genre, (count / maxCount) * 25);
+
+  const favorite = new Set((preferences?.favoriteGenres || []).map(g => g.toLowerCase()));
+  return {
+    favorite,
+    disliked: new Set((preferences?.dislikedGenres || []).map(g => g.toLowerCase())),
+    hasFavorites: favorite.size > 0,
+    hasHistory: (history || []).length > 0,
+    affinity,
+    currentYear: new Date().getFullYear(),
+  };
+}
+
+/** Score one item (0-100) against a compiled profile */
+function scoreDagzRank(item, profile) {
+  let score = 0;
+  // BUG 4 FIX: Use resolveGenres to handle both Jellyfin and TMDB formats
+  const itemGenres = resolveGenres(item).map(g => g.toLowerCase());
+
+  // 1. Genre Match Score (0-40)
+  if (itemGenres.length > 0 && profile.hasFavorites) {
+    let matchCount = 0;
+    let dislikeCount = 0;
+    for (const g of itemGenres) {
+      if (profile.favorite.has(g)) matchCount++;
+      if (profile.disliked.has(g)) dislikeCount++;
+    }
+    const genreScore = (matchCount / itemGenres.length) * 40;
+    const dislikePenalty = (dislikeCount / itemGenres.length) * 20;
+    score += Math.max(0, genreScore - dislikePenalty);
+  } else {
+    score += 15; // Default score for items with no genre data
+  }
+
+  // 2. Watch History Affinity (0-25)
+  if (profile.hasHistory) {
+    let affinityScore = 0;
+    for (const g of itemGenres) affinityScore += profile.affinity.get(g) || 0;
+    score += Math.min(25, affinityScore);
+  } else {
+    score += 10; // Default for new users
+  }
+
+  // 3. Community Score (0-20)
+  const rating = item.communityRating || item.CommunityRating || item.voteAverage || 0;
+  score += (rating / 10) * 20;
+
+  // 4. Freshness Bonus (0-10)
+  const year = item.year || item.ProductionYear || 0;
+  if (year) {
+    const age = profile.currentYear - parseInt(year);
+    if (age <= 1) score += 10;
+    else if (age <= 3) score += 7;
+    else if (age <= 5) score += 4;
+    else if (age <= 10) score += 2;
+  }
+
+  // 5. Already Watched Penalty
+  if (item.isPlayed) {
+    score = Math.max(0, score - 50);
+  }
+
+  return Math.min(100, Math.round(score));
+}
+
+/**
+ * Load the persisted watch-history part of a user's DagzRank profile
+ * (stored as `dagzProfile` in their preferences document), rebuilding it
+ * from Jellyfin when missing or older than DAGZ_PROFILE_MAX_AGE.
+ * Returns the history list, or null when Jellyfin could not be reached.
+ */
+export async function loadDagzHistory(db, config, session, prefs, budgetMs) {
+  const stored = prefs?.dagzProfile;
+  if (stored && Date.now() - new Date(stored.builtAt).getTime() < DAGZ_PROFILE_MAX_AGE) {
+    return stored.history || [];
+  }
+  const data = await fetchJsonWithin(
+    `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?IsPlayed=true&Recursive=true&Limit=${DAGZ_HISTORY_WINDOW}&Fields=Genres&EnableImages=false&SortBy=DatePlayed&SortOrder=Descending`,
+    { 'X-Emby-Token': session.jellyfinToken },
+    budgetMs
+  );
+  // Oldest first, so incremental updates can $push + $slice the most recent window
+  const history = (data.Items || []).map(i => ({ id: i.Id, genres: i.Genres || [] })).reverse();
+  await db.collection('preferences').updateOne(
+    { userId: session.userId },
+    { $set: { userId: session.userId, dagzProfile: { history, builtAt: new Date() } } },
+    { upsert: true }
+  );
+  invalidatePreferences(session.userId);
+  return history;
+}
+
+/** Append a newly played item to the persisted DagzRank history (called on stop reports) */
+export async function recordPlayInDagzProfile(config, session, itemId) {
+  const db = await getDb();
+  const prefs = await db.collection('preferences').findOne(
+    { userId: session.userId },
+    { projection: { 'dagzProfile.history.id': 1 } }
+  );
+  const history = prefs?.dagzProfile?.history;
+  if (!history || history.some(h => h.id === itemId)) return;
+
+  const data = await fetchJsonWithin(
+    `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?Ids=${itemId}&Fields=Genres&EnableImages=false`,
+    { 'X-Emby-Token': session.jellyfinToken },
+    30000
+  );
+  const item = (data.Items || [])[0];
+  if (!item?.UserData?.Played) return;
+
+  await db.collection('preferences').updateOne(
+    { userId: session.userId, 'dagzProfile.history.id': { $ne: itemId } },
+    { $push: { 'dagzProfile.history': { $each: [{ id: itemId, genres: item.Genres || [] }], $slice: -DAGZ_HISTORY_WINDOW } } }
+  );
+  invalidatePreferences(session.userId);
+}
+
+/** Map a Jellyfin item or catalog index document to a DagzRank candidate */
+function mapJellyfinCandidate(item, isPlayed) {
+  const id = item.Id || item._id;
+  return {
+    id,
+    name: item.Name ?? item.name,
+    type: item.Type ?? item.type,
+    overview: item.Overview ?? item.overview ?? '',
+    genres: item.Genres ?? item.genres ?? [],
+    communityRating: item.CommunityRating ?? item.communityRating ?? 0,
+    year: item.ProductionYear ?? item.year ?? '',
+    posterUrl: jellyfinImageUrl(id, 'Primary'),
+    backdropUrl: jellyfinImageUrl(id, 'Backdrop'),
+    isPlayed,
+    source: 'jellyfin',
+  };
+}
+
+/** Score the whole catalog index and keep the best `limit` items as candidates */
+function topCatalogCandidates(items, profile, playedIds, limit) {
+  const ranked = [];
+  for (const doc of items) {
+    const isPlayed = playedIds.has(doc._id);
+    ranked.push({ doc, isPlayed, score: scoreDagzRank(isPlayed ? { ...doc, isPlayed } : doc, profile) });
+  }
+  ranked.sort((a, b) => b.score - a.score);
+  return ranked.slice(0, limit).map(r => mapJellyfinCandidate(r.doc, r.isPlayed));
+}
+
+/** Map a Jellyseerr discover result to a DagzRank candidate */
+function mapDiscoverCandidate(item, discoverType) {
+  return {
+    id: `tmdb-${item.id}`,
+    tmdbId: item.id,
+    name: item.title || item.name || '',
+    type: discoverType === 'tv' ? 'Series' : 'Movie',
+    mediaType: discoverType === 'tv' ? 'tv' : 'movie',
+    overview: item.overview || '',
+    genreIds: item.genreIds || [],
+    genres: item.genres || [], // Resolved by the discover store, else by resolveGenres via genreIds
+    voteAverage: item.voteAverage || 0,
+    communityRating: item.voteAverage || 0,
+    year: (item.releaseDate || item.firstAirDate || '').substring(0, 4),
+    posterUrl: tmdbImageUrl(item.posterPath, 'poster'),
+    backdropUrl: tmdbImageUrl(item.backdropPath, 'backdrop'),
+    isPlayed: false,
+    mediaStatus: item.mediaInfo?.status || 0,
+    source: 'jellyseerr',
+  };
+}
+/** DagzRank recommendations of a session (response of /api/recommendations, `picks` row of the home feed) */
+export async function computeRecommendations(db, config, session) {
+  const jellyfinHeaders = { 'X-Emby-Token': session.jellyfinToken };
+
+  const discoverTypes = config.jellyseerrUrl ? ['movies', 'tv'] : [];
+  if (config.jellyseerrUrl) ensureDiscoverRefresher();
+  const catalog = await catalogForSession(db, config, session);
+  const prefsPromise = getPreferences(session.userId);
+  const [prefsResult, histResult, mediaResult, ...discoverResults] = await Promise.allSettled([
+    prefsPromise,
+    // User's watch history: persisted DagzRank profile, rebuilt from Jellyfin when stale
+    prefsPromise.then(prefs => loadDagzHistory(db, config, session, prefs, RECO_SOURCE_BUDGETS.history)),
+    // SOURCE 1: available media from Jellyfin (catalog index + played ids, or a random sample)
+    catalog
+      ? getPlayedIds(config, session)
+      : fetchJsonWithin(
+        `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?Recursive=true&Limit=100&IncludeItemTypes=Movie,Series&Fields=Overview,Genres,CommunityRating,PremiereDate&SortBy=Random`,
+        jellyfinHeaders,
+        RECO_SOURCE_BUDGETS.jellyfin
+      ),
+    // SOURCE 2: BUG 4 FIX - trending movies + TV from Jellyseerr (TMDB), read from the discover snapshots
+    ...discoverTypes.map(discoverType => getDiscoverPage(db, config, discoverType, 1, { budget: RECO_SOURCE_BUDGETS.jellyseerr })),
+  ]);
+
+  const skippedSources = [];
+  const prefs = prefsResult.status === 'fulfilled' ? prefsResult.value : null;
+  if (prefsResult.status === 'rejected') skippedSources.push('preferences');
+
+  let watchHistory = [];
+  if (histResult.status === 'fulfilled') {
+    watchHistory = histResult.value;
+  } else {
+    skippedSources.push('history');
+  }
+  const profile = compileDagzProfile(prefs, watchHistory);
+
+  let jellyfinItems = [];
+  if (catalog) {
+    if (mediaResult.status === 'rejected') skippedSources.push('jellyfin:played');
+    const playedIds = new Set(mediaResult.status === 'fulfilled' ? mediaResult.value : []);
+    jellyfinItems = timePhase('transform', () => topCatalogCandidates(catalog.items, profile, playedIds, RECO_CATALOG_POOL));
+  } else if (mediaResult.status === 'fulfilled') {
+    jellyfinItems = (mediaResult.value.Items || []).map(item => mapJellyfinCandidate(item, item.UserData?.Played || false));
+  } else {
+    console.error('[DagzRank] Jellyfin fetch error:', mediaResult.reason?.message);
+    skippedSources.push('jellyfin');
+  }
+
+  const jellyseerrItems = [];
+  const snapshots = {};
+  discoverResults.forEach((result, idx) => {
+    if (result.status === 'fulfilled') {
+      jellyseerrItems.push(...result.value.results.map(item => mapDiscoverCandidate(item, discoverTypes[idx])));
+      snapshots[discoverTypes[idx]] = result.value.snapshot;
+    } else {
+      skippedSources.push(`jellyseerr:${discoverTypes[idx]}`);
+    }
+  });
+
+  // --- FUSION: Deduplicate by name and score everything ---
+  const seenNames = new Set();
+  const allItems = [];
+
+  // Jellyfin items first (they're locally available)
+  for (const item of jellyfinItems) {
+    const key = item.name.toLowerCase();
+    if (!seenNames.has(key)) {
+      seenNames.add(key);
+      allItems.push(item);
+    }
+  }
+
+  // Then Jellyseerr items (world catalog)
+  for (const item of jellyseerrItems) {
+    const key = item.name.toLowerCase();
+    if (!seenNames.has(key)) {
+      seenNames.add(key);
+      allItems.push(item);
+    }
+  }
+
+  // Score each item with DagzRank, then sort by DagzRank descending
+  const scored = timePhase('transform', () => allItems
+    .map(item => ({ ...item, dagzRank: scoreDagzRank(item, profile) }))
+    .sort((a, b) => b.dagzRank - a.dagzRank));
+
+  return {
+    recommendations: scored.filter(s => s.dagzRank > 20).slice(0, 30),
+    totalScored: scored.length + (catalog ? catalog.items.length - jellyfinItems.length : 0),
+    sources: {
+      jellyfin: catalog ? catalog.items.length : jellyfinItems.length,
+      jellyseerr: jellyseerrItems.length,
+      catalog: catalog ? 'index' : 'live',
+    },
+    snapshots,
+    skippedSources,
+    partial: skippedSources.length > 0,
+  };
+}
+
@@ -0,0 +1,184 @@
+/* =================================================================
+   DagzFlix - Discover snapshot store
+   Jellyseerr's trending lists (/discover/movies, /discover/tv) are the
+   same for every user and move a few times a day. Their first
+   DISCOVER_SNAPSHOT_PAGES pages are fetched on a schedule into MongoDB
+   (collection `discover_snapshots`, one document per list) and kept in
+   memory:
+   - TMDB genre ids resolved to names once, when the pages are fetched
+   - /api/discover and the recommendation candidates read from here,
+     with the snapshot's age; later pages go to Jellyseerr through the
+     shared discover cache (lib/server/media-status)
+   - Background refresher: one timer per BFF process; a read finding a
+     missing or outdated snapshot starts a refresh as well
+   - A failed refresh keeps serving the previous snapshot
+   ================================================================= */
+
+import { upstreamJson } from '@/lib/server/upstream';
+import { jellyseerrDiscover } from '@/lib/server/media-status';
+import { registerMetricsCollector, metricFamily, runDetached } from '@/lib/server/metrics';
+import { withPriority } from '@/lib/server/admission';
+
+export const DISCOVER_SNAPSHOT_PAGES = parseInt(process.env.DISCOVER_SNAPSHOT_PAGES || '5');
+export const DISCOVER_REFRESH_INTERVAL_MS = parseInt(process.env.DISCOVER_REFRESH_INTERVAL_MS || '10800000');
+
+export const DISCOVER_LISTS = ['movies', 'tv'];
+
+const PAGE_TIMEOUT = 30000;
+// Minimum delay between two refreshes started by reads (Jellyseerr down: do not retry on every request)
+const REFRESH_RETRY_MS = 60000;
+// How often a read re-checks MongoDB for a refresh made by another process
+const STATE_CHECK_MS = 30000;
+
+export const TMDB_GENRE_ID_TO_NAME = {
+  // Movies
+  28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy',
+  80: 'Crime', 99: 'Documentary', 18: 'Drama', 10751: 'Family',
+  14: 'Fantasy', 36: 'History', 27: 'Horror', 10402: 'Music',
+  9648: 'Mystery', 10749: 'Romance', 878: 'Science Fiction',
+  10770: 'TV Movie', 53: 'Thriller', 10752: 'War', 37: 'Western',
+  // TV-specific
+  10759: 'Action & Adventure', 10762: 'Kids', 10763: 'News',
+  10764: 'Reality', 10765: 'Sci-Fi & Fantasy', 10766: 'Soap',
+  10767: 'Talk', 10768: 'War & Politics',
+};
+
+/** Genre names of TMDB genre ids (unknown ids kept as Genre_<id>) */
+export function tmdbGenreNames(genreIds = []) {
+  return genreIds.map(id => TMDB_GENRE_ID_TO_NAME[id] || `Genre_${id}`);
+}
+
+/** Jellyseerr results with their genre names resolved */
+function withGenreNames(results = []) {
+  return results.map(item => (item.genres ? item : { ...item, genres: tmdbGenreNames(item.genreIds || []) }));
+}
+
+// One copy per process: App Router routes are bundled separately, and the
+// snapshots loaded at warm-up (lib/server/warmup) must be the ones they read
+const store = globalThis.__dagzflixDiscover || (globalThis.__dagzflixDiscover = {
+  runningRefresh: null,
+  lastRefreshAttempt: 0,
+  refresherTimer: null,
+  snapshots: {}, // list -> { fetchedAt: Date, totalPages, totalResults, pages: [results[]], checkedAt }
+});
+
+/** Fetch the first DISCOVER_SNAPSHOT_PAGES pages of one list; throws if any page fails */
+async function fetchList(db, config, list) {
+  const pages = await Promise.all(Array.from({ length: DISCOVER_SNAPSHOT_PAGES }, (_, idx) => upstreamJson(
+    `${config.jellyseerrUrl}/api/v1/discover/${list}?page=${idx + 1}`,
+    { headers: { 'X-Api-Key': config.jellyseerrApiKey }, service: 'Jellyseerr' },
+    { budget: PAGE_TIMEOUT }
+  )));
+  const totalPages = pages[0].totalPages || 1;
+  const doc = {
+    fetchedAt: new Date(),
+    totalPages,
+    totalResults: pages[0].totalResults || 0,
+    pages: pages.slice(0, totalPages).map(page => withGenreNames(page.results)),
+  };
+  await db.collection('discover_snapshots').updateOne({ _id: list }, { $set: doc }, { upsert: true });
+  store.snapshots[list] = { ...doc, checkedAt: Date.now() };
+  return doc;
+}
+
+/**
+ * Refetch every list (background upstream calls). Concurrent calls in the same process share the running
+ * refresh; a list that fails keeps its previous snapshot.
+ */
+export function refreshDiscoverSnapshots(db, config) {
+  if (!store.runningRefresh) {
+    store.lastRefreshAttempt = Date.now();
+    store.runningRefresh = withPriority('background', async () => {
+      if (!config?.jellyseerrUrl) return false;
+      const results = await Promise.allSettled(DISCOVER_LISTS.map(list => fetchList(db, config, list)));
+      const failed = results.find(r => r.status === 'rejected');
+      if (failed) throw failed.reason;
+      return true;
+    }).finally(() => { store.runningRefresh = null; });
+  }
+  return store.runningRefresh;
+}
+
+/**
+ * Snapshot of one list ({ fetchedAt, totalPages, pages }), or null before the
+ * first refresh. MongoDB is re-checked at most every STATE_CHECK_MS.
+ */
+export async function getDiscoverSnapshot(db, list) {
+  const now = Date.now();
+  const current = store.snapshots[list];
+  if (current && now - current.checkedAt < STATE_CHECK_MS) return current;
+
+  const state = await db.collection('discover_snapshots').findOne({ _id: list }, { projection: { fetchedAt: 1 } });
+  if (!state) return null;
+  if (current && current.fetchedAt.getTime() === new Date(state.fetchedAt).getTime()) {
+    current.checkedAt = now;
+    return current;
+  }
+  const doc = await db.collection('discover_snapshots').findOne({ _id: list });
+  if (!doc) return null;
+  store.snapshots[list] = { ...doc, fetchedAt: new Date(doc.fetchedAt), checkedAt: now };
+  return store.snapshots[list];
+}
+
+/** True when the snapshot is missing or older than the refresh interval */
+function isStale(snap) {
+  return !snap || Date.now() - snap.fetchedAt.getTime() > DISCOVER_REFRESH_INTERVAL_MS;
+}
+
+/** { fetchedAt, ageMs } of a snapshot, as exposed by the API */
+export function snapshotAge(snap) {
+  return snap ? { fetchedAt: snap.fetchedAt.toISOString(), ageMs: Date.now() - snap.fetchedAt.getTime() } : null;
+}
+
+/**
+ * One discover page ({ results, totalPages, snapshot }), results carrying their
+ * genre names. Pages within the snapshot are served from it (snapshot = its
+ * age); other pages, and every page until the first refresh landed, are read
+ * from Jellyseerr through the shared discover cache within `budget` ms.
+ */
+export async function getDiscoverPage(db, config, list, page = 1, { budget } = {}) {
+  const snap = page <= DISCOVER_SNAPSHOT_PAGES ? await getDiscoverSnapshot(db, list) : null;
+  if (page <= DISCOVER_SNAPSHOT_PAGES && isStale(snap) && Date.now() - store.lastRefreshAttempt > REFRESH_RETRY_MS) {
+    runDetached(() => refreshDiscoverSnapshots(db, config))
+      .catch(err => console.error('[DagzFlix] Discover snapshot refresh failed:', err.message));
+  }
+  if (snap && page <= snap.pages.length) {
+    return { results: snap.pages[page - 1], totalPages: snap.totalPages, snapshot: snapshotAge(snap) };
+  }
+  const data = await jellyseerrDiscover(config, list, page, budget);
+  return { results: withGenreNames(data.results), totalPages: data.totalPages || 1, snapshot: null };
+}
+
+/**
+ * Start the background refresher (idempotent). `loadContext` resolves the
+ * current { db, config } on every tick; a tick finding fresh snapshots (made
+ * by another process) does nothing.
+ */
+export function startDiscoverRefresher(loadContext, intervalMs = DISCOVER_REFRESH_INTERVAL_MS) {
+  if (store.refresherTimer || intervalMs <= 0) return;
+  const tick = async () => {
+    try {
+      const { db, config } = await loadContext();
+      if (!config?.jellyseerrUrl) return;
+      const current = await Promise.all(DISCOVER_LISTS.map(list => getDiscoverSnapshot(db, list)));
+      if (current.some(isStale)) await refreshDiscoverSnapshots(db, config);
+    } catch (err) {
+      console.error('[DagzFlix] Discover snapshot refresh failed:', err.message);
+    }
+  };
+  store.refresherTimer = setInterval(tick, Math.max(intervalMs / 4, STATE_CHECK_MS));
+  store.refresherTimer.unref?.();
+  tick();
+}
+
+/** Forget every snapshot (setup changed: they belong to another Jellyseerr) */
+export async function resetDiscoverSnapshots(db) {
+  store.snapshots = {};
+  store.lastRefreshAttempt = 0;
+  await db.collection('discover_snapshots').deleteMany({});
+}
+
+registerMetricsCollector('discover-store', () => metricFamily(
+  'dagzflix_discover_snapshot_age_seconds', 'gauge', 'Age of the Jellyseerr discover snapshots held in memory',
+  Object.entries(store.snapshots).map(([list, snap]) => [{ list }, (Date.now() - snap.fetchedAt.getTime()) / 1000])
+));
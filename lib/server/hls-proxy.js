@@ -0,0 +1,292 @@
+/* =================================================================
+   DagzFlix - HLS streaming proxy
+   GET /api/hls/<path> answers for <jellyfin>/Videos/<path>, called with
+   the session's token in a header: no Jellyfin URL nor token reaches
+   the browser. With STREAM_PROXY=true, /api/media/stream hands out
+   these URLs instead of raw Jellyfin ones.
+   - Playlists (.m3u8) are fetched per request and rewritten: every URI
+     points back at /api/hls, api_key parameters removed
+   - Media segments come from a shared SegmentCache keyed by their URL
+     without the per-viewer parameters (PlaySessionId, DeviceId, api_key):
+     household members watching the same title share one remux and one
+     transfer. Cached segments are only served to a user who loaded a
+     playlist of the item (i.e. Jellyfin let them); anyone else goes
+     upstream with their own token first
+   - After each segment, the next HLS_READAHEAD_SEGMENTS segments of its
+     playlist are fetched in the background, one after the other
+   - Byte ranges are answered from the cached segment (206); other files
+     (direct play stream, subtitles) are piped through with the Range header
+   ================================================================= */
+
+import { getSession, getConfig, jsonResponse, errorResponse } from '@/lib/server/bff';
+import { responseCache, normalizeUrl } from '@/lib/server/response-cache';
+import { upstreamFetch } from '@/lib/server/upstream';
+import { SegmentCache } from '@/lib/server/segment-cache';
+import {
+  beginRequestTiming, finishRequestTiming, timePhase, registerMetricsCollector, metricFamily,
+} from '@/lib/server/metrics';
+
+export const STREAM_PROXY = process.env.STREAM_PROXY === 'true';
+export const HLS_PROXY_PATH = '/api/hls';
+
+const HLS_READAHEAD_SEGMENTS = parseInt(process.env.HLS_READAHEAD_SEGMENTS || '3');
+// A user's right to cached segments of an item, granted by a playlist Jellyfin served them
+const HLS_ACCESS_TTL_MS = parseInt(process.env.HLS_ACCESS_TTL_MS || '21600000');
+// Whole-file pass-through (direct play) lasts as long as the viewer watches
+const HLS_PASSTHROUGH_BUDGET_MS = parseInt(process.env.HLS_PASSTHROUGH_BUDGET_MS || '14400000');
+// Segment -> position in its playlist, for read-ahead
+const SEGMENT_INDEX_MAX = 100000;
+
+const AUTH_PARAMS = new Set(['api_key', 'apikey']);
+const VIEWER_PARAMS = new Set(['playsessionid', 'deviceid']);
+const SEGMENT_PATH = /(^|\/)hls\d*\/.+\.(ts|m4s|mp4|aac)$/i;
+const PASSTHROUGH_HEADERS = ['content-type', 'content-length', 'content-range', 'accept-ranges', 'last-modified', 'etag'];
+
+const segmentCache = new SegmentCache({
+  maxMemoryBytes: parseInt(process.env.HLS_SEGMENT_CACHE_MB || '256') * 1024 * 1024,
+  dir: process.env.HLS_SEGMENT_CACHE_DIR || '',
+  maxDiskBytes: parseInt(process.env.HLS_SEGMENT_CACHE_DISK_MB || '2048') * 1024 * 1024,
+});
+const segmentIndex = new Map(); // segment key -> { list: upstream URLs of the playlist, index }
+const counters = { readAhead: 0, readAheadFailures: 0, upstreamBytes: 0 };
+
+function stripParams(url, names) {
+  for (const name of [...url.searchParams.keys()]) {
+    if (names.has(name.toLowerCase())) url.searchParams.delete(name);
+  }
+  return url;
+}
+
+/** Cache key of a segment: its upstream URL without credentials nor per-viewer parameters */
+function segmentKey(upstreamUrl) {
+  const url = stripParams(stripParams(new URL(upstreamUrl), AUTH_PARAMS), VIEWER_PARAMS);
+  return `hls|${normalizeUrl(url.href)}`;
+}
+
+/** Path below /Videos/ of a Jellyfin URL, or null when it points elsewhere */
+function videosPath(url, jellyfinUrl) {
+  const base = new URL(jellyfinUrl);
+  const prefix = `${base.pathname.replace(/\/+$/, '')}/Videos/`;
+  if (url.origin !== base.origin || !url.pathname.startsWith(prefix)) return null;
+  return url.pathname.slice(prefix.length);
+}
+
+/**
+ * Browser URL for a Jellyfin /Videos URL: the /api/hls path without api_key
+ * when STREAM_PROXY is on, the URL itself otherwise.
+ */
+export function streamUrlFor(config, upstreamUrl) {
+  if (!STREAM_PROXY) return upstreamUrl;
+  const url = stripParams(new URL(upstreamUrl), AUTH_PARAMS);
+  const rest = videosPath(url, config.jellyfinUrl);
+  return rest === null ? upstreamUrl : `${HLS_PROXY_PATH}/${rest}${url.search}`;
+}
+
+/**
+ * Rewrite a playlist fetched from upstreamUrl: URIs (plain lines and URI="..."
+ * attributes) resolved, stripped of api_key and mapped onto /api/hls.
+ * Returns the text and the upstream URLs of its media segments, in order.
+ */
+export function rewritePlaylist(text, upstreamUrl, jellyfinUrl) {
+  const segments = [];
+  const rewrite = (uri) => {
+    const url = stripParams(new URL(uri, upstreamUrl), AUTH_PARAMS);
+    const rest = videosPath(url, jellyfinUrl);
+    if (rest === null) return url.href;
+    if (SEGMENT_PATH.test(rest)) segments.push(url.href);
+    return `${HLS_PROXY_PATH}/${rest}${url.search}`;
+  };
+  const lines = text.split(/\r?\n/).map((line) => {
+    const trimmed = line.trim();
+    if (!trimmed) return line;
+    if (trimmed.startsWith('#')) return line.replace(/URI="([^"]+)"/g, (_, uri) => `URI="${rewrite(uri)}"`);
+    return rewrite(trimmed);
+  });
+  return { text: lines.join('\n'), segments };
+}
+
+function rememberPlaylist(list) {
+  list.forEach((href, index) => {
+    const key = segmentKey(href);
+    segmentIndex.delete(key);
+    segmentIndex.set(key, { list, index });
+  });
+  for (const key of segmentIndex.keys()) {
+    if (segmentIndex.size <= SEGMENT_INDEX_MAX) break;
+    segmentIndex.delete(key);
+  }
+}
+
+function accessKey(session, itemId) {
+  return `hls-access|${session.userId}|${itemId}`;
+}
+
+function grantAccess(session, itemId) {
+  responseCache.set(accessKey(session, itemId), true, { ttl: HLS_ACCESS_TTL_MS, tags: ['hls'] });
+}
+
+/** Whole segment from Jellyfin as { body, contentType }; rejects with err.status on non-2xx */
+async function fetchSegment(href, token) {
+  const res = await upstreamFetch(href, { headers: { 'X-Emby-Token': token } }, { budget: 'heavy', service: 'Jellyfin' });
+  if (!res.ok) {
+    res.body?.cancel().catch(() => {});
+    const err = new Error(`Jellyfin responded with ${res.status}`);
+    err.status = res.status;
+    throw err;
+  }
+  const body = Buffer.from(await res.arrayBuffer());
+  counters.upstreamBytes += body.length;
+  return { body, contentType: res.headers.get('content-type') || 'video/mp2t' };
+}
+
+/** { start, end } of a single "bytes=" range, null for none / unsupported, false when unsatisfiable */
+export function parseRange(header, size) {
+  const match = /^bytes=(\d*)-(\d*)$/.exec((header || '').trim());
+  if (!match) return null;
+  let start;
+  let end;
+  if (match[1] === '') {
+    const suffix = parseInt(match[2]);
+    if (!suffix) return false;
+    start = Math.max(0, size - suffix);
+    end = size - 1;
+  } else {
+    start = parseInt(match[1]);
+    end = match[2] === '' ? size - 1 : Math.min(parseInt(match[2]), size - 1);
+  }
+  return start > end || start >= size ? false : { start, end };
+}
+
+function segmentResponse(req, { body, contentType }) {
+  const headers = { 'Content-Type': contentType, 'Accept-Ranges': 'bytes', 'Cache-Control': 'private, max-age=3600' };
+  const range = parseRange(req.headers.get('range'), body.length);
+  if (range === false) {
+    return new Response(null, { status: 416, headers: { ...headers, 'Content-Range': `bytes */${body.length}` } });
+  }
+  if (range) {
+    return new Response(body.subarray(range.start, range.end + 1), {
+      status: 206,
+      headers: { ...headers, 'Content-Range': `bytes ${range.start}-${range.end}/${body.length}`, 'Content-Length': String(range.end - range.start + 1) },
+    });
+  }
+  return new Response(body, { status: 200, headers: { ...headers, 'Content-Length': String(body.length) } });
+}
+
+/** Fetch the segments following href in its playlist, for the viewer of href */
+async function readAhead(session, href) {
+  const position = segmentIndex.get(segmentKey(href));
+  if (!position || HLS_READAHEAD_SEGMENTS <= 0) return;
+  const current = new URL(href);
+  const viewer = [...current.searchParams].filter(([name]) => VIEWER_PARAMS.has(name.toLowerCase()));
+  for (const next of position.list.slice(position.index + 1, position.index + 1 + HLS_READAHEAD_SEGMENTS)) {
+    const url = stripParams(new URL(next), VIEWER_PARAMS);
+    for (const [name, value] of viewer) url.searchParams.set(name, value);
+    const key = segmentKey(url.href);
+    if (segmentCache.has(key)) continue;
+    try {
+      await segmentCache.load(key, () => fetchSegment(url.href, session.jellyfinToken));
+      counters.readAhead++;
+    } catch {
+      counters.readAheadFailures++;
+      return; // the viewer's own request will retry it
+    }
+  }
+}
+
+async function servePlaylist(session, config, href, itemId) {
+  const res = await upstreamFetch(href, { headers: { 'X-Emby-Token': session.jellyfinToken } }, { budget: 'heavy', service: 'Jellyfin' });
+  if (!res.ok) {
+    res.body?.cancel().catch(() => {});
+    return jsonResponse({ error: `Jellyfin responded with ${res.status}` }, res.status);
+  }
+  const text = await res.text();
+  grantAccess(session, itemId);
+  const playlist = timePhase('transform', () => rewritePlaylist(text, href, config.jellyfinUrl));
+  if (playlist.segments.length) rememberPlaylist(playlist.segments);
+  return finishRequestTiming(new Response(playlist.text, {
+    status: 200,
+    headers: { 'Content-Type': 'application/vnd.apple.mpegurl', 'Cache-Control': 'no-store' },
+  }));
+}
+
+async function serveSegment(req, session, href, itemId) {
+  const key = segmentKey(href);
+  let entry;
+  try {
+    if (responseCache.get(accessKey(session, itemId))) {
+      entry = await segmentCache.load(key, () => fetchSegment(href, session.jellyfinToken));
+    } else {
+      entry = segmentCache.put(key, await fetchSegment(href, session.jellyfinToken));
+      grantAccess(session, itemId);
+    }
+  } catch (err) {
+    if (!err.status) throw err;
+    return jsonResponse({ error: err.message }, err.status);
+  }
+  const response = finishRequestTiming(segmentResponse(req, entry));
+  readAhead(session, href).catch(err => console.error('[DagzFlix] HLS read-ahead error:', err.message));
+  return response;
+}
+
+async function passThrough(req, session, href) {
+  const headers = { 'X-Emby-Token': session.jellyfinToken };
+  if (req.headers.get('range')) headers.Range = req.headers.get('range');
+  const res = await upstreamFetch(
+    href,
+    { headers, signal: req.signal },
+    { budget: HLS_PASSTHROUGH_BUDGET_MS, retries: 0, service: 'Jellyfin' }
+  );
+  const out = {};
+  for (const name of PASSTHROUGH_HEADERS) {
+    if (res.headers.get(name)) out[name] = res.headers.get(name);
+  }
+  return finishRequestTiming(new Response(res.body, { status: res.status, headers: out }));
+}
+
+/** GET /api/hls/<path segments> */
+export async function serveHls(req, parts) {
+  const rest = (parts || []).join('/');
+  const kind = /\.m3u8$/i.test(rest) ? 'playlist' : SEGMENT_PATH.test(rest) ? 'segment' : 'file';
+  beginRequestTiming(`hls/${kind}`, req);
+  try {
+    const session = await getSession(req);
+    if (!session) return jsonResponse({ error: 'Non authentifie' }, 401);
+    if (!parts?.length || parts.some(p => !p || p === '.' || p === '..' || /[\\/]/.test(p))) {
+      return jsonResponse({ error: 'Chemin invalide' }, 400);
+    }
+    const config = await getConfig();
+    if (!config?.jellyfinUrl) return jsonResponse({ error: 'Serveur non configure' }, 503);
+
+    const upstream = new URL(`${config.jellyfinUrl}/Videos/${parts.map(encodeURIComponent).join('/')}`);
+    new URL(req.url).searchParams.forEach((value, name) => {
+      if (!AUTH_PARAMS.has(name.toLowerCase())) upstream.searchParams.append(name, value);
+    });
+    const itemId = parts[0];
+    if (kind === 'playlist') return await servePlaylist(session, config, upstream.href, itemId);
+    if (kind === 'segment') return await serveSegment(req, session, upstream.href, itemId);
+    return await passThrough(req, session, upstream.href);
+  } catch (err) {
+    console.error('[DagzFlix] HLS proxy error:', err.message);
+    return errorResponse(err, {}, 502);
+  }
+}
+
+registerMetricsCollector('hls-proxy', () => {
+  const st = segmentCache.stats();
+  return [
+    ...metricFamily('dagzflix_hls_segment_cache_hits_total', 'counter', 'HLS segments served from the cache', [
+      [{ tier: 'memory' }, st.hits],
+      [{ tier: 'disk' }, st.diskHits],
+    ]),
+    ...metricFamily('dagzflix_hls_segment_cache_misses_total', 'counter', 'HLS segments fetched from Jellyfin', [[{}, st.misses]]),
+    ...metricFamily('dagzflix_hls_segment_cache_bytes', 'gauge', 'HLS segment cache size', [
+      [{ tier: 'memory' }, st.bytes],
+      [{ tier: 'disk' }, st.diskBytes],
+    ]),
+    ...metricFamily('dagzflix_hls_readahead_total', 'counter', 'HLS segments fetched ahead of the player', [
+      [{ outcome: 'ok' }, counters.readAhead],
+      [{ outcome: 'failed' }, counters.readAheadFailures],
+    ]),
+    ...metricFamily('dagzflix_hls_upstream_bytes_total', 'counter', 'Segment bytes transferred from Jellyfin', [[{}, counters.upstreamBytes]]),
+  ];
+});
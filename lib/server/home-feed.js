@@ -0,0 +1,211 @@
+/* =================================================================
+   DagzFlix - Materialized home feed
+   The dashboard rows of each user (resume, DagzRank picks, new movies
+   and series, trending movies and series) stored in MongoDB (collection
+   `home_feeds`, one document per user) and served as one response.
+   A row is rebuilt when:
+   - it was marked dirty after it started building (progress start/stop,
+     preference saves: markHomeFeedDirty)
+   - its inputs changed (catalog sync, discover snapshot refresh: each
+     row's inputs() signature differs from the one it was built with)
+   - it is older than its maxAge (changes made outside DagzFlix)
+   Rebuilds run in the background; a read waits HOME_FEED_WAIT_MS for
+   them, then serves the previous row flagged stale. Rows never built
+   are waited for. Each row reuses the loader of the route it replaces
+   (lib/server/library, lib/server/dagzrank, the discover snapshots).
+   ================================================================= */
+
+import { timePhase, runDetached } from '@/lib/server/metrics';
+import { currentPriority, withPriority } from '@/lib/server/admission';
+import { CACHE_POLICIES, progressQueue, loadResumeItems, loadLibraryPage } from '@/lib/server/library';
+import { computeRecommendations } from '@/lib/server/dagzrank';
+import { getCatalogSnapshot } from '@/lib/server/catalog-index';
+import { getDiscoverPage, getDiscoverSnapshot } from '@/lib/server/discover-store';
+import { mapSeerrResult, rememberSeerrResults } from '@/lib/server/search-index';
+
+export const HOME_ROWS = ['resume', 'picks', 'newMovies', 'newSeries', 'trendingMovies', 'trendingSeries'];
+
+const HOME_FEED_WAIT_MS = parseInt(process.env.HOME_FEED_WAIT_MS || '1500');
+// Quiet period before a marked feed is rebuilt (a playback sends start, pauses, stop...)
+const HOME_FEED_REBUILD_DELAY_MS = parseInt(process.env.HOME_FEED_REBUILD_DELAY_MS || '15000');
+
+// Running rebuilds and debounce timers, per process (the home route is bundled apart from the catch-all)
+const state = globalThis.__dagzflixHomeFeed || (globalThis.__dagzflixHomeFeed = {
+  building: new Map(), // `${userId}|${row}` -> promise of the row
+  timers: new Map(), // userId -> pending debounced rebuild
+});
+
+const HOME_LIBRARY_QUERY = { sortBy: 'DateCreated', sortOrder: 'Descending', genreIds: '', searchTerm: '', fields: 'detail' };
+
+/** Version of the catalog index ('' before its first sync) */
+async function catalogVersion({ db }) {
+  return (await getCatalogSnapshot(db))?.version || '';
+}
+
+/** Fetch date of a discover snapshot ('' while there is none) */
+async function discoverVersion({ db, config }, list) {
+  if (!config.jellyseerrUrl) return '';
+  return (await getDiscoverSnapshot(db, list))?.fetchedAt.toISOString() || '';
+}
+
+/** Trending row: first discover page of a list, mapped like /api/discover */
+async function trendingRow({ db, config }, list) {
+  if (!config.jellyseerrUrl) return [];
+  const data = await getDiscoverPage(db, config, list, 1);
+  const pairs = data.results.map(item => [item, mapSeerrResult(item, list === 'tv' ? 'tv' : 'movie')]);
+  rememberSeerrResults(pairs);
+  return pairs.map(([, result]) => result);
+}
+
+// Row definitions: build(ctx) -> items, inputs(ctx)? -> signature of the shared data, maxAge (ms)
+const ROWS = {
+  resume: {
+    build: async ({ config, session }) => {
+      await progressQueue.settle(`${session.userId}|`);
+      return loadResumeItems(config, session);
+    },
+    maxAge: CACHE_POLICIES.resume.ttl,
+  },
+  picks: {
+    build: async ({ db, config, session }) => (await computeRecommendations(db, config, session)).recommendations,
+    inputs: async ctx => `${await catalogVersion(ctx)}|${await discoverVersion(ctx, 'movies')}|${await discoverVersion(ctx, 'tv')}`,
+    maxAge: 30 * 60 * 1000,
+  },
+  newMovies: {
+    build: async ({ config, session }) => (await loadLibraryPage(config, session, { ...HOME_LIBRARY_QUERY, type: 'Movie' }, 0, 20)).items,
+    inputs: catalogVersion,
+    maxAge: 15 * 60 * 1000,
+  },
+  newSeries: {
+    build: async ({ config, session }) => (await loadLibraryPage(config, session, { ...HOME_LIBRARY_QUERY, type: 'Series' }, 0, 20)).items,
+    inputs: catalogVersion,
+    maxAge: 15 * 60 * 1000,
+  },
+  trendingMovies: {
+    build: ctx => trendingRow(ctx, 'movies'),
+    inputs: ctx => discoverVersion(ctx, 'movies'),
+    maxAge: 60 * 60 * 1000,
+  },
+  trendingSeries: {
+    build: ctx => trendingRow(ctx, 'tv'),
+    inputs: ctx => discoverVersion(ctx, 'tv'),
+    maxAge: 60 * 60 * 1000,
+  },
+};
+
+/** Input signature of every row ('' for rows without one) */
+async function rowInputs(ctx) {
+  const entries = await Promise.all(HOME_ROWS.map(async name => [name, String(await ROWS[name].inputs?.(ctx) ?? '')]));
+  return Object.fromEntries(entries);
+}
+
+function isOutdated(row, dirtyAt, inputs, maxAge) {
+  if (!row) return true;
+  if (dirtyAt && new Date(dirtyAt) > new Date(row.startedAt)) return true;
+  return row.inputs !== inputs || Date.now() - new Date(row.builtAt).getTime() > maxAge;
+}
+
+/**
+ * Rebuild one row and store it; concurrent rebuilds of a row share one run.
+ * Its upstream calls keep the caller's priority (a dashboard read is interactive).
+ */
+function buildRow(ctx, name, inputs) {
+  const { db, session } = ctx;
+  const key = `${session.userId}|${name}`;
+  if (state.building.has(key)) return state.building.get(key);
+  const priority = currentPriority();
+  const run = runDetached(() => withPriority(priority, async () => {
+    const startedAt = new Date();
+    const items = await ROWS[name].build(ctx);
+    const row = { items, builtAt: new Date(), startedAt, inputs };
+    await db.collection('home_feeds').updateOne(
+      { _id: session.userId },
+      { $set: { [`rows.${name}`]: row } },
+      { upsert: true }
+    );
+    return row;
+  })).finally(() => state.building.delete(key));
+  state.building.set(key, run);
+  return run;
+}
+
+/** Start the rebuild of every outdated row: { name: { row, rebuild } } */
+async function planFeed(ctx) {
+  const doc = await timePhase('mongo', () => ctx.db.collection('home_feeds').findOne({ _id: ctx.session.userId }));
+  const inputs = await rowInputs(ctx);
+  const plan = {};
+  for (const name of HOME_ROWS) {
+    const row = doc?.rows?.[name] || null;
+    const outdated = isOutdated(row, doc?.dirty?.[name], inputs[name], ROWS[name].maxAge);
+    plan[name] = { row, rebuild: outdated ? buildRow(ctx, name, inputs[name]) : null };
+  }
+  return plan;
+}
+
+/**
+ * The user's home feed: { rows: { name: { items, builtAt, ageMs, stale, error? } } }.
+ * Rows being rebuilt are waited for HOME_FEED_WAIT_MS (without limit when
+ * never built); a row whose rebuild fails keeps its previous items.
+ */
+export async function getHomeFeed(ctx) {
+  const plan = await planFeed(ctx);
+  let timer;
+  const deadline = new Promise(resolve => { timer = setTimeout(resolve, HOME_FEED_WAIT_MS); });
+  const rows = await Promise.all(HOME_ROWS.map(async name => {
+    const { row, rebuild } = plan[name];
+    let current = row;
+    let error = null;
+    if (rebuild) {
+      const outcome = rebuild.then(value => ({ value }), err => ({ err }));
+      const settled = await (row ? Promise.race([outcome, deadline]) : outcome);
+      if (settled?.value) current = settled.value;
+      if (settled?.err) {
+        error = settled.err.message;
+        console.error(`[DagzFlix] Home row ${name} failed:`, error);
+      }
+    }
+    return [name, {
+      items: current?.items || [],
+      builtAt: current?.builtAt || null,
+      ageMs: current ? Date.now() - new Date(current.builtAt).getTime() : null,
+      stale: current !== null && current === row && !!rebuild,
+      ...(error ? { error } : {}),
+    }];
+  }));
+  clearTimeout(timer);
+  return { rows: Object.fromEntries(rows) };
+}
+
+/** Rebuild the outdated rows in the background (login prefetch, debounced marks) */
+export async function refreshHomeFeed(ctx) {
+  const plan = await planFeed(ctx);
+  await Promise.allSettled(Object.values(plan).map(({ rebuild }) => rebuild).filter(Boolean));
+}
+
+/**
+ * Mark rows of the user's feed as changed: the next read rebuilds them, and a
+ * rebuild is scheduled after `delay` ms without further marks.
+ */
+export async function markHomeFeedDirty(ctx, rows, { delay = HOME_FEED_REBUILD_DELAY_MS } = {}) {
+  const { db, session } = ctx;
+  const now = new Date();
+  await db.collection('home_feeds').updateOne(
+    { _id: session.userId },
+    { $max: Object.fromEntries(rows.map(name => [`dirty.${name}`, now])) },
+    { upsert: true }
+  );
+  clearTimeout(state.timers.get(session.userId));
+  const timer = setTimeout(() => {
+    state.timers.delete(session.userId);
+    refreshHomeFeed(ctx).catch(err => console.error('[DagzFlix] Home feed rebuild failed:', err.message));
+  }, delay);
+  timer.unref?.();
+  state.timers.set(session.userId, timer);
+}
+
+/** Drop every stored feed (setup changed: the rows belong to other servers) */
+export async function resetHomeFeeds(db) {
+  for (const timer of state.timers.values()) clearTimeout(timer);
+  state.timers.clear();
+  await db.collection('home_feeds').deleteMany({});
+}
@@ -0,0 +1,225 @@
+/* =================================================================
+   DagzFlix - On-disk Image Cache
+   Poster/backdrop bytes proxied from Jellyfin and TMDB, kept on disk.
+   - Upstream bodies are streamed to the client and to disk at once (tee)
+   - Files named by the hash of their cache key, ETag = hash of the bytes
+   - Size cap with LRU eviction (in-memory index rebuilt from disk at start)
+   - Conditional requests (If-None-Match / If-Modified-Since) answer 304
+   - Output format negotiated from the Accept header (IMAGE_FORMATS, in
+     order of preference); each format is its own cache entry
+   ================================================================= */
+
+import { createHash, randomBytes } from 'crypto';
+import fsp from 'fs/promises';
+import path from 'path';
+import { Readable, Transform } from 'stream';
+import { pipeline } from 'stream/promises';
+
+const CACHE_CONTROL = 'public, max-age=86400';
+// Formats the upstream can encode to, preferred first (Jellyfin: webp; avif on builds that support it)
+const IMAGE_FORMATS = (process.env.IMAGE_FORMATS || 'webp').split(',').map(f => f.trim().toLowerCase()).filter(Boolean);
+
+/** First IMAGE_FORMATS entry the client accepts, or null (keep the source format) */
+export function negotiateImageFormat(accept) {
+  const accepted = (accept || '').toLowerCase().split(',').map(part => part.trim().split(';'))
+    .filter(([, ...params]) => !params.some(p => /^\s*q=0(\.0*)?\s*$/.test(p)))
+    .map(([type]) => type.trim());
+  return IMAGE_FORMATS.find(format => accepted.includes(`image/${format}`)) || null;
+}
+
+export class ImageDiskCache {
+  constructor({ dir = '.cache/images', maxBytes = 512 * 1024 * 1024, maxAge = 7 * 24 * 60 * 60 * 1000 } = {}) {
+    this.dir = path.resolve(dir);
+    this.maxBytes = maxBytes;
+    this.maxAge = maxAge;
+    this.entries = new Map(); // name -> meta, insertion order = LRU order (oldest first)
+    this.bytes = 0;
+    this.ready = null;
+    this.hits = 0;
+    this.misses = 0;
+    this.notModified = 0;
+  }
+
+  /** Load the index from disk once (metadata sidecars, oldest first) */
+  init() {
+    if (!this.ready) {
+      this.ready = (async () => {
+        await fsp.mkdir(this.dir, { recursive: true });
+        const metas = [];
+        for (const file of await fsp.readdir(this.dir)) {
+          if (!file.endsWith('.json')) continue;
+          try {
+            metas.push(JSON.parse(await fsp.readFile(path.join(this.dir, file), 'utf8')));
+          } catch {
+            await fsp.rm(path.join(this.dir, file), { force: true });
+          }
+        }
+        metas.sort((a, b) => a.storedAt - b.storedAt);
+        for (const meta of metas) this.track(meta);
+        await this.evict();
+      })().catch(err => {
+        this.ready = null;
+        throw err;
+      });
+    }
+    return this.ready;
+  }
+
+  nameFor(key) {
+    return createHash('sha256').update(key).digest('hex').slice(0, 40);
+  }
+
+  track(meta) {
+    this.entries.set(meta.name, meta);
+    this.bytes += meta.size;
+  }
+
+  async remove(name) {
+    const meta = this.entries.get(name);
+    if (meta) {
+      this.entries.delete(name);
+      this.bytes -= meta.size;
+    }
+    await Promise.all([
+      fsp.rm(path.join(this.dir, name), { force: true }),
+      fsp.rm(path.join(this.dir, `${name}.json`), { force: true }),
+    ]);
+  }
+
+  async evict() {
+    for (const name of this.entries.keys()) {
+      if (this.bytes <= this.maxBytes) break;
+      await this.remove(name);
+    }
+  }
+
+  /** Cached entry for key (LRU bumped), or null when absent or past maxAge */
+  async lookup(key) {
+    await this.init();
+    const name = this.nameFor(key);
+    const meta = this.entries.get(name);
+    if (!meta) return null;
+    if (Date.now() - meta.storedAt > this.maxAge) {
+      await this.remove(name);
+      return null;
+    }
+    this.entries.delete(name);
+    this.entries.set(name, meta);
+    return meta;
+  }
+
+  /** Write a web ReadableStream to disk under key; the entry appears once the body is complete */
+  async store(key, body, { contentType, lastModified }) {
+    await this.init();
+    const name = this.nameFor(key);
+    const tmp = path.join(this.dir, `${name}.${randomBytes(4).toString('hex')}.tmp`);
+    const hash = createHash('sha1');
+    let size = 0;
+    const meter = new Transform({
+      transform(chunk, _enc, done) {
+        hash.update(chunk);
+        size += chunk.length;
+        done(null, chunk);
+      },
+    });
+    try {
+      const handle = await fsp.open(tmp, 'w');
+      await pipeline(Readable.fromWeb(body), meter, handle.createWriteStream());
+      const meta = { name, key, size, contentType, lastModified, etag: `"${hash.digest('hex')}"`, storedAt: Date.now() };
+      if (size > this.maxBytes) throw new Error('Image larger than the cache');
+      await fsp.rename(tmp, path.join(this.dir, name));
+      await fsp.writeFile(path.join(this.dir, `${name}.json`), JSON.stringify(meta));
+      const previous = this.entries.get(name);
+      if (previous) {
+        this.entries.delete(name);
+        this.bytes -= previous.size;
+      }
+      this.track(meta);
+      await this.evict();
+      return meta;
+    } catch (err) {
+      await fsp.rm(tmp, { force: true });
+      throw err;
+    }
+  }
+
+  /**
+   * Answer an image request for key: 304 when the client copy is current,
+   * cached bytes streamed from disk, or the upstream body streamed through
+   * (and to disk). `fetchUpstream` returns a fetch Response; a non-2xx
+   * upstream answer is returned as null so the caller picks the error.
+   * `headers` are added to every answer (Vary of negotiated images).
+   */
+  async serve(req, key, fetchUpstream, { headers: extra = {} } = {}) {
+    const cached = await this.lookup(key);
+    if (cached) {
+      const headers = { ...validatorHeaders(cached), ...extra };
+      if (isNotModified(req, cached)) {
+        this.notModified++;
+        return new Response(null, { status: 304, headers });
+      }
+      try {
+        const handle = await fsp.open(path.join(this.dir, cached.name));
+        this.hits++;
+        return new Response(Readable.toWeb(handle.createReadStream()), {
+          status: 200,
+          headers: { ...headers, 'Content-Type': cached.contentType, 'Content-Length': String(cached.size) },
+        });
+      } catch {
+        await this.remove(cached.name); // evicted under our feet: refetch
+      }
+    }
+
+    this.misses++;
+    const res = await fetchUpstream();
+    if (!res.ok || !res.body) return null;
+    const contentType = res.headers.get('content-type') || 'image/jpeg';
+    const upstreamDate = Date.parse(res.headers.get('last-modified') || '');
+    const lastModified = new Date(Number.isNaN(upstreamDate) ? Date.now() : upstreamDate).toUTCString();
+
+    const [toClient, toDisk] = res.body.tee();
+    this.store(key, toDisk, { contentType, lastModified }).catch(err => {
+      console.error('[DagzFlix] Image cache write failed:', err.message);
+    });
+    const headers = { ...validatorHeaders({ lastModified }), ...extra, 'Content-Type': contentType };
+    if (res.headers.get('content-length')) headers['Content-Length'] = res.headers.get('content-length');
+    return new Response(toClient, { status: 200, headers });
+  }
+
+  /** Drop every entry, or only those whose key starts with prefix */
+  async clear(prefix = '') {
+    await this.init();
+    for (const [name, meta] of [...this.entries]) {
+      if (meta.key.startsWith(prefix)) await this.remove(name);
+    }
+  }
+
+  stats() {
+    return {
+      entries: this.entries.size,
+      bytes: this.bytes,
+      hits: this.hits,
+      misses: this.misses,
+      notModified: this.notModified,
+    };
+  }
+}
+
+function validatorHeaders(meta) {
+  const headers = {
+    'Cache-Control': CACHE_CONTROL,
+    'Access-Control-Allow-Origin': '*',
+    'Last-Modified': meta.lastModified,
+  };
+  if (meta.etag) headers.ETag = meta.etag;
+  return headers;
+}
+
+function isNotModified(req, meta) {
+  const ifNoneMatch = req.headers.get('if-none-match');
+  if (ifNoneMatch) {
+    return ifNoneMatch.split(',').some(tag => tag.trim().replace(/^W\//, '') === meta.etag || tag.trim() === '*');
+  }
+  const ifModifiedSince = Date.parse(req.headers.get('if-modified-since') || '');
+  return !Number.isNaN(ifModifiedSince) && ifModifiedSince >= Date.parse(meta.lastModified);
+}
@@ -0,0 +1,349 @@
+/* =================================================================
+   DagzFlix - Jellyfin reads shared by the BFF routes
+   Cached catalog reads, the catalog index and discover helpers, the
+   library and resume loaders, and the playback progress queue. Used by
+   the catch-all BFF route and by the home feed rows
+   (lib/server/home-feed), which the home route bundles on its own.
+   ================================================================= */
+
+import { createHash } from 'crypto';
+import { getDb, getConfig } from '@/lib/server/bff';
+import { responseCache, normalizeUrl } from '@/lib/server/response-cache';
+import { upstreamFetch, upstreamJson } from '@/lib/server/upstream';
+import { ProgressQueue } from '@/lib/server/progress-queue';
+import { timePhase, registerMetricsCollector, metricFamily } from '@/lib/server/metrics';
+import {
+  syncCatalog, getCatalogStatus, isCatalogStale, getCatalogSnapshot, startCatalogRefresher,
+} from '@/lib/server/catalog-index';
+import { startDiscoverRefresher, tmdbGenreNames } from '@/lib/server/discover-store';
+import { jellyfinImageUrl } from '@/lib/images';
+
+/* =================================================================
+   SERVER-SIDE RESPONSE CACHE
+   Catalog reads are shared between users: the key is the normalized
+   upstream URL (user id stripped) + the user's visibility scope, i.e.
+   a hash of the Jellyfin policy deciding which libraries they can see.
+   Per-user state (played / resume position) never lives in shared
+   entries: it is overlaid from a small per-user cache that progress
+   reports invalidate.
+   ================================================================= */
+
+// Per-route freshness (ttl) and stale-while-revalidate window (swr), in ms
+export const CACHE_POLICIES = {
+  genres: { ttl: 600000, swr: 3600000, timeout: 30000 },
+  detail: { ttl: 300000, swr: 1800000, timeout: 30000 },
+  similar: { ttl: 600000, swr: 3600000, timeout: 30000 },
+  seasons: { ttl: 300000, swr: 1800000, timeout: 30000 },
+  collection: { ttl: 3600000, swr: 86400000, timeout: 30000 },
+  library: { ttl: 120000, swr: 600000, timeout: 45000 },
+  userData: { ttl: 300000, swr: 0, timeout: 30000 },
+  resume: { ttl: 60000, swr: 0, timeout: 'heavy' },
+};
+
+/** Hash the parts of a Jellyfin user policy that decide which items the user can see */
+export function policyScope(policy) {
+  if (!policy) return null;
+  const visibility = {
+    allFolders: !!policy.EnableAllFolders,
+    folders: [...(policy.EnabledFolders || [])].sort(),
+    maxRating: policy.MaxParentalRating ?? null,
+    blockedTags: [...(policy.BlockedTags || [])].sort(),
+    allowedTags: [...(policy.AllowedTags || [])].sort(),
+    blockUnrated: [...(policy.BlockUnratedItems || [])].sort(),
+  };
+  return `scope:${createHash('sha1').update(JSON.stringify(visibility)).digest('hex').slice(0, 16)}`;
+}
+
+/** Visibility scope of a session (sessions created before scopes existed stay per-user) */
+export function visibilityScope(session) {
+  return session.visibilityScope || `user:${session.userId}`;
+}
+
+/** Fetch a Jellyfin JSON read through the shared cache of the session's visibility scope */
+export async function cachedJellyfinJson(url, session, policyName) {
+  const { ttl, swr, timeout } = CACHE_POLICIES[policyName];
+  const scope = visibilityScope(session);
+  const key = `${scope}|${normalizeUrl(url).split(session.jellyfinUserId).join('{user}')}`;
+  return responseCache.wrap(key, { ttl, swr, tags: ['jellyfin', scope] }, () => upstreamJson(
+    url,
+    { headers: { 'X-Emby-Token': session.jellyfinToken }, service: 'Jellyfin' },
+    { budget: timeout }
+  ));
+}
+
+/** Played / resume state for a set of items, cached per user (one light Ids= query for misses) */
+export async function getUserItemData(config, session, itemIds) {
+  const { ttl, timeout } = CACHE_POLICIES.userData;
+  const result = {};
+  const missing = [];
+  for (const id of itemIds) {
+    const cached = responseCache.get(`userdata|${session.userId}|${id}`);
+    if (cached) result[id] = cached;
+    else missing.push(id);
+  }
+  if (missing.length === 0) return result;
+
+  await progressQueue.settle(`${session.userId}|`);
+  const res = await upstreamFetch(
+    `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?Ids=${missing.join(',')}&Fields=&EnableImages=false`,
+    { headers: { 'X-Emby-Token': session.jellyfinToken } },
+    { budget: timeout, service: 'Jellyfin' }
+  );
+  if (!res.ok) return result;
+  const data = await res.json();
+  const byId = Object.fromEntries((data.Items || []).map(i => [i.Id, i.UserData || {}]));
+  for (const id of missing) {
+    result[id] = responseCache.set(`userdata|${session.userId}|${id}`, byId[id] || {}, { ttl, tags: [`user:${session.userId}`] });
+  }
+  return result;
+}
+
+/* =================================================================
+   CATALOG INDEX
+   Full Movie/Series catalog mirrored in MongoDB (lib/server/catalog-index).
+   Only sessions whose Jellyfin policy sees the whole server read from it;
+   restricted users keep querying Jellyfin with their own token.
+   ================================================================= */
+
+/** True when a Jellyfin policy sees every library without rating/tag filters */
+export function hasFullCatalogAccess(policy) {
+  if (!policy) return false;
+  return !!policy.EnableAllFolders
+    && policy.MaxParentalRating == null
+    && !(policy.BlockedTags || []).length
+    && !(policy.AllowedTags || []).length
+    && !(policy.BlockUnratedItems || []).length;
+}
+
+/** Start the per-process background refresher on first use */
+export function ensureCatalogRefresher() {
+  startCatalogRefresher(async () => ({ db: await getDb(), config: await getConfig() }));
+}
+
+/** Same for the Jellyseerr discover snapshots */
+export function ensureDiscoverRefresher() {
+  startDiscoverRefresher(async () => ({ db: await getDb(), config: await getConfig() }));
+}
+
+/**
+ * Catalog snapshot usable for this session, or null (restricted user, index not built yet).
+ * Kicks off a background sync when the index is missing or stale; without a server
+ * API key the sync reads through the session's own token.
+ */
+export async function catalogForSession(db, config, session) {
+  ensureCatalogRefresher();
+  if (!session.fullCatalogAccess) return null;
+  const snap = await timePhase('mongo', () => getCatalogSnapshot(db));
+  if (!snap || !config.jellyfinApiKey) {
+    const status = await timePhase('mongo', () => getCatalogStatus(db));
+    if (!status.running && isCatalogStale(status)) {
+      syncCatalog(db, config, { auth: { token: session.jellyfinToken, userId: session.jellyfinUserId } })
+        .catch(err => console.error('[DagzFlix] Catalog sync error:', err.message));
+    }
+  }
+  return snap;
+}
+
+/** Ids of everything the user has played (one light query, cached per user) */
+export async function getPlayedIds(config, session) {
+  const { ttl, timeout } = CACHE_POLICIES.userData;
+  return responseCache.wrap(`played|${session.userId}`, { ttl, tags: [`user:${session.userId}`] }, async () => {
+    const data = await fetchJsonWithin(
+      `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?IsPlayed=true&Recursive=true&IncludeItemTypes=Movie,Series&Fields=&EnableImages=false&EnableUserData=false`,
+      { 'X-Emby-Token': session.jellyfinToken },
+      timeout
+    );
+    return (data.Items || []).map(i => i.Id);
+  });
+}
+
+/* =================================================================
+   BUG 4 FIX: TMDB Genre ID → Name mapping
+   Allows DagzRank to score TMDB objects (genreIds) alongside
+   Jellyfin objects (Genres as string names). The mapping lives in
+   lib/server/discover-store, which resolves discover results up front.
+   ================================================================= */
+
+/** Resolve genres from any source: Jellyfin (string[]), TMDB (genreIds number[]), or both */
+export function resolveGenres(item) {
+  // Priority 1: Jellyfin string genres
+  const stringGenres = item.genres || item.Genres || [];
+  if (stringGenres.length > 0 && typeof stringGenres[0] === 'string') {
+    return stringGenres;
+  }
+  // Priority 2: TMDB genreIds → resolve to names
+  const genreIds = item.genreIds || item.genre_ids || [];
+  if (genreIds.length > 0) {
+    return tmdbGenreNames(genreIds);
+  }
+  // Priority 3: if stringGenres contains objects like { id, name }
+  if (stringGenres.length > 0 && typeof stringGenres[0] === 'object') {
+    return stringGenres.map(g => g.name || g.Name).filter(Boolean);
+  }
+  return [];
+}
+
+
+/** Fetch JSON within a deadline budget; rejects on timeout, network error, open breaker or non-2xx */
+export function fetchJsonWithin(url, headers, budgetMs) {
+  const service = headers['X-Api-Key'] ? 'Jellyseerr' : 'Jellyfin';
+  return upstreamJson(url, { headers, service }, { budget: budgetMs });
+}
+
+/* =================================================================
+   LIBRARY AND RESUME LOADERS
+   ================================================================= */
+
+// Library projections: Jellyfin Fields requested and item shape returned.
+// 'card' is what a poster grid renders; 'detail' is the historical full shape (default).
+export const LIBRARY_PROJECTIONS = {
+  card: {
+    fields: 'PrimaryImageAspectRatio',
+    imageTypes: 'Primary',
+    map: (item, userData) => ({
+      id: item.Id,
+      name: item.Name,
+      type: item.Type,
+      year: item.ProductionYear || '',
+      communityRating: item.CommunityRating || 0,
+      posterUrl: jellyfinImageUrl(item.Id, 'Primary'),
+      isPlayed: userData?.Played || false,
+      playbackPositionTicks: userData?.PlaybackPositionTicks || 0,
+    }),
+  },
+  detail: {
+    fields: 'Overview,Genres,CommunityRating,OfficialRating,PremiereDate,RunTimeTicks,People,ProviderIds,MediaSources',
+    imageTypes: 'Primary,Backdrop,Thumb',
+    map: (item, userData) => ({
+      id: item.Id,
+      name: item.Name,
+      type: item.Type,
+      overview: item.Overview || '',
+      genres: item.Genres || [],
+      communityRating: item.CommunityRating || 0,
+      officialRating: item.OfficialRating || '',
+      premiereDate: item.PremiereDate || '',
+      year: item.ProductionYear || '',
+      runtime: item.RunTimeTicks ? Math.round(item.RunTimeTicks / 600000000) : 0,
+      posterUrl: jellyfinImageUrl(item.Id, 'Primary'),
+      backdropUrl: jellyfinImageUrl(item.Id, 'Backdrop'),
+      thumbUrl: jellyfinImageUrl(item.Id, 'Thumb'),
+      people: (item.People || []).slice(0, 5).map(p => ({ name: p.Name, role: p.Role, type: p.Type })),
+      providerIds: item.ProviderIds || {},
+      hasSubtitles: item.HasSubtitles || false,
+      isPlayed: userData?.Played || false,
+      playbackPositionTicks: userData?.PlaybackPositionTicks || 0,
+      mediaSources: (item.MediaSources || []).length > 0,
+    }),
+  },
+};
+
+/** One slice of the library in the requested projection: { items, total } */
+export async function loadLibraryPage(config, session, query, startIndex, limit) {
+  const projection = LIBRARY_PROJECTIONS[query.fields];
+  const endpoint = `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items`;
+  const params = new URLSearchParams({
+    IncludeItemTypes: query.type,
+    Limit: String(limit),
+    StartIndex: String(startIndex),
+    SortBy: query.sortBy,
+    SortOrder: query.sortOrder,
+    Recursive: 'true',
+    Fields: projection.fields,
+    ImageTypeLimit: '1',
+    EnableImageTypes: projection.imageTypes,
+  });
+
+  if (query.genreIds) params.set('GenreIds', query.genreIds);
+  if (query.searchTerm) params.set('SearchTerm', query.searchTerm);
+
+  let data;
+  if (query.sortBy.includes('Random')) {
+    data = await upstreamJson(
+      `${endpoint}?${params.toString()}`,
+      { headers: { 'X-Emby-Token': session.jellyfinToken }, service: 'Jellyfin' },
+      { budget: 'heavy' } // BUG 3 FIX: 15s → 45s (heavy query)
+    );
+  } else {
+    // Shared between users of the same visibility scope; user state is overlaid below
+    params.set('EnableUserData', 'false');
+    data = await cachedJellyfinJson(`${endpoint}?${params.toString()}`, session, 'library');
+  }
+  const userData = await getUserItemData(config, session, (data.Items || []).map(i => i.Id));
+
+  // Transform items to include proxy image URLs
+  const items = timePhase('transform', () => (data.Items || []).map(item => projection.map(item, userData[item.Id] || item.UserData)));
+  return { items, total: data.TotalRecordCount || 0 };
+}
+
+/** The user's resume row, cached per user until a progress report changes it (or prefetched at login) */
+export function loadResumeItems(config, session) {
+  const { ttl, timeout } = CACHE_POLICIES.resume;
+  return responseCache.wrap(`resume|${session.userId}`, { ttl, tags: [`user:${session.userId}`] }, async () => {
+    const data = await upstreamJson(
+      `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items/Resume?Limit=20&Recursive=true&Fields=Overview,Genres,CommunityRating,PremiereDate,RunTimeTicks,MediaSources&MediaTypes=Video&ImageTypeLimit=1&EnableImageTypes=Primary,Backdrop,Thumb`,
+      { headers: { 'X-Emby-Token': session.jellyfinToken }, service: 'Jellyfin' },
+      { budget: timeout } // BUG 3 FIX: 10s → 45s (heavy query)
+    );
+    return (data.Items || []).map(item => ({
+      id: item.Id,
+      name: item.Name,
+      type: item.Type,
+      seriesName: item.SeriesName || '',
+      overview: item.Overview || '',
+      genres: item.Genres || [],
+      communityRating: item.CommunityRating || 0,
+      year: item.ProductionYear || '',
+      runtime: item.RunTimeTicks ? Math.round(item.RunTimeTicks / 600000000) : 0,
+      posterUrl: jellyfinImageUrl(item.Id, 'Primary'),
+      backdropUrl: jellyfinImageUrl(item.Id, 'Backdrop'),
+      thumbUrl: jellyfinImageUrl(item.Id, 'Thumb'),
+      playbackPositionTicks: item.UserData?.PlaybackPositionTicks || 0,
+      playbackPercentage: item.UserData?.PlayedPercentage || 0,
+    }));
+  });
+}
+
+/* =================================================================
+   PLAYBACK PROGRESS QUEUE
+   Progress reports are coalesced per (user, item) and flushed on an
+   interval (lib/server/progress-queue); start/stop go out at once.
+   Reads of a user's played / resume state settle the queue first.
+   ================================================================= */
+
+/** POST one playback report to Jellyfin (204 No Content on success) */
+async function sendPlaybackReport({ url, token, body }) {
+  const res = await upstreamFetch(url, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-Emby-Token': token,
+    },
+    body: JSON.stringify(body),
+  }, { service: 'Jellyfin', priority: 'playback' }); // interval flushes run outside any request
+  if (!res.ok && res.status !== 204) {
+    console.error(`[DagzFlix] Progress report failed: ${res.status}`);
+    throw new Error(`Jellyfin responded with ${res.status}`);
+  }
+}
+
+// One queue per process: the routes that settle it are bundled apart from the one filling it
+export const progressQueue = globalThis.__dagzflixProgress || (globalThis.__dagzflixProgress = new ProgressQueue({
+  send: sendPlaybackReport,
+  flushInterval: parseInt(process.env.PROGRESS_FLUSH_INTERVAL_MS || '30000'),
+  concurrency: parseInt(process.env.PROGRESS_FLUSH_CONCURRENCY || '8'),
+}));
+
+registerMetricsCollector('progress-queue', () => {
+  const st = progressQueue.stats();
+  return [
+    ...metricFamily('dagzflix_progress_reports_total', 'counter', 'Playback reports by outcome', [
+      [{ outcome: 'received' }, st.received],
+      [{ outcome: 'coalesced' }, st.coalesced],
+      [{ outcome: 'sent' }, st.sent],
+      [{ outcome: 'failed' }, st.failed],
+    ]),
+    ...metricFamily('dagzflix_progress_pending', 'gauge', 'Progress reports waiting for the next flush', [[{}, st.pending]]),
+  ];
+});
+
@@ -0,0 +1,136 @@
+/* =================================================================
+   DagzFlix - Smart Button status resolution
+   Resolves the status of many { id, tmdbId, mediaType } tuples at once:
+   - Jellyfin availability for every id in a single Ids= query
+   - Jellyseerr status for items Jellyfin does not have: one cached
+     movie / tv lookup per TMDB id, at most STATUS_SEERR_CONCURRENCY in
+     flight. All Jellyseerr entries carry tag 'seerr'.
+   Used by /api/media/status (one tuple), /api/media/status/batch and the
+   status section of /api/media/detail. The cached Jellyseerr discover
+   pages live here too (pages beyond the discover snapshot store).
+   ================================================================= */
+
+import { responseCache } from '@/lib/server/response-cache';
+import { upstreamJson } from '@/lib/server/upstream';
+
+export const STATUS_BATCH_MAX = 100;
+
+const JELLYFIN_ID = /^[0-9a-f]{32}$|^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i;
+const SEERR_CONCURRENCY = parseInt(process.env.STATUS_SEERR_CONCURRENCY || '6');
+// Jellyseerr data is global: one entry serves every user, dropped on media requests
+const SEERR_MEDIA_POLICY = { ttl: 60000, swr: 300000, timeout: 30000 };
+const SEERR_DISCOVER_POLICY = { ttl: 300000, swr: 1800000, timeout: 30000 };
+
+/** Run fn over items with at most `limit` calls in flight; results keep the input order */
+export async function mapWithConcurrency(items, limit, fn) {
+  const results = new Array(items.length);
+  let next = 0;
+  const worker = async () => {
+    while (next < items.length) {
+      const idx = next++;
+      results[idx] = await fn(items[idx], idx);
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, worker));
+  return results;
+}
+
+/** Smart Button status from Jellyfin availability + Jellyseerr mediaInfo.status */
+export function smartButtonStatus(jellyfinAvailable, jellyseerrStatus) {
+  if (jellyfinAvailable) return 'available'; // -> Play button
+  if (jellyseerrStatus === 2 || jellyseerrStatus === 3) return 'pending'; // -> "En cours d'acquisition"
+  if (jellyseerrStatus === 4) return 'partial'; // -> Partially available
+  if (jellyseerrStatus === 5) return 'available'; // Available via Jellyseerr
+  return 'not_available'; // -> Request button
+}
+
+/** Ids (among itemIds) that Jellyfin can play for this user, in one Ids= query */
+async function playableJellyfinIds(config, session, itemIds) {
+  if (itemIds.length === 0) return new Set();
+  try {
+    const data = await upstreamJson(
+      `${config.jellyfinUrl}/Users/${session.jellyfinUserId}/Items?Ids=${itemIds.join(',')}&Fields=MediaSources&EnableImages=false&EnableUserData=false`,
+      { headers: { 'X-Emby-Token': session.jellyfinToken }, service: 'Jellyfin' }
+    );
+    return new Set((data.Items || []).filter(i => (i.MediaSources || []).length > 0).map(i => i.Id));
+  } catch (e) {
+    return new Set(); // Jellyfin unreachable or failing
+  }
+}
+
+/**
+ * Jellyseerr movie / tv details of one TMDB id (mediaInfo, relatedVideos,
+ * collection...), cached: the detail page's trailer and collection sections
+ * read the same entry as the status lookup.
+ */
+export function jellyseerrDetails(config, mediaType, tmdbId) {
+  const endpoint = mediaType === 'tv' ? 'tv' : 'movie';
+  const { ttl, swr, timeout } = SEERR_MEDIA_POLICY;
+  return responseCache.wrap(`seerr|${endpoint}/${tmdbId}`, { ttl, swr, tags: ['seerr'] }, () => upstreamJson(
+    `${config.jellyseerrUrl}/api/v1/${endpoint}/${tmdbId}`,
+    { headers: { 'X-Api-Key': config.jellyseerrApiKey }, service: 'Jellyseerr' },
+    { budget: timeout }
+  ));
+}
+
+/**
+ * One Jellyseerr discover page (endpoint 'movies' or 'tv'), cached for every
+ * user. The first pages are usually served by the snapshot store
+ * (lib/server/discover-store); this covers the pages beyond it.
+ */
+export function jellyseerrDiscover(config, endpoint, page = 1, budget = SEERR_DISCOVER_POLICY.timeout) {
+  const { ttl, swr } = SEERR_DISCOVER_POLICY;
+  return responseCache.wrap(`seerr|discover/${endpoint}?page=${page}`, { ttl, swr, tags: ['seerr'] }, () => upstreamJson(
+    `${config.jellyseerrUrl}/api/v1/discover/${endpoint}?page=${page}`,
+    { headers: { 'X-Api-Key': config.jellyseerrApiKey }, service: 'Jellyseerr' },
+    { budget }
+  ));
+}
+
+/** Jellyseerr mediaInfo.status for one TMDB id (null when unknown or unreachable) */
+async function jellyseerrMediaStatus(config, mediaType, tmdbId) {
+  try {
+    const data = await jellyseerrDetails(config, mediaType, tmdbId);
+    return data.mediaInfo?.status || null;
+  } catch (e) {
+    return null; // Jellyseerr unreachable
+  }
+}
+
+/**
+ * Resolve Smart Button statuses for a list of { id, tmdbId, mediaType } tuples.
+ * Returns one { id, tmdbId, mediaType, status, jellyfinAvailable, jellyseerrStatus }
+ * per tuple, in input order.
+ */
+export async function resolveMediaStatuses(config, session, tuples) {
+  // Only Jellyfin GUIDs: TMDB-only results carry numeric ids that Jellyfin would reject
+  const ids = [...new Set(tuples.map(t => String(t.id || '')).filter(id => JELLYFIN_ID.test(id)))];
+  const playable = await playableJellyfinIds(config, session, ids);
+
+  const seerrKeys = new Map(); // `${type}/${tmdbId}` -> Jellyseerr mediaInfo.status
+  for (const t of tuples) {
+    if (/^\d+$/.test(String(t.tmdbId || '')) && config.jellyseerrUrl && !playable.has(String(t.id))) {
+      seerrKeys.set(`${t.mediaType === 'tv' ? 'tv' : 'movie'}/${t.tmdbId}`, null);
+    }
+  }
+  const keys = [...seerrKeys.keys()];
+  const seerrStatuses = await mapWithConcurrency(keys, SEERR_CONCURRENCY, key => {
+    const [mediaType, tmdbId] = key.split('/');
+    return jellyseerrMediaStatus(config, mediaType, tmdbId);
+  });
+  keys.forEach((key, idx) => seerrKeys.set(key, seerrStatuses[idx]));
+
+  return tuples.map(t => {
+    const mediaType = t.mediaType === 'tv' ? 'tv' : 'movie';
+    const jellyfinAvailable = !!t.id && playable.has(String(t.id));
+    const jellyseerrStatus = seerrKeys.get(`${mediaType}/${t.tmdbId}`) ?? null;
+    return {
+      id: t.id || null,
+      tmdbId: t.tmdbId || null,
+      mediaType,
+      status: smartButtonStatus(jellyfinAvailable, jellyseerrStatus),
+      jellyfinAvailable,
+      jellyseerrStatus,
+    };
+  });
+}
@@ -0,0 +1,173 @@
+/* =================================================================
+   DagzFlix - Request timing and metrics
+   Every BFF handler opens a timing context (beginRequestTiming); the
+   shared plumbing records phases into it as the request runs:
+   - mongo        session / config / preferences / catalog reads (cache misses)
+   - jellyfin, jellyseerr, tmdb   upstream calls (lib/server/upstream)
+   - transform    mapping / scoring of upstream data
+   - index        search index sync and lookups (lib/server/search-index)
+   - serialize    JSON encoding of the response
+   The response carries a Server-Timing header; durations are aggregated
+   into Prometheus histograms served by /api/metrics.
+   ================================================================= */
+
+import { AsyncLocalStorage } from 'async_hooks';
+
+// Histogram buckets (seconds)
+const BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+
+class Histogram {
+  constructor(name, help, labelNames) {
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.series = new Map(); // label values joined -> { labels, counts, sum, count }
+  }
+
+  observe(labels, seconds) {
+    const key = this.labelNames.map(n => labels[n]).join('\u0000');
+    let series = this.series.get(key);
+    if (!series) {
+      series = { labels, counts: new Array(BUCKETS.length).fill(0), sum: 0, count: 0 };
+      this.series.set(key, series);
+    }
+    const idx = BUCKETS.findIndex(le => seconds <= le);
+    if (idx >= 0) series.counts[idx]++;
+    series.sum += seconds;
+    series.count++;
+  }
+
+  render() {
+    const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} histogram`];
+    for (const { labels, counts, sum, count } of this.series.values()) {
+      const base = this.labelNames.map(n => `${n}="${escapeLabel(labels[n])}"`).join(',');
+      let cumulative = 0;
+      BUCKETS.forEach((le, idx) => {
+        cumulative += counts[idx];
+        lines.push(`${this.name}_bucket{${base},le="${le}"} ${cumulative}`);
+      });
+      lines.push(`${this.name}_bucket{${base},le="+Inf"} ${count}`);
+      lines.push(`${this.name}_sum{${base}} ${sum}`);
+      lines.push(`${this.name}_count{${base}} ${count}`);
+    }
+    return lines.join('\n');
+  }
+}
+
+function escapeLabel(value) {
+  return String(value ?? '').replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+}
+
+// One registry per process: App Router routes are bundled separately, so it
+// lives on globalThis for /api/metrics to see what the catch-all recorded
+const registry = globalThis.__dagzflixMetrics || (globalThis.__dagzflixMetrics = {
+  requests: new Histogram('dagzflix_request_duration_seconds', 'BFF request latency by route and status', ['route', 'method', 'status']),
+  phases: new Histogram('dagzflix_phase_duration_seconds', 'Wall time per request phase (concurrent calls counted once)', ['route', 'method', 'phase']),
+  collectors: new Map(), // name -> () => Prometheus text lines
+  storage: new AsyncLocalStorage(),
+});
+
+/** Open the timing context of the current request; call first thing in a handler */
+export function beginRequestTiming(route, req) {
+  registry.storage.enterWith({
+    route,
+    method: req?.method || 'GET',
+    start: performance.now(),
+    phases: new Map(),
+    done: false,
+  });
+}
+
+/** Route of the current request (as passed to beginRequestTiming), null outside a request */
+export function currentRoute() {
+  return registry.storage.getStore()?.route || null;
+}
+
+/** Phase accounting: wall time during which at least one call of the phase was running */
+function enterPhase(timing, phase) {
+  let entry = timing.phases.get(phase);
+  if (!entry) {
+    entry = { ms: 0, calls: 0, running: 0, since: 0 };
+    timing.phases.set(phase, entry);
+  }
+  if (entry.running++ === 0) entry.since = performance.now();
+  entry.calls++;
+  return () => {
+    if (--entry.running === 0) entry.ms += performance.now() - entry.since;
+  };
+}
+
+/**
+ * Run fn (sync or async) as a phase of the current request; no-op outside a
+ * request. Concurrent calls of one phase count once (wall time, not the sum).
+ */
+export function timePhase(phase, fn) {
+  const timing = registry.storage.getStore();
+  if (!timing || timing.done) return fn();
+  const record = enterPhase(timing, phase);
+  let result;
+  try {
+    result = fn();
+  } catch (err) {
+    record();
+    throw err;
+  }
+  if (result && typeof result.then === 'function') {
+    return result.finally(record);
+  }
+  record();
+  return result;
+}
+
+/** Run fn outside of any request timing: background work started by a handler is not its phases */
+export function runDetached(fn) {
+  return registry.storage.exit(fn);
+}
+
+/** Close the request's timing: record the histograms and set Server-Timing on the response */
+export function finishRequestTiming(response) {
+  const timing = registry.storage.getStore();
+  if (!timing || timing.done || !response) return response;
+  timing.done = true;
+  const total = performance.now() - timing.start;
+  const entries = [];
+  for (const [phase, { ms: spent, calls, running, since }] of timing.phases) {
+    const ms = running > 0 ? spent + performance.now() - since : spent; // still running: background work
+    registry.phases.observe({ route: timing.route, method: timing.method, phase }, ms / 1000);
+    entries.push(`${phase};dur=${ms.toFixed(1)}${calls > 1 ? `;desc="${calls} calls"` : ''}`);
+  }
+  entries.push(`total;dur=${total.toFixed(1)}`);
+  registry.requests.observe({ route: timing.route, method: timing.method, status: String(response.status) }, total / 1000);
+  try {
+    response.headers.set('Server-Timing', entries.join(', '));
+  } catch { /* immutable headers (upstream Response passed through) */ }
+  return response;
+}
+
+/** Add gauges/counters rendered at scrape time; fn returns Prometheus text lines */
+export function registerMetricsCollector(name, fn) {
+  registry.collectors.set(name, fn);
+}
+
+/** Prometheus text exposition of every histogram and collector */
+export function renderMetrics() {
+  const parts = [registry.requests.render(), registry.phases.render()];
+  for (const [name, collect] of registry.collectors) {
+    try {
+      parts.push(collect().join('\n'));
+    } catch (err) {
+      console.error(`[DagzFlix] Metrics collector ${name} failed:`, err.message);
+    }
+  }
+  return `${parts.filter(Boolean).join('\n')}\n`;
+}
+
+/** Lines of a counter or gauge family: samples = [[labels, value], ...] */
+export function metricFamily(name, type, help, samples) {
+  const lines = [`# HELP ${name} ${help}`, `# TYPE ${name} ${type}`];
+  for (const [labels, value] of samples) {
+    const rendered = Object.entries(labels).map(([k, v]) => `${k}="${escapeLabel(v)}"`).join(',');
+    lines.push(`${name}${rendered ? `{${rendered}}` : ''} ${Number(value) || 0}`);
+  }
+  return lines;
+}
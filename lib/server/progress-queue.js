@@ -0,0 +1,106 @@
+/* =================================================================
+   DagzFlix - Playback progress queue
+   Progress reports are acknowledged at once and coalesced per key
+   (user + item): only the latest position is kept, and queued reports
+   are flushed upstream on an interval with bounded concurrency.
+   Start/stop events skip the queue (sent immediately, ahead of queued
+   flushes) and replace the unsent progress of their key. Sends for one
+   key never overlap, so a late progress flush cannot land after a stop.
+   ================================================================= */
+
+export class ProgressQueue {
+  constructor({ send, flushInterval = 30000, concurrency = 8 }) {
+    this.send = send; // async (report) => void, throws on failure
+    this.flushInterval = flushInterval;
+    this.concurrency = concurrency;
+    this.pending = new Map(); // key -> latest unsent report
+    this.inflight = new Map(); // key -> promise of the last send for that key
+    this.active = 0;
+    this.waiting = [];
+    this.timer = null;
+    this.counters = { received: 0, coalesced: 0, sent: 0, failed: 0 };
+  }
+
+  /** Queue a progress report, replacing any unsent report for the same key */
+  enqueue(key, report) {
+    this.counters.received++;
+    if (this.pending.has(key)) this.counters.coalesced++;
+    this.pending.set(key, report);
+    this.startTimer();
+  }
+
+  /** Send a start/stop event now; the unsent progress of that key is superseded */
+  sendNow(key, report) {
+    this.counters.received++;
+    this.pending.delete(key);
+    return this.dispatch(key, report, true);
+  }
+
+  /** Send every queued report whose key starts with prefix, and wait for its in-flight sends */
+  settle(prefix) {
+    const waits = [];
+    for (const [key, report] of [...this.pending]) {
+      if (!key.startsWith(prefix)) continue;
+      this.pending.delete(key);
+      waits.push(this.dispatch(key, report, true));
+    }
+    for (const [key, promise] of this.inflight) {
+      if (key.startsWith(prefix)) waits.push(promise);
+    }
+    return Promise.allSettled(waits);
+  }
+
+  /** Send everything queued (interval tick) */
+  flush() {
+    const batch = [...this.pending];
+    this.pending.clear();
+    return Promise.allSettled(batch.map(([key, report]) => this.dispatch(key, report, false)));
+  }
+
+  dispatch(key, report, urgent) {
+    const previous = this.inflight.get(key) || Promise.resolve();
+    const promise = previous
+      .catch(() => { /* the previous report's failure is already counted */ })
+      .then(() => this.withSlot(() => this.send(report), urgent));
+    this.inflight.set(key, promise);
+    promise
+      .then(() => { this.counters.sent++; }, () => { this.counters.failed++; })
+      .finally(() => {
+        if (this.inflight.get(key) === promise) this.inflight.delete(key);
+      });
+    return promise;
+  }
+
+  /** Run fn under the concurrency cap; urgent work jumps ahead of queued flushes */
+  async withSlot(fn, urgent) {
+    if (this.active < this.concurrency) {
+      this.active++;
+    } else {
+      await new Promise(resolve => (urgent ? this.waiting.unshift(resolve) : this.waiting.push(resolve)));
+    }
+    try {
+      return await fn();
+    } finally {
+      const next = this.waiting.shift();
+      if (next) next(); // hand the slot over
+      else this.active--;
+    }
+  }
+
+  startTimer() {
+    if (this.timer) return;
+    this.timer = setInterval(() => {
+      if (this.pending.size === 0) {
+        clearInterval(this.timer);
+        this.timer = null;
+        return;
+      }
+      this.flush();
+    }, this.flushInterval);
+    this.timer.unref?.();
+  }
+
+  stats() {
+    return { ...this.counters, pending: this.pending.size, inflight: this.inflight.size, active: this.active };
+  }
+}
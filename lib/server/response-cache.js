@@ -0,0 +1,194 @@
+/* =================================================================
+   DagzFlix - Server-side Response Cache
+   Memory-bounded LRU shared by every request hitting this BFF process.
+   - Per-entry TTL + stale-while-revalidate window
+   - Bounded by entry count AND approximate byte size
+   - Tag-based invalidation (e.g. 'user:<id>', 'seerr')
+   - Identical in-flight loads share one promise; an invalidation
+     matching a load in flight detaches it: its result is returned to
+     the callers already waiting but not stored, and the next read
+     starts a new load
+   ================================================================= */
+
+import { registerMetricsCollector, metricFamily } from '@/lib/server/metrics';
+
+function estimateBytes(value) {
+  try {
+    return Buffer.byteLength(JSON.stringify(value) || '');
+  } catch {
+    return 1024;
+  }
+}
+
+export class ResponseCache {
+  constructor({ maxEntries = 5000, maxBytes = 64 * 1024 * 1024 } = {}) {
+    this.maxEntries = maxEntries;
+    this.maxBytes = maxBytes;
+    this.entries = new Map(); // insertion order = LRU order (oldest first)
+    this.inflight = new Map(); // key -> { promise, tags, detached }
+    this.bytes = 0;
+    this.hits = 0;
+    this.staleHits = 0;
+    this.misses = 0;
+  }
+
+  /** Raw lookup: { value, fresh } or null when absent or past its stale window */
+  peek(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return null;
+    const now = Date.now();
+    if (now > entry.staleUntil) {
+      this.remove(key);
+      return null;
+    }
+    // Refresh LRU position
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return { value: entry.value, fresh: now <= entry.expiresAt };
+  }
+
+  get(key) {
+    const hit = this.peek(key);
+    return hit?.fresh ? hit.value : undefined;
+  }
+
+  set(key, value, { ttl = 60000, swr = 0, tags = [] } = {}) {
+    this.remove(key);
+    const size = estimateBytes(value) + key.length;
+    if (size > this.maxBytes) return value;
+    const now = Date.now();
+    this.entries.set(key, { value, size, tags, expiresAt: now + ttl, staleUntil: now + ttl + swr });
+    this.bytes += size;
+    this.evict();
+    return value;
+  }
+
+  /** Drop the entry of key and detach its load in flight */
+  delete(key) {
+    const load = this.inflight.get(key);
+    if (load) this.detach(key, load);
+    return this.remove(key) || !!load;
+  }
+
+  /** Drop the stored entry only (expiry, eviction, overwrite) */
+  remove(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+    this.entries.delete(key);
+    this.bytes -= entry.size;
+    return true;
+  }
+
+  /** A load whose key was invalidated while it ran: not stored, not shared with later reads */
+  detach(key, load) {
+    load.detached = true;
+    this.inflight.delete(key);
+  }
+
+  evict() {
+    for (const key of this.entries.keys()) {
+      if (this.entries.size <= this.maxEntries && this.bytes <= this.maxBytes) break;
+      this.remove(key);
+    }
+  }
+
+  /**
+   * Return the cached value for key, or load it.
+   * Fresh hit -> cached value. Stale hit (within swr) -> cached value + background refresh.
+   * Miss -> await loader(); concurrent misses for the same key share one load.
+   * Loader results are not cached when the loader throws.
+   */
+  async wrap(key, { ttl, swr, tags } = {}, loader) {
+    const hit = this.peek(key);
+    if (hit?.fresh) {
+      this.hits++;
+      return hit.value;
+    }
+    if (hit) {
+      this.staleHits++;
+      this.load(key, { ttl, swr, tags }, loader).catch(() => { /* keep serving stale */ });
+      return hit.value;
+    }
+    this.misses++;
+    return this.load(key, { ttl, swr, tags }, loader);
+  }
+
+  load(key, options, loader) {
+    if (this.inflight.has(key)) return this.inflight.get(key).promise;
+    const load = { tags: options?.tags || [], detached: false };
+    load.promise = Promise.resolve()
+      .then(loader)
+      .then(value => (load.detached ? value : this.set(key, value, options)))
+      .finally(() => {
+        if (this.inflight.get(key) === load) this.inflight.delete(key);
+      });
+    this.inflight.set(key, load);
+    return load.promise;
+  }
+
+  /** Drop every entry carrying the given tag, and detach the loads in flight that would store one */
+  invalidateTag(tag) {
+    let removed = 0;
+    for (const [key, entry] of this.entries) {
+      if (entry.tags.includes(tag) && this.remove(key)) removed++;
+    }
+    for (const [key, load] of [...this.inflight]) {
+      if (load.tags.includes(tag)) this.detach(key, load);
+    }
+    return removed;
+  }
+
+  /** Drop every entry whose key starts with prefix, and detach the matching loads in flight */
+  invalidatePrefix(prefix) {
+    let removed = 0;
+    for (const key of [...this.entries.keys()]) {
+      if (key.startsWith(prefix) && this.remove(key)) removed++;
+    }
+    for (const [key, load] of [...this.inflight]) {
+      if (key.startsWith(prefix)) this.detach(key, load);
+    }
+    return removed;
+  }
+
+  clear() {
+    this.entries.clear();
+    this.bytes = 0;
+    for (const [key, load] of [...this.inflight]) this.detach(key, load);
+  }
+
+  stats() {
+    return {
+      entries: this.entries.size,
+      bytes: this.bytes,
+      hits: this.hits,
+      staleHits: this.staleHits,
+      misses: this.misses,
+      inflight: this.inflight.size,
+    };
+  }
+}
+
+/** Normalize an upstream URL so equivalent requests share a cache key (sorted query params) */
+export function normalizeUrl(rawUrl) {
+  const url = new URL(rawUrl);
+  url.searchParams.sort();
+  return `${url.origin}${url.pathname.replace(/\/+$/, '')}?${url.searchParams.toString()}`;
+}
+
+// Process-wide instance shared by the catch-all API route and the dedicated routes (bundled
+// separately): an invalidation made by one route must reach the entries the others read
+export const responseCache = globalThis.__dagzflixResponseCache || (globalThis.__dagzflixResponseCache = new ResponseCache({
+  maxEntries: parseInt(process.env.RESPONSE_CACHE_MAX_ENTRIES || '5000'),
+  maxBytes: parseInt(process.env.RESPONSE_CACHE_MAX_MB || '64') * 1024 * 1024,
+}));
+
+registerMetricsCollector('response-cache', () => {
+  const st = responseCache.stats();
+  return [
+    ...metricFamily('dagzflix_response_cache_hits_total', 'counter', 'Response cache fresh hits', [[{}, st.hits]]),
+    ...metricFamily('dagzflix_response_cache_stale_hits_total', 'counter', 'Response cache stale hits (served while revalidating)', [[{}, st.staleHits]]),
+    ...metricFamily('dagzflix_response_cache_misses_total', 'counter', 'Response cache misses', [[{}, st.misses]]),
+    ...metricFamily('dagzflix_response_cache_entries', 'gauge', 'Response cache entries', [[{}, st.entries]]),
+    ...metricFamily('dagzflix_response_cache_bytes', 'gauge', 'Approximate response cache size', [[{}, st.bytes]]),
+  ];
+});
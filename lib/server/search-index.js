@@ -0,0 +1,429 @@
+/* =================================================================
+   DagzFlix - Search Index
+   In-memory inverted index answering search before Jellyseerr is asked:
+   - local   the catalog index snapshot (owned content), synced
+             incrementally when the snapshot version changes: only
+             added / changed / removed items touch the postings
+   - tmdb    TMDB results recently returned by Jellyseerr search and
+             discover (bounded LRU with a TTL, their request status ages)
+   Matching per query word: exact (3), prefix (2, as-you-type), or one
+   typo (1: insertion, deletion, substitution or transposition, words of
+   TYPO_MIN_LENGTH+ letters) through a deletion neighbourhood, so no scan
+   of the vocabulary. Every word must match. Genre / type / year facets
+   are counted over the whole match set, each one ignoring its own filter.
+   ================================================================= */
+
+import { timePhase, registerMetricsCollector, metricFamily } from '@/lib/server/metrics';
+import { resolveGenres } from '@/lib/server/library';
+import { jellyfinImageUrl, tmdbImageUrl } from '@/lib/images';
+
+const REMOTE_MAX = parseInt(process.env.SEARCH_REMOTE_MAX || '2000');
+const REMOTE_TTL_MS = parseInt(process.env.SEARCH_REMOTE_TTL_MS || '21600000');
+const TYPO_MIN_LENGTH = 4;
+// Vocabulary words a short prefix may expand to ("a" must not walk the whole index)
+const PREFIX_EXPANSION_MAX = 200;
+const FACET_LIMIT = 30;
+
+const WEIGHT_EXACT = 3;
+const WEIGHT_PREFIX = 2;
+const WEIGHT_TYPO = 1;
+
+/** Lowercase, accent-free words of a text */
+export function tokenize(text) {
+  return String(text || '')
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+    .split(/[^\p{L}\p{N}]+/u)
+    .filter(Boolean);
+}
+
+/** Variants of a word with one letter removed */
+function deletions(word) {
+  const out = new Set();
+  for (let i = 0; i < word.length; i++) out.add(word.slice(0, i) + word.slice(i + 1));
+  return out;
+}
+
+/** Optimal string alignment distance, capped: returns max + 1 as soon as it is exceeded */
+function editDistance(a, b, max = 1) {
+  if (Math.abs(a.length - b.length) > max) return max + 1;
+  let prev2 = null;
+  let prev = Array.from({ length: b.length + 1 }, (_, j) => j);
+  for (let i = 1; i <= a.length; i++) {
+    const cur = [i];
+    let rowMin = i;
+    for (let j = 1; j <= b.length; j++) {
+      const cost = a[i - 1] === b[j - 1] ? 0 : 1;
+      let d = Math.min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost);
+      if (prev2 && i > 1 && j > 1 && a[i - 1] === b[j - 2] && a[i - 2] === b[j - 1]) d = Math.min(d, prev2[j - 2] + 1);
+      cur.push(d);
+      rowMin = Math.min(rowMin, d);
+    }
+    if (rowMin > max) return max + 1;
+    prev2 = prev;
+    prev = cur;
+  }
+  return prev[b.length];
+}
+
+/** First index of `sorted` whose value is >= word */
+function lowerBound(sorted, word) {
+  let lo = 0;
+  let hi = sorted.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (sorted[mid] < word) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+/** Local search document of a catalog snapshot item */
+function catalogDoc(item) {
+  return {
+    id: item._id,
+    source: 'local',
+    name: item.name,
+    text: item.name,
+    type: item.type,
+    year: String(item.year || ''),
+    genres: item.genres || [],
+    rating: item.communityRating || 0,
+    tmdbId: item.tmdbId ? String(item.tmdbId) : null,
+    result: {
+      id: item._id,
+      tmdbId: item.tmdbId || null,
+      name: item.name,
+      type: item.type,
+      overview: item.overview,
+      posterUrl: jellyfinImageUrl(item._id, 'Primary'),
+      year: item.year,
+      communityRating: item.communityRating,
+      mediaStatus: 5, // Available in Jellyfin
+    },
+  };
+}
+
+/** What makes a catalog item's document change */
+function catalogSignature(item) {
+  return [item.name, item.type, item.year, (item.genres || []).join('|'), item.communityRating, item.tmdbId, (item.overview || '').length].join('\u0000');
+}
+
+export class SearchIndex {
+  constructor({ remoteMax = REMOTE_MAX, remoteTtl = REMOTE_TTL_MS } = {}) {
+    this.remoteMax = remoteMax;
+    this.remoteTtl = remoteTtl;
+    this.docs = new Map(); // doc id -> document
+    this.postings = new Map(); // word -> Set of doc ids
+    this.vocabulary = null; // sorted words for prefix ranges, rebuilt lazily after bulk changes
+    this.neighbours = new Map(); // word with one letter removed -> Set of words
+    this.localVersion = null;
+    this.localSignatures = new Map(); // catalog id -> signature
+    this.localByTmdb = new Map(); // tmdbKey -> catalog id
+    this.remote = new Map(); // remote doc id -> seenAt, insertion order = LRU order
+    this.queries = 0;
+    this.syncs = 0;
+  }
+
+  addWord(word, id) {
+    let ids = this.postings.get(word);
+    if (!ids) {
+      ids = new Set();
+      this.postings.set(word, ids);
+      this.vocabulary?.splice(lowerBound(this.vocabulary, word), 0, word);
+      if (word.length >= TYPO_MIN_LENGTH) {
+        for (const variant of deletions(word)) {
+          if (!this.neighbours.has(variant)) this.neighbours.set(variant, new Set());
+          this.neighbours.get(variant).add(word);
+        }
+      }
+    }
+    ids.add(id);
+  }
+
+  removeWord(word, id) {
+    const ids = this.postings.get(word);
+    if (!ids) return;
+    ids.delete(id);
+    if (ids.size > 0) return;
+    this.postings.delete(word);
+    this.vocabulary?.splice(lowerBound(this.vocabulary, word), 1);
+    if (word.length >= TYPO_MIN_LENGTH) {
+      for (const variant of deletions(word)) {
+        const words = this.neighbours.get(variant);
+        words?.delete(word);
+        if (words?.size === 0) this.neighbours.delete(variant);
+      }
+    }
+  }
+
+  /** Add or replace a document: { id, source, name, text, type, year, genres, rating, tmdbId, result } */
+  upsert(doc) {
+    this.remove(doc.id);
+    doc.words = [...new Set(tokenize(doc.text))];
+    doc.nameKey = tokenize(doc.name).join(' ');
+    this.docs.set(doc.id, doc);
+    for (const word of doc.words) this.addWord(word, doc.id);
+    if (doc.source === 'local' && doc.tmdbId) this.localByTmdb.set(tmdbKey(doc), doc.id);
+  }
+
+  remove(id) {
+    const doc = this.docs.get(id);
+    if (!doc) return false;
+    for (const word of doc.words) this.removeWord(word, id);
+    if (doc.source === 'local' && doc.tmdbId && this.localByTmdb.get(tmdbKey(doc)) === id) this.localByTmdb.delete(tmdbKey(doc));
+    this.docs.delete(id);
+    this.remote.delete(id);
+    return true;
+  }
+
+  /**
+   * Bring the local documents in line with a catalog snapshot. No-op while
+   * the snapshot version is unchanged; otherwise only the items whose
+   * signature changed are re-indexed. Returns { added, updated, removed }.
+   */
+  syncCatalog(snap) {
+    const changes = { added: 0, updated: 0, removed: 0 };
+    if (!snap?.items || snap.version === this.localVersion) return changes;
+    const seen = new Set();
+    this.vocabulary = null; // one sort after the batch instead of one insertion per new word
+    for (const item of snap.items) {
+      seen.add(item._id);
+      const signature = catalogSignature(item);
+      const previous = this.localSignatures.get(item._id);
+      if (previous === signature) continue;
+      this.upsert(catalogDoc(item));
+      this.localSignatures.set(item._id, signature);
+      if (previous === undefined) changes.added++;
+      else changes.updated++;
+    }
+    for (const id of [...this.localSignatures.keys()]) {
+      if (seen.has(id)) continue;
+      this.remove(id);
+      this.localSignatures.delete(id);
+      changes.removed++;
+    }
+    this.localVersion = snap.version;
+    this.syncs++;
+    return changes;
+  }
+
+  /** Forget everything (setup changed: other servers behind the BFF) */
+  clear() {
+    this.docs.clear();
+    this.postings.clear();
+    this.neighbours.clear();
+    this.vocabulary = null;
+    this.localVersion = null;
+    this.localSignatures.clear();
+    this.localByTmdb.clear();
+    this.remote.clear();
+  }
+
+  /**
+   * Remember TMDB results seen through Jellyseerr. docs carry the same fields as
+   * upsert(); ids are namespaced by the caller (e.g. 'tmdb:movie:603').
+   */
+  rememberRemote(docs) {
+    const now = Date.now();
+    for (const doc of docs) {
+      this.upsert({ ...doc, source: 'tmdb' });
+      this.remote.set(doc.id, now);
+    }
+    for (const id of this.remote.keys()) {
+      if (this.remote.size <= this.remoteMax) break;
+      this.remove(id);
+    }
+  }
+
+  sortedVocabulary() {
+    if (!this.vocabulary) this.vocabulary = [...this.postings.keys()].sort();
+    return this.vocabulary;
+  }
+
+  /** doc id -> best weight of one query word */
+  matchWord(word) {
+    const weights = new Map();
+    const credit = (w, weight) => {
+      for (const id of this.postings.get(w) || []) {
+        if ((weights.get(id) || 0) < weight) weights.set(id, weight);
+      }
+    };
+    if (word.length >= TYPO_MIN_LENGTH) {
+      const candidates = new Set(this.neighbours.get(word) || []); // one letter inserted
+      for (const variant of deletions(word)) {
+        if (this.postings.has(variant)) candidates.add(variant); // one letter deleted
+        for (const w of this.neighbours.get(variant) || []) candidates.add(w); // substituted / transposed
+      }
+      for (const w of candidates) {
+        if (w !== word && w.length >= TYPO_MIN_LENGTH && editDistance(word, w) <= 1) credit(w, WEIGHT_TYPO);
+      }
+    }
+    const vocabulary = this.sortedVocabulary();
+    const start = lowerBound(vocabulary, word);
+    for (let i = start; i < vocabulary.length && i < start + PREFIX_EXPANSION_MAX; i++) {
+      const w = vocabulary[i];
+      if (!w.startsWith(word)) break;
+      if (w !== word) credit(w, WEIGHT_PREFIX);
+    }
+    credit(word, WEIGHT_EXACT);
+    return weights;
+  }
+
+  /**
+   * Ranked matches and facets.
+   * options: { type, genre, year, sources: ['local', 'tmdb'], offset, limit }
+   * Returns { items (result objects), total, localTotal, facets: { genres, types, years } }.
+   */
+  search(query, { type = null, genre = null, year = null, sources = ['local', 'tmdb'], offset = 0, limit = 20 } = {}) {
+    this.queries++;
+    const words = tokenize(query);
+    const empty = { items: [], total: 0, localTotal: 0, facets: { genres: [], types: [], years: [] } };
+    if (words.length === 0) return empty;
+
+    // Every word must match: intersect, rarest word first
+    const perWord = words.map(word => this.matchWord(word));
+    perWord.sort((a, b) => a.size - b.size);
+    const scores = new Map();
+    for (const [id, weight] of perWord[0]) {
+      let score = weight;
+      for (let i = 1; i < perWord.length && score > 0; i++) {
+        const w = perWord[i].get(id);
+        score = w ? score + w : 0;
+      }
+      if (score > 0) scores.set(id, score);
+    }
+
+    // Resolve documents: expired / hidden sources out, TMDB hits of owned titles become the local item
+    const now = Date.now();
+    const allowLocal = sources.includes('local');
+    const matched = new Map(); // doc id -> score
+    for (const [id, score] of scores) {
+      let doc = this.docs.get(id);
+      if (doc.source === 'tmdb') {
+        if (now - (this.remote.get(id) || 0) > this.remoteTtl) {
+          this.remove(id);
+          continue;
+        }
+        const localId = allowLocal && this.localByTmdb.get(tmdbKey(doc));
+        if (localId) doc = this.docs.get(localId);
+      }
+      if (!sources.includes(doc.source)) continue;
+      matched.set(doc.id, Math.max(matched.get(doc.id) || 0, score));
+    }
+
+    const phrase = words.join(' ');
+    const genres = new Map();
+    const types = new Map();
+    const years = new Map();
+    const bump = (counts, key) => counts.set(key, (counts.get(key) || 0) + 1);
+    const hits = [];
+    for (const [id, score] of matched) {
+      const doc = this.docs.get(id);
+      const okType = !type || doc.type === type;
+      const okGenre = !genre || doc.genres.includes(genre);
+      const okYear = !year || doc.year === String(year);
+      if (okGenre && okYear) bump(types, doc.type);
+      if (okType && okYear) for (const g of doc.genres) bump(genres, g);
+      if (okType && okGenre && doc.year) bump(years, doc.year);
+      if (okType && okGenre && okYear) {
+        const boost = (doc.nameKey === phrase ? 3 : doc.nameKey.startsWith(phrase) ? 1 : 0) + (doc.source === 'local' ? 0.5 : 0);
+        hits.push({ doc, score: score + boost });
+      }
+    }
+    hits.sort((a, b) => b.score - a.score || b.doc.rating - a.doc.rating || a.doc.name.localeCompare(b.doc.name));
+
+    const facet = (counts, order) => [...counts.entries()]
+      .map(([name, count]) => ({ name, count }))
+      .sort(order)
+      .slice(0, FACET_LIMIT);
+    const byCount = (a, b) => b.count - a.count || String(a.name).localeCompare(String(b.name));
+    return {
+      items: hits.slice(offset, offset + limit).map(h => h.doc.result),
+      total: hits.length,
+      localTotal: hits.filter(h => h.doc.source === 'local').length,
+      facets: {
+        genres: facet(genres, byCount),
+        types: facet(types, byCount),
+        years: facet(years, (a, b) => b.name.localeCompare(a.name)),
+      },
+    };
+  }
+
+  stats() {
+    return {
+      local: this.localSignatures.size,
+      tmdb: this.remote.size,
+      words: this.postings.size,
+      queries: this.queries,
+      syncs: this.syncs,
+    };
+  }
+}
+
+/** Process-wide instance, shared by the separately bundled routes and the warm-up */
+export const searchIndex = globalThis.__dagzflixSearchIndex || (globalThis.__dagzflixSearchIndex = new SearchIndex());
+
+registerMetricsCollector('search-index', () => {
+  const st = searchIndex.stats();
+  return [
+    ...metricFamily('dagzflix_search_index_documents', 'gauge', 'Search index documents by source', [[{ source: 'local' }, st.local], [{ source: 'tmdb' }, st.tmdb]]),
+    ...metricFamily('dagzflix_search_index_words', 'gauge', 'Distinct words in the search index', [[{}, st.words]]),
+    ...metricFamily('dagzflix_search_index_queries_total', 'counter', 'Queries answered by the search index', [[{}, st.queries]]),
+    ...metricFamily('dagzflix_search_index_syncs_total', 'counter', 'Catalog snapshot versions applied to the search index', [[{}, st.syncs]]),
+  ];
+});
+
+/* =================================================================
+   JELLYSEERR RESULTS
+   Jellyseerr search and discover items mapped to the search result
+   shape, and fed to the tmdb side of the index as they are served.
+   ================================================================= */
+
+/** Search result of a Jellyseerr (TMDB) search or discover item */
+/** Identity of a TMDB title ({ mediaType } or { type }, tmdbId): movie and tv ids overlap */
+export function tmdbKey({ mediaType, type, tmdbId }) {
+  return `${mediaType || (type === 'Series' ? 'tv' : 'movie')}:${tmdbId}`;
+}
+
+export function mapSeerrResult(item, mediaType = item.mediaType) {
+  return {
+    id: item.id,
+    tmdbId: item.id,
+    name: item.title || item.name || '',
+    type: mediaType === 'tv' ? 'Series' : 'Movie',
+    mediaType,
+    overview: item.overview || '',
+    posterUrl: tmdbImageUrl(item.posterPath, 'poster'),
+    backdropUrl: tmdbImageUrl(item.backdropPath, 'backdrop'),
+    year: (item.releaseDate || item.firstAirDate || '').substring(0, 4),
+    voteAverage: item.voteAverage || 0,
+    genreIds: item.genreIds || [],
+    mediaStatus: item.mediaInfo?.status || 0,
+  };
+}
+
+/** Search index document of a mapped TMDB result (original titles are searchable too) */
+function tmdbSearchDoc(item, result) {
+  return {
+    id: `tmdb:${result.mediaType}:${result.tmdbId}`,
+    name: result.name,
+    text: [result.name, item.originalTitle, item.originalName].filter(Boolean).join(' '),
+    type: result.type,
+    year: result.year,
+    genres: resolveGenres(item),
+    rating: result.voteAverage,
+    tmdbId: String(result.tmdbId),
+    result,
+  };
+}
+
+/** Feed Jellyseerr items (movies and shows, not people) to the search index */
+export function rememberSeerrResults(pairs) {
+  const docs = pairs
+    .filter(([item, result]) => result.mediaType === 'movie' || result.mediaType === 'tv')
+    .map(([item, result]) => tmdbSearchDoc(item, result));
+  timePhase('index', () => searchIndex.rememberRemote(docs));
+  return docs;
+}
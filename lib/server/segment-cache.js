@@ -0,0 +1,134 @@
+/* =================================================================
+   DagzFlix - HLS segment cache
+   Media segments proxied from Jellyfin (lib/server/hls-proxy), shared by
+   every viewer of the same rendition:
+   - Memory tier: LRU capped at maxMemoryBytes, segments kept as Buffers
+   - Optional disk tier (dir set): the on-disk LRU of lib/server/image-cache,
+     capped at maxDiskBytes; disk hits are promoted to memory
+   - Concurrent misses of one segment share one upstream transfer
+   Segments larger than maxEntryBytes are served but never kept.
+   ================================================================= */
+
+import fsp from 'fs/promises';
+import path from 'path';
+import { Readable } from 'stream';
+import { ImageDiskCache } from '@/lib/server/image-cache';
+
+export class SegmentCache {
+  constructor({
+    maxMemoryBytes = 256 * 1024 * 1024,
+    maxEntryBytes = 32 * 1024 * 1024,
+    dir = '',
+    maxDiskBytes = 2 * 1024 * 1024 * 1024,
+    maxAge = 24 * 60 * 60 * 1000,
+  } = {}) {
+    this.maxMemoryBytes = maxMemoryBytes;
+    this.maxEntryBytes = maxEntryBytes;
+    this.memory = new Map(); // key -> { body, contentType }, insertion order = LRU order (oldest first)
+    this.memoryBytes = 0;
+    this.disk = dir ? new ImageDiskCache({ dir, maxBytes: maxDiskBytes, maxAge }) : null;
+    this.inflight = new Map();
+    this.hits = 0;
+    this.diskHits = 0;
+    this.misses = 0;
+    this.oversized = 0;
+  }
+
+  /** True when key is in memory or being loaded (cheap check, the disk tier is not consulted) */
+  has(key) {
+    return this.memory.has(key) || this.inflight.has(key);
+  }
+
+  /** Cached { body, contentType } for key (memory, then disk), or null */
+  async get(key) {
+    const entry = this.memory.get(key);
+    if (entry) {
+      this.memory.delete(key);
+      this.memory.set(key, entry);
+      this.hits++;
+      return entry;
+    }
+    if (!this.disk) return null;
+    const meta = await this.disk.lookup(key);
+    if (!meta) return null;
+    try {
+      const body = await fsp.readFile(path.join(this.disk.dir, meta.name));
+      this.diskHits++;
+      return this.remember(key, { body, contentType: meta.contentType });
+    } catch {
+      await this.disk.remove(meta.name); // evicted under our feet
+      return null;
+    }
+  }
+
+  remember(key, entry) {
+    if (entry.body.length > this.maxEntryBytes) return entry;
+    const previous = this.memory.get(key);
+    if (previous) {
+      this.memory.delete(key);
+      this.memoryBytes -= previous.body.length;
+    }
+    this.memory.set(key, entry);
+    this.memoryBytes += entry.body.length;
+    for (const [oldKey, old] of this.memory) {
+      if (this.memoryBytes <= this.maxMemoryBytes) break;
+      this.memory.delete(oldKey);
+      this.memoryBytes -= old.body.length;
+    }
+    return entry;
+  }
+
+  /** Store a segment loaded by the caller in both tiers */
+  put(key, entry) {
+    if (entry.body.length > this.maxEntryBytes) {
+      this.oversized++;
+      return entry;
+    }
+    this.remember(key, entry);
+    if (this.disk) {
+      this.disk.store(key, Readable.toWeb(Readable.from([entry.body])), {
+        contentType: entry.contentType,
+        lastModified: new Date().toUTCString(),
+      }).catch(err => console.error('[DagzFlix] Segment cache write failed:', err.message));
+    }
+    return entry;
+  }
+
+  /**
+   * Cached segment for key, or loader() -> { body: Buffer, contentType } stored.
+   * Concurrent misses share one load; a failing loader caches nothing.
+   */
+  async load(key, loader) {
+    if (this.inflight.has(key)) return this.inflight.get(key);
+    const cached = await this.get(key);
+    if (cached) return cached;
+    if (this.inflight.has(key)) return this.inflight.get(key);
+    this.misses++;
+    const promise = Promise.resolve()
+      .then(loader)
+      .then(entry => this.put(key, entry))
+      .finally(() => this.inflight.delete(key));
+    this.inflight.set(key, promise);
+    return promise;
+  }
+
+  async clear() {
+    this.memory.clear();
+    this.memoryBytes = 0;
+    if (this.disk) await this.disk.clear();
+  }
+
+  stats() {
+    return {
+      entries: this.memory.size,
+      bytes: this.memoryBytes,
+      diskEntries: this.disk ? this.disk.entries.size : 0,
+      diskBytes: this.disk ? this.disk.bytes : 0,
+      hits: this.hits,
+      diskHits: this.diskHits,
+      misses: this.misses,
+      oversized: this.oversized,
+      inflight: this.inflight.size,
+    };
+  }
+}
@@ -0,0 +1,235 @@
+/* =================================================================
+   DagzFlix - Upstream HTTP client
+   Every server-side call to Jellyfin, Jellyseerr and TMDB goes through
+   here:
+   - Connection cap per origin: Node's fetch already keeps sockets alive
+     and pools them per origin; calls beyond the cap wait their turn
+     instead of piling more requests onto a struggling server. Slots are
+     granted by priority class, low classes shed when their queue is
+     full (lib/server/admission)
+   - Named latency budgets: one deadline covers queueing and retries
+   - Idempotent GETs retried on network errors and 502/503/504, with
+     jittered exponential backoff, while the budget allows
+   - Circuit breaker per origin: after consecutive failures calls fail
+     fast for a cooldown, then a single trial call decides. Reads behind
+     the response cache keep serving their stale copy meanwhile
+   - Identical in-flight JSON GETs (same URL and credentials) share one
+     upstream call: callers get the same parsed object, never mutate it
+   Each call is timed as a phase named after its service (jellyfin,
+   jellyseerr, tmdb) of the current request (lib/server/metrics).
+   ================================================================= */
+
+import { timePhase, registerMetricsCollector, metricFamily } from '@/lib/server/metrics';
+import { AdmissionQueue, currentPriority, PRIORITY_CLASSES } from '@/lib/server/admission';
+
+// Latency budgets (ms), per kind of call
+export const UPSTREAM_BUDGETS = {
+  default: parseInt(process.env.UPSTREAM_BUDGET_DEFAULT_MS || '30000'), // BUG 3 FIX values
+  heavy: parseInt(process.env.UPSTREAM_BUDGET_HEAVY_MS || '45000'),
+  image: parseInt(process.env.UPSTREAM_BUDGET_IMAGE_MS || '30000'),
+};
+
+const MAX_CONCURRENT = parseInt(process.env.UPSTREAM_MAX_CONCURRENT || '16');
+// Per-service caps: UPSTREAM_MAX_CONCURRENT_JELLYFIN, _JELLYSEERR, _TMDB (default MAX_CONCURRENT)
+const serviceConcurrency = service => parseInt(process.env[`UPSTREAM_MAX_CONCURRENT_${service.toUpperCase()}`] || MAX_CONCURRENT);
+const MAX_RETRIES = parseInt(process.env.UPSTREAM_MAX_RETRIES || '2');
+const RETRY_BASE_MS = 200;
+const RETRY_STATUSES = new Set([502, 503, 504]);
+const BREAKER_THRESHOLD = parseInt(process.env.UPSTREAM_BREAKER_THRESHOLD || '5');
+const BREAKER_COOLDOWN_MS = parseInt(process.env.UPSTREAM_BREAKER_COOLDOWN_MS || '15000');
+
+// Per process, not per bundle: every App Router route shares the same caps, breakers and
+// coalesced calls, and the 'upstream' collector reads them whichever bundle registered it
+const { origins, inflight } = globalThis.__dagzflixUpstream || (globalThis.__dagzflixUpstream = {
+  origins: new Map(), // origin -> { admission, breaker, counters }
+  inflight: new Map(), // coalescing key -> promise of parsed JSON
+});
+
+/** Raised without calling upstream while the origin's breaker is open (retryAfter: seconds left) */
+export class CircuitOpenError extends Error {
+  constructor(origin, retryAfter) {
+    super(`${origin} unavailable (circuit open)`);
+    this.name = 'CircuitOpenError';
+    this.code = 'CIRCUIT_OPEN';
+    this.retryAfter = retryAfter;
+  }
+}
+
+function originState(origin, service = 'Upstream') {
+  let state = origins.get(origin);
+  if (!state) {
+    state = {
+      admission: new AdmissionQueue(origin, serviceConcurrency(service)),
+      breaker: { state: 'closed', failures: 0, openedAt: 0, trial: false },
+      counters: { requests: 0, retries: 0, failures: 0, failFast: 0, coalesced: 0 },
+    };
+    origins.set(origin, state);
+  }
+  return state;
+}
+
+/** Let one call through the breaker, or throw CircuitOpenError; true when it is the half-open trial */
+function admit(origin, state) {
+  const breaker = state.breaker;
+  if (breaker.state === 'open' && Date.now() - breaker.openedAt >= BREAKER_COOLDOWN_MS) {
+    breaker.state = 'half-open';
+    breaker.trial = false;
+  }
+  if (breaker.state === 'open' || (breaker.state === 'half-open' && breaker.trial)) {
+    state.counters.failFast++;
+    const remaining = breaker.state === 'open' ? BREAKER_COOLDOWN_MS - (Date.now() - breaker.openedAt) : 0;
+    throw new CircuitOpenError(origin, Math.max(1, Math.ceil(remaining / 1000)));
+  }
+  if (breaker.state !== 'half-open') return false;
+  breaker.trial = true;
+  return true;
+}
+
+function recordOutcome(state, ok) {
+  const breaker = state.breaker;
+  if (ok) {
+    breaker.state = 'closed';
+    breaker.failures = 0;
+    breaker.trial = false;
+    return;
+  }
+  state.counters.failures++;
+  breaker.failures++;
+  if (breaker.state === 'half-open' || breaker.failures >= BREAKER_THRESHOLD) {
+    breaker.state = 'open';
+    breaker.openedAt = Date.now();
+    breaker.trial = false;
+  }
+}
+
+function sleep(ms, signal) {
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      signal.removeEventListener('abort', onAbort);
+      resolve();
+    }, ms);
+    const onAbort = () => {
+      clearTimeout(timer);
+      reject(signal.reason);
+    };
+    signal.addEventListener('abort', onAbort, { once: true });
+  });
+}
+
+function budgetMs(budget) {
+  return typeof budget === 'number' ? budget : (UPSTREAM_BUDGETS[budget] || UPSTREAM_BUDGETS.default);
+}
+
+/** One upstream call, timed as the current request's `<service>` phase */
+function request(url, init, { service = 'Upstream', ...options } = {}, consume) {
+  return timePhase(service.toLowerCase(), () => attemptRequest(url, init, { ...options, service }, consume));
+}
+
+/**
+ * fetch() through the origin's slot, breaker and retry policy; `consume(res)`
+ * runs inside the slot and the deadline (reading the body counts too).
+ */
+async function attemptRequest(url, init, { budget = 'default', retries = MAX_RETRIES, service, priority = currentPriority() }, consume) {
+  const origin = new URL(url).origin;
+  const state = originState(origin, service);
+  const method = (init.method || 'GET').toUpperCase();
+  const attempts = method === 'GET' ? retries + 1 : 1; // only idempotent reads are retried
+  const deadline = AbortSignal.timeout(budgetMs(budget));
+  const signal = init.signal ? AbortSignal.any([init.signal, deadline]) : deadline;
+
+  state.counters.requests++;
+  return state.admission.run(priority, signal, async () => {
+    for (let attempt = 1; ; attempt++) {
+      const trial = admit(origin, state);
+      let res;
+      try {
+        res = await fetch(url, { ...init, signal });
+      } catch (err) {
+        if (init.signal?.aborted) {
+          // Cancelled by the caller, not an upstream failure: a cancelled trial lets the next call try
+          if (trial) state.breaker.trial = false;
+          throw err;
+        }
+        recordOutcome(state, false);
+        if (attempt >= attempts || signal.aborted) throw err;
+        state.counters.retries++;
+        await sleep(Math.random() * RETRY_BASE_MS * 2 ** (attempt - 1), signal);
+        continue;
+      }
+      recordOutcome(state, res.status < 500);
+      if (RETRY_STATUSES.has(res.status) && attempt < attempts) {
+        res.body?.cancel().catch(() => {});
+        state.counters.retries++;
+        await sleep(Math.random() * RETRY_BASE_MS * 2 ** (attempt - 1), signal);
+        continue;
+      }
+      return consume(res);
+    }
+  });
+}
+
+/**
+ * Raw Response from upstream (images, POSTs, error bodies). The caller
+ * checks res.ok; the body is read outside the connection slot.
+ * options: { budget, retries, service, priority (default: lib/server/admission's currentPriority) }
+ */
+export function upstreamFetch(url, init = {}, options = {}) {
+  return request(url, init, options, res => res);
+}
+
+/**
+ * Parsed JSON from upstream; rejects on non-2xx with "<service> responded with <status>".
+ * Concurrent identical GETs are coalesced into one call.
+ */
+export function upstreamJson(url, { headers = {}, service = 'Upstream', ...init } = {}, options = {}) {
+  const run = () => request(url, { ...init, headers }, { ...options, service }, async res => {
+    if (!res.ok) {
+      res.body?.cancel().catch(() => {});
+      throw new Error(`${service} responded with ${res.status}`);
+    }
+    return res.json();
+  });
+  if ((init.method || 'GET').toUpperCase() !== 'GET' || init.signal) return run();
+
+  const key = `${url}|${headers['X-Emby-Token'] || ''}|${headers['X-Api-Key'] || ''}`;
+  if (inflight.has(key)) {
+    originState(new URL(url).origin, service).counters.coalesced++;
+    return inflight.get(key);
+  }
+  const promise = run().finally(() => inflight.delete(key));
+  inflight.set(key, promise);
+  return promise;
+}
+
+/** Per-origin counters, breaker state and slot usage per priority class */
+export function upstreamStats() {
+  const stats = {};
+  for (const [origin, state] of origins) {
+    stats[origin] = {
+      ...state.counters,
+      breaker: state.breaker.state,
+      ...state.admission.stats(),
+    };
+  }
+  return stats;
+}
+
+registerMetricsCollector('upstream', () => {
+  const entries = Object.entries(upstreamStats());
+  const family = (name, type, help, pick) => metricFamily(name, type, help, entries.map(([origin, st]) => [{ origin }, pick(st)]));
+  const perClass = (name, type, help, field) => metricFamily(name, type, help, entries.flatMap(([origin, st]) => (
+    Object.keys(PRIORITY_CLASSES).map(priority => [{ origin, priority }, st[field][priority]])
+  )));
+  return [
+    ...family('dagzflix_upstream_requests_total', 'counter', 'Upstream calls', st => st.requests),
+    ...family('dagzflix_upstream_retries_total', 'counter', 'Upstream retry attempts', st => st.retries),
+    ...family('dagzflix_upstream_failures_total', 'counter', 'Failed upstream attempts (network, timeout, 5xx)', st => st.failures),
+    ...family('dagzflix_upstream_fail_fast_total', 'counter', 'Calls refused by an open circuit breaker', st => st.failFast),
+    ...family('dagzflix_upstream_coalesced_total', 'counter', 'Calls served by an identical in-flight call', st => st.coalesced),
+    ...family('dagzflix_upstream_breaker_open', 'gauge', '1 while the origin circuit breaker is not closed', st => (st.breaker === 'closed' ? 0 : 1)),
+    ...family('dagzflix_upstream_capacity', 'gauge', 'Connection slots of the origin', st => st.capacity),
+    ...perClass('dagzflix_upstream_active', 'gauge', 'Upstream calls in flight', 'activeBy'),
+    ...perClass('dagzflix_upstream_queued', 'gauge', 'Upstream calls waiting for a connection slot', 'queuedBy'),
+    ...perClass('dagzflix_upstream_shed_total', 'counter', 'Calls refused because their class was over its queue limit or wait', 'shedBy'),
+  ];
+});
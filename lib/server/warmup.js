@@ -0,0 +1,173 @@
+/* =================================================================
+   DagzFlix - Warm-up and readiness
+   The first request after a deploy or an idle period used to pay for
+   the MongoDB handshake, the config read and cold upstream queries.
+   warmUp() does that work once per process, in the background:
+   - mongo     connect + ping (the driver then keeps MONGO_MIN_POOL_SIZE sockets open)
+   - config    setup document into the lookup cache (lib/server/bff)
+   - catalog   catalog snapshot, its genre list and the search index,
+               background refresher started (lib/server/catalog-index)
+   - discover  Jellyseerr discover snapshots loaded, or fetched when missing or
+               outdated; background refresher started (lib/server/discover-store)
+   Everything it fills lives on globalThis (MongoDB client, lookup cache,
+   catalog, search and discover stores), so the separately bundled
+   routes read the warmed copies. Started by instrumentation.js at boot
+   and by the first /api/health probe. The process is ready once mongo
+   and config succeeded and the other steps settled, or WARMUP_TIMEOUT_MS
+   elapsed: a dead upstream must not keep it out of rotation. A run whose mongo / config step
+   failed is retried by the next probe after WARMUP_RETRY_MS.
+
+   prefetchInBackground() runs prefetches (dashboard at login, playback
+   info) off the request path, one at a time per key.
+   ================================================================= */
+
+import { getDb, getConfig } from '@/lib/server/bff';
+import { getCatalogSnapshot, catalogGenres, startCatalogRefresher } from '@/lib/server/catalog-index';
+import { searchIndex } from '@/lib/server/search-index';
+import { DISCOVER_LISTS, getDiscoverSnapshot, refreshDiscoverSnapshots, startDiscoverRefresher } from '@/lib/server/discover-store';
+import { registerMetricsCollector, metricFamily, runDetached } from '@/lib/server/metrics';
+import { withPriority } from '@/lib/server/admission';
+
+const WARMUP_TIMEOUT_MS = parseInt(process.env.WARMUP_TIMEOUT_MS || '30000');
+const WARMUP_RETRY_MS = parseInt(process.env.WARMUP_RETRY_MS || '10000');
+const PREFETCH_MAX_USERS = parseInt(process.env.PREFETCH_MAX_USERS || '20');
+
+const OPTIONAL_STEPS = ['catalog', 'discover'];
+
+// One state per process, read by /api/health (bundled apart from the catch-all)
+const state = globalThis.__dagzflixWarmup || (globalThis.__dagzflixWarmup = {
+  run: null,
+  ready: false,
+  startedAt: null,
+  finishedAt: null,
+  steps: {}, // name -> { status: running | done | skipped | failed, ms, error }
+  prefetches: new Map(), // key -> promise of the running prefetch
+  prefetchCounts: { completed: 0, skipped: 0, failedTasks: 0 },
+});
+
+/** Run one step, recording its status; returns fn's result, rethrows its error */
+async function runStep(name, fn) {
+  const start = performance.now();
+  state.steps[name] = { status: 'running' };
+  try {
+    const result = await fn();
+    state.steps[name] = { status: result === false ? 'skipped' : 'done', ms: Math.round(performance.now() - start) };
+    return result;
+  } catch (err) {
+    state.steps[name] = { status: 'failed', ms: Math.round(performance.now() - start), error: err.message };
+    console.error(`[DagzFlix] Warm-up ${name} failed:`, err.message);
+    throw err;
+  }
+}
+
+async function warmMongo() {
+  const db = await getDb();
+  await db.command({ ping: 1 });
+  return db;
+}
+
+/** Catalog snapshot in memory, genres computed, search index built; false before the first full sync */
+async function warmCatalog(db, config) {
+  if (!config?.jellyfinUrl) return false;
+  startCatalogRefresher(async () => ({ db: await getDb(), config: await getConfig() }));
+  const snap = await getCatalogSnapshot(db);
+  if (!snap) return false;
+  catalogGenres(snap);
+  searchIndex.syncCatalog(snap);
+  return true;
+}
+
+/** Discover snapshots in memory, fetched first when this deployment has none yet */
+async function warmDiscover(db, config) {
+  if (!config?.jellyseerrUrl) return false;
+  startDiscoverRefresher(async () => ({ db: await getDb(), config: await getConfig() }));
+  const current = await Promise.all(DISCOVER_LISTS.map(list => getDiscoverSnapshot(db, list)));
+  if (current.some(snap => !snap)) await refreshDiscoverSnapshots(db, config);
+  return true;
+}
+
+async function runWarmup() {
+  state.ready = false;
+  state.startedAt = new Date().toISOString();
+  state.finishedAt = null;
+  state.steps = {};
+  let db;
+  let config;
+  try {
+    db = await runStep('mongo', warmMongo);
+    config = await runStep('config', getConfig);
+  } catch {
+    for (const name of OPTIONAL_STEPS) state.steps[name] = { status: 'skipped' };
+    state.finishedAt = new Date().toISOString();
+    return;
+  }
+  const optional = Promise.allSettled([
+    runStep('catalog', () => warmCatalog(db, config)),
+    runStep('discover', () => warmDiscover(db, config)),
+  ]);
+  let timer;
+  await Promise.race([optional, new Promise(resolve => { timer = setTimeout(resolve, WARMUP_TIMEOUT_MS); })]);
+  clearTimeout(timer);
+  state.ready = true;
+  state.finishedAt = new Date().toISOString();
+}
+
+/**
+ * Start the process warm-up (idempotent: returns the current run). A finished
+ * run that could not reach MongoDB or the config is restarted after WARMUP_RETRY_MS.
+ */
+export function warmUp() {
+  const failed = state.finishedAt && !state.ready;
+  if (state.run && !(failed && Date.now() - Date.parse(state.finishedAt) >= WARMUP_RETRY_MS)) return state.run;
+  state.run = runWarmup().catch(err => console.error('[DagzFlix] Warm-up error:', err.message));
+  return state.run;
+}
+
+/** Readiness and per-step timings, as served by /api/health */
+export function warmupStatus() {
+  return {
+    ready: state.ready,
+    startedAt: state.startedAt,
+    finishedAt: state.finishedAt,
+    steps: state.steps,
+    prefetch: { ...state.prefetchCounts, running: state.prefetches.size },
+  };
+}
+
+/**
+ * Run prefetch tasks ({ name: () => promise }) in the background, outside the
+ * current request's timing. A key (user, or user + purpose) with a prefetch
+ * still running gets that one; beyond PREFETCH_MAX_USERS concurrent keys the
+ * prefetch is skipped (the requests will load on demand). Its upstream calls
+ * are background work (lib/server/admission). Failures are logged, never thrown.
+ */
+export function prefetchInBackground(key, tasks) {
+  if (state.prefetches.has(key)) return state.prefetches.get(key);
+  if (state.prefetches.size >= PREFETCH_MAX_USERS) {
+    state.prefetchCounts.skipped++;
+    return null;
+  }
+  const run = runDetached(() => withPriority('background', () => Promise.allSettled(Object.entries(tasks).map(([name, task]) => Promise.resolve()
+    .then(task)
+    .catch(err => {
+      state.prefetchCounts.failedTasks++;
+      console.error(`[DagzFlix] Prefetch ${name} failed:`, err.message);
+    })))))
+    .finally(() => {
+      state.prefetchCounts.completed++;
+      state.prefetches.delete(key);
+    });
+  state.prefetches.set(key, run);
+  return run;
+}
+
+registerMetricsCollector('warmup', () => [
+  ...metricFamily('dagzflix_ready', 'gauge', '1 once the startup warm-up finished', [[{}, state.ready ? 1 : 0]]),
+  ...metricFamily('dagzflix_warmup_step_seconds', 'gauge', 'Duration of each startup warm-up step',
+    Object.entries(state.steps).map(([step, { status, ms }]) => [{ step, status }, (ms || 0) / 1000])),
+  ...metricFamily('dagzflix_prefetch_total', 'counter', 'Per-user background prefetches by outcome', [
+    [{ outcome: 'completed' }, state.prefetchCounts.completed],
+    [{ outcome: 'skipped' }, state.prefetchCounts.skipped],
+  ]),
+  ...metricFamily('dagzflix_prefetch_failed_tasks_total', 'counter', 'Prefetch tasks that failed', [[{}, state.prefetchCounts.failedTasks]]),
+]);
@@ -6,6 +6,8 @@ const nextConfig = {
   experimental: {
     // Remove if not using Server Components
     serverComponentsExternalPackages: ['mongodb'],
+    // instrumentation.js: startup warm-up (lib/server/warmup)
+    instrumentationHook: true,
   },
   webpack(config, { dev }) {
     if (dev) {
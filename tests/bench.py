@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+DagzFlix Benchmark Suite
+Times every BFF route against the upstream stand-in with a fixed, seeded fixture
+library at several sizes (1k / 10k / 100k items) and compares the results with
+the JSON baselines stored in tests/baselines/. A route fails when its median
+latency regresses past the threshold relative to its baseline. Each route
+also reports the median per-phase times of the BFF's Server-Timing header.
+
+Usage:
+    python -m tests.bench                          compare against stored baselines
+    python -m tests.bench --update-baseline        (re)record the baselines
+    python -m tests.bench --sizes 1000 --routes recommendations,media/library
+    python backend_test.py --bench ...             (same options after --bench)
+
+Baselines are machine dependent: record them on the machine that gates.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+from tests.load import BASE_URL, login, percentile, point_bff_at_stub
+from tests.metrics import parse_server_timing
+from tests.upstream_stub import UpstreamStub
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+DEFAULT_SIZES = (1000, 10000, 100000)
+FIXTURE_SEED = 42
+
+# Relative regression allowed before failing, and an absolute floor so that
+# sub-millisecond jitter on very fast routes never fails the gate
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 5.0
+
+
+def bench_routes(stub):
+    """Route name -> (method, path, params or body), built from the deterministic fixture library"""
+    movie = next(i for i in stub.library if i["Type"] == "Movie")
+    series = next(i for i in stub.library if i["Type"] == "Series")
+    word = movie["Name"].split()[0]
+    return {
+        "setup/check": ("GET", "setup/check", None),
+        "auth/session": ("GET", "auth/session", None),
+        "preferences": ("GET", "preferences", None),
+        "media/library": ("GET", "media/library", {"type": "Movie", "limit": 100}),
+        "media/genres": ("GET", "media/genres", None),
+        "media/detail": ("GET", "media/detail", {"id": movie["Id"]}),
+        "media/resume": ("GET", "media/resume", None),
+        "media/status": ("GET", "media/status", {"id": series["Id"], "tmdbId": series["ProviderIds"]["Tmdb"], "mediaType": "tv"}),
+        "search": ("GET", "search", {"q": word}),
+        "discover": ("GET", "discover", {"type": "movies"}),
+        "recommendations": ("GET", "recommendations", None),
+        "proxy/image": ("GET", "proxy/image", {"itemId": movie["Id"], "type": "Primary", "maxWidth": 400}),
+        "media/stream": ("GET", "media/stream", {"id": movie["Id"]}),
+        "media/progress": ("POST", "media/progress", {"itemId": movie["Id"], "positionTicks": 600000000, "isPaused": False}),
+    }
+
+
+def time_route(http, base_url, method, path, payload, iterations, warmup):
+    """Time one route; returns latency stats in milliseconds, with the BFF's median Server-Timing phases"""
+    samples, errors, phases = [], 0, {}
+    for n in range(warmup + iterations):
+        started = time.perf_counter()
+        if method == "POST":
+            res = http.post(f"{base_url}/{path}", json=payload, timeout=120)
+        else:
+            res = http.get(f"{base_url}/{path}", params=payload, timeout=120)
+        res.content
+        elapsed = time.perf_counter() - started
+        if n >= warmup:
+            samples.append(elapsed * 1000)
+            errors += res.status_code >= 400
+            for phase, ms in parse_server_timing(res.headers.get("Server-Timing")).items():
+                phases.setdefault(phase, []).append(ms)
+    return {
+        "median_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+        "min_ms": round(min(samples), 2),
+        "errors": errors,
+        "iterations": iterations,
+        "phases": {phase: round(percentile(values, 50), 2) for phase, values in sorted(phases.items())},
+    }
+
+
+def run_size(base_url, size, iterations, warmup, routes=None, latency=0.0):
+    """Benchmark every route against a fixture library of the given size"""
+    with UpstreamStub(host=os.environ.get("DAGZFLIX_STUB_HOST", "127.0.0.1"), library_size=size,
+                      seed=FIXTURE_SEED, default_latency=latency) as stub:
+        point_bff_at_stub(base_url, stub)
+        http = login(base_url, *next(iter(stub.users.items())))
+        results = {}
+        for name, (method, path, payload) in bench_routes(stub).items():
+            if routes and name not in routes:
+                continue
+            results[name] = time_route(http, base_url, method, path, payload, iterations, warmup)
+            print(f"  {name:<18} median {results[name]['median_ms']:>9.1f}ms   p95 {results[name]['p95_ms']:>9.1f}ms"
+                  f"{'   errors ' + str(results[name]['errors']) if results[name]['errors'] else ''}")
+            phases = {p: ms for p, ms in results[name]["phases"].items() if p != "total"}
+            if phases:
+                print(f"  {'':<18} " + "  ".join(f"{p} {ms:.1f}ms" for p, ms in phases.items()))
+        http.close()
+    return results
+
+
+def baseline_path(size, directory=BASELINE_DIR):
+    return os.path.join(directory, f"bench_{size}.json")
+
+
+def load_baseline(size, directory=BASELINE_DIR):
+    path = baseline_path(size, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(size, results, directory=BASELINE_DIR):
+    """Store results as the baseline of their routes; the other routes keep theirs (--routes runs)"""
+    os.makedirs(directory, exist_ok=True)
+    stored = (load_baseline(size, directory) or {}).get("routes", {})
+    data = {
+        "size": size,
+        "seed": FIXTURE_SEED,
+        "recordedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "routes": {**stored, **results},
+    }
+    with open(baseline_path(size, directory), "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """List of (route, baseline_ms, current_ms, ratio) for routes that regressed past the threshold"""
+    regressions = []
+    base_routes = (baseline or {}).get("routes", {})
+    for route, current in results.items():
+        base = base_routes.get(route)
+        if not base:
+            continue
+        before, after = base["median_ms"], current["median_ms"]
+        if after - before > min_delta_ms and after > before * (1 + threshold):
+            regressions.append((route, before, after, after / before if before else float("inf")))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DagzFlix BFF benchmark suite with baseline regression gating")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="fixture library sizes")
+    parser.add_argument("--routes", help="comma separated subset of routes")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="upstream latency per call (s)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative regression (0.25 = +25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+    parser.add_argument("--baseline-dir", default=BASELINE_DIR)
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    routes = set(args.routes.split(",")) if args.routes else None
+    all_results, failed = {}, False
+
+    for size in sizes:
+        print("=" * 80)
+        print(f"Benchmark - fixture library {size} items")
+        print("=" * 80)
+        results = run_size(args.base_url, size, args.iterations, args.warmup, routes, args.stub_latency)
+        all_results[size] = results
+
+        if args.update_baseline:
+            save_baseline(size, results, args.baseline_dir)
+            print(f"📌 Baseline stored: {baseline_path(size, args.baseline_dir)}")
+            continue
+
+        baseline = load_baseline(size, args.baseline_dir)
+        if baseline is None:
+            print(f"⚠️  No baseline for {size} items - run with --update-baseline to record one")
+            continue
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for route, before, after, ratio in regressions:
+            print(f"❌ REGRESSION: {route} {before:.1f}ms → {after:.1f}ms (x{ratio:.2f})")
+        if regressions:
+            failed = True
+        else:
+            print(f"✅ No regression past +{args.threshold:.0%} for {size} items")
+        print()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except requests.RequestException as e:
+        print(f"Benchmark aborted: {e}")
+        sys.exit(1)
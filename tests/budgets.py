@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+DagzFlix Upstream Call Budgets
+Replays a scripted user session (login -> dashboard -> detail -> play ->
+progress -> search) against the counting upstream stand-in, cold (first
+visit after the BFF was pointed at a fresh library) then warm (the same
+session again), and records every Jellyfin / Jellyseerr call each step
+triggers, including the background work it starts. A step fails when its
+calls exceed the budgets stored in tests/baselines/call_budgets.json; the
+report then shows the step's call graph (BFF request -> upstream calls).
+
+Usage:
+    python -m tests.budgets                        check against the stored budgets
+    python -m tests.budgets --update-budgets       record the current counts as budgets
+    python -m tests.budgets --steps dashboard,detail --graph
+    python backend_test.py --budgets ...           (same options after --budgets)
+
+Call counts do not depend on the machine: the budgets file is versioned,
+and a check without it, or against budgets never recorded (no recordedAt),
+fails (exit 1) instead of passing with nothing real to compare. Lower a budget when a change saves calls; raise one only on purpose.
+"""
+
+import argparse
+import collections
+import json
+import os
+import re
+import sys
+import time
+
+import requests
+
+from tests.load import BASE_URL, point_bff_at_stub
+from tests.upstream_stub import UpstreamStub
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "baselines", "call_budgets.json")
+FIXTURE_SEED = 42
+DEFAULT_LIBRARY_SIZE = 1000
+PASSES = ("cold", "warm")
+SERVICES = ("jellyfin", "jellyseerr")
+
+# A step is over once the stand-in saw no call for QUIET_S (its background work landed)
+QUIET_S = 1.0
+STEP_TIMEOUT_S = 30
+SETUP_TIMEOUT_S = 180
+
+ITEM_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def flow_steps(stub):
+    """Step name -> BFF requests (method, path, params or body), as the UI sends them"""
+    username, password = next(iter(stub.users.items()))
+    movie = next(i for i in stub.library if i["Type"] == "Movie")
+    series = next(i for i in stub.library if i["Type"] == "Series")
+    word = movie["Name"].split()[0]
+    detail = {
+        "id": series["Id"], "tmdbId": series["ProviderIds"]["Tmdb"], "mediaType": "tv",
+        "sections": "item,similar,status,seasons,episodes,collection,trailers", "format": "ndjson",
+    }
+    return {
+        "login": [("POST", "auth/login", {"username": username, "password": password})],
+        "dashboard": [("GET", "auth/session", None), ("GET", "media/home", None)],
+        "detail": [("GET", "media/detail", detail), ("GET", "media/stream", {"id": series["Id"]})],
+        "play": [("GET", "media/stream", {"id": movie["Id"]})],
+        "progress": [
+            ("POST", "media/progress", {"itemId": movie["Id"], "positionTicks": 0, "isPaused": False}),
+            *[("POST", "media/progress", {"itemId": movie["Id"], "positionTicks": n * 100000000, "isPaused": False})
+              for n in range(1, 4)],
+            ("POST", "media/progress", {"itemId": movie["Id"], "positionTicks": 400000000, "isStopped": True}),
+        ],
+        "search": [("GET", "search", {"q": word, "scope": "local"}), ("GET", "search", {"q": word})],
+    }
+
+
+def wait_quiet(stub, quiet=QUIET_S, timeout=STEP_TIMEOUT_S):
+    """Block until the stand-in saw no call for `quiet` seconds (or timeout); returns the log length"""
+    deadline = time.monotonic() + timeout
+    seen = len(stub.call_log)
+    last_change = time.monotonic()
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        if len(stub.call_log) != seen:
+            seen = len(stub.call_log)
+            last_change = time.monotonic()
+        elif time.monotonic() - last_change >= quiet:
+            break
+    return len(stub.call_log)
+
+
+def run_step(http, base_url, stub, requests_):
+    """Send a step's requests one after the other; returns (requests with their time windows, upstream calls)"""
+    mark = wait_quiet(stub)
+    sent = []
+    for method, path, payload in requests_:
+        started = time.monotonic()
+        if method == "POST":
+            res = http.post(f"{base_url}/{path}", json=payload, timeout=120)
+        else:
+            res = http.get(f"{base_url}/{path}", params=payload, timeout=120)
+        res.content
+        sent.append({"request": f"{method} {path}", "status": res.status_code, "start": started, "end": time.monotonic()})
+    end = wait_quiet(stub)
+    return sent, stub.call_log[mark:end]
+
+
+def count_calls(calls):
+    """{service: n, 'total': n} of a list of stub call log entries"""
+    counts = collections.Counter(call["service"] for call in calls)
+    return {**{service: counts.get(service, 0) for service in SERVICES}, "total": len(calls)}
+
+
+def call_graph(sent, calls):
+    """[(BFF request or 'after the responses', [(service, endpoint, count, sample target)])]: each call
+    is attributed to the request in flight when it reached the stand-in"""
+    groups = collections.OrderedDict((entry["request"] + f" -> {entry['status']}", []) for entry in sent)
+    groups["after the responses"] = []
+    for call in calls:
+        owner = next((f"{e['request']} -> {e['status']}" for e in sent if e["start"] <= call["at"] <= e["end"]),
+                     "after the responses")
+        groups[owner].append(call)
+    graph = []
+    for owner, owned in groups.items():
+        by_endpoint = collections.OrderedDict()
+        for call in owned:
+            key = (call["service"], call["method"], call["endpoint"])
+            by_endpoint.setdefault(key, []).append(call)
+        edges = [(service, f"{method} {endpoint}", len(group), ITEM_ID.sub("{id}", group[0]["target"]))
+                 for (service, method, endpoint), group in by_endpoint.items()]
+        if edges or owner != "after the responses":
+            graph.append((owner, edges))
+    return graph
+
+
+def print_graph(graph, indent="    "):
+    for owner, edges in graph:
+        print(f"{indent}{owner}")
+        for service, endpoint, count, target in edges:
+            sample = target if len(target) <= 90 else target[:87] + "..."
+            print(f"{indent}  {service:<10} {endpoint:<24} x{count:<3} {sample}")
+
+
+def run_flow(base_url, stub, steps=None, passes=PASSES):
+    """{pass: {step: {counts, graph}}}, every pass on its own login session"""
+    results = {}
+    flow = flow_steps(stub)
+    for pass_name in passes:
+        http = requests.Session()
+        results[pass_name] = {}
+        for step, requests_ in flow.items():
+            sent, calls = run_step(http, base_url, stub, requests_)
+            if steps and step not in steps:
+                continue  # still replayed: later steps need the session and the state it leaves
+            results[pass_name][step] = {"counts": count_calls(calls), "graph": call_graph(sent, calls)}
+            failed = [f"{e['request']} -> {e['status']}" for e in sent if e["status"] >= 400]
+            counts = results[pass_name][step]["counts"]
+            print(f"  {pass_name:<5} {step:<10} jellyfin {counts['jellyfin']:>4}   jellyseerr {counts['jellyseerr']:>4}"
+                  f"{'   errors: ' + ', '.join(failed) if failed else ''}")
+        http.close()
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_budgets(results, library_size, path=BUDGETS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "librarySize": library_size,
+        "seed": FIXTURE_SEED,
+        "recordedAt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "budgets": {
+            pass_name: {step: {s: r["counts"][s] for s in SERVICES} for step, r in steps.items()}
+            for pass_name, steps in results.items()
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def over_budget(results, budgets):
+    """List of (pass, step, service, budget, actual) where a step made more calls than its budget"""
+    exceeded = []
+    stored = (budgets or {}).get("budgets", {})
+    for pass_name, steps in results.items():
+        for step, result in steps.items():
+            limits = stored.get(pass_name, {}).get(step)
+            if not limits:
+                continue
+            for service, limit in limits.items():
+                actual = result["counts"].get(service, 0)
+                if actual > limit:
+                    exceeded.append((pass_name, step, service, limit, actual))
+    return exceeded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upstream call budgets of scripted DagzFlix user flows")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--library-size", type=int, default=DEFAULT_LIBRARY_SIZE)
+    parser.add_argument("--steps", help="comma separated subset of steps to check (the whole flow is replayed)")
+    parser.add_argument("--budgets", default=BUDGETS_PATH, help="budgets file")
+    parser.add_argument("--update-budgets", action="store_true", help="store the current counts as the budgets")
+    parser.add_argument("--graph", action="store_true", help="print the call graph of every step")
+    parser.add_argument("--json", help="write the counts to this file")
+    args = parser.parse_args(argv)
+
+    steps = set(args.steps.split(",")) if args.steps else None
+    if args.update_budgets and steps:
+        parser.error("--update-budgets records the whole flow: drop --steps")
+    budgets = None if args.update_budgets else load_budgets(args.budgets)
+    if budgets is None and not args.update_budgets:
+        print(f"❌ No budgets in {args.budgets} - run with --update-budgets to record them")
+        return 1
+    if budgets is not None and not budgets.get("recordedAt"):
+        # Budgets that were never measured cannot tell a regression from a wrong guess
+        print(f"❌ Budgets in {args.budgets} were not recorded ({budgets.get('source', 'no recordedAt')})"
+              " - run with --update-budgets against the stub to record them")
+        return 1
+
+    print("=" * 80)
+    print(f"Upstream call budgets - fixture library {args.library_size} items")
+    print("=" * 80)
+    with UpstreamStub(host=os.environ.get("DAGZFLIX_STUB_HOST", "127.0.0.1"), library_size=args.library_size,
+                      seed=FIXTURE_SEED) as stub:
+        point_bff_at_stub(args.base_url, stub)
+        wait_quiet(stub, quiet=2 * QUIET_S, timeout=SETUP_TIMEOUT_S)  # catalog sync and discover snapshots
+        results = run_flow(args.base_url, stub, steps)
+
+    if args.graph:
+        for pass_name, step_results in results.items():
+            for step, result in step_results.items():
+                print(f"\n  {pass_name} {step}")
+                print_graph(result["graph"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({p: {s: r["counts"] for s, r in sr.items()} for p, sr in results.items()}, f, indent=2)
+
+    if args.update_budgets:
+        save_budgets(results, args.library_size, args.budgets)
+        print(f"📌 Budgets stored: {args.budgets}")
+        return 0
+
+    if budgets.get("librarySize") != args.library_size:
+        print(f"⚠️  Budgets were recorded with {budgets.get('librarySize')} items, this run used {args.library_size}")
+    exceeded = over_budget(results, budgets)
+    for pass_name, step, service, limit, actual in exceeded:
+        print(f"\n❌ OVER BUDGET: {pass_name} {step} made {actual} {service} calls (budget {limit})")
+        print_graph(results[pass_name][step]["graph"])
+    if not exceeded:
+        print("\n✅ Every step within its upstream call budget")
+    return 1 if exceeded else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except requests.RequestException as e:
+        print(f"Budget run aborted: {e}")
+        sys.exit(1)
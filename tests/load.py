@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+DagzFlix Load Generator
+Replays a weighted mix of BFF calls from concurrent simulated users, each holding
+its own session cookie, and reports p50/p95/p99 latency, throughput and error
+rate per route. A ramp (--ramp 5,10,25,50) steps the user count up and stops at
+the first level that breaks the error-rate or p95 limits.
+
+Usage:
+    python -m tests.load --users 20 --duration 30
+    python -m tests.load --stub --library-size 10000 --ramp 5,10,25,50,100
+    python backend_test.py --load        (same options after --load)
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE_URL = os.environ.get("DAGZFLIX_BASE_URL", "https://media-hub-dev-1.preview.emergentagent.com/api")
+
+# Route name -> weight in the replayed mix (roughly one dashboard + browsing session)
+DEFAULT_MIX = {
+    "media/library": 25,
+    "media/detail": 15,
+    "recommendations": 5,
+    "search": 10,
+    "proxy/image": 35,
+    "media/progress": 10,
+}
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of an unsorted list (pct in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def parse_mix(spec):
+    """Parse 'route=weight,route=weight' into a mix dict"""
+    mix = {}
+    for part in spec.split(","):
+        route, _, weight = part.partition("=")
+        if route.strip():
+            mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+class RouteStats:
+    """Latency samples and error count for one route"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    def add(self, seconds, ok):
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "throughput": count / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p95_ms": percentile(self.latencies, 95) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+            "max_ms": max(self.latencies, default=0.0) * 1000,
+        }
+
+
+class LoadRecorder:
+    """Thread-safe collection of RouteStats keyed by route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.routes.setdefault(route, RouteStats()).add(seconds, ok)
+
+    def report(self, elapsed):
+        with self._lock:
+            per_route = {route: stats.summary(elapsed) for route, stats in sorted(self.routes.items())}
+            total = RouteStats()
+            for stats in self.routes.values():
+                total.latencies.extend(stats.latencies)
+                total.errors += stats.errors
+        return {"elapsed_s": elapsed, "routes": per_route, "total": total.summary(elapsed)}
+
+
+def login(base_url, username, password):
+    """Open a requests.Session with a real dagzflix_session cookie"""
+    http = requests.Session()
+    res = http.post(f"{base_url}/auth/login", json={"username": username, "password": password}, timeout=30)
+    if res.status_code != 200 or "dagzflix_session" not in http.cookies:
+        raise RuntimeError(f"Login failed for {username}: {res.status_code} {res.text[:200]}")
+    return http
+
+
+def point_bff_at_stub(base_url, stub):
+    """Save the stand-in as both Jellyfin and Jellyseerr in the BFF setup"""
+    res = requests.post(f"{base_url}/setup/save", json={
+        "jellyfinUrl": stub.url, "jellyfinApiKey": stub.api_key,
+        "jellyseerrUrl": stub.url, "jellyseerrApiKey": stub.api_key,
+    }, timeout=10)
+    res.raise_for_status()
+
+
+def discover_catalog(http, base_url):
+    """Collect item ids and search words used to build realistic request parameters"""
+    ids, words = [], set()
+    for item_type in ("Movie", "Series"):
+        res = http.get(f"{base_url}/media/library", params={"type": item_type, "limit": 100}, timeout=60)
+        for item in res.json().get("items", []):
+            ids.append(item["id"])
+            words.update(w for w in item.get("name", "").split() if len(w) > 2 and not w.isdigit())
+    if not ids:
+        raise RuntimeError("Library is empty - nothing to replay")
+    return ids, sorted(words) or ["a"]
+
+
+class LoadRunner:
+    """Drives concurrent simulated users against the BFF"""
+
+    def __init__(self, base_url=BASE_URL, credentials=(("demo", "demo"),), mix=None,
+                 think_time=0.0, timeout=60, seed=1):
+        self.base_url = base_url
+        self.credentials = list(credentials)
+        self.mix = dict(mix or DEFAULT_MIX)
+        self.think_time = think_time
+        self.timeout = timeout
+        self.seed = seed
+        self.item_ids = []
+        self.search_words = []
+
+    def _request(self, http, route, rng):
+        """Issue one call for a route; returns the response"""
+        url = f"{self.base_url}/{route}"
+        if route == "media/library":
+            params = {"type": rng.choice(["Movie", "Series"]), "limit": 20, "startIndex": rng.randrange(0, 200, 20)}
+            return http.get(url, params=params, timeout=self.timeout)
+        if route == "media/detail":
+            return http.get(url, params={"id": rng.choice(self.item_ids)}, timeout=self.timeout)
+        if route == "search":
+            return http.get(url, params={"q": rng.choice(self.search_words)}, timeout=self.timeout)
+        if route == "proxy/image":
+            params = {"itemId": rng.choice(self.item_ids), "type": rng.choice(["Primary", "Backdrop"]), "maxWidth": 400}
+            return http.get(url, params=params, timeout=self.timeout)
+        if route == "media/progress":
+            body = {"itemId": rng.choice(self.item_ids), "positionTicks": rng.randint(1, 5000) * 10000000, "isPaused": False}
+            return http.post(url, json=body, timeout=self.timeout)
+        return http.get(url, timeout=self.timeout)
+
+    def _user_loop(self, index, http, deadline, recorder):
+        rng = random.Random(self.seed * 1000 + index)
+        routes, weights = zip(*self.mix.items())
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            started = time.perf_counter()
+            try:
+                res = self._request(http, route, rng)
+                ok = res.status_code < 400
+                res.content  # make sure the full body is read before stopping the clock
+            except requests.RequestException:
+                ok = False
+            recorder.record(route, time.perf_counter() - started, ok)
+            if self.think_time:
+                time.sleep(rng.uniform(0, self.think_time * 2))
+
+    def run(self, users, duration):
+        """Run one load level; returns the report dict"""
+        sessions = [
+            login(self.base_url, *self.credentials[i % len(self.credentials)])
+            for i in range(users)
+        ]
+        if not self.item_ids:
+            self.item_ids, self.search_words = discover_catalog(sessions[0], self.base_url)
+
+        recorder = LoadRecorder()
+        started = time.monotonic()
+        deadline = started + duration
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            for i, http in enumerate(sessions):
+                pool.submit(self._user_loop, i, http, deadline, recorder)
+        report = recorder.report(time.monotonic() - started)
+        report["users"] = users
+        for http in sessions:
+            http.close()
+        return report
+
+    def ramp(self, levels, duration, max_error_rate=0.05, max_p95_ms=None):
+        """Step through user levels; stop at the first level that exceeds the limits"""
+        reports = []
+        for users in levels:
+            report = self.run(users, duration)
+            reports.append(report)
+            print_report(report)
+            total = report["total"]
+            broken = total["error_rate"] > max_error_rate or (max_p95_ms and total["p95_ms"] > max_p95_ms)
+            if broken:
+                print(f"❌ Breaking point: {users} concurrent users "
+                      f"(error rate {total['error_rate']:.1%}, p95 {total['p95_ms']:.0f}ms)")
+                break
+        else:
+            print(f"✅ No breaking point up to {levels[-1]} concurrent users")
+        return reports
+
+
+def print_report(report):
+    """Print a per-route latency table"""
+    print("=" * 96)
+    print(f"{report['users']} users - {report['elapsed_s']:.1f}s")
+    print("=" * 96)
+    header = f"{'route':<20}{'reqs':>8}{'req/s':>9}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, s in rows:
+        print(f"{route:<20}{s['requests']:>8}{s['throughput']:>9.1f}{s['error_rate'] * 100:>7.1f}%"
+              f"{s['p50_ms']:>10.0f}{s['p95_ms']:>10.0f}{s['p99_ms']:>10.0f}{s['max_ms']:>10.0f}")
+    print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the DagzFlix BFF")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--ramp", help="comma separated user levels, e.g. 5,10,25,50")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per load level")
+    parser.add_argument("--mix", help="route=weight,... (default: %s)" % ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between calls per user (s)")
+    parser.add_argument("--username", default="demo")
+    parser.add_argument("--password", default="demo")
+    parser.add_argument("--max-error-rate", type=float, default=0.05)
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--json", help="write the reports to this file")
+    parser.add_argument("--stub", action="store_true", help="run against the local upstream stand-in")
+    parser.add_argument("--library-size", type=int, default=1000, help="stand-in library size (--stub)")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="stand-in latency per call (s, --stub)")
+    args = parser.parse_args(argv)
+
+    stub = None
+    credentials = [(args.username, args.password)]
+    if args.stub:
+        from tests.upstream_stub import UpstreamStub
+        stub = UpstreamStub(host=os.environ.get("DAGZFLIX_STUB_HOST", "127.0.0.1"),
+                            library_size=args.library_size, default_latency=args.stub_latency).start()
+        point_bff_at_stub(args.base_url, stub)
+        credentials = list(stub.users.items())
+
+    runner = LoadRunner(args.base_url, credentials, mix=parse_mix(args.mix) if args.mix else None,
+                        think_time=args.think_time)
+    try:
+        if args.ramp:
+            levels = [int(v) for v in args.ramp.split(",") if v.strip()]
+            reports = runner.ramp(levels, args.duration, args.max_error_rate, args.max_p95_ms)
+        else:
+            reports = [runner.run(args.users, args.duration)]
+            print_report(reports[0])
+    finally:
+        if stub:
+            stub.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    return reports
+
+
+if __name__ == "__main__":
+    main()
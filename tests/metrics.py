@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+DagzFlix Metrics Scraper
+Reads the BFF's Prometheus endpoint (/api/metrics) and the Server-Timing header
+of individual responses, and reports where each route spends its time
+(mongo, jellyfin, jellyseerr, tmdb, transform, serialize).
+
+Usage:
+    python -m tests.metrics                        per-route phase breakdown
+    python -m tests.metrics --route recommendations
+    python -m tests.metrics --raw                  dump the scrape as-is
+    METRICS_TOKEN=... python -m tests.metrics      the token the BFF was started with (required)
+"""
+
+import argparse
+import os
+import re
+import sys
+
+import requests
+
+from tests.load import BASE_URL
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_prometheus(text):
+    """Prometheus text exposition -> list of (name, labels dict, float value)"""
+    samples = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        parsed = {k: v.replace('\\"', '"').replace("\\n", "\n").replace("\\\\", "\\")
+                  for k, v in _LABEL.findall(labels or "")}
+        samples.append((name, parsed, float(value)))
+    return samples
+
+
+def parse_server_timing(header):
+    """'mongo;dur=2.1, jellyfin;dur=80;desc="2 calls"' -> {'mongo': 2.1, 'jellyfin': 80.0}"""
+    phases = {}
+    for entry in (header or "").split(","):
+        parts = [p.strip() for p in entry.split(";")]
+        if not parts[0]:
+            continue
+        for param in parts[1:]:
+            key, _, value = param.partition("=")
+            if key == "dur":
+                phases[parts[0]] = float(value)
+    return phases
+
+
+def scrape(base_url=BASE_URL, token=None, timeout=30):
+    """Fetch and parse /api/metrics"""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    res = requests.get(f"{base_url}/metrics", headers=headers, timeout=timeout)
+    res.raise_for_status()
+    return parse_prometheus(res.text)
+
+
+def sample_value(samples, name, **labels):
+    """Sum of the samples of one metric whose labels include the given ones"""
+    return sum(v for n, l, v in samples if n == name and all(l.get(k) == str(x) for k, x in labels.items()))
+
+
+def phase_breakdown(samples):
+    """{route: {'requests': n, 'mean_ms': x, 'phases': {phase: mean_ms}}} from the histogram sums/counts"""
+    routes = {}
+    for name, labels, value in samples:
+        if name.startswith("dagzflix_request_duration_seconds_"):
+            entry = routes.setdefault(labels["route"], {"requests": 0, "sum": 0.0, "phases": {}})
+            if name.endswith("_count"):
+                entry["requests"] += value
+            elif name.endswith("_sum"):
+                entry["sum"] += value
+    for name, labels, value in samples:
+        if name.startswith("dagzflix_phase_duration_seconds_") and labels["route"] in routes:
+            phase = routes[labels["route"]]["phases"].setdefault(labels["phase"], {"count": 0, "sum": 0.0})
+            if name.endswith("_count"):
+                phase["count"] += value
+            elif name.endswith("_sum"):
+                phase["sum"] += value
+    breakdown = {}
+    for route, entry in routes.items():
+        requests_count = entry["requests"] or 1
+        breakdown[route] = {
+            "requests": int(entry["requests"]),
+            "mean_ms": round(entry["sum"] * 1000 / requests_count, 2),
+            # Phase means are per request of the route, so phases add up to (at most) the route mean
+            "phases": {p: round(v["sum"] * 1000 / requests_count, 2) for p, v in sorted(entry["phases"].items())},
+        }
+    return breakdown
+
+
+def print_breakdown(breakdown, only=None):
+    print(f"{'route':<22} {'requests':>8} {'mean':>9}   phases (mean ms per request)")
+    for route in sorted(breakdown):
+        if only and route != only:
+            continue
+        entry = breakdown[route]
+        phases = "  ".join(f"{p} {ms:.1f}" for p, ms in entry["phases"].items())
+        print(f"{route:<22} {entry['requests']:>8} {entry['mean_ms']:>7.1f}ms   {phases}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the DagzFlix BFF metrics endpoint")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--token", default=os.environ.get("METRICS_TOKEN"))
+    parser.add_argument("--route", help="only this route")
+    parser.add_argument("--raw", action="store_true", help="print the scrape as-is")
+    args = parser.parse_args(argv)
+
+    if args.raw:
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        print(requests.get(f"{args.base_url}/metrics", headers=headers, timeout=30).text)
+        return 0
+    print_breakdown(phase_breakdown(scrape(args.base_url, args.token)), args.route)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except requests.RequestException as e:
+        print(f"Scrape failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,46 @@
+"""
+Run a snippet of JavaScript against the repository's server modules with Node.
+The `@/` import alias of jsconfig.json is resolved to the repository root and
+the repository's .js files are loaded as ES modules, as Next.js does.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+
+NODE = shutil.which("node")
+ROOT_URL = "file://" + os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + "/"
+
+_HOOK = """
+import { readFile } from 'node:fs/promises';
+const ROOT = %(root)s;
+export async function resolve(specifier, context, next) {
+  if (specifier.startsWith('@/')) specifier = new URL(specifier.slice(2).replace(/(\\\\.js)?$/, '.js'), ROOT).href;
+  return next(specifier, context);
+}
+export async function load(url, context, next) {
+  if (url.startsWith(ROOT) && url.endsWith('.js')) {
+    return { format: 'module', source: await readFile(new URL(url)), shortCircuit: true };
+  }
+  return next(url, context);
+}
+"""
+
+_PRELUDE = """
+import { register } from 'node:module';
+register('data:text/javascript,' + encodeURIComponent(%(hook)s));
+const load = path => import(%(root)s + path);
+const report = value => console.log(JSON.stringify(value));
+"""
+
+
+def run_js(tmp_path, body, timeout=30):
+    """Run body (an ES module; `await load('lib/server/x.js')` imports a module, `report(value)`
+    prints a result) and return the reported values, in order"""
+    hook = _HOOK % {"root": json.dumps(ROOT_URL)}
+    script = tmp_path / "script.mjs"
+    script.write_text(_PRELUDE % {"hook": json.dumps(hook), "root": json.dumps(ROOT_URL)} + body + "\nprocess.exit(0);\n")
+    done = subprocess.run([NODE, str(script)], capture_output=True, text=True, timeout=timeout)
+    assert done.returncode == 0, done.stderr
+    return [json.loads(line) for line in done.stdout.splitlines() if line.strip()]
@@ -0,0 +1,50 @@
+"""
+Self-checks for benchmark baseline storage and regression gating.
+"""
+
+from tests.bench import bench_routes, compare, load_baseline, save_baseline
+from tests.upstream_stub import UpstreamStub
+
+
+def _route(median):
+    return {"median_ms": median, "p95_ms": median * 1.5, "min_ms": median / 2, "errors": 0, "iterations": 5}
+
+
+def test_baseline_roundtrip(tmp_path):
+    assert load_baseline(1000, str(tmp_path)) is None
+    save_baseline(1000, {"search": _route(12.0)}, str(tmp_path))
+    baseline = load_baseline(1000, str(tmp_path))
+    assert baseline["size"] == 1000
+    assert baseline["routes"]["search"]["median_ms"] == 12.0
+
+
+def test_partial_update_keeps_other_routes(tmp_path):
+    save_baseline(1000, {"search": _route(12.0), "recommendations": _route(80.0)}, str(tmp_path))
+    save_baseline(1000, {"search": _route(10.0)}, str(tmp_path))
+    routes = load_baseline(1000, str(tmp_path))["routes"]
+    assert routes["search"]["median_ms"] == 10.0
+    assert routes["recommendations"]["median_ms"] == 80.0
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"routes": {
+        "recommendations": _route(100.0),
+        "search": _route(2.0),
+        "media/library": _route(50.0),
+    }}
+    current = {
+        "recommendations": _route(140.0),   # +40% and +40ms -> regression
+        "search": _route(4.0),              # x2 but only +2ms -> under the noise floor
+        "media/library": _route(55.0),      # +10% -> within threshold
+        "discover": _route(80.0),           # no baseline yet -> ignored
+    }
+    regressions = compare(current, baseline, threshold=0.25, min_delta_ms=5.0)
+    assert [r[0] for r in regressions] == ["recommendations"]
+    assert regressions[0][3] == 1.4
+
+
+def test_bench_routes_are_deterministic():
+    first = bench_routes(UpstreamStub(library_size=50, seed=42))
+    second = bench_routes(UpstreamStub(library_size=50, seed=42))
+    assert first == second
+    assert "recommendations" in first and first["media/progress"][0] == "POST"
@@ -0,0 +1,91 @@
+"""
+Self-checks for upstream call budget accounting (no BFF required).
+"""
+
+import json
+import urllib.request
+
+from tests.budgets import BUDGETS_PATH, call_graph, count_calls, flow_steps, load_budgets, main, over_budget, save_budgets
+from tests.upstream_stub import UpstreamStub
+
+
+def _call(at, endpoint, target, service="jellyfin", method="GET"):
+    return {"at": at, "method": method, "endpoint": endpoint, "service": service, "target": target}
+
+
+def _result(jellyfin, jellyseerr):
+    return {"counts": {"jellyfin": jellyfin, "jellyseerr": jellyseerr, "total": jellyfin + jellyseerr}, "graph": []}
+
+
+def test_budgets_roundtrip(tmp_path):
+    path = str(tmp_path / "call_budgets.json")
+    assert load_budgets(path) is None
+    save_budgets({"cold": {"dashboard": _result(7, 3)}}, 1000, path)
+    budgets = load_budgets(path)
+    assert budgets["librarySize"] == 1000
+    assert budgets["budgets"]["cold"]["dashboard"] == {"jellyfin": 7, "jellyseerr": 3}
+
+
+def test_check_without_budgets_fails(tmp_path, capsys):
+    assert main(["--budgets", str(tmp_path / "missing.json"), "--base-url", "http://127.0.0.1:9"]) == 1
+    assert "--update-budgets" in capsys.readouterr().out
+
+
+def test_check_against_unrecorded_budgets_fails(tmp_path, capsys):
+    path = tmp_path / "call_budgets.json"
+    path.write_text(json.dumps({"librarySize": 1000, "recordedAt": None, "budgets": {"cold": {}, "warm": {}}}))
+    assert main(["--budgets", str(path), "--base-url", "http://127.0.0.1:9"]) == 1
+    assert "not recorded" in capsys.readouterr().out
+
+
+def test_versioned_budgets_cover_the_whole_flow():
+    budgets = load_budgets(BUDGETS_PATH)
+    steps = ["login", "dashboard", "detail", "play", "progress", "search"]
+    for pass_name in ("cold", "warm"):
+        assert sorted(budgets["budgets"][pass_name]) == sorted(steps)
+        assert all(set(limits) == {"jellyfin", "jellyseerr"} for limits in budgets["budgets"][pass_name].values())
+
+
+def test_over_budget_flags_only_exceeded_services():
+    budgets = {"budgets": {"cold": {"dashboard": {"jellyfin": 7, "jellyseerr": 3}},
+                           "warm": {"dashboard": {"jellyfin": 0, "jellyseerr": 0}}}}
+    results = {
+        "cold": {"dashboard": _result(7, 2), "detail": _result(50, 50)},  # detail has no budget yet
+        "warm": {"dashboard": _result(2, 0)},
+    }
+    assert over_budget(results, budgets) == [("warm", "dashboard", "jellyfin", 0, 2)]
+
+
+def test_call_graph_attributes_calls_to_the_request_in_flight():
+    sent = [
+        {"request": "GET media/detail", "status": 200, "start": 1.0, "end": 2.0},
+        {"request": "GET media/stream", "status": 200, "start": 2.5, "end": 3.0},
+    ]
+    item = "a" * 32
+    calls = [
+        _call(1.1, "item", f"/Users/u1/Items/{item}"),
+        _call(1.2, "item", f"/Users/u1/Items/{'b' * 32}"),
+        _call(1.3, "seerr_tv", "/api/v1/tv/100001", service="jellyseerr"),
+        _call(2.7, "playback_info", f"/Items/{item}/PlaybackInfo", method="POST"),
+        _call(3.5, "items", "/Users/u1/Items?Limit=20"),
+    ]
+    assert count_calls(calls) == {"jellyfin": 4, "jellyseerr": 1, "total": 5}
+    graph = dict(call_graph(sent, calls))
+    assert graph["GET media/detail -> 200"] == [
+        ("jellyfin", "GET item", 2, "/Users/u1/Items/{id}"),
+        ("jellyseerr", "GET seerr_tv", 1, "/api/v1/tv/100001"),
+    ]
+    assert graph["GET media/stream -> 200"] == [("jellyfin", "POST playback_info", 1, "/Items/{id}/PlaybackInfo")]
+    assert graph["after the responses"] == [("jellyfin", "GET items", 1, "/Users/u1/Items?Limit=20")]
+
+
+def test_stub_logs_calls_per_service():
+    with UpstreamStub(library_size=50) as stub:
+        steps = flow_steps(stub)
+        assert list(steps) == ["login", "dashboard", "detail", "play", "progress", "search"]
+        req = urllib.request.Request(f"{stub.url}/Users/AuthenticateByName", method="POST",
+                                     data=json.dumps({"Username": "demo", "Pw": "demo"}).encode(),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=10) as res:
+            assert res.status == 200
+        assert [(c["method"], c["endpoint"], c["service"]) for c in stub.call_log] == [("POST", "auth", "jellyfin")]
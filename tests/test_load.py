@@ -0,0 +1,92 @@
+"""
+Self-checks for the load generator statistics and user loop (no BFF required).
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tests.load import LoadRecorder, LoadRunner, parse_mix, percentile
+
+
+class _FakeBff(BaseHTTPRequestHandler):
+    """Minimal BFF: cookie login, a library page, 500s on search"""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, data, cookie=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if cookie:
+            self.send_header("Set-Cookie", f"dagzflix_session={cookie}; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/api/auth/login":
+            return self._send(200, {"success": True}, cookie="abc")
+        self._send(200 if "dagzflix_session" in self.headers.get("Cookie", "") else 401, {})
+
+    def do_GET(self):
+        if "dagzflix_session" not in self.headers.get("Cookie", ""):
+            return self._send(401, {"error": "Non authentifie"})
+        if self.path.startswith("/api/media/library"):
+            return self._send(200, {"items": [{"id": "i1", "name": "Dark River 1"}, {"id": "i2", "name": "Lost Echo 2"}]})
+        if self.path.startswith("/api/search"):
+            return self._send(500, {"error": "boom"})
+        self._send(200, {})
+
+
+@pytest.fixture
+def bff():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeBff)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api"
+    server.shutdown()
+
+
+def test_percentile_interpolates():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([], 95) == 0.0
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_parse_mix():
+    assert parse_mix("search=2, proxy/image=8") == {"search": 2.0, "proxy/image": 8.0}
+
+
+def test_recorder_report():
+    recorder = LoadRecorder()
+    for ms in (10, 20, 30, 40):
+        recorder.record("search", ms / 1000, ok=ms != 40)
+    report = recorder.report(elapsed=2.0)
+    search = report["routes"]["search"]
+    assert search["requests"] == 4 and search["errors"] == 1
+    assert search["error_rate"] == 0.25 and search["throughput"] == 2.0
+    assert report["total"]["p50_ms"] == pytest.approx(25.0)
+
+
+def test_runner_records_every_route(bff):
+    runner = LoadRunner(bff, mix={"media/library": 1, "search": 1, "media/progress": 1})
+    report = runner.run(users=3, duration=0.5)
+    routes = report["routes"]
+    assert set(routes) == {"media/library", "search", "media/progress"}
+    assert routes["search"]["error_rate"] == 1.0
+    assert routes["media/library"]["errors"] == 0
+    assert routes["media/progress"]["errors"] == 0
+
+
+def test_ramp_stops_at_breaking_point(bff, capsys):
+    runner = LoadRunner(bff, mix={"search": 1})
+    reports = runner.ramp([1, 2, 4], duration=0.2)
+    assert len(reports) == 1
+    assert "Breaking point: 1" in capsys.readouterr().out
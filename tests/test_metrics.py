@@ -0,0 +1,45 @@
+"""
+Self-checks for the metrics scraper parsing (no BFF required).
+"""
+
+from tests.metrics import parse_prometheus, parse_server_timing, phase_breakdown, sample_value
+
+SCRAPE = """\
+# HELP dagzflix_request_duration_seconds BFF request latency by route and status
+# TYPE dagzflix_request_duration_seconds histogram
+dagzflix_request_duration_seconds_bucket{route="recommendations",method="GET",status="200",le="0.5"} 3
+dagzflix_request_duration_seconds_bucket{route="recommendations",method="GET",status="200",le="+Inf"} 4
+dagzflix_request_duration_seconds_sum{route="recommendations",method="GET",status="200"} 1.6
+dagzflix_request_duration_seconds_count{route="recommendations",method="GET",status="200"} 4
+# TYPE dagzflix_phase_duration_seconds histogram
+dagzflix_phase_duration_seconds_sum{route="recommendations",method="GET",phase="jellyseerr"} 1.2
+dagzflix_phase_duration_seconds_count{route="recommendations",method="GET",phase="jellyseerr"} 4
+dagzflix_phase_duration_seconds_sum{route="recommendations",method="GET",phase="mongo"} 0.04
+dagzflix_phase_duration_seconds_count{route="recommendations",method="GET",phase="mongo"} 2
+# TYPE dagzflix_upstream_requests_total counter
+dagzflix_upstream_requests_total{origin="http://127.0.0.1:8096"} 12
+dagzflix_response_cache_entries 7
+"""
+
+
+def test_parse_prometheus_samples_and_labels():
+    samples = parse_prometheus(SCRAPE + 'odd_label{path="a \\"quoted\\" value"} 1\n')
+    assert ("dagzflix_response_cache_entries", {}, 7.0) in samples
+    assert sample_value(samples, "dagzflix_upstream_requests_total", origin="http://127.0.0.1:8096") == 12
+    assert sample_value(samples, "dagzflix_request_duration_seconds_bucket", le="+Inf") == 4
+    assert sample_value(samples, "odd_label", path='a "quoted" value') == 1
+
+
+def test_phase_breakdown_means_per_request():
+    breakdown = phase_breakdown(parse_prometheus(SCRAPE))
+    reco = breakdown["recommendations"]
+    assert reco["requests"] == 4
+    assert reco["mean_ms"] == 400.0
+    # mongo ran on 2 of the 4 requests: its mean is spread over all of them
+    assert reco["phases"] == {"jellyseerr": 300.0, "mongo": 10.0}
+
+
+def test_parse_server_timing():
+    header = 'mongo;dur=2.5, jellyfin;dur=80.1;desc="2 calls", serialize;dur=0.3, total;dur=91'
+    assert parse_server_timing(header) == {"mongo": 2.5, "jellyfin": 80.1, "serialize": 0.3, "total": 91.0}
+    assert parse_server_timing(None) == {}
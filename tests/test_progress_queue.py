@@ -0,0 +1,41 @@
+"""
+Self-checks for lib/server/progress-queue (Node required, no BFF).
+"""
+
+import pytest
+
+from tests.nodejs import NODE, run_js
+
+pytestmark = pytest.mark.skipif(NODE is None, reason="node is not installed")
+
+SETUP = """
+const { ProgressQueue } = await load('lib/server/progress-queue.js');
+const sent = [];
+const queue = new ProgressQueue({ send: async report => { sent.push(report); }, flushInterval: 50 });
+const sleep = ms => new Promise(r => setTimeout(r, ms));
+"""
+
+
+def test_reports_of_one_interval_collapse_into_one_send(tmp_path):
+    [before, after, stats] = run_js(tmp_path, SETUP + """
+for (let position = 1; position <= 6; position++) queue.enqueue('u1|item', { position });
+queue.enqueue('u1|other', { position: 9 });
+report(sent.length);
+await sleep(120);
+report(sent);
+report(queue.stats());
+""")
+    assert before == 0
+    assert after == [{"position": 6}, {"position": 9}]  # one upstream POST per key, latest position only
+    assert (stats["received"], stats["coalesced"], stats["sent"], stats["pending"]) == (7, 5, 2, 0)
+
+
+def test_stop_supersedes_queued_progress(tmp_path):
+    [sent] = run_js(tmp_path, SETUP + """
+queue.enqueue('u1|item', { position: 3 });
+queue.enqueue('u1|item', { position: 4 });
+await queue.sendNow('u1|item', { stopped: 5 });
+await sleep(120);
+report(sent);
+""")
+    assert sent == [{"stopped": 5}]
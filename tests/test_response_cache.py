@@ -0,0 +1,59 @@
+"""
+Self-checks for lib/server/response-cache (Node required, no BFF).
+"""
+
+import pytest
+
+from tests.nodejs import NODE, run_js
+
+pytestmark = pytest.mark.skipif(NODE is None, reason="node is not installed")
+
+SETUP = """
+const { ResponseCache } = await load('lib/server/response-cache.js');
+const cache = new ResponseCache();
+const deferred = () => { let resolve; const promise = new Promise(r => { resolve = r; }); return { promise, resolve }; };
+"""
+
+
+def test_delete_during_load_is_not_stored(tmp_path):
+    [first, waiting, second, stored] = run_js(tmp_path, SETUP + """
+const slow = deferred();
+const pending = cache.wrap('resume|u1', { ttl: 60000, tags: ['user:u1'] }, () => slow.promise);
+cache.delete('resume|u1');  // progress report while the read is in flight
+const fresh = cache.wrap('resume|u1', { ttl: 60000, tags: ['user:u1'] }, async () => 'new');
+slow.resolve('old');
+report(await pending);
+report(await fresh);
+report(await cache.wrap('resume|u1', {}, async () => 'reloaded'));
+report(cache.get('resume|u1'));
+""")
+    assert (first, waiting) == ("old", "new")  # the waiting caller gets its answer, later reads reload
+    assert (second, stored) == ("new", "new")
+
+
+def test_tag_and_prefix_invalidation_detach_loads(tmp_path):
+    [by_tag, by_prefix, other] = run_js(tmp_path, SETUP + """
+const loads = ['a', 'b', 'c'].map(() => deferred());
+cache.wrap('played|u1', { tags: ['user:u1'] }, () => loads[0].promise);
+cache.wrap('userdata|u1|x', { tags: [] }, () => loads[1].promise);
+const kept = cache.wrap('userdata|u2|x', { tags: [] }, () => loads[2].promise);
+cache.invalidateTag('user:u1');
+cache.invalidatePrefix('userdata|u1|');
+loads.forEach(d => d.resolve('old'));
+await kept;
+report(cache.get('played|u1') ?? null);
+report(cache.get('userdata|u1|x') ?? null);
+report(cache.get('userdata|u2|x') ?? null);
+""")
+    assert (by_tag, by_prefix, other) == (None, None, "old")
+
+
+def test_concurrent_reads_share_one_load(tmp_path):
+    [calls, values] = run_js(tmp_path, SETUP + """
+let calls = 0;
+const loader = async () => { calls++; return 'v'; };
+const values = await Promise.all([1, 2, 3].map(() => cache.wrap('k', {}, loader)));
+report(calls);
+report(values);
+""")
+    assert calls == 1 and values == ["v", "v", "v"]
@@ -0,0 +1,133 @@
+"""
+Self-checks for the Jellyfin/Jellyseerr stand-in (stdlib only, no BFF required).
+"""
+
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from tests.upstream_stub import ENDPOINTS, UpstreamStub
+
+
+def _call(stub, path, method="GET", body=None, headers=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f"{stub.url}{path}", data=data, method=method, headers=headers or {})
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=10) as res:
+            raw = res.read()
+            return res.status, res.headers.get("Content-Type"), raw
+    except urllib.error.HTTPError as err:
+        return err.code, err.headers.get("Content-Type"), err.read()
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with UpstreamStub(library_size=200) as s:
+        yield s
+
+
+@pytest.fixture(scope="module")
+def login(stub):
+    status, _, raw = _call(stub, "/Users/AuthenticateByName", "POST", {"Username": "demo", "Pw": "demo"})
+    assert status == 200
+    data = json.loads(raw)
+    return data["User"]["Id"], {"X-Emby-Token": data["AccessToken"]}
+
+
+def test_authenticate_rejects_bad_password(stub):
+    status, _, _ = _call(stub, "/Users/AuthenticateByName", "POST", {"Username": "demo", "Pw": "nope"})
+    assert status == 401
+
+
+def test_items_require_token(stub):
+    status, _, _ = _call(stub, "/Users/x/Items")
+    assert status == 401
+
+
+def test_items_paging_and_fields(stub, login):
+    user_id, headers = login
+    status, _, raw = _call(stub, f"/Users/{user_id}/Items?IncludeItemTypes=Movie&Limit=10&StartIndex=5&Fields=Genres", headers=headers)
+    data = json.loads(raw)
+    assert status == 200
+    assert len(data["Items"]) == 10
+    assert all(i["Type"] == "Movie" for i in data["Items"])
+    assert "Genres" in data["Items"][0] and "People" not in data["Items"][0]
+    assert data["TotalRecordCount"] == sum(1 for i in stub.library if i["Type"] == "Movie")
+
+
+def test_user_policy_and_user_data_toggle(stub, login):
+    user_id, headers = login
+    status, _, raw = _call(stub, f"/Users/{user_id}", headers=headers)
+    assert status == 200 and "Policy" in json.loads(raw)
+    status, _, raw = _call(stub, f"/Users/{user_id}/Items?Limit=2&EnableUserData=false", headers=headers)
+    assert all("UserData" not in i for i in json.loads(raw)["Items"])
+    ids = ",".join(i["Id"] for i in stub.library[:3])
+    status, _, raw = _call(stub, f"/Users/{user_id}/Items?Ids={ids}&Fields=", headers=headers)
+    assert sorted(i["Id"] for i in json.loads(raw)["Items"]) == sorted(ids.split(","))
+    assert all("UserData" in i for i in json.loads(raw)["Items"])
+
+
+def test_server_items_incremental_listing():
+    with UpstreamStub(library_size=50) as stub:
+        headers = {"X-Emby-Token": stub.api_key}
+        status, _, raw = _call(stub, "/Items?Recursive=true&IncludeItemTypes=Movie,Series&Fields=Genres", headers=headers)
+        assert status == 200 and json.loads(raw)["TotalRecordCount"] == 50
+        assert "GenreItems" in json.loads(raw)["Items"][0]
+
+        stub.touch_items([i["Id"] for i in stub.library[:4]])
+        stub.remove_items([stub.library[0]["Id"]])
+        since = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(time.time() - 60))
+        status, _, raw = _call(stub, f"/Items?MinDateLastSaved={since}", headers=headers)
+        assert json.loads(raw)["TotalRecordCount"] == 3
+
+
+def test_playback_info_and_similar(stub, login):
+    user_id, headers = login
+    movie = next(i for i in stub.library if i["Type"] == "Movie")
+    status, _, raw = _call(stub, f"/Items/{movie['Id']}/PlaybackInfo?UserId={user_id}", "POST", {"DeviceProfile": {}}, headers)
+    assert status == 200
+    pb = json.loads(raw)
+    assert pb["PlaySessionId"] and pb["MediaSources"][0]["MediaStreams"]
+    subtitles = [s for s in pb["MediaSources"][0]["MediaStreams"] if s["Type"] == "Subtitle"]
+    assert all(s["DeliveryUrl"].endswith(f"api_key={headers['X-Emby-Token']}") for s in subtitles)
+    status, _, raw = _call(stub, f"/Items/{movie['Id']}/Similar?Limit=5", headers=headers)
+    assert status == 200 and len(json.loads(raw)["Items"]) <= 5
+
+
+def test_image_is_png(stub):
+    item = stub.library[0]
+    status, content_type, raw = _call(stub, f"/Items/{item['Id']}/Images/Primary?maxWidth=200", headers={"X-Emby-Token": stub.api_key})
+    assert status == 200 and content_type == "image/png"
+    assert raw.startswith(b"\x89PNG")
+    assert stub.calls["image"] >= 1
+
+
+def test_jellyseerr_endpoints(stub):
+    headers = {"X-Api-Key": stub.api_key}
+    status, _, raw = _call(stub, "/api/v1/discover/movies?page=2", headers=headers)
+    assert status == 200 and len(json.loads(raw)["results"]) == 20
+    name = stub.library[3]["Name"]
+    status, _, raw = _call(stub, f"/api/v1/search?query={name.split()[0]}&page=1", headers=headers)
+    assert status == 200 and json.loads(raw)["totalResults"] > 0
+    status, _, raw = _call(stub, "/api/v1/request", "POST", {"mediaType": "movie", "mediaId": 900001}, headers)
+    assert status == 200 and stub.requested
+    status, _, raw = _call(stub, "/api/v1/movie/900001", headers=headers)
+    assert json.loads(raw)["mediaInfo"]["status"] == 2
+    assert all(endpoint in ENDPOINTS for endpoint in stub.calls)
+    status, _, _ = _call(stub, "/api/v1/discover/tv")
+    assert status == 401
+
+
+def test_latency_and_failure_injection():
+    with UpstreamStub(library_size=10, latency={"genres": 0.2}, failure_rate={"system": 1.0}) as stub:
+        started = time.perf_counter()
+        status, _, _ = _call(stub, "/Genres", headers={"X-Emby-Token": stub.api_key})
+        assert status == 200
+        assert time.perf_counter() - started >= 0.2
+        status, _, _ = _call(stub, "/System/Info/Public")
+        assert status == 503
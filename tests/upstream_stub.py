@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+"""
+DagzFlix Upstream Stand-in
+Local asyncio HTTP server that mimics the Jellyfin and Jellyseerr endpoints the
+BFF talks to, so the authenticated hot paths (library, recommendations, stream)
+can be exercised end-to-end on a machine with no network.
+
+Both APIs are served from the same origin: Jellyseerr paths live under /api/v1,
+everything else is answered as Jellyfin. Point the BFF at it with
+POST /api/setup/save using stub.url for both jellyfinUrl and jellyseerrUrl.
+
+Usage (in-process):
+    stub = UpstreamStub(library_size=1000, latency={'items': 0.05})
+    stub.start()
+    ...
+    stub.stop()
+
+Usage (standalone):
+    python -m tests.upstream_stub --port 8096 --library-size 10000 --latency items=0.08
+"""
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+DEFAULT_USERS = {"demo": "demo"}
+DEFAULT_API_KEY = "stub-api-key"
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary", "Drama",
+    "Family", "Fantasy", "History", "Horror", "Music", "Mystery", "Romance",
+    "Science Fiction", "Thriller", "War", "Western",
+]
+
+# TMDB genre ids as used by Jellyseerr discover/search results
+TMDB_GENRE_IDS = [28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 53, 10752, 37]
+
+TITLE_WORDS = [
+    "Dark", "Silent", "Last", "Broken", "Golden", "Hidden", "Lost", "Crimson", "Final",
+    "Midnight", "Iron", "Frozen", "Wild", "Secret", "Burning", "Shadow", "Electric",
+    "River", "Empire", "Station", "Garden", "Horizon", "Signal", "Harbor", "Storm",
+    "Kingdom", "Echo", "Road", "Witness", "Protocol", "Orchard", "Machine", "Island",
+]
+
+AUDIO_CODECS = ["aac", "ac3", "eac3", "dts", "truehd", "mp3", "flac"]
+
+# HLS renditions served under /Videos/{id}/: segments per playlist and bytes per segment
+HLS_SEGMENTS = 10
+HLS_SEGMENT_BYTES = 64 * 1024
+
+# Logical endpoint names used as keys for latency / failure_rate configuration
+ENDPOINTS = (
+    "system", "auth", "user", "items", "item", "resume", "genres", "similar", "playback_info",
+    "image", "sessions", "seasons", "episodes", "hls_playlist", "hls_segment", "seerr_status", "seerr_search", "seerr_discover",
+    "seerr_media", "seerr_collection", "seerr_request",
+)
+
+
+def _stable_id(*parts):
+    """Deterministic 32-char hex id, shaped like a Jellyfin item id"""
+    return hashlib.md5(":".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def _png(width, height, seed):
+    """Build a valid noise PNG so image payloads have realistic, incompressible size"""
+    rng = random.Random(seed)
+    row_len = width * 3
+    raw = bytearray()
+    for _ in range(height):
+        raw.append(0)
+        raw.extend(rng.getrandbits(8) for _ in range(row_len))
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(raw), 1)) + chunk(b"IEND", b"")
+
+
+def build_library(size, seed=42, played_ratio=0.15):
+    """Generate a deterministic Jellyfin-shaped library of Movie/Series items"""
+    rng = random.Random(seed)
+    items = []
+    for n in range(size):
+        item_type = "Series" if rng.random() < 0.3 else "Movie"
+        year = rng.randint(1970, 2026)
+        genres = rng.sample(GENRES, rng.randint(1, 3))
+        name = f"{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {n}"
+        item_id = _stable_id("item", seed, n)
+        audio = rng.choice(AUDIO_CODECS)
+        items.append({
+            "Id": item_id,
+            "Name": name,
+            "OriginalTitle": name,
+            "Type": item_type,
+            "Overview": f"{name} is a {genres[0].lower()} story. " * 4,
+            "Genres": genres,
+            "GenreItems": [{"Id": _stable_id("genre", g), "Name": g} for g in genres],
+            "CommunityRating": round(rng.uniform(3.0, 9.5), 1),
+            "OfficialRating": rng.choice(["PG", "PG-13", "R", "TV-MA", "TV-14"]),
+            "ProductionYear": year,
+            "PremiereDate": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00.0000000Z",
+            "DateCreated": f"{rng.randint(2019, 2026)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00.0000000Z",
+            "DateLastSaved": "2026-01-01T00:00:00.0000000Z",
+            "RunTimeTicks": rng.randint(80, 180) * 600000000,
+            "People": [
+                {"Name": f"Actor {rng.randint(1, 5000)}", "Role": f"Role {i}", "Type": "Actor", "Id": _stable_id("person", n, i)}
+                for i in range(8)
+            ],
+            "Studios": [{"Name": f"Studio {rng.randint(1, 200)}"}],
+            "Taglines": [f"The {genres[0].lower()} event of {year}"],
+            "ProviderIds": {"Tmdb": str(100000 + n), "Imdb": f"tt{1000000 + n}"},
+            "MediaSources": [] if item_type == "Series" else [{
+                "Id": item_id,
+                "Name": name,
+                "Size": rng.randint(1, 60) * 1024 ** 3,
+                "Container": rng.choice(["mkv", "mp4"]),
+                "MediaStreams": [
+                    {"Type": "Video", "Index": 0, "Codec": rng.choice(["h264", "hevc"]), "Width": 1920, "Height": 1080, "IsDefault": True},
+                    {"Type": "Audio", "Index": 1, "Codec": audio, "Language": "eng", "IsDefault": True},
+                    {"Type": "Subtitle", "Index": 2, "Codec": "srt", "Language": "fre", "DisplayTitle": "Francais"},
+                    {"Type": "Subtitle", "Index": 3, "Codec": "subrip", "Language": "eng", "DisplayTitle": "English"},
+                ],
+            }],
+            "ChildCount": rng.randint(1, 8) if item_type == "Series" else 0,
+            "HasSubtitles": True,
+            "_played": rng.random() < played_ratio,
+            "_position": rng.randint(1, 60) * 600000000 if rng.random() < 0.05 else 0,
+        })
+    return items
+
+
+# Heavy fields only included when requested through the Fields= parameter
+OPTIONAL_FIELDS = ("Overview", "Genres", "GenreItems", "People", "ProviderIds", "MediaSources", "Studios", "Taglines", "OriginalTitle")
+
+
+class UpstreamStub:
+    """In-process Jellyfin + Jellyseerr stand-in served by an asyncio event loop on a background thread"""
+
+    def __init__(self, host="127.0.0.1", port=0, library_size=1000, seed=42,
+                 latency=None, default_latency=0.0, failure_rate=None,
+                 users=None, api_key=DEFAULT_API_KEY, discover_pages=20):
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.latency = dict(latency or {})
+        self.default_latency = default_latency
+        self.failure_rate = dict(failure_rate or {})
+        self.users = dict(users or DEFAULT_USERS)
+        self.api_key = api_key
+        self.discover_pages = discover_pages
+        self.tokens = {}
+        self.requested = []
+        self.calls = collections.Counter()
+        self.call_log = []  # every routed call: {at (time.monotonic), method, endpoint, service, target}
+        self.playback_reports = []
+        self.image_queries = []
+        self._rng = random.Random(seed)
+        self._images = {}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.set_library_size(library_size)
+
+    # --- Configuration ---
+
+    def set_library_size(self, size):
+        """Regenerate the library with a new item count"""
+        self.library = build_library(size, seed=self.seed)
+        self.by_id = {item["Id"]: item for item in self.library}
+        self.by_tmdb = {item["ProviderIds"]["Tmdb"]: item for item in self.library}
+
+    def touch_items(self, item_ids):
+        """Mark items as modified now (visible to MinDateLastSaved= queries)"""
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S.0000000Z", time.gmtime())
+        for item_id in item_ids:
+            self.by_id[item_id]["DateLastSaved"] = stamp
+
+    def remove_items(self, item_ids):
+        """Delete items from the library"""
+        gone = set(item_ids)
+        self.library = [i for i in self.library if i["Id"] not in gone]
+        self.by_id = {item["Id"]: item for item in self.library}
+        self.by_tmdb = {item["ProviderIds"]["Tmdb"]: item for item in self.library}
+
+    def set_latency(self, endpoint, seconds):
+        """Set latency for one endpoint: a number, or a (min, max) tuple for uniform jitter"""
+        self.latency[endpoint] = seconds
+
+    def set_failure_rate(self, endpoint, rate):
+        """Set the probability (0-1) that an endpoint answers 503"""
+        self.failure_rate[endpoint] = rate
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start serving on a background thread; returns once the socket is bound"""
+        self._thread = threading.Thread(target=self._run, name="upstream-stub", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle_connection, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def serve_forever(self):
+        """Serve on the current event loop (standalone mode)"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        async with self._server:
+            await self._server.serve_forever()
+
+    # --- HTTP plumbing (HTTP/1.1 with keep-alive, Content-Length bodies only) ---
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                body = await reader.readexactly(length) if length else b""
+
+                status, content_type, payload = await self._dispatch(method, target, headers, body)
+                reason = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+                          404: "Not Found", 500: "Internal Server Error", 503: "Service Unavailable"}.get(status, "OK")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                head = [
+                    f"HTTP/1.1 {status} {reason}",
+                    f"Content-Type: {content_type}",
+                    f"Content-Length: {len(payload)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, headers, body):
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/")
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        segments = [s for s in path.split("/") if s]
+
+        endpoint, handler = self._route(method, segments)
+        if not handler:
+            return 404, "application/json", b'{"message":"Not Found"}'
+        self.calls[endpoint] += 1
+        self.call_log.append({
+            "at": time.monotonic(),
+            "method": method,
+            "endpoint": endpoint,
+            "service": "jellyseerr" if endpoint.startswith("seerr_") else "jellyfin",
+            "target": target,
+        })
+
+        delay = self.latency.get(endpoint, self.default_latency)
+        if isinstance(delay, (tuple, list)):
+            delay = self._rng.uniform(*delay)
+        if delay:
+            await asyncio.sleep(delay)
+        if self._rng.random() < self.failure_rate.get(endpoint, 0.0):
+            return 503, "application/json", b'{"message":"Stub failure injected"}'
+
+        if endpoint.startswith("seerr_"):
+            if headers.get("x-api-key") != self.api_key:
+                return 401, "application/json", b'{"message":"Unauthorized"}'
+        elif endpoint not in ("system", "auth"):
+            token = headers.get("x-emby-token") or query.get("api_key", "")
+            if token not in self.tokens and token != self.api_key:
+                return 401, "application/json", b'{"message":"Unauthorized"}'
+
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return 400, "application/json", b'{"message":"Invalid JSON"}'
+        try:
+            result = handler(segments, query, payload)
+        except Exception as err:  # surface stub bugs as 500s instead of dropped connections
+            return 500, "application/json", json.dumps({"message": str(err)}).encode()
+        if isinstance(result, tuple):
+            return result
+        if result is None:
+            return 204, "application/json", b""
+        return 200, "application/json", json.dumps(result).encode()
+
+    def _route(self, method, s):
+        """Map (method, path segments) to (endpoint name, handler)"""
+        n = len(s)
+        if s[:2] == ["api", "v1"]:
+            if s[2:] == ["status"]:
+                return "seerr_status", lambda *_: {"version": "stub"}
+            if s[2:] == ["search"]:
+                return "seerr_search", self._seerr_search
+            if n == 4 and s[2] == "discover" and s[3] in ("movies", "tv"):
+                return "seerr_discover", self._seerr_discover
+            if n == 4 and s[2] == "collection":
+                return "seerr_collection", self._seerr_collection
+            if n == 4 and s[2] in ("movie", "tv"):
+                return "seerr_media", self._seerr_media
+            if s[2:] == ["request"] and method == "POST":
+                return "seerr_request", self._seerr_request
+            return None, None
+        if s == ["System", "Info", "Public"]:
+            return "system", lambda *_: {"ServerName": "DagzFlix Stub", "Version": "10.9.0"}
+        if s == ["Users", "AuthenticateByName"] and method == "POST":
+            return "auth", self._authenticate
+        if n == 2 and s[0] == "Users" and method == "GET":
+            return "user", self._user
+        if n == 3 and s[0] == "Users" and s[2] == "Items":
+            return "items", self._items
+        if s == ["Items"] and method == "GET":
+            return "items", self._items
+        if n == 4 and s[0] == "Users" and s[2:] == ["Items", "Resume"]:
+            return "resume", self._resume
+        if n == 4 and s[0] == "Users" and s[2] == "Items":
+            return "item", self._item
+        if s == ["Genres"]:
+            return "genres", self._genres
+        if n == 3 and s[0] == "Items" and s[2] == "Similar":
+            return "similar", self._similar
+        if n == 3 and s[0] == "Items" and s[2] == "PlaybackInfo" and method == "POST":
+            return "playback_info", self._playback_info
+        if n >= 4 and s[0] == "Items" and s[2] == "Images":
+            return "image", self._image
+        if n == 3 and s[0] == "Shows" and s[2] == "Seasons":
+            return "seasons", self._seasons
+        if n == 3 and s[0] == "Shows" and s[2] == "Episodes":
+            return "episodes", self._episodes
+        if n == 3 and s[0] == "Videos" and s[2] in ("master.m3u8", "main.m3u8"):
+            return "hls_playlist", self._hls_playlist
+        if n == 5 and s[0] == "Videos" and s[2] == "hls1":
+            return "hls_segment", self._hls_segment
+        if s[:2] == ["Sessions", "Playing"] and method == "POST":
+            return "sessions", self._playback_report
+        return None, None
+
+    # --- Jellyfin handlers ---
+
+    def _authenticate(self, segments, query, payload):
+        username = payload.get("Username", "")
+        if self.users.get(username) != payload.get("Pw"):
+            return 401, "application/json", b'{"message":"Invalid username or password"}'
+        user_id = _stable_id("user", username)
+        token = _stable_id("token", username, time.time(), self._rng.random())
+        self.tokens[token] = user_id
+        return {"User": self._user_dto(username), "AccessToken": token, "ServerId": "stub"}
+
+    def _user_dto(self, username):
+        return {
+            "Id": _stable_id("user", username),
+            "Name": username,
+            "Policy": {"IsAdministrator": False, "EnableAllFolders": True, "EnabledFolders": [], "BlockedTags": []},
+        }
+
+    def _user(self, segments, query, payload):
+        for username in self.users:
+            if _stable_id("user", username) == segments[1]:
+                return self._user_dto(username)
+        return 404, "application/json", b'{"message":"User not found"}'
+
+    def _shape(self, item, fields, user_data=True):
+        """Project an internal item to the Jellyfin wire shape honouring Fields= and EnableUserData="""
+        out = {k: v for k, v in item.items() if not k.startswith("_") and k not in OPTIONAL_FIELDS}
+        for field in OPTIONAL_FIELDS:
+            if field in fields:
+                out[field] = item[field]
+        if "Genres" in fields:
+            out["GenreItems"] = item["GenreItems"]  # Jellyfin attaches GenreItems along with Genres
+        out["ImageTags"] = {"Primary": item["Id"][:8]}
+        out["BackdropImageTags"] = [item["Id"][8:16]]
+        if user_data:
+            out["UserData"] = {
+                "Played": item["_played"],
+                "PlaybackPositionTicks": item["_position"],
+                "PlayedPercentage": round(item["_position"] / item["RunTimeTicks"] * 100, 1) if item["_position"] else 0,
+            }
+        return out
+
+    def _items(self, segments, query, payload):
+        items = self.library
+        if query.get("Ids"):
+            wanted = query["Ids"].split(",")
+            items = [self.by_id[i] for i in wanted if i in self.by_id]
+        types = [t for t in query.get("IncludeItemTypes", "").split(",") if t]
+        if types:
+            items = [i for i in items if i["Type"] in types]
+        if query.get("MinDateLastSaved"):
+            since = query["MinDateLastSaved"][:19]
+            items = [i for i in items if i["DateLastSaved"][:19] >= since]
+        if query.get("IsPlayed") == "true":
+            items = [i for i in items if i["_played"]]
+        if query.get("SearchTerm"):
+            term = query["SearchTerm"].lower()
+            items = [i for i in items if term in i["Name"].lower()]
+        if query.get("GenreIds"):
+            wanted = set(query["GenreIds"].split("|")) | set(query["GenreIds"].split(","))
+            items = [i for i in items if any(g["Id"] in wanted for g in i["GenreItems"])]
+        if query.get("Genres"):
+            wanted = set(query["Genres"].split("|"))
+            items = [i for i in items if wanted & set(i["Genres"])]
+
+        start = int(query.get("StartIndex", 0) or 0)
+        limit = int(query.get("Limit", 0) or 0) or len(items)
+        sort_by = query.get("SortBy", "SortName").split(",")[0]
+        if sort_by == "Random":
+            items = random.Random(self._rng.random()).sample(items, min(len(items), start + limit))
+        else:
+            key = {
+                "DateCreated": lambda i: i["DateCreated"],
+                "PremiereDate": lambda i: i["PremiereDate"],
+                "CommunityRating": lambda i: i["CommunityRating"],
+                "ProductionYear": lambda i: i["ProductionYear"],
+                "DatePlayed": lambda i: i["Id"],
+            }.get(sort_by, lambda i: i["Name"])
+            items = sorted(items, key=key, reverse=query.get("SortOrder") == "Descending")
+
+        total = len(items) if sort_by != "Random" else len(self.library)
+        fields = set(query.get("Fields", "").split(","))
+        page = items[start:start + limit]
+        user_data = query.get("EnableUserData", "true").lower() != "false"
+        return {"Items": [self._shape(i, fields, user_data) for i in page], "TotalRecordCount": total, "StartIndex": start}
+
+    def _playback_report(self, segments, query, payload):
+        self.playback_reports.append(("/".join(segments), payload))
+        return None
+
+    def _resume(self, segments, query, payload):
+        limit = int(query.get("Limit", 20) or 20)
+        fields = set(query.get("Fields", "").split(","))
+        items = [i for i in self.library if i["_position"] and not i["_played"]][:limit]
+        return {"Items": [self._shape(i, fields) for i in items], "TotalRecordCount": len(items)}
+
+    def _item(self, segments, query, payload):
+        item = self.by_id.get(segments[3])
+        if not item:
+            return 404, "application/json", b'{"message":"Item not found"}'
+        return self._shape(item, set(OPTIONAL_FIELDS))
+
+    def _genres(self, segments, query, payload):
+        return {"Items": [{"Id": _stable_id("genre", g), "Name": g} for g in sorted(GENRES)], "TotalRecordCount": len(GENRES)}
+
+    def _similar(self, segments, query, payload):
+        item = self.by_id.get(segments[1])
+        if not item:
+            return 404, "application/json", b'{"message":"Item not found"}'
+        limit = int(query.get("Limit", 12) or 12)
+        genre = item["Genres"][0]
+        fields = set(query.get("Fields", "").split(","))
+        similar = [i for i in self.library if genre in i["Genres"] and i["Id"] != item["Id"]][:limit]
+        return {"Items": [self._shape(i, fields) for i in similar], "TotalRecordCount": len(similar)}
+
+    def _seasons(self, segments, query, payload):
+        series = self.by_id.get(segments[1])
+        if not series or series["Type"] != "Series":
+            return 404, "application/json", b'{"message":"Series not found"}'
+        seasons = [{"Id": _stable_id("season", series["Id"], n), "Name": f"Saison {n}", "IndexNumber": n,
+                    "Type": "Season", "SeriesId": series["Id"], "ChildCount": 8}
+                   for n in range(1, series["ChildCount"] + 1)]
+        return {"Items": seasons, "TotalRecordCount": len(seasons)}
+
+    def _episodes(self, segments, query, payload):
+        series = self.by_id.get(segments[1])
+        if not series or series["Type"] != "Series":
+            return 404, "application/json", b'{"message":"Series not found"}'
+        episodes = []
+        for season in range(1, series["ChildCount"] + 1):
+            season_id = _stable_id("season", series["Id"], season)
+            if query.get("SeasonId") and query["SeasonId"] != season_id:
+                continue
+            episodes += [{"Id": _stable_id("episode", series["Id"], season, e), "Name": f"Episode {e}", "Type": "Episode",
+                          "IndexNumber": e, "ParentIndexNumber": season, "SeasonId": season_id, "SeriesId": series["Id"],
+                          "Overview": f"{series['Name']} S{season:02d}E{e:02d}.", "RunTimeTicks": 45 * 600000000,
+                          "UserData": {"Played": False, "PlaybackPositionTicks": 0}}
+                         for e in range(1, 9)]
+        return {"Items": episodes, "TotalRecordCount": len(episodes)}
+
+    def _playback_info(self, segments, query, payload):
+        item = self.by_id.get(segments[1])
+        if not item:
+            return 404, "application/json", b'{"message":"Item not found"}'
+        # External subtitles get a DeliveryUrl carrying the caller's token, like Jellyfin's
+        token = next((t for t, user in self.tokens.items() if user == query.get("UserId")), self.api_key)
+        sources = [{**source, "MediaStreams": [
+            {**s, "DeliveryUrl": f"/Videos/{item['Id']}/{source['Id']}/Subtitles/{s['Index']}/0/Stream.vtt?api_key={token}"}
+            if s["Type"] == "Subtitle" else s
+            for s in source["MediaStreams"]
+        ]} for source in item["MediaSources"]]
+        return {"MediaSources": sources, "PlaySessionId": _stable_id("play", item["Id"], self._rng.random())}
+
+    def _hls_playlist(self, segments, query, payload):
+        """master.m3u8 -> one variant (main.m3u8); main.m3u8 -> HLS_SEGMENTS 6s segments. URIs are
+        relative and repeat the request's query, api_key included, like Jellyfin's"""
+        if segments[1] not in self.by_id:
+            return 404, "application/json", b'{"message":"Item not found"}'
+        qs = urlencode(query)
+        if segments[2] == "master.m3u8":
+            lines = ["#EXTM3U", '#EXT-X-STREAM-INF:BANDWIDTH=8000000,CODECS="avc1.640028,mp4a.40.2"', f"main.m3u8?{qs}"]
+        else:
+            lines = ["#EXTM3U", "#EXT-X-PLAYLIST-TYPE:VOD", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:6", "#EXT-X-MEDIA-SEQUENCE:0"]
+            for n in range(HLS_SEGMENTS):
+                lines += ["#EXTINF:6.000000, nodesc",
+                          f"hls1/main/{n}.ts?{qs}&runtimeTicks={n * 60000000}&actualSegmentLengthTicks=60000000"]
+            lines.append("#EXT-X-ENDLIST")
+        return 200, "application/vnd.apple.mpegurl", "\n".join(lines).encode()
+
+    def _hls_segment(self, segments, query, payload):
+        if segments[1] not in self.by_id:
+            return 404, "application/json", b'{"message":"Item not found"}'
+        seed = hashlib.sha256(f"{segments[1]}:{segments[4]}".encode()).digest()
+        return 200, "video/mp2t", seed * (HLS_SEGMENT_BYTES // len(seed))
+
+    def _image(self, segments, query, payload):
+        if segments[1] not in self.by_id:
+            return 404, "application/json", b'{"message":"Item not found"}'
+        image_type = segments[3]
+        self.image_queries.append(dict(query))
+        width = max(16, min(int(query.get("maxWidth", 400) or 400), 1920))
+        height = width * 9 // 16 if image_type in ("Backdrop", "Thumb") else width * 3 // 2
+        # Scale down the generated bitmap so huge widths stay cheap to build, size still grows with width
+        key = (image_type, width)
+        if key not in self._images:
+            self._images[key] = _png(max(1, width // 4), max(1, height // 4), f"{image_type}:{width}")
+        return 200, "image/png", self._images[key]
+
+    # --- Jellyseerr handlers ---
+
+    def _tmdb_result(self, n, media_type):
+        rng = random.Random(f"tmdb:{self.seed}:{media_type}:{n}")
+        title = f"{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} T{n}"
+        tmdb_id = 100000 + n
+        local = self.by_tmdb.get(str(tmdb_id))
+        date = f"{rng.randint(1980, 2026)}-{rng.randint(1, 12):02d}-01"
+        result = {
+            "id": tmdb_id,
+            "mediaType": media_type,
+            "overview": f"{title} overview.",
+            "posterPath": f"/p{tmdb_id}.jpg",
+            "backdropPath": f"/b{tmdb_id}.jpg",
+            "voteAverage": round(rng.uniform(4.0, 9.0), 1),
+            "genreIds": rng.sample(TMDB_GENRE_IDS, rng.randint(1, 3)),
+        }
+        if media_type == "tv":
+            result.update(name=title, firstAirDate=date)
+        else:
+            result.update(title=title, releaseDate=date)
+        if local:
+            result["mediaInfo"] = {"status": 5, "jellyfinMediaId": local["Id"]}
+        return result
+
+    def _seerr_discover(self, segments, query, payload):
+        media_type = "tv" if segments[3] == "tv" else "movie"
+        page = max(1, int(query.get("page", 1) or 1))
+        offset = 0 if media_type == "movie" else 50000
+        results = [self._tmdb_result(offset + (page - 1) * 20 + i, media_type) for i in range(20)] if page <= self.discover_pages else []
+        return {"page": page, "totalPages": self.discover_pages, "totalResults": self.discover_pages * 20, "results": results}
+
+    def _seerr_search(self, segments, query, payload):
+        term = query.get("query", "").lower()
+        page = max(1, int(query.get("page", 1) or 1))
+        matches = [i for i in self.library if term and term in i["Name"].lower()]
+        results = []
+        for item in matches[(page - 1) * 20:page * 20]:
+            n = int(item["ProviderIds"]["Tmdb"]) - 100000
+            result = self._tmdb_result(n, "tv" if item["Type"] == "Series" else "movie")
+            result["title" if item["Type"] == "Movie" else "name"] = item["Name"]
+            results.append(result)
+        total_pages = max(1, (len(matches) + 19) // 20)
+        return {"page": page, "totalPages": total_pages, "totalResults": len(matches), "results": results}
+
+    def _seerr_status_of(self, tmdb_id):
+        """Jellyseerr media status: 5 for library items, 2 (pending) for requested ones, else None"""
+        if str(tmdb_id) in self.by_tmdb:
+            return 5
+        if any(str(r["media"]["tmdbId"]) == str(tmdb_id) for r in self.requested):
+            return 2
+        return None
+
+    def _seerr_media(self, segments, query, payload):
+        local = self.by_tmdb.get(segments[3])
+        status = self._seerr_status_of(segments[3])
+        info = {"status": status, "jellyfinMediaId": local["Id"] if local else None} if status else None
+        tmdb_id = int(segments[3]) if segments[3].isdigit() else 0
+        details = {
+            "id": tmdb_id,
+            "mediaInfo": info,
+            "relatedVideos": [{"type": "Trailer", "site": "YouTube", "key": f"yt{tmdb_id}", "name": "Official Trailer",
+                               "url": f"https://www.youtube.com/watch?v=yt{tmdb_id}"}],
+        }
+        # Movies come in sagas of four consecutive TMDB ids (every other block)
+        if segments[2] == "movie" and tmdb_id and (tmdb_id // 4) % 2 == 0:
+            details["collection"] = {"id": tmdb_id // 4, "name": f"Saga {tmdb_id // 4}"}
+        return details
+
+    def _seerr_collection(self, segments, query, payload):
+        collection_id = int(segments[3]) if segments[3].isdigit() else 0
+        parts = []
+        for tmdb_id in range(collection_id * 4, collection_id * 4 + 4):
+            part = self._tmdb_result(tmdb_id - 100000, "movie")
+            local = self.by_tmdb.get(str(tmdb_id))
+            if local:
+                part["title"] = local["Name"]
+            parts.append(part)
+        return {"id": collection_id, "name": f"Saga {collection_id}", "overview": f"Saga {collection_id} overview.", "parts": parts}
+
+    def _seerr_request(self, segments, query, payload):
+        if not payload.get("mediaId"):
+            return 400, "application/json", b'{"message":"mediaId required"}'
+        request = {"id": len(self.requested) + 1, "status": 1, "media": {"tmdbId": payload["mediaId"], "mediaType": payload.get("mediaType", "movie")}}
+        self.requested.append(request)
+        return request
+
+
+def _parse_pairs(values, cast):
+    """Parse repeated name=value CLI options into a dict"""
+    out = {}
+    for value in values or []:
+        name, _, raw = value.partition("=")
+        out[name] = cast(raw)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Jellyfin/Jellyseerr stand-in for DagzFlix")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8096)
+    parser.add_argument("--library-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--default-latency", type=float, default=0.0, help="seconds added to every endpoint")
+    parser.add_argument("--latency", action="append", help=f"endpoint=seconds, endpoints: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--failure-rate", action="append", help="endpoint=probability (0-1) of answering 503")
+    args = parser.parse_args()
+
+    stub = UpstreamStub(
+        host=args.host, port=args.port, library_size=args.library_size, seed=args.seed,
+        default_latency=args.default_latency,
+        latency=_parse_pairs(args.latency, float),
+        failure_rate=_parse_pairs(args.failure_rate, float),
+    )
+    print(f"DagzFlix upstream stub on http://{args.host}:{args.port} ({args.library_size} items)")
+    print(f"Users: {', '.join(stub.users)} | Jellyseerr API key: {stub.api_key}")
+    try:
+        asyncio.run(stub.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
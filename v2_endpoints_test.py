@@ -10,9 +10,10 @@ Tests the 4 new V2 endpoints specifically as requested in the review:
 
 import requests
 import json
+import os
 import sys
 
-BASE_URL = "https://media-hub-dev-1.preview.emergentagent.com/api"
+BASE_URL = os.environ.get("DAGZFLIX_BASE_URL", "https://media-hub-dev-1.preview.emergentagent.com/api")
 
 def log_test(test_name, success, details=""):
     """Log test results with consistent formatting"""